@@ -15,33 +15,118 @@ Author: Video Calling AI Team
 Version: 1.0.0
 """
 
-from fastapi import FastAPI, WebSocket
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+from fastapi import FastAPI, Response, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
 import uvicorn
 
 # Import configuration
-from config import PORT, LIVEKIT_URL, GEMINI_API_KEY
+from config import (
+    PORT,
+    LIVEKIT_URL,
+    GEMINI_API_KEY,
+    GEMINI_PRELOAD,
+    HTTP_GZIP_LEVEL,
+    HTTP_GZIP_MIN_BYTES,
+    WS_PER_MESSAGE_DEFLATE
+)
 
 # Import models for health check
 from models import HealthResponse
 
+# Import metrics
+from services.metrics import (
+    PROMETHEUS_CONTENT_TYPE,
+    MetricsMiddleware,
+    loop_lag_monitor,
+    render_metrics
+)
+
+# Import the deferred Gemini SDK loader
+from services.ai_service import preload_gemini_sdk
+
+# Import the JSON response class (orjson when installed)
+from services.serialization import FastJSONResponse
+
+# Import admission control (rate limits and load shedding)
+from services.admission import AdmissionMiddleware
+
+# Import the background job pool
+from services.jobs import job_manager
+
+# Import the audio ingestion worker pool
+from services.audio_ingest import audio_ingestor
+
+# Import the meeting sentiment timeline
+from services.sentiment_timeline import sentiment_timeline
+
+# Import tracing and profiling
+from services.profiler import loop_watchdog
+from services.tracing import TracingMiddleware, tracer
+
 # Import routers
-from routers import ai_router, code_router
+from routers import admin_router, ai_router, code_router, jobs_router, session_router
 
 # Import WebSocket handlers
-from websockets import websocket_ai_chat, websocket_yjs_sync
+from websockets import (
+    websocket_ai_chat,
+    websocket_code_room,
+    websocket_job_updates,
+    websocket_sentiment_updates,
+    websocket_yjs_sync
+)
+from websockets.ai_chat import chat_manager
+from websockets.collaborative import room_manager
 
 
 # ==================== App Initialization ====================
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Startup/shutdown hooks"""
+    # Connect the multi-worker room relay (no-op in single-worker mode)
+    await room_manager.start()
+    # Sample event loop lag for /metrics
+    loop_lag_monitor.start()
+    # Capture the stack of whatever blocks the event loop
+    loop_watchdog.start()
+    # Import the Gemini SDK off the event loop; serving starts without waiting for it
+    preload = asyncio.create_task(preload_gemini_sdk()) if GEMINI_API_KEY and GEMINI_PRELOAD else None
+    yield
+    if preload is not None and not preload.done():
+        preload.cancel()
+    loop_watchdog.stop()
+    await loop_lag_monitor.stop()
+    # Snapshot collaborative rooms so a restart doesn't lose edits
+    await room_manager.close()
+    # Store live AI chat sessions so clients resume them after the restart
+    await chat_manager.close()
+    # Stop background job workers
+    await job_manager.close()
+    # Stop the audio conversion worker processes
+    audio_ingestor.close()
+    # Stop pushing sentiment updates
+    await sentiment_timeline.close()
+    tracer.close()
+
+
 app = FastAPI(
     title="Video Calling AI Server",
     description="FastAPI server for AI-powered features in video calling application",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=FastJSONResponse,
+    lifespan=lifespan
 )
 
+# Rate-limit clients and shed load (inside CORS, so 429/503 responses carry CORS headers)
+app.add_middleware(AdmissionMiddleware)
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -49,22 +134,45 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Retry-After"],
 )
 
+# Compress large JSON responses (endpoints that set Content-Encoding themselves are left alone)
+if HTTP_GZIP_MIN_BYTES > 0:
+    app.add_middleware(GZipMiddleware, minimum_size=HTTP_GZIP_MIN_BYTES, compresslevel=HTTP_GZIP_LEVEL)
+
+# Open a root span per sampled request (no-op unless TRACE_EXPORT is set)
+app.add_middleware(TracingMiddleware)
+
+# Record request count and latency per route (outermost, so it times the whole stack)
+app.add_middleware(MetricsMiddleware)
+
 
 # ==================== Include Routers ====================
 
 app.include_router(ai_router)
 app.include_router(code_router)
+app.include_router(jobs_router)
+app.include_router(session_router)
+app.include_router(admin_router)
 
 
 # ==================== WebSocket Endpoints ====================
 
 @app.websocket("/ws/ai-chat/{client_id}")
-async def ai_chat_websocket(websocket: WebSocket, client_id: str):
+async def ai_chat_websocket(
+    websocket: WebSocket,
+    client_id: str,
+    room_id: Optional[str] = None,
+    batch: bool = False,
+    resume_token: Optional[str] = None
+):
     """
     WebSocket endpoint for real-time AI chat with audio support
     
+    Pass ?room_id=<meeting room> so clients of the same meeting share one
+    transcription of the meeting audio and one meeting context.
+    
     Message types:
     - text: {"type": "text", "content": "user message"}
     - audio: {"type": "audio", "data": "base64_encoded_audio"}
@@ -72,8 +180,17 @@ async def ai_chat_websocket(websocket: WebSocket, client_id: str):
     - start_listening: {"type": "start_listening"}
     - stop_listening: {"type": "stop_listening"}
     - clear: {"type": "clear"} - Clear chat history
+    
+    A new session is sent {"type": "session", "resume_token": "..."}.
+    Reconnecting with the same client_id and ?resume_token=<token> resumes
+    the session (see SESSION_STORE); a wrong or missing token for an existing
+    session is refused with close code 4401.
+    
+    Offer the "msgpack" subprotocol for MessagePack binary frames, and pass
+    ?batch=true to receive events produced together as one
+    {"type": "batch", "events": [...]} frame.
     """
-    await websocket_ai_chat(websocket, client_id)
+    await websocket_ai_chat(websocket, client_id, room_id, batch, resume_token)
 
 
 @app.websocket("/ws/yjs/{room_id}")
@@ -81,12 +198,50 @@ async def yjs_sync_websocket(websocket: WebSocket, room_id: str):
     """
     WebSocket endpoint for Yjs document synchronization (Collaborative Code Editor)
     
-    This is a broadcast server that relays Yjs sync messages between clients.
+    The server keeps a merged copy of each room's document and answers
+    sync-step-1 itself; updates and awareness messages are relayed to peers.
     Supports: sync-step-1, sync-step-2, update, awareness messages
     """
     await websocket_yjs_sync(websocket, room_id)
 
 
+@app.websocket("/ws/code/{room_id}")
+async def code_room_websocket(websocket: WebSocket, room_id: str, participant: Optional[str] = None):
+    """
+    WebSocket endpoint for room-shared code execution (Collaborative Code Editor)
+    
+    A run triggered by any member executes once and its status, streamed
+    output and final result are broadcast to the whole room; late joiners
+    get the current or last execution.
+    
+    Message types:
+    - run: {"type": "run", "code": "...", "language": "python", "stdin": ""}
+    """
+    await websocket_code_room(websocket, room_id, participant)
+
+
+@app.websocket("/ws/jobs/{job_id}")
+async def job_updates_websocket(websocket: WebSocket, job_id: str):
+    """
+    WebSocket endpoint pushing a background job's progress (see /api/jobs)
+    
+    Sends {"type": "job", "status": ..., "result": ...} now and on each
+    status change, and closes once the job has finished.
+    """
+    await websocket_job_updates(websocket, job_id)
+
+
+@app.websocket("/ws/sentiment/{room_id}")
+async def sentiment_updates_websocket(websocket: WebSocket, room_id: str):
+    """
+    WebSocket endpoint pushing a meeting room's rolling sentiment
+    
+    Sends the room's timeline on connect, then every SENTIMENT_PUSH_INTERVAL_MS
+    the changed buckets and current room / per-speaker mood.
+    """
+    await websocket_sentiment_updates(websocket, room_id)
+
+
 # ==================== HTTP Endpoints ====================
 
 @app.get("/health", response_model=HealthResponse)
@@ -98,6 +253,18 @@ async def health_check():
     }
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """
+    Prometheus metrics endpoint
+    
+    Request latency per route, Gemini call latency/retries, code execution
+    counts and concurrency, WebSocket connections per room, send queue depth
+    and event loop lag, for this worker process.
+    """
+    return Response(render_metrics(), media_type=PROMETHEUS_CONTENT_TYPE)
+
+
 @app.get("/")
 async def root():
     """Root endpoint with API information"""
@@ -131,6 +298,7 @@ if __name__ == "__main__":
     print(f"Gemini API: {'Configured' if GEMINI_API_KEY else 'Not configured - set GEMINI_API_KEY'}")
     print(f"API Docs: http://localhost:{PORT}/docs")
     print(f"ReDoc: http://localhost:{PORT}/redoc")
+    print("Development mode (auto-reload) - use serve.py in production")
     print("=" * 60)
     
     uvicorn.run(
@@ -139,5 +307,6 @@ if __name__ == "__main__":
         port=PORT,
         reload=True,
         log_level="info",
-        ws="wsproto"  # Use wsproto instead of websockets for compatibility
+        ws="wsproto",  # Use wsproto instead of websockets for compatibility
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE
     )
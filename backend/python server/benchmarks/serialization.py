@@ -0,0 +1,159 @@
+"""
+Serialization Benchmark - Encode/decode cost of AI chat events per codec
+=======================================================================
+
+Times encoding and decoding of representative AI chat and code room
+WebSocket events with the stdlib json module (as Starlette's send_json does),
+orjson and MessagePack (each when installed), and compares the frames and
+encode time of one AI answer sent as separate frames vs. batch envelopes.
+
+Usage:
+    python benchmarks/serialization.py
+    python benchmarks/serialization.py --iterations 50000 --output serialization.json
+"""
+import argparse
+import json
+import time
+from typing import Callable, Dict, List, Tuple
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# Envelope type used by services/serialization.py
+BATCH_EVENT = "batch"
+
+ANSWER = (
+    "Here is a summary of the discussion so far:\n\n"
+    + "".join(f"- **Point {i}**: the team agreed to revisit item {i} next sprint ✓\n" for i in range(30))
+)
+
+EVENTS = {
+    "typing": {"type": "typing", "status": True},
+    "message": {"type": "message", "role": "assistant", "content": ANSWER},
+    "meeting_transcription": {
+        "type": "meeting_transcription",
+        "content": "Could we move the deadline to Friday so QA has time to finish?",
+        "speaker": "Participant"
+    },
+    "history": {
+        "type": "history",
+        "messages": [
+            {"role": "user" if i % 2 == 0 else "assistant", "content": ANSWER[:200 + 20 * i]}
+            for i in range(20)
+        ]
+    },
+    "execution_output": {
+        "type": "execution_output",
+        "execution_id": "3f2a9c1e8b7d4e6f",
+        "stream": "stdout",
+        "data": "line of program output\n" * 40
+    }
+}
+
+# (name, encode, decode), where encode returns what goes on the wire
+Codec = Tuple[str, Callable[[dict], object], Callable[[object], object]]
+
+
+def available_codecs() -> List[Codec]:
+    codecs: List[Codec] = [(
+        "json",
+        lambda obj: json.dumps(obj, separators=(",", ":"), ensure_ascii=False),
+        json.loads
+    )]
+    if orjson is not None:
+        codecs.append(("orjson", lambda obj: orjson.dumps(obj).decode("utf-8"), orjson.loads))
+    if msgpack is not None:
+        codecs.append((
+            "msgpack",
+            lambda obj: msgpack.packb(obj, use_bin_type=True),
+            lambda data: msgpack.unpackb(data, raw=False)
+        ))
+    return codecs
+
+
+def per_call_us(function: Callable, argument, iterations: int) -> float:
+    start_time = time.perf_counter()
+    for _ in range(iterations):
+        function(argument)
+    return (time.perf_counter() - start_time) / iterations * 1e6
+
+
+def wire_bytes(frame) -> int:
+    return len(frame.encode("utf-8")) if isinstance(frame, str) else len(frame)
+
+
+def bench_events(codecs: List[Codec], iterations: int) -> Dict[str, dict]:
+    results = {}
+    for event_name, event in EVENTS.items():
+        results[event_name] = {}
+        for codec_name, encode, decode in codecs:
+            frame = encode(event)
+            results[event_name][codec_name] = {
+                "bytes": wire_bytes(frame),
+                "encode_us": round(per_call_us(encode, event, iterations), 3),
+                "decode_us": round(per_call_us(decode, frame, iterations), 3)
+            }
+    return results
+
+
+def bench_answer(codecs: List[Codec], iterations: int) -> Dict[str, dict]:
+    """One answer: typing on, then typing off + message (unbatched: 3 frames, batched: 2)"""
+    typing_on = EVENTS["typing"]
+    typing_off = {"type": "typing", "status": False}
+    message = EVENTS["message"]
+
+    def unbatched(encode):
+        return [encode(typing_on), encode(typing_off), encode(message)]
+
+    def batched(encode):
+        return [encode(typing_on), encode({"type": BATCH_EVENT, "events": [typing_off, message]})]
+
+    results = {}
+    for codec_name, encode, _ in codecs:
+        results[codec_name] = {}
+        for mode, build in (("separate", unbatched), ("batched", batched)):
+            frames = build(encode)
+            results[codec_name][mode] = {
+                "frames": len(frames),
+                "bytes": sum(wire_bytes(frame) for frame in frames),
+                "encode_us": round(per_call_us(build, encode, iterations), 3)
+            }
+    return results
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="WebSocket event serialization benchmark")
+    parser.add_argument("--iterations", type=int, default=20000, help="Calls timed per measurement")
+    parser.add_argument("--output", help="Write the JSON result here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    codecs = available_codecs()
+
+    result = {
+        "codecs": [name for name, _, _ in codecs],
+        "iterations": args.iterations,
+        "events": bench_events(codecs, args.iterations),
+        "answer": bench_answer(codecs, args.iterations)
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
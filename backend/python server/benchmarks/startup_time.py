@@ -0,0 +1,177 @@
+"""
+Startup Time Benchmark - Cold start to first served request
+===========================================================
+
+Starts the server from this checkout several times and measures how long
+each start takes until /health answers, plus the latency of that first
+request. It also profiles `import app` with -X importtime to show which
+modules dominate, and checks that the Gemini SDK is not imported until it
+is needed.
+
+Usage:
+    python benchmarks/startup_time.py --runs 5
+    python benchmarks/startup_time.py --entry uvicorn --output baseline.json
+    python benchmarks/startup_time.py --env GEMINI_PRELOAD=false
+"""
+import argparse
+import http.client
+import json
+import os
+import re
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Command per entry point; {port} is filled in per run
+ENTRY_COMMANDS = {
+    # Production launcher (uvloop/httptools when installed, no reloader)
+    "serve": [sys.executable, "serve.py"],
+    # Plain uvicorn with its defaults, for comparison
+    "uvicorn": [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", "{port}",
+                "--ws", "wsproto", "--log-level", "warning"]
+}
+
+IMPORTTIME_LINE = re.compile(r"^import time:\s+(\d+) \|\s+(\d+) \|( +)(\S+)")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def server_env(port: int, extra_env: List[str]) -> Dict[str, str]:
+    env = dict(os.environ)
+    env["PORT"] = str(port)
+    env["SERVER_HOST"] = "127.0.0.1"
+    env.setdefault("YJS_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="startup-"), "rooms.sqlite3"))
+    for item in extra_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    return env
+
+
+def first_response_ms(port: int) -> Optional[float]:
+    """Latency of one GET /health, or None if nothing is listening yet"""
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=5)
+    try:
+        start_time = time.perf_counter()
+        connection.request("GET", "/health")
+        response = connection.getresponse()
+        response.read()
+        if response.status != 200:
+            return None
+        return (time.perf_counter() - start_time) * 1000
+    except OSError:
+        return None
+    finally:
+        connection.close()
+
+
+def measure_start(entry: str, extra_env: List[str], timeout: float, poll_interval: float) -> dict:
+    """Start the server once and time it until the first successful request"""
+    port = free_port()
+    command = [part.format(port=port) for part in ENTRY_COMMANDS[entry]]
+    start_time = time.perf_counter()
+    process = subprocess.Popen(
+        command, cwd=SERVER_DIR, env=server_env(port, extra_env),
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        deadline = start_time + timeout
+        while time.perf_counter() < deadline:
+            if process.poll() is not None:
+                raise RuntimeError(f"Server exited during startup (code {process.returncode})")
+            latency_ms = first_response_ms(port)
+            if latency_ms is not None:
+                return {
+                    "ready_ms": round((time.perf_counter() - start_time) * 1000, 1),
+                    "first_request_ms": round(latency_ms, 2)
+                }
+            time.sleep(poll_interval)
+        raise RuntimeError(f"Server did not answer within {timeout}s")
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=15)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def profile_imports(top: int) -> dict:
+    """Import `app` in a fresh interpreter and report the most expensive direct imports"""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c",
+         "import sys, app; print('google.generativeai' in sys.modules)"],
+        cwd=SERVER_DIR, capture_output=True, text=True
+    )
+    total_us = None
+    direct: List[dict] = []
+    for line in result.stderr.splitlines():
+        match = IMPORTTIME_LINE.match(line)
+        if not match:
+            continue
+        self_us, cumulative_us, indent, name = match.groups()
+        if name == "app" and len(indent) == 1:
+            total_us = int(cumulative_us)
+        elif len(indent) == 3:
+            # Direct imports of app.py
+            direct.append({"module": name, "cumulative_ms": round(int(cumulative_us) / 1000, 1)})
+    direct.sort(key=lambda item: item["cumulative_ms"], reverse=True)
+    return {
+        "import_app_ms": round(total_us / 1000, 1) if total_us is not None else None,
+        "gemini_sdk_imported": result.stdout.strip().endswith("True"),
+        "top_imports": direct[:top]
+    }
+
+
+def summarize(samples: List[float]) -> dict:
+    return {
+        "median": round(statistics.median(samples), 1),
+        "min": round(min(samples), 1),
+        "max": round(max(samples), 1)
+    }
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Server cold start to first request benchmark")
+    parser.add_argument("--entry", choices=sorted(ENTRY_COMMANDS), default="serve", help="How the server is launched")
+    parser.add_argument("--runs", type=int, default=5, help="Number of cold starts")
+    parser.add_argument("--timeout", type=float, default=60.0, help="Seconds to wait for each start")
+    parser.add_argument("--poll-ms", type=float, default=5.0, help="Interval between readiness probes")
+    parser.add_argument("--top-imports", type=int, default=10, help="Direct imports of app.py to report")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Extra server environment (repeatable)")
+    parser.add_argument("--output", help="Write the JSON result here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+
+    runs = [measure_start(args.entry, args.env, args.timeout, args.poll_ms / 1000) for _ in range(args.runs)]
+    result = {
+        "entry": args.entry,
+        "env": args.env,
+        "runs": runs,
+        "ready_ms": summarize([run["ready_ms"] for run in runs]),
+        "first_request_ms": summarize([run["first_request_ms"] for run in runs]),
+        **profile_imports(args.top_imports)
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,139 @@
+"""
+Transcript Index Benchmark - Prompt context lookup over a full meeting
+======================================================================
+
+Builds a synthetic meeting transcript (a snippet every few seconds for the
+given duration) in the room transcript index, then asks questions about
+snippets said at random earlier points. Reports index build cost and size,
+lookup latency, and how often the snippet a question is about makes it into
+the prompt context, compared with the previous "last 20 transcriptions"
+context.
+
+Run from the server directory so the services package is importable:
+
+Usage:
+    python -m benchmarks.transcript_index
+    python -m benchmarks.transcript_index --minutes 180 --queries 2000 --output index.json
+"""
+import argparse
+import json
+import random
+import statistics
+import time
+from typing import List
+
+from services.chat_state import ChatMessage
+from services.transcript_index import RoomTranscript, format_snippet
+
+# Context the AI prompt used before the index: the latest transcriptions verbatim
+BASELINE_RECENT = 20
+
+FILLER = (
+    "I think we should", "so basically", "let me check", "right, and then", "from my side",
+    "as I said earlier", "just to add", "if that works", "on the other hand", "to be honest"
+)
+SPEAKERS = ("Alice", "Bob", "Chandra", "Dmitri", "Eve")
+
+
+def make_vocabulary(size: int, rng: random.Random) -> List[str]:
+    letters = "abcdefghijklmnopqrstuvwxyz"
+    return ["".join(rng.choice(letters) for _ in range(rng.randint(4, 9))) for _ in range(size)]
+
+
+def make_meeting(count: int, vocabulary: List[str], rng: random.Random) -> List[ChatMessage]:
+    """Snippets whose topic words follow a Zipf-like distribution, a few seconds apart"""
+    weights = [1 / (rank + 1) for rank in range(len(vocabulary))]
+    start = time.time() - count * 3
+    snippets = []
+    for i in range(count):
+        words = rng.choices(vocabulary, weights, k=rng.randint(4, 12))
+        text = f"{rng.choice(FILLER)} {' '.join(words)}."
+        snippets.append(ChatMessage(rng.choice(SPEAKERS), text, start + i * 3))
+    return snippets
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Meeting transcript index benchmark")
+    parser.add_argument("--minutes", type=int, default=120, help="Meeting length")
+    parser.add_argument("--snippet-seconds", type=float, default=3.0, help="Seconds between transcriptions")
+    parser.add_argument("--vocabulary", type=int, default=5000, help="Distinct topic words")
+    parser.add_argument("--queries", type=int, default=1000, help="Questions asked")
+    parser.add_argument("--max-chars", type=int, default=4000, help="Context budget per prompt")
+    parser.add_argument("--recent", type=int, default=3, help="Latest snippets always included")
+    parser.add_argument("--seed", type=int, default=7)
+    parser.add_argument("--output", help="Write the JSON result here instead of stdout")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    rng = random.Random(args.seed)
+    count = int(args.minutes * 60 / args.snippet_seconds)
+    meeting = make_meeting(count, make_vocabulary(args.vocabulary, rng), rng)
+
+    transcript = RoomTranscript(max_snippets=max(count, 1))
+    start_time = time.perf_counter()
+    for snippet in meeting:
+        transcript.append(snippet)
+    build_seconds = time.perf_counter() - start_time
+
+    lookup_us = []
+    context_chars = []
+    hits = 0
+    baseline_hits = 0
+    for _ in range(args.queries):
+        # A question reusing a few words of something said earlier in the meeting
+        target = rng.randrange(count)
+        words = meeting[target].content.rstrip(".").split()[-4:]
+        query = f"what did we say about {' '.join(rng.sample(words, min(2, len(words))))}?"
+
+        start_time = time.perf_counter()
+        lines = transcript.select(query, args.max_chars, args.recent)
+        lookup_us.append((time.perf_counter() - start_time) * 1e6)
+
+        context_chars.append(sum(len(line) + 1 for line in lines))
+        hits += format_snippet(meeting[target]) in lines
+        baseline_hits += target >= count - BASELINE_RECENT
+
+    baseline_chars = sum(len(snippet.content) + 1 for snippet in meeting[-BASELINE_RECENT:])
+    result = {
+        "snippets": count,
+        "index": {
+            "build_ms": round(build_seconds * 1000, 1),
+            "append_us": round(build_seconds / count * 1e6, 2),
+            "terms": len(transcript.postings),
+            "bytes": transcript.nbytes()
+        },
+        "lookup_us": {
+            "p50": round(statistics.median(lookup_us), 1),
+            "p95": round(percentile(lookup_us, 0.95), 1),
+            "p99": round(percentile(lookup_us, 0.99), 1),
+            "max": round(max(lookup_us), 1)
+        },
+        "context": {
+            "indexed": {
+                "target_recall": round(hits / args.queries, 3),
+                "avg_chars": round(statistics.mean(context_chars))
+            },
+            "last_20": {
+                "target_recall": round(baseline_hits / args.queries, 3),
+                "chars": baseline_chars
+            }
+        }
+    }
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
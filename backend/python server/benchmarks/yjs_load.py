@@ -0,0 +1,502 @@
+"""
+Yjs Load Generator - Synthetic rooms x clients against /ws/yjs
+==============================================================
+
+Simulates M rooms with N clients each. Every client types (small Yjs text
+inserts) and moves its cursor (awareness updates) at configurable rates,
+and measures how long its peers take to receive each edit.
+
+Every client integrates what it receives, and fan-out latency is measured
+from its document's state vector: an edit counts as delivered once a peer
+has its author's clock, so the numbers stay correct when the server merges
+updates into batched frames (YJS_BATCH_WINDOW_MS).
+
+By default a uvicorn server is started from this checkout for the run;
+pass --url to target a server that is already running.
+
+Usage:
+    python benchmarks/yjs_load.py --rooms 20 --clients 5 --duration 20
+    python benchmarks/yjs_load.py --env YJS_BATCH_WINDOW_MS=20 --output batched.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+from urllib.parse import urlparse
+
+from pycrdt import Doc, Text
+from wsproto import ConnectionType, WSConnection
+from wsproto.events import (
+    AcceptConnection,
+    BytesMessage,
+    CloseConnection,
+    Message,
+    Ping,
+    RejectConnection,
+    Request,
+    TextMessage
+)
+
+SERVER_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, SERVER_DIR)
+
+from services.yjs_protocol import (  # noqa: E402
+    MESSAGE_AWARENESS,
+    MESSAGE_SYNC,
+    SYNC_STEP2,
+    SYNC_UPDATE,
+    awareness_message,
+    parse_message,
+    read_var_uint,
+    sync_step1_message,
+    update_message
+)
+
+TYPED_CHARACTERS = "abcdefghijklmnopqrstuvwxyz     ()=:\n"
+
+
+# ==================== WebSocket Client ====================
+
+class WebSocketClient:
+    """Minimal asyncio WebSocket client on top of wsproto"""
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter, connection: WSConnection):
+        self.reader = reader
+        self.writer = writer
+        self.connection = connection
+        self.close_code: Optional[int] = None
+        self._events: Deque = deque()
+        self._buffer = bytearray()
+
+    @classmethod
+    async def connect(cls, host: str, port: int, path: str) -> "WebSocketClient":
+        reader, writer = await asyncio.open_connection(host, port)
+        connection = WSConnection(ConnectionType.CLIENT)
+        writer.write(connection.send(Request(host=f"{host}:{port}", target=path)))
+        client = cls(reader, writer, connection)
+        while True:
+            event = await client._next_event()
+            if isinstance(event, AcceptConnection):
+                return client
+            if isinstance(event, RejectConnection) or event is None:
+                writer.close()
+                raise ConnectionError(f"WebSocket handshake for {path} rejected")
+
+    async def _next_event(self):
+        while not self._events:
+            data = await self.reader.read(65536)
+            self.connection.receive_data(data or None)
+            self._events.extend(self.connection.events())
+            if not data and not self._events:
+                return None
+        return self._events.popleft()
+
+    def send(self, data: bytes):
+        self.writer.write(self.connection.send(Message(data=data)))
+
+    async def receive(self) -> Optional[bytes]:
+        """Next binary message, or None once the connection closed"""
+        while True:
+            event = await self._next_event()
+            if event is None:
+                return None
+            if isinstance(event, Ping):
+                self.writer.write(self.connection.send(event.response()))
+            elif isinstance(event, CloseConnection):
+                self.close_code = event.code
+                try:
+                    self.writer.write(self.connection.send(event.response()))
+                except Exception:
+                    pass
+                return None
+            elif isinstance(event, BytesMessage):
+                self._buffer += event.data
+                if event.message_finished:
+                    message, self._buffer = bytes(self._buffer), bytearray()
+                    return message
+            elif isinstance(event, TextMessage):
+                continue
+
+    async def close(self):
+        try:
+            self.writer.write(self.connection.send(CloseConnection(code=1000)))
+            await self.writer.drain()
+        except Exception:
+            pass
+        self.writer.close()
+
+
+# ==================== Metrics ====================
+
+def decode_state_vector(state_vector: bytes) -> Dict[int, int]:
+    """Decode a Yjs state vector into {client id: clock}"""
+    count, pos = read_var_uint(state_vector)
+    clocks = {}
+    for _ in range(count):
+        client, pos = read_var_uint(state_vector, pos)
+        clocks[client], pos = read_var_uint(state_vector, pos)
+    return clocks
+
+
+def percentile(samples: List[float], fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+class LoadMetrics:
+    def __init__(self):
+        self.latencies_ms: List[float] = []
+        self.updates_sent = 0
+        self.awareness_sent = 0
+        self.frames_received = 0
+        self.bytes_received = 0
+        self.connect_failures = 0
+        self.dropped_clients = 0
+        self.close_codes: Dict[str, int] = {}
+        self.rss_samples_kb: List[int] = []
+
+
+# ==================== Simulated Client ====================
+
+class SimulatedClient:
+    """One editor: types into the shared text and moves its cursor"""
+
+    def __init__(self, room: "SimulatedRoom", index: int):
+        self.room = room
+        self.index = index
+        self.doc = Doc()
+        self.text = self.doc.get("codemirror", type=Text)
+        self.awareness_id = random.getrandbits(31)
+        self.awareness_clock = 0
+        self.pending_update: Optional[bytes] = None
+        self.applying_remote = False
+        self.doc.observe(self._on_update)
+        self.socket: Optional[WebSocketClient] = None
+        self.connected = False
+        # Highest clock seen per author, and how far into each author's send log this client is
+        self.seen_clocks: Dict[int, int] = {}
+        self.log_positions: Dict[int, int] = {}
+
+    def _on_update(self, event):
+        if not self.applying_remote:
+            self.pending_update = event.update
+
+    @property
+    def client_id(self) -> int:
+        return self.doc.client_id
+
+    async def run(self, args, metrics: LoadMetrics, stop_at: float):
+        try:
+            self.socket = await WebSocketClient.connect(args.host, args.port, f"/ws/yjs/{self.room.room_id}")
+        except (OSError, ConnectionError):
+            metrics.connect_failures += 1
+            return
+        self.connected = True
+        self.socket.send(sync_step1_message(self.doc.get_state()))
+
+        receiver = asyncio.create_task(self._receive_loop(metrics))
+        try:
+            await self._send_loop(args, metrics, stop_at, receiver)
+        finally:
+            if not receiver.done():
+                # Give in-flight fan-out a moment to arrive before hanging up
+                await asyncio.sleep(args.drain)
+                receiver.cancel()
+            await self.socket.close()
+
+    async def _send_loop(self, args, metrics: LoadMetrics, stop_at: float, receiver: asyncio.Task):
+        loop = asyncio.get_running_loop()
+        next_update = loop.time() + random.expovariate(args.update_rate) if args.update_rate else float("inf")
+        next_awareness = loop.time() + random.expovariate(args.awareness_rate) if args.awareness_rate else float("inf")
+
+        while loop.time() < stop_at and not receiver.done():
+            await asyncio.sleep(max(0.0, min(next_update, next_awareness, stop_at) - loop.time()))
+            now = loop.time()
+            if now >= next_update:
+                self._type(args.chars_per_update, metrics)
+                next_update = now + random.expovariate(args.update_rate)
+            if now >= next_awareness:
+                self._move_cursor(metrics)
+                next_awareness = now + random.expovariate(args.awareness_rate)
+
+    def _type(self, count: int, metrics: LoadMetrics):
+        position = random.randint(0, len(self.text))
+        self.text.insert(position, "".join(random.choice(TYPED_CHARACTERS) for _ in range(count)))
+        update, self.pending_update = self.pending_update, None
+        if update is None:
+            return
+        clock = decode_state_vector(self.doc.get_state()).get(self.client_id, 0)
+        self.room.send_log.setdefault(self.client_id, []).append((clock, time.perf_counter()))
+        self.socket.send(update_message(update))
+        metrics.updates_sent += 1
+
+    def _move_cursor(self, metrics: LoadMetrics):
+        self.awareness_clock += 1
+        state = json.dumps({
+            "user": {"name": f"load-{self.room.room_id}-{self.index}", "color": "#30bced"},
+            "cursor": {"anchor": random.randint(0, 10_000), "head": random.randint(0, 10_000)}
+        })
+        self.socket.send(awareness_message([(self.awareness_id, self.awareness_clock, state)]))
+        metrics.awareness_sent += 1
+
+    async def _receive_loop(self, metrics: LoadMetrics):
+        while True:
+            frame = await self.socket.receive()
+            if frame is None:
+                if self.socket.close_code is not None and self.socket.close_code != 1000:
+                    metrics.dropped_clients += 1
+                    code = str(self.socket.close_code)
+                    metrics.close_codes[code] = metrics.close_codes.get(code, 0) + 1
+                elif self.socket.close_code is None:
+                    metrics.dropped_clients += 1
+                return
+            metrics.frames_received += 1
+            metrics.bytes_received += len(frame)
+            try:
+                message_type, sync_type, payload = parse_message(frame)
+            except ValueError:
+                continue
+            if message_type == MESSAGE_SYNC and sync_type in (SYNC_STEP2, SYNC_UPDATE):
+                self._record_delivery(payload, metrics)
+            elif message_type == MESSAGE_AWARENESS:
+                continue
+
+    def _record_delivery(self, update: bytes, metrics: LoadMetrics):
+        received_at = time.perf_counter()
+        # Integrate like a real editor; the doc's state vector then tells which edits arrived
+        self.applying_remote = True
+        try:
+            self.doc.apply_update(update)
+        finally:
+            self.applying_remote = False
+        for author, clock in decode_state_vector(self.doc.get_state()).items():
+            if author == self.client_id or clock <= self.seen_clocks.get(author, 0):
+                continue
+            self.seen_clocks[author] = clock
+            sends = self.room.send_log.get(author, [])
+            position = self.log_positions.get(author, 0)
+            while position < len(sends) and sends[position][0] <= clock:
+                metrics.latencies_ms.append((received_at - sends[position][1]) * 1000)
+                position += 1
+            self.log_positions[author] = position
+
+
+class SimulatedRoom:
+    def __init__(self, room_id: str, clients: int):
+        self.room_id = room_id
+        # Structure: {yjs client id: [(clock after the edit, perf_counter when sent), ...]}
+        self.send_log: Dict[int, List[Tuple[int, float]]] = {}
+        self.clients = [SimulatedClient(self, index) for index in range(clients)]
+
+
+# ==================== Server ====================
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(port: int, extra_env: List[str], log_path: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env.setdefault("YJS_STORE_PATH", os.path.join(tempfile.mkdtemp(prefix="yjs-load-"), "rooms.sqlite3"))
+    for item in extra_env:
+        key, _, value = item.partition("=")
+        env[key] = value
+    log = open(log_path, "w")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", str(port),
+         "--ws", "wsproto", "--log-level", "warning"],
+        cwd=SERVER_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+    )
+
+
+def wait_for_server(base_url: str, process: Optional[subprocess.Popen], timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process is not None and process.poll() is not None:
+            raise RuntimeError("Server exited during startup")
+        try:
+            urllib.request.urlopen(f"{base_url}/health", timeout=1).read()
+            return
+        except OSError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Server at {base_url} did not become ready")
+
+
+def read_rss_kb(pid: int) -> Optional[int]:
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            for line in status:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        return None
+    return None
+
+
+async def sample_rss(pid: Optional[int], metrics: LoadMetrics, interval: float = 0.5):
+    if pid is None:
+        return
+    while True:
+        rss = read_rss_kb(pid)
+        if rss is not None:
+            metrics.rss_samples_kb.append(rss)
+        await asyncio.sleep(interval)
+
+
+def fetch_json(url: str) -> Optional[dict]:
+    try:
+        return json.loads(urllib.request.urlopen(url, timeout=5).read())
+    except (OSError, ValueError):
+        return None
+
+
+# ==================== Runner ====================
+
+async def run_load(args, server_pid: Optional[int]) -> dict:
+    metrics = LoadMetrics()
+    rooms = [SimulatedRoom(f"load-{args.run_id}-{index}", args.clients) for index in range(args.rooms)]
+    clients = [client for room in rooms for client in room.clients]
+
+    sampler = asyncio.create_task(sample_rss(server_pid, metrics))
+    rss_before = read_rss_kb(server_pid) if server_pid else None
+
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    stop_at = started + args.ramp + args.duration
+    tasks = []
+    for index, client in enumerate(clients):
+        # Spread connects over the ramp-up so joins don't all land in one tick
+        delay = args.ramp * index / max(1, len(clients))
+        tasks.append(asyncio.create_task(_delayed(delay, client.run(args, metrics, stop_at))))
+    await asyncio.gather(*tasks)
+    elapsed = loop.time() - started
+    sampler.cancel()
+
+    latencies = metrics.latencies_ms
+    expected = sum(
+        len(sends) * (args.clients - 1) for room in rooms for sends in room.send_log.values()
+    )
+    server_stats = fetch_json(f"{args.base_url}/api/collab/rooms")
+    return {
+        "config": {
+            "rooms": args.rooms,
+            "clients_per_room": args.clients,
+            "duration_seconds": args.duration,
+            "ramp_seconds": args.ramp,
+            "update_rate_hz": args.update_rate,
+            "awareness_rate_hz": args.awareness_rate,
+            "chars_per_update": args.chars_per_update,
+            "server_env": args.env
+        },
+        "latency_ms": {
+            "samples": len(latencies),
+            "p50": round(percentile(latencies, 0.50), 3),
+            "p90": round(percentile(latencies, 0.90), 3),
+            "p99": round(percentile(latencies, 0.99), 3),
+            "max": round(max(latencies), 3) if latencies else 0.0
+        },
+        "delivery_ratio": round(len(latencies) / expected, 4) if expected else 1.0,
+        "frames": {
+            "updates_sent": metrics.updates_sent,
+            "awareness_sent": metrics.awareness_sent,
+            "received": metrics.frames_received,
+            "sent_per_second": round((metrics.updates_sent + metrics.awareness_sent) / elapsed, 1),
+            "received_per_second": round(metrics.frames_received / elapsed, 1),
+            "bytes_received": metrics.bytes_received
+        },
+        "clients": {
+            "total": len(clients),
+            "connected": sum(1 for client in clients if client.connected),
+            "connect_failures": metrics.connect_failures,
+            "dropped": metrics.dropped_clients,
+            "close_codes": metrics.close_codes
+        },
+        "server": {
+            "pid": server_pid,
+            "rss_kb_before": rss_before,
+            "rss_kb_peak": max(metrics.rss_samples_kb) if metrics.rss_samples_kb else None,
+            "rss_kb_after": read_rss_kb(server_pid) if server_pid else None,
+            "batching": server_stats.get("batching") if server_stats else None,
+            "relay": server_stats.get("relay") if server_stats else None
+        },
+        "elapsed_seconds": round(elapsed, 2)
+    }
+
+
+async def _delayed(delay: float, coroutine):
+    await asyncio.sleep(delay)
+    return await coroutine
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Synthetic Yjs room load and fan-out latency benchmark")
+    parser.add_argument("--rooms", type=int, default=10, help="Number of rooms (M)")
+    parser.add_argument("--clients", type=int, default=4, help="Clients per room (N)")
+    parser.add_argument("--duration", type=float, default=15.0, help="Seconds of load after ramp-up")
+    parser.add_argument("--ramp", type=float, default=2.0, help="Seconds over which clients connect")
+    parser.add_argument("--drain", type=float, default=1.0, help="Seconds to wait for in-flight frames at the end")
+    parser.add_argument("--update-rate", type=float, default=5.0, help="Edits per second per client")
+    parser.add_argument("--awareness-rate", type=float, default=2.0, help="Cursor updates per second per client")
+    parser.add_argument("--chars-per-update", type=int, default=1, help="Characters inserted per edit")
+    parser.add_argument("--url", help="Target a running server (e.g. http://127.0.0.1:5000) instead of starting one")
+    parser.add_argument("--server-pid", type=int, help="PID of the --url server, for RSS sampling")
+    parser.add_argument("--env", action="append", default=[], metavar="KEY=VALUE",
+                        help="Environment for the started server (repeatable)")
+    parser.add_argument("--server-log", default=os.path.join(tempfile.gettempdir(), "yjs-load-server.log"))
+    parser.add_argument("--output", help="Write the JSON result here instead of stdout")
+    parser.add_argument("--seed", type=int, help="Random seed")
+    return parser.parse_args(argv)
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    if args.seed is not None:
+        random.seed(args.seed)
+    args.run_id = f"{int(time.time())}"
+
+    process = None
+    if args.url:
+        args.base_url = args.url.rstrip("/")
+        server_pid = args.server_pid
+    else:
+        port = free_port()
+        args.base_url = f"http://127.0.0.1:{port}"
+        process = start_server(port, args.env, args.server_log)
+        server_pid = process.pid
+    parsed = urlparse(args.base_url)
+    args.host, args.port = parsed.hostname, parsed.port or 80
+
+    try:
+        wait_for_server(args.base_url, process)
+        result = asyncio.run(run_load(args, server_pid))
+    finally:
+        if process is not None:
+            process.terminate()
+            try:
+                process.wait(timeout=15)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+    output = json.dumps(result, indent=2)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -3,13 +3,26 @@ Configuration module for the Video Calling AI Server
 """
 import os
 from dotenv import load_dotenv
-import google.generativeai as genai
 
 load_dotenv()
 
 # Server Configuration
 PORT = int(os.getenv('PORT', 5000))
 
+# Compression Configuration
+# Negotiate permessage-deflate on WebSocket endpoints when the client offers it
+WS_PER_MESSAGE_DEFLATE = os.getenv('WS_PER_MESSAGE_DEFLATE', 'true').lower() == 'true'
+# Gzip JSON API responses at least this large (0 disables), at this zlib level
+HTTP_GZIP_MIN_BYTES = int(os.getenv('HTTP_GZIP_MIN_BYTES', 1024))
+HTTP_GZIP_LEVEL = int(os.getenv('HTTP_GZIP_LEVEL', 6))
+# Gzip Yjs document snapshots at least this large, at this zlib level
+YJS_SNAPSHOT_GZIP_MIN_BYTES = int(os.getenv('YJS_SNAPSHOT_GZIP_MIN_BYTES', 1024))
+YJS_SNAPSHOT_GZIP_LEVEL = int(os.getenv('YJS_SNAPSHOT_GZIP_LEVEL', 6))
+
+# Serialization Configuration
+# JSON library for HTTP responses and WebSocket messages: "auto" (orjson when installed) or "json"
+JSON_LIBRARY = os.getenv('JSON_LIBRARY', 'auto')
+
 # LiveKit Configuration
 LIVEKIT_API_KEY = os.getenv('LIVEKIT_API_KEY')
 LIVEKIT_API_SECRET = os.getenv('LIVEKIT_API_SECRET')
@@ -17,10 +30,8 @@ LIVEKIT_URL = os.getenv('LIVEKIT_URL')
 
 # Gemini AI Configuration
 GEMINI_API_KEY = os.getenv('GEMINI_API_KEY')
-
-# Configure Gemini if API key is available
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
+# Import the Gemini SDK in the background at startup instead of on the first AI request
+GEMINI_PRELOAD = os.getenv('GEMINI_PRELOAD', 'true').lower() == 'true'
 
 # Available Gemini models (in order of preference)
 GEMINI_MODELS = [
@@ -30,6 +41,20 @@ GEMINI_MODELS = [
     "gemini-pro"
 ]
 
+# Gemini Request Hedging Configuration
+# Send a backup chat request to the next model when the first is slower than usual (opt-in)
+GEMINI_HEDGING = os.getenv('GEMINI_HEDGING', 'false').lower() == 'true'
+# The backup is sent once the primary has taken longer than this percentile of the model's recent latencies
+GEMINI_HEDGE_PERCENTILE = float(os.getenv('GEMINI_HEDGE_PERCENTILE', '95'))
+# Latencies kept per model, and how many are needed before the percentile is trusted
+GEMINI_HEDGE_WINDOW = int(os.getenv('GEMINI_HEDGE_WINDOW', '200'))
+GEMINI_HEDGE_MIN_SAMPLES = int(os.getenv('GEMINI_HEDGE_MIN_SAMPLES', '20'))
+# Hedge delay used until then, and the lower bound on any hedge delay
+GEMINI_HEDGE_DEFAULT_DELAY_MS = int(os.getenv('GEMINI_HEDGE_DEFAULT_DELAY_MS', '3000'))
+GEMINI_HEDGE_MIN_DELAY_MS = int(os.getenv('GEMINI_HEDGE_MIN_DELAY_MS', '250'))
+# Backup requests may add at most this fraction of extra Gemini calls (quota) on top of the primaries
+GEMINI_HEDGE_MAX_EXTRA_FRACTION = float(os.getenv('GEMINI_HEDGE_MAX_EXTRA_FRACTION', '0.1'))
+
 # AI System Instruction
 AI_SYSTEM_INSTRUCTION = """You are an AI meeting assistant integrated into a video conferencing application. 
 Your role is to:
@@ -39,3 +64,207 @@ Your role is to:
 - Translate content if needed
 - Keep responses concise and helpful
 Be conversational, friendly, and professional."""
+
+# Meeting Transcription Configuration
+# Meeting audio chunks for the same room/track inside one window are transcribed once
+MEETING_AUDIO_WINDOW_SECONDS = float(os.getenv('MEETING_AUDIO_WINDOW_SECONDS', 5))
+# How long a transcribed chunk key is remembered to drop late duplicates
+MEETING_AUDIO_DEDUP_TTL_SECONDS = float(os.getenv('MEETING_AUDIO_DEDUP_TTL_SECONDS', 30))
+
+# Meeting Sentiment Timeline Configuration
+# Score meeting transcriptions into a per-room and per-speaker mood timeline
+SENTIMENT_TIMELINE = os.getenv('SENTIMENT_TIMELINE', 'true').lower() == 'true'
+# "lexicon" (local word list, scored immediately) or "gemini" (batched calls every push interval)
+SENTIMENT_SCORER = os.getenv('SENTIMENT_SCORER', 'lexicon')
+# Timeline resolution, and buckets kept per room and per speaker (240 x 30s = 2 hours)
+SENTIMENT_BUCKET_SECONDS = int(os.getenv('SENTIMENT_BUCKET_SECONDS', 30))
+SENTIMENT_TIMELINE_BUCKETS = int(os.getenv('SENTIMENT_TIMELINE_BUCKETS', 240))
+# Speakers with their own timeline per room; later speakers share one "Other" timeline
+SENTIMENT_MAX_SPEAKERS = int(os.getenv('SENTIMENT_MAX_SPEAKERS', 32))
+# The "current mood" pushed to subscribers covers this much of the latest timeline
+SENTIMENT_MOOD_WINDOW_SECONDS = int(os.getenv('SENTIMENT_MOOD_WINDOW_SECONDS', 300))
+# Changed timelines are pushed to /ws/sentiment subscribers at this interval
+SENTIMENT_PUSH_INTERVAL_MS = int(os.getenv('SENTIMENT_PUSH_INTERVAL_MS', 5000))
+# Rooms with no new transcriptions and no subscribers for this long are dropped
+SENTIMENT_ROOM_IDLE_SECONDS = float(os.getenv('SENTIMENT_ROOM_IDLE_SECONDS', 7200))
+
+# Meeting Question Answering Configuration
+# The same question asked in a room within this window is answered once
+QUESTION_ANSWER_CACHE_TTL_SECONDS = float(os.getenv('QUESTION_ANSWER_CACHE_TTL_SECONDS', 60))
+
+# Transcription Backend Configuration
+# One of: gemini, local, hybrid (can be overridden per request)
+TRANSCRIPTION_BACKEND = os.getenv('TRANSCRIPTION_BACKEND', 'gemini')
+# SpeechRecognition engine used by the offline backend: sphinx, whisper or vosk
+LOCAL_TRANSCRIPTION_ENGINE = os.getenv('LOCAL_TRANSCRIPTION_ENGINE', 'sphinx')
+# Whether hybrid mode refines local text with Gemini in the background
+TRANSCRIPTION_HYBRID_REFINE = os.getenv('TRANSCRIPTION_HYBRID_REFINE', 'true').lower() == 'true'
+
+# Transcription Cache Configuration
+# Memory budget for cached transcriptions, keyed by hash of audio bytes + language
+TRANSCRIPTION_CACHE_MAX_BYTES = int(os.getenv('TRANSCRIPTION_CACHE_MAX_BYTES', 8 * 1024 * 1024))
+# Optional on-disk tier (disabled when empty)
+TRANSCRIPTION_CACHE_DIR = os.getenv('TRANSCRIPTION_CACHE_DIR', '')
+TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES = int(os.getenv('TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES', 10000))
+
+# Audio Ingestion Configuration
+# Payloads larger than this are rejected (Gemini's inline request limit is 20MB)
+AUDIO_MAX_BYTES = int(os.getenv('AUDIO_MAX_BYTES', 20 * 1024 * 1024))
+# Downmix WAV audio to mono and resample it down to this rate before transcription
+AUDIO_NORMALIZE = os.getenv('AUDIO_NORMALIZE', 'true').lower() == 'true'
+AUDIO_TARGET_SAMPLE_RATE = int(os.getenv('AUDIO_TARGET_SAMPLE_RATE', 16000))
+# Smaller chunks are sent as-is; normalizing them isn't worth the trip to a worker process
+AUDIO_NORMALIZE_MIN_BYTES = int(os.getenv('AUDIO_NORMALIZE_MIN_BYTES', 32 * 1024))
+# Worker processes doing the sample conversion, off the event loop
+AUDIO_WORKERS = int(os.getenv('AUDIO_WORKERS', 2))
+# Also re-encode chunks as mono Opus with ffmpeg when that makes them smaller (needs ffmpeg)
+AUDIO_FFMPEG_ENCODE = os.getenv('AUDIO_FFMPEG_ENCODE', 'false').lower() == 'true'
+AUDIO_FFMPEG_BITRATE = os.getenv('AUDIO_FFMPEG_BITRATE', '24k')
+
+# AI Chat Session State Configuration
+# Ring buffer capacities (the AI prompt uses the last 10 messages / 20 transcriptions)
+CHAT_HISTORY_CAPACITY = int(os.getenv('CHAT_HISTORY_CAPACITY', 20))
+CHAT_CONTEXT_CAPACITY = int(os.getenv('CHAT_CONTEXT_CAPACITY', 50))
+# Memory budgets for one session's history and for all chat state combined
+CHAT_SESSION_MAX_BYTES = int(os.getenv('CHAT_SESSION_MAX_BYTES', 256 * 1024))
+CHAT_GLOBAL_MAX_BYTES = int(os.getenv('CHAT_GLOBAL_MAX_BYTES', 64 * 1024 * 1024))
+# Sessions without activity for this long are evicted from memory
+CHAT_SESSION_IDLE_SECONDS = float(os.getenv('CHAT_SESSION_IDLE_SECONDS', 600))
+# Optional directory evicted sessions are spilled to (dropped when empty)
+CHAT_SPILL_DIR = os.getenv('CHAT_SPILL_DIR', '')
+
+# AI Chat Session Store Configuration
+# Where sessions live between connections: "memory" (this worker), "sqlite" (file shared by workers) or "redis"
+SESSION_STORE = os.getenv('SESSION_STORE', 'memory')
+# SQLite file used by SESSION_STORE=sqlite
+SESSION_STORE_PATH = os.getenv('SESSION_STORE_PATH', 'sessions.sqlite3')
+# Redis-protocol server used by SESSION_STORE=redis (relay_broker.py serves the needed commands too)
+SESSION_STORE_URL = os.getenv('SESSION_STORE_URL', os.getenv('RELAY_URL', 'unix:///tmp/yjs-relay.sock'))
+# A disconnected client can resume its history (and an empty room its meeting context) for this long; 0 disables it
+SESSION_TTL_SECONDS = float(os.getenv('SESSION_TTL_SECONDS', 1800))
+# Changed sessions are written to the store in batches at this interval
+SESSION_FLUSH_MS = int(os.getenv('SESSION_FLUSH_MS', 500))
+
+# Meeting Transcript Index Configuration
+# Characters of meeting transcript included in an AI prompt (the most relevant snippets first)
+TRANSCRIPT_CONTEXT_MAX_CHARS = int(os.getenv('TRANSCRIPT_CONTEXT_MAX_CHARS', 4000))
+# Latest snippets always included for conversational continuity, relevant or not
+TRANSCRIPT_CONTEXT_RECENT = int(os.getenv('TRANSCRIPT_CONTEXT_RECENT', 3))
+# Snippets indexed per room; past this the oldest half is dropped from the index
+TRANSCRIPT_MAX_SNIPPETS = int(os.getenv('TRANSCRIPT_MAX_SNIPPETS', 20000))
+# SQLite file keeping full transcripts so a room reopened later is indexed again (empty = memory only)
+TRANSCRIPT_STORE_PATH = os.getenv('TRANSCRIPT_STORE_PATH', '')
+# New snippets are appended to the store in batches at this interval
+TRANSCRIPT_FLUSH_MS = int(os.getenv('TRANSCRIPT_FLUSH_MS', 1000))
+
+# Background Job Configuration
+# Jobs (summaries, batch sentiment, long transcriptions) running at once per worker
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 4))
+# Jobs waiting for a free worker; submissions past this get 503
+JOB_QUEUE_SIZE = int(os.getenv('JOB_QUEUE_SIZE', 100))
+# A job still running after this long fails as timed out
+JOB_TIMEOUT_SECONDS = float(os.getenv('JOB_TIMEOUT_SECONDS', 300))
+# Finished job results can be fetched (and identical submissions reuse them) for this long
+JOB_RESULT_TTL_SECONDS = float(os.getenv('JOB_RESULT_TTL_SECONDS', 3600))
+# Where finished results live: "memory" (this worker), "sqlite" or "redis" (shared, see SESSION_STORE)
+JOB_STORE = os.getenv('JOB_STORE', 'memory')
+# SQLite file used by JOB_STORE=sqlite (JOB_STORE=redis uses SESSION_STORE_URL)
+JOB_STORE_PATH = os.getenv('JOB_STORE_PATH', 'jobs.sqlite3')
+
+# Collaborative Editor (Yjs) Configuration
+# Compact a room's update log into one merged state after this many updates or bytes
+YJS_COMPACT_EVERY_UPDATES = int(os.getenv('YJS_COMPACT_EVERY_UPDATES', 200))
+YJS_COMPACT_LOG_BYTES = int(os.getenv('YJS_COMPACT_LOG_BYTES', 1024 * 1024))
+# Awareness (cursors/presence) fan-out is coalesced to one frame per client per interval
+YJS_AWARENESS_INTERVAL_MS = int(os.getenv('YJS_AWARENESS_INTERVAL_MS', 100))
+# Awareness entries not renewed within this time are expired (clients renew every 15s)
+YJS_AWARENESS_TIMEOUT_SECONDS = float(os.getenv('YJS_AWARENESS_TIMEOUT_SECONDS', 30))
+# Outbound frames buffered per client before it is disconnected as a slow consumer
+YJS_SEND_QUEUE_SIZE = int(os.getenv('YJS_SEND_QUEUE_SIZE', 256))
+# A single send taking longer than this disconnects the client
+YJS_MAX_SEND_LATENCY_MS = int(os.getenv('YJS_MAX_SEND_LATENCY_MS', 5000))
+# Coalesce document updates into one frame per recipient per tick (0 sends every update immediately)
+YJS_BATCH_WINDOW_MS = int(os.getenv('YJS_BATCH_WINDOW_MS', 0))
+# A tick is flushed early once its pending updates reach this many bytes
+YJS_BATCH_MAX_BYTES = int(os.getenv('YJS_BATCH_MAX_BYTES', 64 * 1024))
+# SQLite file holding room snapshots + update log (empty = memory only, idle rooms are then discarded)
+YJS_STORE_PATH = os.getenv('YJS_STORE_PATH', os.path.join('data', 'rooms.sqlite3'))
+# Pending updates are written to the log in batches at this interval
+YJS_STORE_FLUSH_MS = int(os.getenv('YJS_STORE_FLUSH_MS', 50))
+# Rooms without clients for this long are snapshotted (when there is a store) and evicted from memory
+YJS_ROOM_IDLE_SECONDS = float(os.getenv('YJS_ROOM_IDLE_SECONDS', 300))
+
+# Room Code Execution Configuration
+# Streamed program output is broadcast to the room at most once per interval
+CODE_OUTPUT_FLUSH_MS = int(os.getenv('CODE_OUTPUT_FLUSH_MS', 50))
+# Output beyond this many bytes per execution is not broadcast (the HTTP caller still gets all of it)
+CODE_OUTPUT_MAX_BYTES = int(os.getenv('CODE_OUTPUT_MAX_BYTES', 64 * 1024))
+
+# Room Relay (multi-worker) Configuration
+# "inprocess" (single worker) or "broker" to forward room frames between workers over pub/sub
+RELAY_MODE = os.getenv('RELAY_MODE', 'inprocess')
+# Redis-protocol broker: redis://host:port, or unix:///path for relay_broker.py on a Unix socket
+RELAY_URL = os.getenv('RELAY_URL', 'unix:///tmp/yjs-relay.sock')
+# Name of this worker; a random suffix is always added so restarts never reuse update seqs
+WORKER_NAME = os.getenv('WORKER_NAME', 'worker')
+# Comma-separated public URLs of all workers, used for consistent room-to-worker affinity
+RELAY_WORKERS = [url.strip() for url in os.getenv('RELAY_WORKERS', '').split(',') if url.strip()]
+
+# Metrics Configuration
+# How often the event loop lag monitor wakes up (0 disables it)
+METRICS_LOOP_LAG_INTERVAL_MS = int(os.getenv('METRICS_LOOP_LAG_INTERVAL_MS', 250))
+
+# Admission Control Configuration
+# Token-bucket limits are "count/period[:burst]" with period s, min or h (burst defaults to count)
+RATE_LIMIT_ENABLED = os.getenv('RATE_LIMIT_ENABLED', 'true').lower() == 'true'
+# Per client IP for every HTTP route without its own limit
+RATE_LIMIT_HTTP_DEFAULT = os.getenv('RATE_LIMIT_HTTP_DEFAULT', '600/min:120')
+# Per client IP for the Gemini-backed routes and for code execution (also per client for room runs)
+RATE_LIMIT_AI = os.getenv('RATE_LIMIT_AI', '30/min:10')
+RATE_LIMIT_CODE = os.getenv('RATE_LIMIT_CODE', '20/min:5')
+# Per-route overrides per client IP, e.g. "POST /api/chat=10/min:5,POST /api/transcribe=20/min"
+RATE_LIMIT_ROUTES = os.getenv('RATE_LIMIT_ROUTES', '')
+# WebSocket connection attempts per client IP
+RATE_LIMIT_WS_CONNECT = os.getenv('RATE_LIMIT_WS_CONNECT', '30/min:10')
+# AI chat text/audio messages and meeting audio chunks per client_id
+RATE_LIMIT_WS_MESSAGES = os.getenv('RATE_LIMIT_WS_MESSAGES', '30/min:10')
+RATE_LIMIT_MEETING_AUDIO = os.getenv('RATE_LIMIT_MEETING_AUDIO', '30/min:10')
+# AI chat messages and code runs of one room combined
+RATE_LIMIT_ROOM = os.getenv('RATE_LIMIT_ROOM', '240/min:40')
+# Most rate-limit buckets kept in memory (least recently used ones are dropped)
+RATE_LIMIT_MAX_KEYS = int(os.getenv('RATE_LIMIT_MAX_KEYS', 100000))
+# Expensive work (AI calls, code runs) allowed at once; the limit shrinks towards the minimum while
+# event loop lag exceeds SHED_LOOP_LAG_MS or WebSocket send queues exceed SHED_QUEUE_DEPTH frames
+SHED_MAX_CONCURRENCY = int(os.getenv('SHED_MAX_CONCURRENCY', 64))
+SHED_MIN_CONCURRENCY = int(os.getenv('SHED_MIN_CONCURRENCY', 4))
+SHED_LOOP_LAG_MS = int(os.getenv('SHED_LOOP_LAG_MS', 200))
+SHED_QUEUE_DEPTH = int(os.getenv('SHED_QUEUE_DEPTH', 5000))
+
+# Tracing Configuration
+# Where sampled spans go as JSON lines: "stdout", a file path, or empty to disable tracing
+TRACE_EXPORT = os.getenv('TRACE_EXPORT', '')
+# Fraction of requests (HTTP requests, AI chat messages, code runs) that are traced
+TRACE_SAMPLE_RATE = float(os.getenv('TRACE_SAMPLE_RATE', 0.1))
+# Recent traces kept in memory for /api/admin/traces
+TRACE_RECENT = int(os.getenv('TRACE_RECENT', 50))
+
+# Profiling Configuration
+# Token required in X-Admin-Token for /api/admin endpoints (empty allows loopback clients only)
+ADMIN_TOKEN = os.getenv('ADMIN_TOKEN', '')
+# Longest stack-sampling profile one request may capture
+PROFILE_MAX_SECONDS = float(os.getenv('PROFILE_MAX_SECONDS', 30))
+# Record the loop thread's stack when the event loop is blocked this long (0 disables)
+LOOP_BLOCK_THRESHOLD_MS = int(os.getenv('LOOP_BLOCK_THRESHOLD_MS', 100))
+# Loop stalls kept in memory for /api/admin/loop-blocks
+LOOP_BLOCK_HISTORY = int(os.getenv('LOOP_BLOCK_HISTORY', 50))
+
+# Production Server Configuration (serve.py)
+# Interface and number of worker processes; more than one needs RELAY_MODE=broker for collaborative rooms
+SERVER_HOST = os.getenv('SERVER_HOST', '0.0.0.0')
+SERVER_WORKERS = int(os.getenv('SERVER_WORKERS', 1))
+# Event loop and HTTP parser: "auto" uses uvloop / httptools when installed
+SERVER_LOOP = os.getenv('SERVER_LOOP', 'auto')
+SERVER_HTTP = os.getenv('SERVER_HTTP', 'auto')
+# Idle keep-alive connections are closed after this many seconds
+SERVER_KEEP_ALIVE_SECONDS = int(os.getenv('SERVER_KEEP_ALIVE_SECONDS', 5))
+SERVER_LOG_LEVEL = os.getenv('SERVER_LOG_LEVEL', 'warning')
@@ -1,6 +1,8 @@
 """
 Pydantic models for request and response validation
 """
+from typing import List, Optional
+
 from pydantic import BaseModel
 
 
@@ -10,6 +12,7 @@ class TranscribeRequest(BaseModel):
     """Request model for audio transcription"""
     audio: str
     language: str = "en"
+    backend: Optional[str] = None  # gemini, local or hybrid; defaults to TRANSCRIPTION_BACKEND
 
 
 class SentimentRequest(BaseModel):
@@ -23,6 +26,11 @@ class SummaryRequest(BaseModel):
     max_length: int = 200
 
 
+class SentimentBatchRequest(BaseModel):
+    """Request model for sentiment analysis of many texts (a background job)"""
+    texts: List[str]
+
+
 class ChatRequest(BaseModel):
     """Request model for AI chat"""
     message: str
@@ -34,6 +42,9 @@ class CodeExecutionRequest(BaseModel):
     code: str
     language: str = "python"
     stdin: str = ""
+    # Run once for the whole collaborative room and broadcast the result
+    room_id: Optional[str] = None
+    participant: Optional[str] = None
 
 
 # ==================== Response Models ====================
@@ -71,6 +82,20 @@ class ChatResponse(BaseModel):
     success: bool
 
 
+class JobResponse(BaseModel):
+    """Response model for a background job (see GET /api/jobs/{job_id})"""
+    job_id: str
+    kind: str
+    status: str  # queued, running, succeeded or failed
+    created_at: float
+    started_at: Optional[float] = None
+    finished_at: Optional[float] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    # True if an identical submission's job was returned instead of a new one
+    deduplicated: bool = False
+
+
 class CodeExecutionResponse(BaseModel):
     """Response model for code execution"""
     success: bool
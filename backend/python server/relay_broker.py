@@ -0,0 +1,166 @@
+"""
+Relay Broker - Minimal Redis-protocol pub/sub broker for multi-worker deployments
+================================================================================
+
+Stand-in for Redis when running several workers on one machine. Speaks the
+subset of RESP used by the room relay (PING, SUBSCRIBE, UNSUBSCRIBE,
+PUBLISH) and by the AI chat session store (GET, SET with EX/PX, DEL). Any
+real Redis server works as a drop-in replacement.
+
+Usage:
+    python relay_broker.py                          # unix:///tmp/yjs-relay.sock
+    python relay_broker.py redis://127.0.0.1:6390   # TCP
+"""
+import asyncio
+import os
+import sys
+import time
+from typing import Dict, Optional, Set, Tuple
+
+from config import RELAY_URL
+from services.resp import RespError, parse_url, read_reply
+
+
+# Subscribers with this much undelivered data are disconnected (they resync on reconnect)
+MAX_SUBSCRIBER_BUFFER = 16 * 1024 * 1024
+
+# Expired keys are purged once per this many SETs (and on read)
+PURGE_EVERY_SETS = 1000
+
+
+def _bulk(value: bytes) -> bytes:
+    return b"$%d\r\n%s\r\n" % (len(value), value)
+
+
+def _push(*items: bytes, count: int = None) -> bytes:
+    """Encode a pub/sub push: bulk strings, optionally followed by an integer"""
+    parts = [_bulk(item) for item in items]
+    if count is not None:
+        parts.append(b":%d\r\n" % count)
+    return b"*%d\r\n" % len(parts) + b"".join(parts)
+
+
+class RelayBroker:
+    """In-memory channel registry fanning PUBLISH out to subscribers, plus a small keyspace"""
+
+    def __init__(self):
+        # Structure: {channel: {writer, ...}}
+        self.channels: Dict[bytes, Set[asyncio.StreamWriter]] = {}
+        self.published = 0
+        # Structure: {key: (value, monotonic expiry or None)}
+        self.keys: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._sets = 0
+
+    async def handle_client(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        subscriptions: Set[bytes] = set()
+        try:
+            while True:
+                command = await read_reply(reader)
+                if not isinstance(command, list) or not command:
+                    writer.write(b"-ERR expected a command array\r\n")
+                    continue
+                name = command[0].upper()
+                args = command[1:]
+
+                if name == b"PING":
+                    writer.write(b"+PONG\r\n")
+                elif name == b"SUBSCRIBE":
+                    for channel in args:
+                        self.channels.setdefault(channel, set()).add(writer)
+                        subscriptions.add(channel)
+                        writer.write(_push(b"subscribe", channel, count=len(subscriptions)))
+                elif name == b"UNSUBSCRIBE":
+                    for channel in args or list(subscriptions):
+                        self._remove(channel, writer)
+                        subscriptions.discard(channel)
+                        writer.write(_push(b"unsubscribe", channel, count=len(subscriptions)))
+                elif name == b"PUBLISH" and len(args) == 2:
+                    writer.write(b":%d\r\n" % self.publish(args[0], args[1]))
+                elif name == b"GET" and len(args) == 1:
+                    value = self.get(args[0])
+                    writer.write(b"$-1\r\n" if value is None else _bulk(value))
+                elif name == b"SET" and len(args) in (2, 4):
+                    writer.write(self.set(args[0], args[1], args[2:]))
+                elif name == b"DEL" and args:
+                    writer.write(b":%d\r\n" % sum(self.keys.pop(key, None) is not None for key in args))
+                else:
+                    writer.write(b"-ERR unknown command '%s'\r\n" % name)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, RespError):
+            pass
+        finally:
+            for channel in subscriptions:
+                self._remove(channel, writer)
+            writer.close()
+
+    def publish(self, channel: bytes, message: bytes) -> int:
+        """Deliver a message to every subscriber of a channel"""
+        subscribers = self.channels.get(channel)
+        if not subscribers:
+            return 0
+        self.published += 1
+        frame = _push(b"message", channel, message)
+        for subscriber in list(subscribers):
+            if subscriber.transport.get_write_buffer_size() > MAX_SUBSCRIBER_BUFFER:
+                print("[Relay] Disconnecting slow subscriber")
+                subscriber.transport.abort()
+                continue
+            subscriber.write(frame)
+        return len(subscribers)
+
+    def get(self, key: bytes) -> Optional[bytes]:
+        entry = self.keys.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self.keys[key]
+            return None
+        return entry[0]
+
+    def set(self, key: bytes, value: bytes, options: list) -> bytes:
+        """SET key value [EX seconds | PX milliseconds], returning the reply"""
+        expires_at = None
+        if options:
+            unit = options[0].upper()
+            try:
+                amount = int(options[1])
+            except ValueError:
+                return b"-ERR value is not an integer or out of range\r\n"
+            if unit not in (b"EX", b"PX") or amount <= 0:
+                return b"-ERR syntax error\r\n"
+            expires_at = time.monotonic() + (amount if unit == b"EX" else amount / 1000)
+        self.keys[key] = (value, expires_at)
+
+        self._sets += 1
+        if self._sets % PURGE_EVERY_SETS == 0:
+            now = time.monotonic()
+            for expired in [k for k, (_, expiry) in self.keys.items() if expiry is not None and expiry <= now]:
+                del self.keys[expired]
+        return b"+OK\r\n"
+
+    def _remove(self, channel: bytes, writer: asyncio.StreamWriter):
+        subscribers = self.channels.get(channel)
+        if subscribers is not None:
+            subscribers.discard(writer)
+            if not subscribers:
+                del self.channels[channel]
+
+
+async def serve(url: str):
+    broker = RelayBroker()
+    kind, address = parse_url(url)
+    if kind == "unix":
+        if os.path.exists(address):
+            os.unlink(address)
+        server = await asyncio.start_unix_server(broker.handle_client, address)
+    else:
+        server = await asyncio.start_server(broker.handle_client, *address)
+    print(f"[Relay] Broker listening on {url}")
+    async with server:
+        await server.serve_forever()
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(serve(sys.argv[1] if len(sys.argv) > 1 else RELAY_URL))
+    except KeyboardInterrupt:
+        pass
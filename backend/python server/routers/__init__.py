@@ -1,7 +1,10 @@
 """
 Routers module - API route handlers
 """
+from .admin_router import router as admin_router
 from .ai_router import router as ai_router
 from .code_router import router as code_router
+from .jobs_router import router as jobs_router
+from .session_router import router as session_router
 
-__all__ = ['ai_router', 'code_router']
+__all__ = ['admin_router', 'ai_router', 'code_router', 'jobs_router', 'session_router']
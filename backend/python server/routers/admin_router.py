@@ -0,0 +1,120 @@
+"""
+Admin Router - Tracing, profiling, admission control, request hedging and event loop diagnostics for the running worker
+"""
+import hmac
+
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import PlainTextResponse
+
+from config import ADMIN_TOKEN, PROFILE_MAX_SECONDS
+from services.admission import admission_stats
+from services.hedging import gemini_hedger
+from services.profiler import (
+    ProfileInProgress,
+    folded_stacks,
+    loop_watchdog,
+    stack_sampler,
+    top_functions
+)
+from services.tracing import tracer
+
+# Clients allowed without a token when ADMIN_TOKEN is not set
+LOOPBACK_HOSTS = ("127.0.0.1", "::1", "localhost")
+
+
+def require_admin(request: Request):
+    """Allow requests carrying ADMIN_TOKEN, or loopback clients when no token is configured"""
+    if ADMIN_TOKEN:
+        token = request.headers.get("x-admin-token", "")
+        if not hmac.compare_digest(token, ADMIN_TOKEN):
+            raise HTTPException(status_code=403, detail="Invalid admin token")
+        return
+    if request.client is None or request.client.host not in LOOPBACK_HOSTS:
+        raise HTTPException(status_code=403, detail="Admin endpoints are only available locally (set ADMIN_TOKEN)")
+
+
+router = APIRouter(prefix="/api/admin", tags=["Admin"], dependencies=[Depends(require_admin)])
+
+
+@router.get("/profile")
+async def profile(
+    seconds: float = Query(5.0, gt=0),
+    interval_ms: float = Query(10.0, ge=1, le=1000),
+    format: str = Query("json", pattern="^(json|folded)$")
+):
+    """
+    Capture a stack-sampling profile of this worker
+
+    - **seconds**: How long to sample (capped at PROFILE_MAX_SECONDS)
+    - **interval_ms**: Time between samples
+    - **format**: json (top functions + per-thread stacks) or folded
+      (flamegraph.pl / speedscope input)
+    """
+    try:
+        result = await stack_sampler.profile(min(seconds, PROFILE_MAX_SECONDS), interval_ms)
+    except ProfileInProgress:
+        raise HTTPException(status_code=409, detail="A profile is already being captured")
+
+    if format == "folded":
+        return PlainTextResponse(folded_stacks(result))
+    return {
+        "duration_s": result["duration_s"],
+        "interval_ms": result["interval_ms"],
+        "samples": result["samples"],
+        "top_functions": top_functions(result),
+        "threads": result["threads"]
+    }
+
+
+@router.get("/loop-blocks")
+async def loop_blocks():
+    """
+    Recent event loop stalls
+
+    Each entry has the stall duration and the loop thread's stack captured
+    while it was blocked (outermost frame first).
+    """
+    return {
+        "threshold_ms": loop_watchdog.threshold * 1000,
+        "blocks": loop_watchdog.recent_blocks()
+    }
+
+
+@router.get("/traces")
+async def recent_traces(limit: int = Query(20, ge=1, le=500)):
+    """
+    Most recently exported traces, newest first
+
+    Requires TRACE_EXPORT to be set; TRACE_SAMPLE_RATE controls how many
+    requests are traced.
+    """
+    return {
+        **tracer.stats(),
+        "traces": tracer.recent_traces(limit)
+    }
+
+
+@router.get("/admission")
+async def admission():
+    """
+    Rate limiting and load shedding state
+
+    Reports configured route limits, admitted/limited counts per limit,
+    the number of tracked buckets, and the load shedder's current
+    concurrency limit, in-flight work and health inputs (event loop lag,
+    WebSocket send queue depth).
+    """
+    return admission_stats()
+
+
+@router.get("/hedging")
+async def hedging():
+    """
+    Gemini request hedging state
+
+    Reports whether hedging is on, how many chat requests sent a backup
+    (hedge rate) and which request won, the remaining backup allowance,
+    the estimated latency saved, and per-model latency percentiles with
+    the current hedge delay.
+    """
+    return gemini_hedger.stats()
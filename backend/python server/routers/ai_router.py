@@ -2,7 +2,8 @@
 AI Router - Handles AI-related HTTP endpoints
 """
 import base64
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Query
 
 from config import GEMINI_API_KEY
 from models import (
@@ -11,10 +12,16 @@ from models import (
     SummaryRequest, SummaryResponse,
     ChatRequest, ChatResponse
 )
-from services.ai_service import (
-    get_gemini_model,
-    process_text_with_gemini,
-    transcribe_audio_with_gemini
+from services import ai_service
+from services.ai_service import process_text_with_gemini
+from services.audio_ingest import UnsupportedAudioFormat
+from services.sentiment_timeline import sentiment_timeline
+from services.transcription import (
+    get_audio_ingest_stats,
+    get_transcription_backend,
+    get_transcription_cache_stats,
+    get_transcription_stats,
+    transcribe_audio as run_transcription
 )
 
 router = APIRouter(prefix="/api", tags=["AI"])
@@ -53,25 +60,91 @@ async def transcribe_audio(request: TranscribeRequest):
     
     - **audio**: Base64 encoded audio data
     - **language**: Language code (default: en)
+    - **backend**: Optional transcription backend (gemini, local, hybrid)
     """
     try:
-        if not GEMINI_API_KEY:
+        try:
+            backend = get_transcription_backend(request.backend)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        
+        if not backend.available:
             raise HTTPException(status_code=500, detail="Gemini API key not configured")
         
         audio_data = base64.b64decode(request.audio)
-        transcription = await transcribe_audio_with_gemini(audio_data)
+        try:
+            result = await run_transcription(audio_data, request.language, backend.name)
+        except UnsupportedAudioFormat as e:
+            raise HTTPException(status_code=400, detail=str(e))
         
         return {
             "message": "Transcription successful",
             "data": {
                 "language": request.language,
-                "transcription": transcription
+                "transcription": result.text,
+                **result.to_dict()
             }
         }
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 
+@router.get("/transcription/backends")
+async def transcription_backends():
+    """
+    Per-backend transcription statistics
+    
+    Reports call counts, average/last latency and real-time factor
+    (processing time / audio duration) for each backend.
+    """
+    return get_transcription_stats()
+
+
+@router.get("/transcription/cache")
+async def transcription_cache_stats():
+    """
+    Transcription cache metrics
+    
+    Reports entries, memory use, hits (memory and disk), misses and hit rate.
+    """
+    return get_transcription_cache_stats()
+
+
+@router.get("/transcription/audio")
+async def transcription_audio_stats():
+    """
+    Audio ingestion metrics
+    
+    Reports chunks per action (passthrough, normalized, encoded, converted,
+    rejected), bytes received and sent on, and the bytes saved.
+    """
+    return get_audio_ingest_stats()
+
+
+@router.get("/sentiment/{room_id}/timeline")
+async def sentiment_timeline_query(
+    room_id: str,
+    window_seconds: float = Query(1800, gt=0),
+    speaker: Optional[str] = None
+):
+    """
+    Rolling sentiment of a meeting room, from its transcriptions
+    
+    - **window_seconds**: How far back to go (default: 30 minutes)
+    - **speaker**: Only this speaker's utterances
+    
+    Returns per-bucket average polarity (-1 to 1) and label counts, a
+    summary of the window and, for the whole room, per-speaker summaries.
+    Only the buckets inside the window are read.
+    """
+    timeline = sentiment_timeline.timeline(room_id, window_seconds, speaker)
+    if timeline is None:
+        raise HTTPException(status_code=404, detail="No sentiment timeline for this room or speaker")
+    return timeline
+
+
 @router.post("/analyze-sentiment", response_model=SentimentResponse)
 async def analyze_sentiment(request: SentimentRequest):
     """
@@ -83,14 +156,7 @@ async def analyze_sentiment(request: SentimentRequest):
         if not GEMINI_API_KEY:
             raise HTTPException(status_code=500, detail="Gemini API key not configured")
         
-        model = get_gemini_model()
-        response = model.generate_content(
-            f"Analyze the sentiment of this text and respond with ONLY one word (positive/negative/neutral) and a confidence score from 0 to 1. Format: sentiment,score\n\nText: {request.text}"
-        )
-        
-        result = response.text.strip().lower().split(",")
-        sentiment = result[0] if len(result) > 0 else "neutral"
-        score = float(result[1]) if len(result) > 1 else 0.5
+        sentiment, score = await ai_service.analyze_sentiment(request.text)
         
         return {
             "message": "Sentiment analysis completed",
@@ -109,20 +175,19 @@ async def generate_summary(request: SummaryRequest):
     
     - **transcript**: Full meeting transcript
     - **max_length**: Maximum length of summary (default: 200)
+    
+    Long transcripts are better submitted to POST /api/jobs/summary.
     """
     try:
         if not GEMINI_API_KEY:
             raise HTTPException(status_code=500, detail="Gemini API key not configured")
         
-        model = get_gemini_model()
-        response = model.generate_content(
-            f"Summarize this meeting transcript in about {request.max_length} words. Include key points, decisions made, and action items:\n\n{request.transcript}"
-        )
+        summary = await ai_service.generate_summary(request.transcript, request.max_length)
         
         return {
             "message": "Summary generated successfully",
             "transcript_length": len(request.transcript),
-            "summary": response.text
+            "summary": summary
         }
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
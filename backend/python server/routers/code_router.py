@@ -4,7 +4,8 @@ Code Router - Handles code execution HTTP endpoints
 from fastapi import APIRouter
 
 from models import CodeExecutionRequest, CodeExecutionResponse
-from services.code_execution import execute_code_in_sandbox
+from services.code_execution import stream_code_execution
+from websockets.code_room import code_room_manager
 
 router = APIRouter(prefix="/api", tags=["Code Execution"])
 
@@ -17,8 +18,22 @@ async def execute_code(request: CodeExecutionRequest):
     - **code**: The source code to execute
     - **language**: Programming language (python, javascript, cpp, java)
     - **stdin**: Optional standard input for the program
+    - **room_id**: Optional collaborative room; the run is shared with everyone
+      connected to /ws/code/{room_id}, and identical requests while it is
+      running get the same result instead of executing again
     """
-    success, output, error, execution_time = execute_code_in_sandbox(
+    if request.room_id:
+        result, _ = await code_room_manager.execute(
+            request.room_id,
+            code=request.code,
+            language=request.language,
+            stdin=request.stdin,
+            triggered_by=request.participant,
+            source="http"
+        )
+        return result
+    
+    success, output, error, execution_time = await stream_code_execution(
         code=request.code,
         language=request.language,
         stdin=request.stdin
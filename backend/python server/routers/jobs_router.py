@@ -0,0 +1,109 @@
+"""
+Jobs Router - Background jobs for long-running summaries, analyses and transcriptions
+"""
+from fastapi import APIRouter, HTTPException, Response
+
+from config import GEMINI_API_KEY
+from models import JobResponse, SentimentBatchRequest, SummaryRequest, TranscribeRequest
+from services.jobs import JobQueueFull, job_manager
+from services.transcription import get_transcription_backend
+
+router = APIRouter(prefix="/api/jobs", tags=["Jobs"])
+
+# Retry-After sent when the job queue is full
+QUEUE_FULL_RETRY_AFTER_SECONDS = 5
+
+
+async def _submit(kind: str, payload: dict, response: Response) -> dict:
+    """Queue a job (or find the one for the same input) and point the client at it"""
+    try:
+        job, existing = await job_manager.submit(kind, payload)
+    except JobQueueFull as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Job queue is full: {e}",
+            headers={"Retry-After": str(QUEUE_FULL_RETRY_AFTER_SECONDS)}
+        )
+    response.status_code = 200 if job.finished else 202
+    response.headers["Location"] = f"/api/jobs/{job.id}"
+    return {**job.to_dict(), "deduplicated": existing}
+
+
+@router.post("/summary", response_model=JobResponse, status_code=202)
+async def submit_summary(request: SummaryRequest, response: Response):
+    """
+    Summarize a meeting transcript in the background
+
+    - **transcript**: Full meeting transcript
+    - **max_length**: Maximum length of summary (default: 200)
+
+    The result is {"summary", "transcript_length"}.
+    """
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API key not configured")
+    return await _submit("summary", {"transcript": request.transcript, "max_length": request.max_length}, response)
+
+
+@router.post("/sentiment", response_model=JobResponse, status_code=202)
+async def submit_sentiment(request: SentimentBatchRequest, response: Response):
+    """
+    Analyze the sentiment of many texts in the background
+
+    - **texts**: Texts to rate
+
+    The result is {"results": [{"text", "sentiment", "score"}, ...]} in input order.
+    """
+    if not GEMINI_API_KEY:
+        raise HTTPException(status_code=500, detail="Gemini API key not configured")
+    if not request.texts:
+        raise HTTPException(status_code=400, detail="No texts to analyze")
+    return await _submit("sentiment", {"texts": request.texts}, response)
+
+
+@router.post("/transcription", response_model=JobResponse, status_code=202)
+async def submit_transcription(request: TranscribeRequest, response: Response):
+    """
+    Transcribe a long recording in the background
+
+    - **audio**: Base64 encoded audio data
+    - **language**: Language code (default: en)
+    - **backend**: Optional transcription backend (gemini, local, hybrid)
+
+    The result has the same fields as the /api/transcribe data.
+    """
+    try:
+        backend = get_transcription_backend(request.backend)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    if not backend.available:
+        raise HTTPException(status_code=500, detail="Gemini API key not configured")
+    return await _submit(
+        "transcription",
+        {"audio": request.audio, "language": request.language, "backend": backend.name},
+        response
+    )
+
+
+@router.get("/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """
+    Status of a job, with its result or error once finished
+
+    Poll this, or connect to /ws/jobs/{job_id} to be pushed the result.
+    Finished jobs are kept for JOB_RESULT_TTL_SECONDS.
+    """
+    job = await job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Unknown or expired job")
+    return job.to_dict()
+
+
+@router.get("")
+async def job_stats():
+    """
+    Job pool state
+
+    Reports workers, queue length, jobs per status, deduplicated and
+    rejected submissions, and the result store.
+    """
+    return job_manager.stats()
@@ -0,0 +1,107 @@
+"""
+Session Router - Introspection endpoints for real-time session state
+"""
+import hashlib
+
+from fastapi import APIRouter, Depends, Request, Response
+
+from config import RELAY_WORKERS, YJS_SNAPSHOT_GZIP_LEVEL, YJS_SNAPSHOT_GZIP_MIN_BYTES
+from services.compression import compress_payload, get_compression_stats
+from routers.admin_router import require_admin
+from services.room_relay import room_worker
+from websockets.ai_chat import chat_manager
+from websockets.code_room import code_room_manager
+from websockets.collaborative import room_manager
+
+router = APIRouter(prefix="/api", tags=["Sessions"])
+
+
+@router.get("/ai-chat/sessions", dependencies=[Depends(require_admin)])
+async def ai_chat_sessions():
+    """
+    Memory use of AI chat sessions
+    
+    Reports per-session message counts, bytes and idle time, per-room
+    meeting context size, and totals against the configured budgets.
+    Client and room ids are not included. Admin only (see require_admin).
+    """
+    return chat_manager.session_stats()
+
+
+@router.get("/collab/rooms")
+async def collaborative_rooms():
+    """
+    Collaborative editor room state
+    
+    Reports rooms and clients, per-document state/log size, on-disk store
+    size, the duration of the last room reload from storage, and relay
+    traffic to other workers.
+    """
+    return await room_manager.stats()
+
+
+@router.get("/code/rooms")
+async def code_rooms():
+    """
+    Room-shared code execution state
+    
+    Reports connected clients, executions started, duplicate runs that
+    attached to an in-flight execution, and each room's latest execution.
+    """
+    return code_room_manager.stats()
+
+
+@router.get("/collab/rooms/{room_id}/snapshot")
+async def collaborative_room_snapshot(room_id: str, request: Request):
+    """
+    Full Yjs state of a room for initial document delivery
+    
+    Returns the document as one Yjs update (application/octet-stream),
+    gzip-compressed when the client accepts it and the state is at least
+    YJS_SNAPSHOT_GZIP_MIN_BYTES. Clients apply it before connecting to
+    /ws/yjs, so the WebSocket sync only carries the remaining diff.
+    """
+    state = await room_manager.get_snapshot(room_id)
+    etag = f'"{hashlib.sha1(state).hexdigest()}"'
+    headers = {"ETag": etag, "Cache-Control": "no-cache", "Vary": "Accept-Encoding"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers=headers)
+    
+    body, encoding = await compress_payload(
+        "collab_snapshot",
+        state,
+        request.headers.get("accept-encoding"),
+        YJS_SNAPSHOT_GZIP_MIN_BYTES,
+        YJS_SNAPSHOT_GZIP_LEVEL
+    )
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    return Response(content=body, media_type="application/octet-stream", headers=headers)
+
+
+@router.get("/compression")
+async def compression():
+    """
+    Compression metrics per endpoint
+    
+    Reports uncompressed vs. sent bytes, compression ratio and CPU time
+    spent compressing.
+    """
+    return get_compression_stats()
+
+
+@router.get("/collab/rooms/{room_id}/worker")
+async def collaborative_room_worker(room_id: str):
+    """
+    Preferred worker for a room
+    
+    Connecting every client of a room to the same worker (from RELAY_WORKERS)
+    keeps its traffic inside one process; clients on other workers still
+    see each other through the relay.
+    """
+    return {
+        "room_id": room_id,
+        "worker": room_worker(room_id, RELAY_WORKERS),
+        "workers": len(RELAY_WORKERS),
+        "this_worker": room_manager.relay.worker_id
+    }
@@ -0,0 +1,76 @@
+"""
+Production Server - Multi-worker launcher without the development reloader
+==========================================================================
+
+Runs app:app under uvicorn with SERVER_WORKERS processes, uvloop and
+httptools when they are installed, and no file watching. `python app.py`
+remains the development entry point (single process, auto-reload).
+
+Collaborative rooms are only shared across workers with RELAY_MODE=broker
+(see relay_broker.py).
+
+Usage:
+    python serve.py
+    SERVER_WORKERS=4 RELAY_MODE=broker python serve.py
+"""
+import importlib.util
+
+import uvicorn
+
+from config import (
+    PORT,
+    RELAY_MODE,
+    SERVER_HOST,
+    SERVER_HTTP,
+    SERVER_KEEP_ALIVE_SECONDS,
+    SERVER_LOG_LEVEL,
+    SERVER_LOOP,
+    SERVER_WORKERS,
+    WS_PER_MESSAGE_DEFLATE
+)
+
+
+def _installed(module: str) -> bool:
+    return importlib.util.find_spec(module) is not None
+
+
+def resolve_loop(setting: str) -> str:
+    """uvicorn loop implementation for SERVER_LOOP ("auto" prefers uvloop)"""
+    if setting != "auto":
+        return setting
+    return "uvloop" if _installed("uvloop") else "asyncio"
+
+
+def resolve_http(setting: str) -> str:
+    """uvicorn HTTP protocol for SERVER_HTTP ("auto" prefers httptools)"""
+    if setting != "auto":
+        return setting
+    return "httptools" if _installed("httptools") else "h11"
+
+
+def main():
+    loop = resolve_loop(SERVER_LOOP)
+    http = resolve_http(SERVER_HTTP)
+
+    print(f"[Server] http://{SERVER_HOST}:{PORT} workers={SERVER_WORKERS} loop={loop} http={http}")
+    if SERVER_WORKERS > 1 and RELAY_MODE != "broker":
+        print("[Server] Warning: collaborative rooms are not shared between workers unless RELAY_MODE=broker")
+
+    uvicorn.run(
+        "app:app",
+        host=SERVER_HOST,
+        port=PORT,
+        workers=SERVER_WORKERS,
+        loop=loop,
+        http=http,
+        ws="wsproto",
+        ws_per_message_deflate=WS_PER_MESSAGE_DEFLATE,
+        timeout_keep_alive=SERVER_KEEP_ALIVE_SECONDS,
+        log_level=SERVER_LOG_LEVEL,
+        proxy_headers=True,
+        reload=False
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,12 +7,33 @@ from .ai_service import (
     process_text_with_gemini,
     transcribe_audio_with_gemini
 )
-from .code_execution import execute_code_in_sandbox
+from .transcription import (
+    TranscriptionBackend,
+    TranscriptionResult,
+    get_transcription_backend,
+    transcribe_audio
+)
+from .audio_ingest import AudioIngestor, UnsupportedAudioFormat, audio_ingestor
+from .code_execution import execute_code_in_sandbox, stream_code_execution
+from .meeting_transcription import RoomTranscriptionService, meeting_transcriber
+from .question_answering import QuestionAnswerCoalescer, question_answerer
 
 __all__ = [
     'get_gemini_model',
     'is_question',
     'process_text_with_gemini',
     'transcribe_audio_with_gemini',
-    'execute_code_in_sandbox'
+    'TranscriptionBackend',
+    'TranscriptionResult',
+    'get_transcription_backend',
+    'transcribe_audio',
+    'AudioIngestor',
+    'UnsupportedAudioFormat',
+    'audio_ingestor',
+    'execute_code_in_sandbox',
+    'stream_code_execution',
+    'RoomTranscriptionService',
+    'meeting_transcriber',
+    'QuestionAnswerCoalescer',
+    'question_answerer'
 ]
@@ -0,0 +1,387 @@
+"""
+Admission Control - Per-client rate limits and adaptive load shedding
+"""
+import math
+import time
+from collections import OrderedDict
+from typing import Dict, Optional, Tuple
+
+from config import (
+    RATE_LIMIT_AI,
+    RATE_LIMIT_CODE,
+    RATE_LIMIT_ENABLED,
+    RATE_LIMIT_HTTP_DEFAULT,
+    RATE_LIMIT_MAX_KEYS,
+    RATE_LIMIT_MEETING_AUDIO,
+    RATE_LIMIT_ROOM,
+    RATE_LIMIT_ROUTES,
+    RATE_LIMIT_WS_CONNECT,
+    RATE_LIMIT_WS_MESSAGES,
+    SHED_LOOP_LAG_MS,
+    SHED_MAX_CONCURRENCY,
+    SHED_MIN_CONCURRENCY,
+    SHED_QUEUE_DEPTH
+)
+from services.metrics import loop_lag_monitor, registry, websocket_queue_depth
+from services.serialization import FastJSONResponse
+
+
+ADMISSION_REJECTIONS = registry.counter(
+    "admission_rejections_total", "Requests and messages refused by scope and reason (rate_limited, shed)",
+    ("scope", "reason")
+)
+SHED_CONCURRENCY_LIMIT = registry.gauge(
+    "load_shed_concurrency_limit", "Current limit on concurrent expensive requests"
+)
+SHED_IN_FLIGHT = registry.gauge(
+    "load_shed_in_flight", "Expensive requests currently admitted"
+)
+
+PERIOD_SECONDS = {"s": 1, "sec": 1, "min": 60, "m": 60, "h": 3600, "hour": 3600}
+
+# Retry-After sent when work is shed (the limit is re-evaluated this often)
+SHED_ADJUST_INTERVAL = 0.5
+SHED_RETRY_AFTER_SECONDS = 2
+
+
+class Limit:
+    """A token-bucket limit: `rate` tokens per second, up to `burst` saved up"""
+
+    __slots__ = ("rate", "burst", "spec")
+
+    def __init__(self, rate: float, burst: float, spec: str = ""):
+        self.rate = rate
+        self.burst = burst
+        self.spec = spec
+
+    @classmethod
+    def parse(cls, spec: str) -> "Limit":
+        """
+        Parse "count/period[:burst]", e.g. "30/min:10"
+
+        Raises:
+            ValueError: If the spec is malformed
+        """
+        try:
+            amount, _, burst = spec.strip().partition(":")
+            count, _, period = amount.partition("/")
+            seconds = PERIOD_SECONDS[period.strip().lower() or "s"]
+            count = float(count)
+            burst = float(burst) if burst else count
+        except (KeyError, ValueError):
+            raise ValueError(f"Invalid rate limit '{spec}', expected count/period[:burst] like 30/min:10")
+        if count <= 0 or burst < 1:
+            raise ValueError(f"Invalid rate limit '{spec}', count and burst must be positive")
+        return cls(count / seconds, burst, spec.strip())
+
+
+class TokenBucket:
+    """Tokens refilled continuously at the limit's rate"""
+
+    __slots__ = ("tokens", "updated")
+
+    def __init__(self, tokens: float, now: float):
+        self.tokens = tokens
+        self.updated = now
+
+    def take(self, limit: Limit, now: float, cost: float = 1.0) -> float:
+        """
+        Take tokens if available
+
+        Returns:
+            0 if admitted, otherwise seconds until enough tokens are available
+        """
+        self.tokens = min(limit.burst, self.tokens + (now - self.updated) * limit.rate)
+        self.updated = now
+        if self.tokens >= cost:
+            self.tokens -= cost
+            return 0.0
+        return (cost - self.tokens) / limit.rate
+
+
+class RateLimiter:
+    """
+    Token buckets per (name, key), e.g. ("POST /api/chat", client IP)
+
+    Buckets live in an LRU map bounded by RATE_LIMIT_MAX_KEYS; a dropped
+    bucket just starts full again, so the bound only affects clients idle
+    long enough to have refilled anyway.
+    """
+
+    def __init__(self, max_keys: int = RATE_LIMIT_MAX_KEYS):
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[Tuple[str, str], TokenBucket]" = OrderedDict()
+        # Structure: {name: [admitted, limited]}
+        self.counts: Dict[str, list] = {}
+
+    def check(self, name: str, key: str, limit: Limit, cost: float = 1.0) -> float:
+        """
+        Count one event against a bucket
+
+        Args:
+            name: Limit name (route or message kind)
+            key: Who is limited (IP, client_id, room_id)
+            limit: Rate and burst
+            cost: Tokens the event takes
+
+        Returns:
+            0 if admitted, otherwise the Retry-After in seconds
+        """
+        now = time.monotonic()
+        bucket_key = (name, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            bucket = TokenBucket(limit.burst, now)
+            self._buckets[bucket_key] = bucket
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(bucket_key)
+
+        retry_after = bucket.take(limit, now, cost)
+        counts = self.counts.setdefault(name, [0, 0])
+        counts[1 if retry_after else 0] += 1
+        return retry_after
+
+    def stats(self) -> dict:
+        return {
+            "buckets": len(self._buckets),
+            "max_keys": self.max_keys,
+            "limits": {
+                name: {"admitted": admitted, "limited": limited}
+                for name, (admitted, limited) in self.counts.items()
+            }
+        }
+
+
+class LoadShedder:
+    """
+    Adaptive cap on concurrent expensive work (AI calls, code runs)
+
+    Every SHED_ADJUST_INTERVAL the worker's health is checked: while event
+    loop lag is above SHED_LOOP_LAG_MS or WebSocket send queues hold more
+    than SHED_QUEUE_DEPTH frames, the cap shrinks multiplicatively towards
+    SHED_MIN_CONCURRENCY; once healthy it grows back by one per interval.
+    Work over the cap is refused immediately with a Retry-After instead of
+    queueing and raising latency for everyone.
+    """
+
+    def __init__(
+        self,
+        max_concurrency: int = SHED_MAX_CONCURRENCY,
+        min_concurrency: int = SHED_MIN_CONCURRENCY,
+        loop_lag_ms: int = SHED_LOOP_LAG_MS,
+        queue_depth: int = SHED_QUEUE_DEPTH
+    ):
+        self.max_concurrency = max_concurrency
+        self.min_concurrency = min(min_concurrency, max_concurrency)
+        self.max_lag = loop_lag_ms / 1000
+        self.max_queue_depth = queue_depth
+        self.limit = max_concurrency
+        self.in_flight = 0
+        self.overloaded = False
+        self.shed = 0
+        self._checked_at = 0.0
+        SHED_CONCURRENCY_LIMIT.set(self.limit)
+
+    def _adjust(self):
+        now = time.monotonic()
+        if now - self._checked_at < SHED_ADJUST_INTERVAL:
+            return
+        self._checked_at = now
+        self.overloaded = (
+            loop_lag_monitor.last_lag > self.max_lag
+            or websocket_queue_depth() > self.max_queue_depth
+        )
+        if self.overloaded:
+            self.limit = max(self.min_concurrency, int(self.limit * 0.7))
+        else:
+            self.limit = min(self.max_concurrency, self.limit + 1)
+        SHED_CONCURRENCY_LIMIT.set(self.limit)
+
+    def try_acquire(self) -> bool:
+        """Admit one unit of expensive work; release() it when done"""
+        self._adjust()
+        if self.in_flight >= self.limit:
+            self.shed += 1
+            return False
+        self.in_flight += 1
+        SHED_IN_FLIGHT.set(self.in_flight)
+        return True
+
+    def release(self):
+        self.in_flight -= 1
+        SHED_IN_FLIGHT.set(self.in_flight)
+
+    def is_overloaded(self) -> bool:
+        """Whether the worker is currently over its lag or queue thresholds"""
+        self._adjust()
+        return self.overloaded
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "max_concurrency": self.max_concurrency,
+            "min_concurrency": self.min_concurrency,
+            "in_flight": self.in_flight,
+            "overloaded": self.overloaded,
+            "loop_lag_ms": round(loop_lag_monitor.last_lag * 1000, 1),
+            "websocket_queue_depth": websocket_queue_depth(),
+            "shed": self.shed
+        }
+
+
+def parse_route_limits(spec: str) -> Dict[str, Limit]:
+    """
+    Parse RATE_LIMIT_ROUTES ("METHOD /path=limit,...")
+
+    Raises:
+        ValueError: If an entry is malformed
+    """
+    limits = {}
+    for entry in spec.split(","):
+        if not entry.strip():
+            continue
+        route, _, limit = entry.partition("=")
+        method, _, path = route.strip().partition(" ")
+        if not path.strip() or not limit:
+            raise ValueError(f"Invalid RATE_LIMIT_ROUTES entry '{entry}', expected 'METHOD /path=count/period'")
+        limits[f"{method.upper()} {path.strip()}"] = Limit.parse(limit)
+    return limits
+
+
+AI_LIMIT = Limit.parse(RATE_LIMIT_AI)
+CODE_LIMIT = Limit.parse(RATE_LIMIT_CODE)
+
+# Job submissions only queue work, the bounded job pool limits how much runs
+JOB_ROUTES = ("POST /api/jobs/summary", "POST /api/jobs/sentiment", "POST /api/jobs/transcription")
+
+# Routes with their own per-IP bucket; all but job submissions are expensive and subject to load shedding
+ROUTE_LIMITS: Dict[str, Limit] = {
+    "POST /api/chat": AI_LIMIT,
+    "POST /api/transcribe": AI_LIMIT,
+    "POST /api/analyze-sentiment": AI_LIMIT,
+    "POST /api/generate-summary": AI_LIMIT,
+    "POST /api/execute-code": CODE_LIMIT,
+    **{route: AI_LIMIT for route in JOB_ROUTES},
+    **parse_route_limits(RATE_LIMIT_ROUTES)
+}
+SHED_ROUTES = frozenset(ROUTE_LIMITS).difference(JOB_ROUTES)
+
+HTTP_DEFAULT_LIMIT = Limit.parse(RATE_LIMIT_HTTP_DEFAULT)
+WS_CONNECT_LIMIT = Limit.parse(RATE_LIMIT_WS_CONNECT)
+WS_MESSAGE_LIMIT = Limit.parse(RATE_LIMIT_WS_MESSAGES)
+MEETING_AUDIO_LIMIT = Limit.parse(RATE_LIMIT_MEETING_AUDIO)
+ROOM_LIMIT = Limit.parse(RATE_LIMIT_ROOM)
+
+# WebSocket message kinds: per-client limit (the room limit applies to all of them)
+MESSAGE_LIMITS: Dict[str, Limit] = {
+    "ai_message": WS_MESSAGE_LIMIT,
+    "meeting_audio": MEETING_AUDIO_LIMIT,
+    "code_run": CODE_LIMIT
+}
+
+# Global instances
+rate_limiter = RateLimiter()
+load_shedder = LoadShedder()
+
+
+def retry_after_header(seconds: float) -> str:
+    """Retry-After value: whole seconds, at least 1"""
+    return str(max(1, math.ceil(seconds)))
+
+
+def check_message(kind: str, client_id: str, room_id: Optional[str] = None) -> float:
+    """
+    Rate-limit a WebSocket message per client and per room
+
+    Args:
+        kind: "ai_message", "meeting_audio" or "code_run"
+        client_id: Sending client
+        room_id: Room the message counts against, if any
+
+    Returns:
+        0 if admitted, otherwise seconds until the client may retry
+    """
+    if not RATE_LIMIT_ENABLED:
+        return 0.0
+    retry_after = rate_limiter.check(kind, client_id, MESSAGE_LIMITS[kind])
+    if not retry_after and room_id is not None:
+        retry_after = rate_limiter.check("room", room_id, ROOM_LIMIT)
+    if retry_after:
+        ADMISSION_REJECTIONS.labels(kind, "rate_limited").inc()
+    return retry_after
+
+
+def client_ip(scope) -> str:
+    """Client address of a request (uvicorn's proxy_headers resolves X-Forwarded-For from trusted proxies)"""
+    client = scope.get("client")
+    return client[0] if client else "unknown"
+
+
+def admission_stats() -> dict:
+    return {
+        "enabled": RATE_LIMIT_ENABLED,
+        "routes": {route: limit.spec for route, limit in ROUTE_LIMITS.items()},
+        "rate_limiter": rate_limiter.stats(),
+        "load_shedder": load_shedder.stats()
+    }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying per-IP rate limits and load shedding
+
+    HTTP requests take a token from their route's bucket (ROUTE_LIMITS, or
+    RATE_LIMIT_HTTP_DEFAULT) and get 429 with Retry-After when it is empty.
+    Expensive routes additionally need a load shedder slot and get 503 with
+    Retry-After when the worker is saturated. WebSocket handshakes are
+    limited per IP and refused (HTTP 403) over the limit; messages on open
+    sockets are limited by the handlers with check_message().
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if not RATE_LIMIT_ENABLED or scope["type"] not in ("http", "websocket"):
+            await self.app(scope, receive, send)
+            return
+
+        ip = client_ip(scope)
+        if scope["type"] == "websocket":
+            if rate_limiter.check("ws_connect", ip, WS_CONNECT_LIMIT):
+                ADMISSION_REJECTIONS.labels("ws_connect", "rate_limited").inc()
+                await send({"type": "websocket.close", "code": 1008})
+                return
+            await self.app(scope, receive, send)
+            return
+
+        route = f"{scope['method']} {scope['path']}"
+        limit = ROUTE_LIMITS.get(route)
+        retry_after = rate_limiter.check(route if limit is not None else "http", ip, limit or HTTP_DEFAULT_LIMIT)
+        if retry_after:
+            ADMISSION_REJECTIONS.labels("http", "rate_limited").inc()
+            await self._reject(scope, receive, send, 429, "Rate limit exceeded", retry_after)
+            return
+
+        if route not in SHED_ROUTES:
+            await self.app(scope, receive, send)
+            return
+        if not load_shedder.try_acquire():
+            ADMISSION_REJECTIONS.labels("http", "shed").inc()
+            await self._reject(scope, receive, send, 503, "Server is busy", SHED_RETRY_AFTER_SECONDS)
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            load_shedder.release()
+
+    async def _reject(self, scope, receive, send, status: int, detail: str, retry_after: float):
+        seconds = retry_after_header(retry_after)
+        response = FastJSONResponse(
+            {"detail": detail, "retry_after": int(seconds)},
+            status_code=status,
+            headers={"Retry-After": seconds}
+        )
+        await response(scope, receive, send)
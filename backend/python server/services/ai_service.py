@@ -2,11 +2,62 @@
 AI Service - Gemini AI integration for chat, transcription, and analysis
 """
 import asyncio
-from typing import List, Optional
-import google.generativeai as genai
-from google.api_core import exceptions as google_exceptions
+import re
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
 
-from config import GEMINI_MODELS, AI_SYSTEM_INSTRUCTION
+from config import GEMINI_API_KEY, GEMINI_MODELS, AI_SYSTEM_INSTRUCTION
+from services.metrics import (
+    GEMINI_FALLBACKS,
+    GEMINI_REQUEST_DURATION,
+    GEMINI_REQUESTS,
+    GEMINI_RETRIES
+)
+from services.audio_ingest import audio_mime_type
+from services.hedging import gemini_hedger
+from services.tracing import current_span, trace_span, traced
+from services.transcript_index import transcript_index
+
+
+# Fallback responses returned when every model and retry failed
+CAPACITY_RESPONSE = "⏳ I'm currently at capacity. The free tier has limited requests per minute. Please wait a moment and try again."
+ERROR_RESPONSE = "I apologize, but I encountered an error. Please try again in a moment."
+FALLBACK_RESPONSES = (CAPACITY_RESPONSE, ERROR_RESPONSE)
+
+# The Gemini SDK takes most of the server's import time, so it is loaded on first use
+_sdk = None
+_sdk_lock = threading.Lock()
+
+
+def load_gemini_sdk():
+    """
+    Import and configure the Gemini SDK once
+    
+    Safe to call from a worker thread (see preload_gemini_sdk) and from the
+    event loop; only the first call pays the import.
+    
+    Returns:
+        Tuple of (google.generativeai module, google.api_core.exceptions module)
+    """
+    global _sdk
+    if _sdk is None:
+        with _sdk_lock:
+            if _sdk is None:
+                import google.generativeai as genai
+                from google.api_core import exceptions as google_exceptions
+                
+                if GEMINI_API_KEY:
+                    genai.configure(api_key=GEMINI_API_KEY)
+                _sdk = (genai, google_exceptions)
+    return _sdk
+
+
+async def preload_gemini_sdk():
+    """Load the Gemini SDK in a thread so the first AI request doesn't block the loop on it"""
+    start_time = time.perf_counter()
+    await asyncio.to_thread(load_gemini_sdk)
+    print(f"[AI] Gemini SDK loaded in {(time.perf_counter() - start_time) * 1000:.0f}ms")
 
 
 def get_gemini_model(model_name: str = None):
@@ -19,6 +70,7 @@ def get_gemini_model(model_name: str = None):
     Returns:
         GenerativeModel instance
     """
+    genai, _ = load_gemini_sdk()
     model = model_name or GEMINI_MODELS[0]
     return genai.GenerativeModel(
         model_name=model,
@@ -26,6 +78,60 @@ def get_gemini_model(model_name: str = None):
     )
 
 
+def record_gemini_call(operation: str, model_name: str, outcome: str, started_at: float):
+    """
+    Record one Gemini API call in the metrics registry
+    
+    Args:
+        operation: What the call was for (chat, transcription, sentiment, summary)
+        model_name: Gemini model called
+        outcome: success, rate_limited, not_found, error or cancelled
+        started_at: time.perf_counter() when the call started
+    """
+    GEMINI_REQUESTS.labels(operation, model_name, outcome).inc()
+    current_span().set("outcome", outcome)
+    GEMINI_REQUEST_DURATION.labels(operation, model_name).observe(time.perf_counter() - started_at)
+
+
+async def send_chat_message(model_name: str, history: List[dict], message: str) -> str:
+    """
+    Send one chat request to a model, recording its outcome and latency
+    
+    Args:
+        model_name: Gemini model to call
+        history: Conversation so far, in Gemini's {"role", "parts"} format
+        message: Message to send
+    
+    Returns:
+        Response text
+    
+    Raises:
+        Whatever the Gemini SDK raised
+    """
+    _, google_exceptions = load_gemini_sdk()
+    started_at = time.perf_counter()
+    try:
+        chat = get_gemini_model(model_name).start_chat(history=history)
+        response = await chat.send_message_async(message)
+        text = response.text
+    except asyncio.CancelledError:
+        # The other request of a hedged pair won
+        record_gemini_call("chat", model_name, "cancelled", started_at)
+        raise
+    except google_exceptions.ResourceExhausted:
+        record_gemini_call("chat", model_name, "rate_limited", started_at)
+        raise
+    except google_exceptions.NotFound:
+        record_gemini_call("chat", model_name, "not_found", started_at)
+        raise
+    except Exception:
+        record_gemini_call("chat", model_name, "error", started_at)
+        raise
+    record_gemini_call("chat", model_name, "success", started_at)
+    gemini_hedger.observe(model_name, time.perf_counter() - started_at)
+    return text
+
+
 def is_question(text: str) -> bool:
     """
     Detect if the text contains a question
@@ -65,11 +171,14 @@ def is_question(text: str) -> bool:
     return False
 
 
+@traced("gemini.chat")
 async def process_text_with_gemini(
     message: str,
     chat_history: Optional[List[dict]] = None,
     meeting_context: Optional[List[str]] = None,
-    max_retries: int = 3
+    max_retries: int = 3,
+    room_id: Optional[str] = None,
+    context_query: Optional[str] = None
 ) -> str:
     """
     Process text message with Gemini AI with retry logic
@@ -79,59 +188,183 @@ async def process_text_with_gemini(
         chat_history: Previous chat messages for context
         meeting_context: Recent meeting transcriptions for context
         max_retries: Number of retry attempts per model
+        room_id: Meeting room whose transcript is searched for context (instead of meeting_context)
+        context_query: What to search the transcript for, defaults to the message
     
     Returns:
         AI response text
     """
+    _, google_exceptions = load_gemini_sdk()
     last_error = None
     
     # Build context from meeting if available
     context_prompt = ""
-    if meeting_context and len(meeting_context) > 0:
+    if room_id is not None:
+        with trace_span("transcript.select", room_id=room_id) as span:
+            relevant_context = transcript_index.select(room_id, context_query or message)
+            span.set("snippets", len(relevant_context))
+        if relevant_context:
+            context_prompt = "\n\nRelevant parts of the meeting conversation, in order:\n" + "\n".join(relevant_context) + "\n\n"
+    elif meeting_context and len(meeting_context) > 0:
         recent_context = meeting_context[-20:]  # Last 20 transcriptions
         context_prompt = f"\n\nRecent meeting conversation for context:\n" + "\n".join(recent_context) + "\n\n"
     
     full_message = context_prompt + message if context_prompt else message
     
-    for model_name in GEMINI_MODELS:
+    # Build conversation context
+    history = []
+    if chat_history:
+        for msg in chat_history[-10:]:  # Keep last 10 messages for context
+            role = "user" if msg["role"] == "user" else "model"
+            history.append({"role": role, "parts": [msg["content"]]})
+    
+    def send(model_name: str):
+        return send_chat_message(model_name, history, full_message)
+    
+    for index, model_name in enumerate(GEMINI_MODELS):
+        backup_model = GEMINI_MODELS[index + 1] if index + 1 < len(GEMINI_MODELS) else None
         for attempt in range(max_retries):
-            try:
-                model = get_gemini_model(model_name)
-                
-                # Build conversation context
-                history = []
-                if chat_history:
-                    for msg in chat_history[-10:]:  # Keep last 10 messages for context
-                        role = "user" if msg["role"] == "user" else "model"
-                        history.append({"role": role, "parts": [msg["content"]]})
-                
-                chat = model.start_chat(history=history)
-                response = chat.send_message(full_message)
+            if attempt > 0:
+                GEMINI_RETRIES.labels("chat", model_name).inc()
+            with trace_span("gemini.attempt", model=model_name, attempt=attempt + 1):
+                try:
+                    if gemini_hedger.enabled and backup_model is not None:
+                        return await gemini_hedger.run(model_name, backup_model, send)
+                    return await send(model_name)
                 
-                return response.text
+                except google_exceptions.ResourceExhausted as e:
+                    last_error = e
+                    wait_time = (2 ** attempt) + 1  # Exponential backoff
+                    print(f"Rate limited on {model_name}, attempt {attempt + 1}/{max_retries}. Waiting {wait_time}s...")
+                    with trace_span("gemini.backoff", seconds=wait_time):
+                        await asyncio.sleep(wait_time)
                 
-            except google_exceptions.ResourceExhausted as e:
-                last_error = e
-                wait_time = (2 ** attempt) + 1  # Exponential backoff
-                print(f"Rate limited on {model_name}, attempt {attempt + 1}/{max_retries}. Waiting {wait_time}s...")
-                await asyncio.sleep(wait_time)
+                except google_exceptions.NotFound as e:
+                    print(f"Model {model_name} not available, trying next...")
+                    last_error = e
+                    break  # Move to next model
                 
-            except google_exceptions.NotFound as e:
-                print(f"Model {model_name} not available, trying next...")
-                last_error = e
-                break  # Move to next model
-                
-            except Exception as e:
-                last_error = e
-                print(f"Error processing with Gemini ({model_name}): {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
+                except Exception as e:
+                    last_error = e
+                    print(f"Error processing with Gemini ({model_name}): {e}")
+                    if attempt < max_retries - 1:
+                        with trace_span("gemini.backoff", seconds=1):
+                            await asyncio.sleep(1)
     
     # If all retries failed
+    GEMINI_FALLBACKS.labels("chat").inc()
     error_msg = str(last_error) if last_error else "Unknown error"
     if "quota" in error_msg.lower() or "rate" in error_msg.lower():
-        return "⏳ I'm currently at capacity. The free tier has limited requests per minute. Please wait a moment and try again."
-    return "I apologize, but I encountered an error. Please try again in a moment."
+        return CAPACITY_RESPONSE
+    return ERROR_RESPONSE
+
+
+# Texts rated per Gemini call by analyze_sentiments
+SENTIMENT_BATCH_SIZE = 20
+SENTIMENT_LABELS = ("positive", "negative", "neutral")
+# One "number,sentiment,score" answer line, tolerating "1." or spaces around the commas
+SENTIMENT_LINE = re.compile(r"^\W*(\d+)\W+(positive|negative|neutral)(?:\W+(\d*\.?\d+))?", re.MULTILINE)
+
+
+async def generate_content(operation: str, prompt) -> str:
+    """
+    One generate_content call on the primary model, without blocking the event loop
+    
+    Args:
+        operation: Metrics label (sentiment, summary)
+        prompt: Prompt text or parts
+    
+    Returns:
+        Response text
+    
+    Raises:
+        Exception: Whatever the Gemini SDK raised
+    """
+    model_name = GEMINI_MODELS[0]
+    model = get_gemini_model(model_name)
+    started_at = time.perf_counter()
+    try:
+        response = await model.generate_content_async(prompt)
+        text = response.text
+    except Exception:
+        record_gemini_call(operation, model_name, "error", started_at)
+        raise
+    record_gemini_call(operation, model_name, "success", started_at)
+    return text
+
+
+def parse_sentiment(text: str) -> Tuple[str, float]:
+    """
+    Parse a "sentiment,score" answer
+    
+    Returns:
+        Tuple of (positive/negative/neutral, confidence from 0 to 1); neutral 0.5 if unreadable
+    """
+    parts = [part.strip() for part in text.strip().lower().split(",")]
+    sentiment = parts[0] if parts[0] in SENTIMENT_LABELS else "neutral"
+    try:
+        score = min(max(float(parts[1]), 0.0), 1.0)
+    except (IndexError, ValueError):
+        score = 0.5
+    return sentiment, score
+
+
+@traced("gemini.sentiment")
+async def analyze_sentiment(text: str) -> Tuple[str, float]:
+    """
+    Rate the sentiment of a text
+    
+    Returns:
+        Tuple of (sentiment, confidence score)
+    """
+    answer = await generate_content(
+        "sentiment",
+        f"Analyze the sentiment of this text and respond with ONLY one word (positive/negative/neutral) and a confidence score from 0 to 1. Format: sentiment,score\n\nText: {text}"
+    )
+    return parse_sentiment(answer)
+
+
+@traced("gemini.sentiment_batch")
+async def analyze_sentiments(texts: List[str], fill_missing: bool = True) -> List[Optional[dict]]:
+    """
+    Rate the sentiment of many texts, SENTIMENT_BATCH_SIZE per Gemini call
+    
+    Args:
+        texts: Texts to rate
+        fill_missing: Rate texts Gemini skipped as neutral (0.5) instead of None
+    
+    Returns:
+        One {"text", "sentiment", "score"} per text, in order
+    """
+    results = []
+    for start in range(0, len(texts), SENTIMENT_BATCH_SIZE):
+        batch = texts[start:start + SENTIMENT_BATCH_SIZE]
+        numbered = "\n".join(f"{i + 1}. {' '.join(text.split())}" for i, text in enumerate(batch))
+        answer = await generate_content(
+            "sentiment",
+            "Analyze the sentiment of each numbered text. Respond with ONLY one line per text, in order, "
+            "formatted as: number,sentiment,score - where sentiment is positive/negative/neutral and score "
+            f"is a confidence from 0 to 1.\n\n{numbered}"
+        )
+        ratings: Dict[int, Tuple[str, float]] = {}
+        for match in SENTIMENT_LINE.finditer(answer.lower()):
+            ratings[int(match.group(1))] = parse_sentiment(f"{match.group(2)},{match.group(3) or ''}")
+        for i, text in enumerate(batch):
+            if i + 1 not in ratings and not fill_missing:
+                results.append(None)
+                continue
+            sentiment, score = ratings.get(i + 1, ("neutral", 0.5))
+            results.append({"text": text, "sentiment": sentiment, "score": score})
+    return results
+
+
+@traced("gemini.summary")
+async def generate_summary(transcript: str, max_length: int = 200) -> str:
+    """Summarize a meeting transcript with key points, decisions and action items"""
+    return await generate_content(
+        "summary",
+        f"Summarize this meeting transcript in about {max_length} words. Include key points, decisions made, and action items:\n\n{transcript}"
+    )
 
 
 async def transcribe_audio_with_gemini(audio_data: bytes, max_retries: int = 3) -> str:
@@ -145,45 +378,79 @@ async def transcribe_audio_with_gemini(audio_data: bytes, max_retries: int = 3)
     Returns:
         Transcription text, or empty string if failed
     """
+    transcription = await request_gemini_transcription(audio_data, max_retries=max_retries)
+    return transcription or ""
+
+
+@traced("gemini.transcription")
+async def request_gemini_transcription(
+    audio_data: bytes,
+    mime_type: Optional[str] = None,
+    max_retries: int = 3
+) -> Optional[str]:
+    """
+    Transcribe audio with Gemini, distinguishing silence from failure
+    
+    Args:
+        audio_data: Raw audio bytes
+        mime_type: MIME type of the audio payload, sniffed from its bytes when not given
+        max_retries: Number of retry attempts per model
+    
+    Returns:
+        Transcription text, empty string for silence, or None if every attempt failed
+    """
+    genai, google_exceptions = load_gemini_sdk()
     last_error = None
+    mime_type = mime_type or audio_mime_type(audio_data)
     
     for model_name in GEMINI_MODELS:
         for attempt in range(max_retries):
-            try:
-                model = genai.GenerativeModel(model_name)
+            if attempt > 0:
+                GEMINI_RETRIES.labels("transcription", model_name).inc()
+            started_at = time.perf_counter()
+            with trace_span("gemini.attempt", model=model_name, attempt=attempt + 1):
+                try:
+                    model = genai.GenerativeModel(model_name)
                 
-                audio_part = {
-                    "mime_type": "audio/webm",
-                    "data": audio_data
-                }
+                    audio_part = {
+                        "mime_type": mime_type,
+                        "data": audio_data
+                    }
                 
-                response = model.generate_content([
-                    "Transcribe the following audio. Only output the transcription text, nothing else. If the audio is silent or unclear, respond with [silence]:",
-                    audio_part
-                ])
+                    response = await model.generate_content_async([
+                        "Transcribe the following audio. Only output the transcription text, nothing else. If the audio is silent or unclear, respond with [silence]:",
+                        audio_part
+                    ])
                 
-                result = response.text.strip()
-                # Filter out silence markers
-                if result.lower() in ['[silence]', 'silence', '[unclear]', '[inaudible]', '']:
-                    return ""
-                return result
+                    result = response.text.strip()
+                    record_gemini_call("transcription", model_name, "success", started_at)
+                    # Filter out silence markers
+                    if result.lower() in ['[silence]', 'silence', '[unclear]', '[inaudible]', '']:
+                        return ""
+                    return result
                 
-            except google_exceptions.ResourceExhausted as e:
-                last_error = e
-                wait_time = (2 ** attempt) + 1
-                print(f"Rate limited on {model_name} for transcription, waiting {wait_time}s...")
-                await asyncio.sleep(wait_time)
+                except google_exceptions.ResourceExhausted as e:
+                    record_gemini_call("transcription", model_name, "rate_limited", started_at)
+                    last_error = e
+                    wait_time = (2 ** attempt) + 1
+                    print(f"Rate limited on {model_name} for transcription, waiting {wait_time}s...")
+                    with trace_span("gemini.backoff", seconds=wait_time):
+                        await asyncio.sleep(wait_time)
                 
-            except google_exceptions.NotFound as e:
-                print(f"Model {model_name} not available for transcription, trying next...")
-                last_error = e
-                break
+                except google_exceptions.NotFound as e:
+                    record_gemini_call("transcription", model_name, "not_found", started_at)
+                    print(f"Model {model_name} not available for transcription, trying next...")
+                    last_error = e
+                    break
                 
-            except Exception as e:
-                last_error = e
-                print(f"Error transcribing audio with {model_name}: {e}")
-                if attempt < max_retries - 1:
-                    await asyncio.sleep(1)
+                except Exception as e:
+                    record_gemini_call("transcription", model_name, "error", started_at)
+                    last_error = e
+                    print(f"Error transcribing audio with {model_name}: {e}")
+                    if attempt < max_retries - 1:
+                        with trace_span("gemini.backoff", seconds=1):
+                            await asyncio.sleep(1)
     
+    GEMINI_FALLBACKS.labels("transcription").inc()
     print(f"All transcription attempts failed: {last_error}")
-    return ""
+    return None
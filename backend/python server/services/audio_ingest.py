@@ -0,0 +1,389 @@
+"""
+Audio Ingestion - Format detection and speech-rate normalization before transcription
+"""
+import asyncio
+import io
+import multiprocessing
+import shutil
+import subprocess
+import sys
+import time
+import wave
+from array import array
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+
+from config import (
+    AUDIO_FFMPEG_BITRATE,
+    AUDIO_FFMPEG_ENCODE,
+    AUDIO_MAX_BYTES,
+    AUDIO_NORMALIZE,
+    AUDIO_NORMALIZE_MIN_BYTES,
+    AUDIO_TARGET_SAMPLE_RATE,
+    AUDIO_WORKERS
+)
+from services.metrics import registry
+from services.tracing import trace_span
+
+
+AUDIO_CHUNKS = registry.counter(
+    "audio_ingest_chunks_total",
+    "Audio payloads by sniffed format and action (passthrough, normalized, encoded, converted, rejected)",
+    ("format", "action")
+)
+AUDIO_BYTES = registry.counter(
+    "audio_ingest_bytes_total", "Audio bytes received (in) and passed on to transcription (out)", ("stage",)
+)
+AUDIO_INGEST_DURATION = registry.histogram(
+    "audio_ingest_duration_seconds", "Time spent detecting and converting an audio payload", ("action",)
+)
+
+# MIME types of the formats Gemini accepts inline
+SUPPORTED_FORMATS = {
+    "wav": "audio/wav",
+    "mp3": "audio/mp3",
+    "aiff": "audio/aiff",
+    "aac": "audio/aac",
+    "ogg": "audio/ogg",
+    "flac": "audio/flac",
+    "webm": "audio/webm"
+}
+
+# Ingestion actions
+PASSTHROUGH = "passthrough"
+NORMALIZED = "normalized"
+ENCODED = "encoded"
+CONVERTED = "converted"
+REJECTED = "rejected"
+
+# ffmpeg gets this long per payload
+FFMPEG_TIMEOUT_SECONDS = 30
+
+
+class UnsupportedAudioFormat(ValueError):
+    """Raised for audio that can't be transcribed and can't be converted"""
+
+
+def sniff_audio_format(data: bytes) -> Optional[str]:
+    """
+    Identify an audio container or codec from its magic bytes
+
+    Args:
+        data: Audio payload (only the first bytes are looked at)
+
+    Returns:
+        Format name (a SUPPORTED_FORMATS key, or mp4, amr or caf), or None
+    """
+    head = data[:64]
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        # EBML header; Matroska audio decodes like WebM
+        return "webm"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"FORM" and head[8:12] in (b"AIFF", b"AIFC"):
+        return "aiff"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if head[4:8] == b"ftyp":
+        return "mp4"
+    if head[:5] == b"#!AMR":
+        return "amr"
+    if head[:4] == b"caff":
+        return "caf"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # MPEG frame sync: layer bits 00 are ADTS AAC, anything else MPEG audio
+        return "aac" if head[1] & 0x06 == 0 else "mp3"
+    return None
+
+
+def audio_mime_type(data: bytes, default: str = "audio/webm") -> str:
+    """MIME type of a payload by its magic bytes, or the default when unrecognised"""
+    return SUPPORTED_FORMATS.get(sniff_audio_format(data), default)
+
+
+def wav_info(data: bytes) -> Optional[Tuple[int, int, int, float]]:
+    """(channels, sample rate, sample width, seconds) of a PCM WAV payload, or None"""
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            rate = wav.getframerate()
+            return wav.getnchannels(), rate, wav.getsampwidth(), wav.getnframes() / float(rate)
+    except Exception:
+        return None
+
+
+def _to_int16(frames: bytes, width: int) -> array:
+    """Little-endian PCM samples of any width as signed 16-bit"""
+    if width == 1:
+        # 8-bit WAV is unsigned
+        return array("h", ((byte - 128) << 8 for byte in frames))
+    if width == 2:
+        samples = array("h", frames)
+    else:
+        # Keep the two most significant bytes of each 24/32-bit sample
+        high = bytearray(len(frames) // width * 2)
+        high[0::2] = frames[width - 2::width]
+        high[1::2] = frames[width - 1::width]
+        samples = array("h", bytes(high))
+    if sys.byteorder == "big":
+        samples.byteswap()
+    return samples
+
+
+def normalize_wav(data: bytes, target_rate: int) -> Optional[bytes]:
+    """
+    Downmix a PCM WAV payload to 16-bit mono at no more than target_rate
+
+    Resampling averages the input samples falling into each output sample,
+    which doubles as the low-pass filter against aliasing. Runs in an
+    ingestion worker process.
+
+    Args:
+        data: WAV payload
+        target_rate: Highest output sample rate; lower rates are kept
+
+    Returns:
+        The converted WAV, or None if it is already compact or can't be read
+    """
+    try:
+        with wave.open(io.BytesIO(data)) as wav:
+            channels, width, rate = wav.getnchannels(), wav.getsampwidth(), wav.getframerate()
+            if channels == 1 and width <= 2 and rate <= target_rate:
+                return None
+            samples = _to_int16(wav.readframes(wav.getnframes()), width)
+    except (wave.Error, EOFError):
+        return None
+
+    if channels > 1:
+        samples = array("h", (
+            sum(frame) // channels for frame in zip(*(samples[c::channels] for c in range(channels)))
+        ))
+
+    if rate > target_rate:
+        step = rate / target_rate
+        count = int(len(samples) / step)
+        resampled = array("h", bytes(count * 2))
+        for i in range(count):
+            start, end = int(i * step), int((i + 1) * step)
+            resampled[i] = sum(samples[start:end]) // (end - start)
+        samples, rate = resampled, target_rate
+
+    if sys.byteorder == "big":
+        samples.byteswap()
+    output = io.BytesIO()
+    with wave.open(output, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return output.getvalue()
+
+
+def ffmpeg_to_opus(data: bytes, sample_rate: int, bitrate: str) -> bytes:
+    """
+    Re-encode any audio ffmpeg can read as mono Opus in an Ogg container
+
+    Raises:
+        RuntimeError: If ffmpeg fails
+    """
+    result = subprocess.run(
+        [
+            "ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-vn", "-ac", "1", "-ar", str(sample_rate),
+            "-c:a", "libopus", "-b:a", bitrate, "-application", "voip", "-f", "ogg", "pipe:1"
+        ],
+        input=data,
+        capture_output=True,
+        timeout=FFMPEG_TIMEOUT_SECONDS
+    )
+    if result.returncode != 0 or not result.stdout:
+        raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='ignore').strip()}")
+    return result.stdout
+
+
+class PreparedAudio:
+    """An audio payload ready for transcription, and what ingestion did to it"""
+
+    __slots__ = ("data", "format", "mime_type", "action", "input_bytes", "seconds")
+
+    def __init__(self, data: bytes, format: str, action: str, input_bytes: int, seconds: Optional[float] = None):
+        self.data = data
+        self.format = format
+        self.mime_type = SUPPORTED_FORMATS[format]
+        self.action = action
+        self.input_bytes = input_bytes
+        self.seconds = seconds
+
+    @property
+    def bytes_saved(self) -> int:
+        return self.input_bytes - len(self.data)
+
+    def to_dict(self) -> dict:
+        return {
+            "format": self.format,
+            "action": self.action,
+            "input_bytes": self.input_bytes,
+            "output_bytes": len(self.data),
+            "bytes_saved": self.bytes_saved
+        }
+
+
+class AudioIngestor:
+    """
+    Checks and shrinks audio payloads before they reach a transcription backend
+
+    The format is sniffed from magic bytes instead of trusted from the
+    client, so Gemini is told the real MIME type. Formats Gemini can't take
+    are converted with ffmpeg when it is installed and rejected otherwise.
+    Stereo or high-rate WAV is downmixed and resampled to speech-rate mono
+    in worker processes, and with AUDIO_FFMPEG_ENCODE any large chunk is
+    re-encoded as Opus; a conversion is only kept if it is smaller.
+    """
+
+    def __init__(
+        self,
+        normalize: bool = AUDIO_NORMALIZE,
+        target_rate: int = AUDIO_TARGET_SAMPLE_RATE,
+        min_bytes: int = AUDIO_NORMALIZE_MIN_BYTES,
+        max_bytes: int = AUDIO_MAX_BYTES,
+        workers: int = AUDIO_WORKERS,
+        ffmpeg_encode: bool = AUDIO_FFMPEG_ENCODE,
+        ffmpeg_bitrate: str = AUDIO_FFMPEG_BITRATE
+    ):
+        self.normalize = normalize
+        self.target_rate = target_rate
+        self.min_bytes = min_bytes
+        self.max_bytes = max_bytes
+        self.workers = workers
+        self.ffmpeg_encode = ffmpeg_encode
+        self.ffmpeg_bitrate = ffmpeg_bitrate
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._ffmpeg: Optional[bool] = None
+        # Structure: {action: count}
+        self.actions = {}
+        self.input_bytes = 0
+        self.output_bytes = 0
+
+    @property
+    def ffmpeg_available(self) -> bool:
+        if self._ffmpeg is None:
+            self._ffmpeg = shutil.which("ffmpeg") is not None
+        return self._ffmpeg
+
+    def _pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Spawned rather than forked: the server process has threads and an event loop
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _encode(self, data: bytes) -> bytes:
+        return await asyncio.to_thread(ffmpeg_to_opus, data, self.target_rate, self.ffmpeg_bitrate)
+
+    async def prepare(self, data: bytes) -> PreparedAudio:
+        """
+        Detect a payload's format and make it as small as configured
+
+        Args:
+            data: Audio bytes as received from the client
+
+        Returns:
+            PreparedAudio with the bytes to transcribe and their MIME type
+
+        Raises:
+            UnsupportedAudioFormat: If the payload is too large, or neither
+                transcribable nor convertible
+        """
+        start_time = time.perf_counter()
+        audio_format = sniff_audio_format(data)
+        with trace_span("audio.ingest", format=audio_format or "unknown", audio_bytes=len(data)) as span:
+            try:
+                prepared = await self._prepare(data, audio_format)
+            except UnsupportedAudioFormat:
+                self._record(audio_format or "unknown", REJECTED, start_time)
+                raise
+            span.set("action", prepared.action)
+            span.set("bytes_saved", prepared.bytes_saved)
+        self._record(audio_format or "unknown", prepared.action, start_time)
+        self.input_bytes += len(data)
+        self.output_bytes += len(prepared.data)
+        AUDIO_BYTES.labels("in").inc(len(data))
+        AUDIO_BYTES.labels("out").inc(len(prepared.data))
+        return prepared
+
+    async def _prepare(self, data: bytes, audio_format: Optional[str]) -> PreparedAudio:
+        if len(data) > self.max_bytes:
+            raise UnsupportedAudioFormat(f"Audio payload of {len(data)} bytes exceeds {self.max_bytes} bytes")
+
+        if audio_format not in SUPPORTED_FORMATS:
+            name = audio_format or "unrecognised"
+            if not self.ffmpeg_available:
+                raise UnsupportedAudioFormat(f"Unsupported audio format: {name}")
+            try:
+                converted = await self._encode(data)
+            except Exception as e:
+                raise UnsupportedAudioFormat(f"Could not convert {name} audio: {e}")
+            return PreparedAudio(converted, "ogg", CONVERTED, len(data))
+
+        info = wav_info(data) if audio_format == "wav" else None
+        seconds = info[3] if info else None
+        best = PreparedAudio(data, audio_format, PASSTHROUGH, len(data), seconds)
+        if not self.normalize or len(data) < self.min_bytes:
+            return best
+
+        if info is not None:
+            loop = asyncio.get_running_loop()
+            try:
+                normalized = await loop.run_in_executor(self._pool(), normalize_wav, data, self.target_rate)
+            except BrokenProcessPool as e:
+                # A worker died; start a fresh pool for the next payload
+                print(f"[Audio] Audio worker pool failed, restarting it: {e}")
+                self.close()
+                normalized = None
+            except Exception as e:
+                print(f"[Audio] Error normalizing WAV audio: {e}")
+                normalized = None
+            if normalized is not None and len(normalized) < len(best.data):
+                best = PreparedAudio(normalized, "wav", NORMALIZED, len(data), seconds)
+
+        if self.ffmpeg_encode and self.ffmpeg_available:
+            try:
+                encoded = await self._encode(best.data)
+            except Exception as e:
+                print(f"[Audio] Error encoding audio with ffmpeg: {e}")
+                encoded = None
+            if encoded is not None and len(encoded) < len(best.data):
+                best = PreparedAudio(encoded, "ogg", ENCODED, len(data), seconds)
+        return best
+
+    def _record(self, audio_format: str, action: str, start_time: float):
+        self.actions[action] = self.actions.get(action, 0) + 1
+        AUDIO_CHUNKS.labels(audio_format, action).inc()
+        AUDIO_INGEST_DURATION.labels(action).observe(time.perf_counter() - start_time)
+
+    def close(self):
+        """Stop the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        return {
+            "normalize": self.normalize,
+            "target_sample_rate": self.target_rate,
+            "ffmpeg": self.ffmpeg_available,
+            "ffmpeg_encode": self.ffmpeg_encode,
+            "chunks": dict(self.actions),
+            "input_bytes": self.input_bytes,
+            "output_bytes": self.output_bytes,
+            "bytes_saved": self.input_bytes - self.output_bytes,
+            "saved_ratio": round(1 - self.output_bytes / self.input_bytes, 4) if self.input_bytes else 0.0
+        }
+
+
+# Global audio ingestor instance
+audio_ingestor = AudioIngestor()
@@ -0,0 +1,101 @@
+"""
+Chat State - Compact fixed-capacity storage for chat history and meeting context
+"""
+import sys
+import time
+from typing import Iterator, List, Optional
+
+
+# Size of a ChatMessage instance itself (object header + 4 slots)
+RECORD_OVERHEAD_BYTES = 72
+
+
+class ChatMessage:
+    """A single chat message or meeting transcription"""
+
+    __slots__ = ("role", "content", "timestamp", "nbytes")
+
+    def __init__(self, role: str, content: str, timestamp: Optional[float] = None):
+        self.role = role
+        self.content = content
+        self.timestamp = timestamp if timestamp is not None else time.time()
+        # Roles are interned literals, so only the content is counted
+        self.nbytes = sys.getsizeof(content) + RECORD_OVERHEAD_BYTES
+
+    def to_dict(self) -> dict:
+        """Serialize to {"role", "content", "timestamp"}; the AI service reads only role and content"""
+        return {"role": self.role, "content": self.content, "timestamp": self.timestamp}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "ChatMessage":
+        return cls(data["role"], data["content"], data.get("timestamp"))
+
+
+class MessageRing:
+    """
+    Fixed-capacity ring buffer of ChatMessage records with a byte budget
+
+    Appending past capacity overwrites the oldest record in place, and the
+    oldest records are also dropped while the total size exceeds max_bytes,
+    so neither memory nor per-append cost grows with conversation length.
+    """
+
+    __slots__ = ("capacity", "max_bytes", "nbytes", "_slots", "_head", "_count")
+
+    def __init__(self, capacity: int, max_bytes: Optional[int] = None):
+        self.capacity = capacity
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._slots: List[Optional[ChatMessage]] = [None] * capacity
+        # Index of the oldest record
+        self._head = 0
+        self._count = 0
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __iter__(self) -> Iterator[ChatMessage]:
+        """Iterate oldest to newest"""
+        for i in range(self._count):
+            yield self._slots[(self._head + i) % self.capacity]
+
+    def append(self, message: ChatMessage):
+        """Add a record, evicting the oldest ones as needed"""
+        if self._count == self.capacity:
+            self._pop_oldest()
+
+        self._slots[(self._head + self._count) % self.capacity] = message
+        self._count += 1
+        self.nbytes += message.nbytes
+
+        # Keep at least the newest record even if it alone exceeds the budget
+        while self.max_bytes is not None and self.nbytes > self.max_bytes and self._count > 1:
+            self._pop_oldest()
+
+    def _pop_oldest(self):
+        oldest = self._slots[self._head]
+        self._slots[self._head] = None
+        self._head = (self._head + 1) % self.capacity
+        self._count -= 1
+        self.nbytes -= oldest.nbytes
+
+    def last(self, n: int) -> List[ChatMessage]:
+        """Get the newest n records, oldest first"""
+        n = min(n, self._count)
+        start = self._head + self._count - n
+        return [self._slots[(start + i) % self.capacity] for i in range(n)]
+
+    def clear(self):
+        """Remove all records"""
+        self._slots = [None] * self.capacity
+        self._head = 0
+        self._count = 0
+        self.nbytes = 0
+
+    def to_dicts(self, n: Optional[int] = None) -> List[dict]:
+        """Serialize the newest n records (all by default)"""
+        return [message.to_dict() for message in self.last(self._count if n is None else n)]
+
+    def texts(self, n: Optional[int] = None) -> List[str]:
+        """Get the content of the newest n records (all by default)"""
+        return [message.content for message in self.last(self._count if n is None else n)]
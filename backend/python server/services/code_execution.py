@@ -1,13 +1,18 @@
 """
 Code Execution Service - Sandboxed code execution for multiple languages
 """
+import asyncio
+import codecs
 import os
 import re
 import time
 import subprocess
 import tempfile
 import shutil
-from typing import Tuple
+from typing import Callable, List, Optional, Tuple
+
+from services.metrics import CODE_EXECUTION_DURATION, CODE_EXECUTIONS, CODE_EXECUTIONS_IN_PROGRESS
+from services.tracing import current_span, trace_span, traced
 
 
 # Supported programming languages
@@ -21,6 +26,13 @@ INTERPRETER_MAP = {
     "java": "Java JDK"
 }
 
+# Time limits for running and compiling user code
+EXECUTION_TIMEOUT_SECONDS = 10
+COMPILE_TIMEOUT_SECONDS = 30
+
+# Read size when streaming process output
+STREAM_CHUNK_BYTES = 4096
+
 
 def execute_code_in_sandbox(
     code: str,
@@ -53,27 +65,14 @@ def execute_code_in_sandbox(
         # Create a temporary directory for code execution
         temp_dir = tempfile.mkdtemp()
         
-        output = ""
-        error = ""
-        
-        if language == "python":
-            output, error = _execute_python(code, temp_dir, stdin)
-            
-        elif language == "javascript":
-            output, error = _execute_javascript(code, temp_dir, stdin)
-            
-        elif language == "cpp":
-            output, error = _execute_cpp(code, temp_dir, stdin)
-            
-        elif language == "java":
-            output, error = _execute_java(code, temp_dir, stdin)
+        output, error = _execute(code, language, temp_dir, stdin)
         
         execution_time = f"{(time.time() - start_time) * 1000:.2f}ms"
         
         return (True, output, error, execution_time)
         
     except subprocess.TimeoutExpired:
-        return (False, "", "Execution timed out (10 second limit)", "10000ms")
+        return (False, "", f"Execution timed out ({EXECUTION_TIMEOUT_SECONDS} second limit)", f"{EXECUTION_TIMEOUT_SECONDS * 1000}ms")
         
     except FileNotFoundError:
         missing = INTERPRETER_MAP.get(language, language)
@@ -101,102 +100,193 @@ def execute_code_in_sandbox(
                 pass
 
 
-def _execute_python(code: str, temp_dir: str, stdin: str) -> Tuple[str, str]:
-    """Execute Python code"""
-    file_path = os.path.join(temp_dir, "main.py")
-    with open(file_path, "w", encoding="utf-8") as f:
-        f.write(code)
-    
-    result = subprocess.run(
-        ["python", file_path],
-        capture_output=True,
-        text=True,
-        timeout=10,
-        input=stdin if stdin else None,
-        cwd=temp_dir
-    )
-    return result.stdout, result.stderr
+def _prepare_commands(code: str, language: str, temp_dir: str) -> Tuple[Optional[List[str]], List[str]]:
+    """
+    Write the source file and get the commands to build and run it
 
+    Returns:
+        Tuple of (compile command or None, run command)
+    """
+    if language == "python":
+        file_path = os.path.join(temp_dir, "main.py")
+        compile_command, run_command = None, ["python", file_path]
+    elif language == "javascript":
+        file_path = os.path.join(temp_dir, "main.js")
+        compile_command, run_command = None, ["node", file_path]
+    elif language == "cpp":
+        file_path = os.path.join(temp_dir, "main.cpp")
+        exe_path = os.path.join(temp_dir, "main.exe" if os.name == "nt" else "main")
+        compile_command, run_command = ["g++", file_path, "-o", exe_path], [exe_path]
+    else:
+        # Extract class name from code
+        class_match = re.search(r'public\s+class\s+(\w+)', code)
+        class_name = class_match.group(1) if class_match else "Main"
+        file_path = os.path.join(temp_dir, f"{class_name}.java")
+        compile_command, run_command = ["javac", file_path], ["java", "-cp", temp_dir, class_name]
 
-def _execute_javascript(code: str, temp_dir: str, stdin: str) -> Tuple[str, str]:
-    """Execute JavaScript code using Node.js"""
-    file_path = os.path.join(temp_dir, "main.js")
     with open(file_path, "w", encoding="utf-8") as f:
         f.write(code)
-    
-    result = subprocess.run(
-        ["node", file_path],
-        capture_output=True,
-        text=True,
-        timeout=10,
-        input=stdin if stdin else None,
-        cwd=temp_dir
-    )
-    return result.stdout, result.stderr
+    return compile_command, run_command
 
 
-def _execute_cpp(code: str, temp_dir: str, stdin: str) -> Tuple[str, str]:
-    """Compile and execute C++ code"""
-    source_path = os.path.join(temp_dir, "main.cpp")
-    exe_path = os.path.join(temp_dir, "main.exe" if os.name == "nt" else "main")
-    
-    with open(source_path, "w", encoding="utf-8") as f:
-        f.write(code)
-    
-    # Compile
-    compile_result = subprocess.run(
-        ["g++", source_path, "-o", exe_path],
-        capture_output=True,
-        text=True,
-        timeout=30,
-        cwd=temp_dir
-    )
-    
-    if compile_result.returncode != 0:
-        return "", f"Compilation Error:\n{compile_result.stderr}"
-    
-    # Execute
+def _execute(code: str, language: str, temp_dir: str, stdin: str) -> Tuple[str, str]:
+    """Compile (if needed) and execute code"""
+    compile_command, run_command = _prepare_commands(code, language, temp_dir)
+
+    if compile_command is not None:
+        compile_result = subprocess.run(
+            compile_command,
+            capture_output=True,
+            text=True,
+            timeout=COMPILE_TIMEOUT_SECONDS,
+            cwd=temp_dir
+        )
+        if compile_result.returncode != 0:
+            return "", f"Compilation Error:\n{compile_result.stderr}"
+
     result = subprocess.run(
-        [exe_path],
+        run_command,
         capture_output=True,
         text=True,
-        timeout=10,
+        timeout=EXECUTION_TIMEOUT_SECONDS,
         input=stdin if stdin else None,
         cwd=temp_dir
     )
     return result.stdout, result.stderr
 
 
-def _execute_java(code: str, temp_dir: str, stdin: str) -> Tuple[str, str]:
-    """Compile and execute Java code"""
-    # Extract class name from code
-    class_match = re.search(r'public\s+class\s+(\w+)', code)
-    class_name = class_match.group(1) if class_match else "Main"
-    
-    source_path = os.path.join(temp_dir, f"{class_name}.java")
-    
-    with open(source_path, "w", encoding="utf-8") as f:
-        f.write(code)
-    
-    # Compile
-    compile_result = subprocess.run(
-        ["javac", source_path],
-        capture_output=True,
-        text=True,
-        timeout=30,
-        cwd=temp_dir
-    )
-    
-    if compile_result.returncode != 0:
-        return "", f"Compilation Error:\n{compile_result.stderr}"
-    
-    # Execute
-    result = subprocess.run(
-        ["java", "-cp", temp_dir, class_name],
-        capture_output=True,
-        text=True,
-        timeout=10,
-        input=stdin if stdin else None,
-        cwd=temp_dir
+# ==================== Streaming Execution ====================
+
+@traced("code.execute")
+async def stream_code_execution(
+    code: str,
+    language: str,
+    stdin: str = "",
+    on_output: Optional[Callable[[str, str], None]] = None
+) -> Tuple[bool, str, str, str]:
+    """
+    Execute code without blocking the event loop, streaming its output
+
+    Args:
+        code: Source code to execute
+        language: Programming language (python, javascript, cpp, java)
+        stdin: Optional standard input
+        on_output: Called with ("stdout" or "stderr", text) as output arrives
+
+    Returns:
+        Tuple of (success, output, error, execution_time), like execute_code_in_sandbox
+    """
+    if language not in SUPPORTED_LANGUAGES:
+        CODE_EXECUTIONS.labels("other", "unsupported").inc()
+        return (
+            False,
+            "",
+            f"Unsupported language: {language}. Supported: {', '.join(SUPPORTED_LANGUAGES)}",
+            "0ms"
+        )
+
+    start_time = time.time()
+    temp_dir = tempfile.mkdtemp()
+    outcome = "error"
+    CODE_EXECUTIONS_IN_PROGRESS.inc()
+    try:
+        compile_command, run_command = _prepare_commands(code, language, temp_dir)
+
+        if compile_command is not None:
+            with trace_span("code.compile"):
+                returncode, _, compile_error = await _run_streaming(
+                    compile_command, temp_dir, "", COMPILE_TIMEOUT_SECONDS, None
+                )
+            if returncode != 0:
+                outcome = "compile_error"
+                error = f"Compilation Error:\n{compile_error}"
+                if on_output is not None:
+                    on_output("stderr", error)
+                return (True, "", error, f"{(time.time() - start_time) * 1000:.2f}ms")
+
+        with trace_span("code.run"):
+            returncode, output, error = await _run_streaming(
+                run_command, temp_dir, stdin, EXECUTION_TIMEOUT_SECONDS, on_output
+            )
+        outcome = "ok" if returncode == 0 else "nonzero_exit"
+        return (True, output, error, f"{(time.time() - start_time) * 1000:.2f}ms")
+
+    except asyncio.TimeoutError:
+        outcome = "timeout"
+        return (False, "", f"Execution timed out ({EXECUTION_TIMEOUT_SECONDS} second limit)", f"{EXECUTION_TIMEOUT_SECONDS * 1000}ms")
+
+    except FileNotFoundError:
+        outcome = "runtime_missing"
+        missing = INTERPRETER_MAP.get(language, language)
+        return (
+            False,
+            "",
+            f"{missing} is not installed or not in PATH. Please install it to run {language} code.",
+            f"{(time.time() - start_time) * 1000:.2f}ms"
+        )
+
+    except Exception as e:
+        return (False, "", str(e), f"{(time.time() - start_time) * 1000:.2f}ms")
+
+    finally:
+        CODE_EXECUTIONS_IN_PROGRESS.dec()
+        CODE_EXECUTIONS.labels(language, outcome).inc()
+        span = current_span()
+        span.set("language", language)
+        span.set("outcome", outcome)
+        CODE_EXECUTION_DURATION.labels(language).observe(time.time() - start_time)
+        shutil.rmtree(temp_dir, ignore_errors=True)
+
+
+async def _run_streaming(
+    command: List[str],
+    cwd: str,
+    stdin: str,
+    timeout: float,
+    on_output: Optional[Callable[[str, str], None]]
+) -> Tuple[int, str, str]:
+    """
+    Run a process, forwarding stdout/stderr chunks as they are produced
+
+    Returns:
+        Tuple of (return code, full stdout, full stderr)
+
+    Raises:
+        asyncio.TimeoutError: If the process ran longer than timeout (it is killed)
+    """
+    process = await asyncio.create_subprocess_exec(
+        *command,
+        stdin=asyncio.subprocess.PIPE if stdin else asyncio.subprocess.DEVNULL,
+        stdout=asyncio.subprocess.PIPE,
+        stderr=asyncio.subprocess.PIPE,
+        cwd=cwd
     )
-    return result.stdout, result.stderr
+    collected = {"stdout": [], "stderr": []}
+
+    async def pump(stream: asyncio.StreamReader, name: str):
+        decoder = codecs.getincrementaldecoder("utf-8")(errors="replace")
+        while True:
+            chunk = await stream.read(STREAM_CHUNK_BYTES)
+            text = decoder.decode(chunk, final=not chunk)
+            if text:
+                collected[name].append(text)
+                if on_output is not None:
+                    on_output(name, text)
+            if not chunk:
+                return
+
+    async def communicate():
+        if stdin:
+            process.stdin.write(stdin.encode("utf-8"))
+            await process.stdin.drain()
+            process.stdin.close()
+        await asyncio.gather(pump(process.stdout, "stdout"), pump(process.stderr, "stderr"))
+        return await process.wait()
+
+    try:
+        returncode = await asyncio.wait_for(communicate(), timeout)
+    except asyncio.TimeoutError:
+        process.kill()
+        await process.wait()
+        raise
+    return returncode, "".join(collected["stdout"]), "".join(collected["stderr"])
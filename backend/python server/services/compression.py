@@ -0,0 +1,109 @@
+"""
+Compression - Size-thresholded response compression with per-endpoint cost metrics
+"""
+import asyncio
+import time
+import zlib
+from typing import Dict, Optional, Tuple
+
+
+# Payloads at least this large are compressed off the event loop (zlib releases the GIL)
+COMPRESS_IN_THREAD_BYTES = 256 * 1024
+
+
+class CompressionStats:
+    """Bandwidth and CPU cost of compression for one endpoint"""
+
+    def __init__(self):
+        self.responses = 0
+        self.compressed = 0
+        self.bytes_in = 0
+        self.bytes_out = 0
+        self.cpu_ms = 0.0
+
+    def to_dict(self) -> dict:
+        return {
+            "responses": self.responses,
+            "compressed": self.compressed,
+            "bytes_in": self.bytes_in,
+            "bytes_out": self.bytes_out,
+            "ratio": round(self.bytes_out / self.bytes_in, 3) if self.bytes_in else 1.0,
+            "cpu_ms": round(self.cpu_ms, 2)
+        }
+
+
+# Structure: {endpoint name: CompressionStats}
+compression_stats: Dict[str, CompressionStats] = {}
+
+
+def accepts_gzip(accept_encoding: Optional[str]) -> bool:
+    """Whether an Accept-Encoding header allows gzip"""
+    if not accept_encoding:
+        return False
+    for coding in accept_encoding.lower().split(","):
+        name, *params = [part.strip() for part in coding.split(";")]
+        if name in ("gzip", "*"):
+            quality = 1.0
+            for param in params:
+                if param.startswith("q="):
+                    try:
+                        quality = float(param[2:])
+                    except ValueError:
+                        quality = 0.0
+            return quality > 0
+    return False
+
+
+def gzip_bytes(data: bytes, level: int) -> bytes:
+    """Compress data in gzip format"""
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+    return compressor.compress(data) + compressor.flush()
+
+
+async def compress_payload(
+    endpoint: str,
+    data: bytes,
+    accept_encoding: Optional[str],
+    min_bytes: int,
+    level: int
+) -> Tuple[bytes, Optional[str]]:
+    """
+    Gzip a response body if the client accepts it and it is large enough
+
+    Args:
+        endpoint: Name the bandwidth/CPU metrics are recorded under
+        data: Uncompressed body
+        accept_encoding: The request's Accept-Encoding header
+        min_bytes: Bodies smaller than this are sent as-is
+        level: zlib compression level (1-9)
+
+    Returns:
+        Tuple of (body, content encoding or None)
+    """
+    stats = compression_stats.setdefault(endpoint, CompressionStats())
+    stats.responses += 1
+    stats.bytes_in += len(data)
+
+    if len(data) < min_bytes or not accepts_gzip(accept_encoding):
+        stats.bytes_out += len(data)
+        return data, None
+
+    start_time = time.perf_counter()
+    if len(data) >= COMPRESS_IN_THREAD_BYTES:
+        compressed = await asyncio.to_thread(gzip_bytes, data, level)
+    else:
+        compressed = gzip_bytes(data, level)
+    stats.cpu_ms += (time.perf_counter() - start_time) * 1000
+
+    # Incompressible data (already-compressed blobs) goes out as-is
+    if len(compressed) >= len(data):
+        stats.bytes_out += len(data)
+        return data, None
+    stats.compressed += 1
+    stats.bytes_out += len(compressed)
+    return compressed, "gzip"
+
+
+def get_compression_stats() -> Dict[str, dict]:
+    """Compression metrics per endpoint"""
+    return {endpoint: stats.to_dict() for endpoint, stats in compression_stats.items()}
@@ -0,0 +1,228 @@
+"""
+Request Hedging - Backup requests to a second model when the first is slower than usual
+"""
+import asyncio
+import math
+import time
+from collections import deque
+from typing import Awaitable, Callable, Deque, Dict, TypeVar
+
+from config import (
+    GEMINI_HEDGE_DEFAULT_DELAY_MS,
+    GEMINI_HEDGE_MAX_EXTRA_FRACTION,
+    GEMINI_HEDGE_MIN_DELAY_MS,
+    GEMINI_HEDGE_MIN_SAMPLES,
+    GEMINI_HEDGE_PERCENTILE,
+    GEMINI_HEDGE_WINDOW,
+    GEMINI_HEDGING
+)
+from services.metrics import registry
+from services.tracing import current_span
+
+
+HEDGED_REQUESTS = registry.counter(
+    "gemini_hedges_total",
+    "Hedging decisions by primary model and outcome (primary_won, backup_won, both_failed, budget_exhausted)",
+    ("model", "outcome")
+)
+HEDGE_SAVED_SECONDS = registry.counter(
+    "gemini_hedge_saved_seconds_total",
+    "Estimated latency saved by backup requests that won, against the primary's usual tail latency",
+    ("model",)
+)
+HEDGE_DELAY = registry.gauge(
+    "gemini_hedge_delay_seconds", "Current delay before a backup request is sent", ("model",)
+)
+
+# Hedging outcomes
+PRIMARY_WON = "primary_won"
+BACKUP_WON = "backup_won"
+BOTH_FAILED = "both_failed"
+BUDGET_EXHAUSTED = "budget_exhausted"
+
+# Unused hedge allowance saved up while traffic is low (in backup requests)
+MAX_SAVED_HEDGES = 10
+
+T = TypeVar("T")
+
+
+class LatencyWindow:
+    """The latest call latencies of one model (lower bounds for cancelled primaries)"""
+
+    __slots__ = ("samples",)
+
+    def __init__(self, size: int):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, percent: float) -> float:
+        """Nearest-rank percentile of the window (0 when empty)"""
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+    def tail_mean(self, above: float) -> float:
+        """Mean of latencies longer than `above` (0 when there are none)"""
+        tail = [seconds for seconds in self.samples if seconds > above]
+        return sum(tail) / len(tail) if tail else 0.0
+
+
+class RequestHedger:
+    """
+    Races a backup request against a primary that is running late
+
+    The primary call gets a head start of the model's recent latency
+    percentile (GEMINI_HEDGE_PERCENTILE); only if it hasn't finished by then
+    is the backup started, and whichever succeeds first is returned while the
+    other is cancelled. Most calls therefore cost exactly one request.
+
+    Backups are paid from an allowance that grows by max_extra_fraction per
+    primary request, so hedging adds at most that fraction of extra calls
+    against the quota however slow the models get.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = GEMINI_HEDGING,
+        percentile: float = GEMINI_HEDGE_PERCENTILE,
+        window: int = GEMINI_HEDGE_WINDOW,
+        min_samples: int = GEMINI_HEDGE_MIN_SAMPLES,
+        default_delay_ms: float = GEMINI_HEDGE_DEFAULT_DELAY_MS,
+        min_delay_ms: float = GEMINI_HEDGE_MIN_DELAY_MS,
+        max_extra_fraction: float = GEMINI_HEDGE_MAX_EXTRA_FRACTION
+    ):
+        self.enabled = enabled and max_extra_fraction > 0
+        self.percentile = percentile
+        self.window = window
+        self.min_samples = min_samples
+        self.default_delay = default_delay_ms / 1000
+        self.min_delay = min_delay_ms / 1000
+        self.max_extra_fraction = max_extra_fraction
+        self.latencies: Dict[str, LatencyWindow] = {}
+        # Backup requests currently allowed
+        self.allowance = 0.0
+        self.primaries = 0
+        # Structure: {outcome: count}
+        self.outcomes: Dict[str, int] = {}
+        self.saved_seconds = 0.0
+        HEDGE_DELAY.set_function(lambda: {(model,): self.delay(model) for model in self.latencies})
+
+    def observe(self, model_name: str, seconds: float):
+        """Record the latency of a call to a model, or a lower bound for a cancelled one"""
+        latencies = self.latencies.get(model_name)
+        if latencies is None:
+            latencies = self.latencies[model_name] = LatencyWindow(self.window)
+        latencies.add(seconds)
+
+    def delay(self, model_name: str) -> float:
+        """Seconds the primary request to a model runs before a backup is sent"""
+        latencies = self.latencies.get(model_name)
+        if latencies is None or len(latencies.samples) < self.min_samples:
+            return max(self.default_delay, self.min_delay)
+        return max(latencies.percentile(self.percentile), self.min_delay)
+
+    def _count(self, model_name: str, outcome: str):
+        self.outcomes[outcome] = self.outcomes.get(outcome, 0) + 1
+        HEDGED_REQUESTS.labels(model_name, outcome).inc()
+        current_span().set("hedge", outcome)
+
+    async def run(
+        self,
+        primary_model: str,
+        backup_model: str,
+        call: Callable[[str], Awaitable[T]]
+    ) -> T:
+        """
+        Call the primary model, hedged with the backup model if it runs late
+
+        Args:
+            primary_model: Model tried first
+            backup_model: Model raced against it once the hedge delay has passed
+            call: Coroutine function making the request to a given model
+
+        Returns:
+            The first successful result
+
+        Raises:
+            The primary's exception if no request succeeded, so the caller's
+            retry and fallback handling applies to the primary model
+        """
+        self.primaries += 1
+        self.allowance = min(MAX_SAVED_HEDGES, self.allowance + self.max_extra_fraction)
+        started_at = time.perf_counter()
+        primary = asyncio.ensure_future(call(primary_model))
+        backup = None
+        try:
+            done, _ = await asyncio.wait({primary}, timeout=self.delay(primary_model))
+            if done:
+                return primary.result()
+            if self.allowance < 1:
+                self._count(primary_model, BUDGET_EXHAUSTED)
+                return await primary
+            self.allowance -= 1
+
+            backup = asyncio.ensure_future(call(backup_model))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                # The primary is preferred when both finish in the same iteration
+                for task in sorted(done, key=lambda task: task is not primary):
+                    if task.exception() is None:
+                        if task is primary:
+                            self._count(primary_model, PRIMARY_WON)
+                        else:
+                            elapsed = time.perf_counter() - started_at
+                            self._count(primary_model, BACKUP_WON)
+                            self._record_saving(primary_model, elapsed)
+                            # The primary took at least this long; leaving it out would
+                            # drop exactly the slow calls and ratchet the delay down
+                            self.observe(primary_model, elapsed)
+                        return task.result()
+            self._count(primary_model, BOTH_FAILED)
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    def _record_saving(self, primary_model: str, elapsed: float):
+        """
+        Estimate how much sooner the backup answered than the primary would have
+
+        The primary was cancelled, so its latency is estimated as the mean of
+        its recent latencies longer than the time already waited.
+        """
+        expected = self.latencies[primary_model].tail_mean(elapsed) if primary_model in self.latencies else 0.0
+        if expected > elapsed:
+            self.saved_seconds += expected - elapsed
+            HEDGE_SAVED_SECONDS.labels(primary_model).inc(expected - elapsed)
+
+    def stats(self) -> dict:
+        hedged = sum(count for outcome, count in self.outcomes.items() if outcome != BUDGET_EXHAUSTED)
+        return {
+            "enabled": self.enabled,
+            "percentile": self.percentile,
+            "max_extra_fraction": self.max_extra_fraction,
+            "requests": self.primaries,
+            "hedged": hedged,
+            "hedge_rate": round(hedged / self.primaries, 4) if self.primaries else 0.0,
+            "outcomes": dict(self.outcomes),
+            "allowance": round(self.allowance, 2),
+            "estimated_saved_seconds": round(self.saved_seconds, 3),
+            "models": {
+                model: {
+                    "samples": len(latencies.samples),
+                    "p50_ms": round(latencies.percentile(50) * 1000, 1),
+                    "p95_ms": round(latencies.percentile(95) * 1000, 1),
+                    "hedge_delay_ms": round(self.delay(model) * 1000, 1)
+                }
+                for model, latencies in self.latencies.items()
+            }
+        }
+
+
+# Global hedger instance for Gemini chat requests
+gemini_hedger = RequestHedger()
@@ -0,0 +1,408 @@
+"""
+Job Manager - Long-running AI work on a bounded background pool with deduplicated results
+"""
+import asyncio
+import base64
+import hashlib
+import json
+import time
+import uuid
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from config import (
+    JOB_QUEUE_SIZE,
+    JOB_RESULT_TTL_SECONDS,
+    JOB_STORE,
+    JOB_STORE_PATH,
+    JOB_TIMEOUT_SECONDS,
+    JOB_WORKERS
+)
+from services.ai_service import analyze_sentiments, generate_summary
+from services.metrics import registry
+from services.serialization import dumps, loads
+from services.session_store import create_session_store
+from services.tracing import trace_span
+from services.transcription import transcribe_audio
+
+
+JOB_SUBMISSIONS = registry.counter(
+    "jobs_submitted_total", "Job submissions by kind and outcome (queued, deduplicated, rejected)",
+    ("kind", "outcome")
+)
+JOBS_FINISHED = registry.counter(
+    "jobs_finished_total", "Finished jobs by kind and status (succeeded, failed)", ("kind", "status")
+)
+JOB_DURATION = registry.histogram(
+    "job_duration_seconds", "Job run time, from start to result", ("kind",)
+)
+JOB_QUEUE_DEPTH = registry.gauge("job_queue_depth", "Jobs waiting for a free worker")
+
+# Job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+FINISHED_STATES = (JOB_SUCCEEDED, JOB_FAILED)
+
+# Keys of jobs and of the job handling an input, in a shared store
+JOB_KEY_PREFIX = "job:"
+JOB_INPUT_KEY_PREFIX = "job:input:"
+
+# How often a job owned by another worker is read again from the store while it is watched
+REMOTE_POLL_SECONDS = 1.0
+
+# A job handler gets the submitted payload and returns the JSON-serializable result
+JobHandler = Callable[[dict], Awaitable[dict]]
+
+
+class JobQueueFull(Exception):
+    """Raised when a job is submitted while JOB_QUEUE_SIZE jobs are already waiting"""
+
+
+def input_hash(kind: str, payload: dict) -> str:
+    """Identity of a job's input; identical submissions share one job"""
+    canonical = json.dumps(payload, sort_keys=True, separators=(",", ":"), ensure_ascii=False)
+    return hashlib.sha256(f"{kind}\n{canonical}".encode("utf-8")).hexdigest()
+
+
+class Job:
+    """One submitted unit of work and, once finished, its result"""
+
+    __slots__ = (
+        "id", "kind", "input_hash", "payload", "status", "created_at", "started_at",
+        "finished_at", "result", "error", "updated"
+    )
+
+    def __init__(self, kind: str, digest: str, payload: Optional[dict]):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.input_hash = digest
+        # Dropped once the job has run
+        self.payload = payload
+        self.status = JOB_QUEUED
+        self.created_at = time.time()
+        self.started_at: Optional[float] = None
+        self.finished_at: Optional[float] = None
+        self.result: Optional[dict] = None
+        self.error: Optional[str] = None
+        # Set (and replaced) on every status change, for watchers of the job
+        self.updated = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in FINISHED_STATES
+
+    def set_status(self, status: str):
+        self.status = status
+        updated, self.updated = self.updated, asyncio.Event()
+        updated.set()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "created_at": self.created_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "result": self.result,
+            "error": self.error
+        }
+
+    @classmethod
+    def from_dict(cls, data: dict, digest: str = "") -> "Job":
+        job = cls(data["kind"], digest, None)
+        job.id = data["job_id"]
+        job.status = data["status"]
+        job.created_at = data["created_at"]
+        job.started_at = data.get("started_at")
+        job.finished_at = data.get("finished_at")
+        job.result = data.get("result")
+        job.error = data.get("error")
+        return job
+
+
+class JobManager:
+    """
+    Runs registered job kinds on JOB_WORKERS background tasks
+
+    A submission returns at once with a job id. A submission whose kind and
+    input match a queued, running or successful job gets that job instead of
+    starting another, so client retries never duplicate work. Finished jobs
+    are kept for JOB_RESULT_TTL_SECONDS. With a shared JOB_STORE every job
+    is written when it is queued, started and finished, so its status,
+    result and deduplication are visible to every worker.
+    """
+
+    def __init__(
+        self,
+        workers: int = JOB_WORKERS,
+        queue_size: int = JOB_QUEUE_SIZE,
+        timeout_seconds: float = JOB_TIMEOUT_SECONDS,
+        result_ttl_seconds: float = JOB_RESULT_TTL_SECONDS
+    ):
+        self.worker_count = workers
+        self.queue_size = queue_size
+        self.timeout = timeout_seconds
+        self.result_ttl = result_ttl_seconds
+        self.handlers: Dict[str, JobHandler] = {}
+        # Jobs of this worker, live or finished within the TTL
+        self.jobs: Dict[str, Job] = {}
+        # Structure: {input hash: job id}
+        self._by_input: Dict[str, str] = {}
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: List[asyncio.Task] = []
+        # Keeps a job's store writes in order (queued before running before finished)
+        self._store_lock = asyncio.Lock()
+        # This worker's own memory already keeps results for the TTL
+        self.store = (
+            create_session_store(JOB_STORE, result_ttl_seconds, JOB_STORE_PATH) if JOB_STORE != "memory" else None
+        )
+        self.deduplicated = 0
+        self.rejected = 0
+        JOB_QUEUE_DEPTH.set_function(lambda: {(): self._queue.qsize() if self._queue is not None else 0})
+
+    def register(self, kind: str, handler: JobHandler):
+        """Register the coroutine function running jobs of a kind"""
+        self.handlers[kind] = handler
+
+    def _start_workers(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue(maxsize=self.queue_size)
+        if not self._workers:
+            loop = asyncio.get_running_loop()
+            self._workers = [loop.create_task(self._worker()) for _ in range(self.worker_count)]
+
+    def _expire(self):
+        """Forget finished jobs older than the result TTL"""
+        cutoff = time.time() - self.result_ttl
+        for job_id in [job_id for job_id, job in self.jobs.items() if job.finished and job.finished_at <= cutoff]:
+            job = self.jobs.pop(job_id)
+            if self._by_input.get(job.input_hash) == job_id:
+                del self._by_input[job.input_hash]
+
+    async def _load(self, job_id: str) -> Optional[Job]:
+        """A job stored by any worker"""
+        if self.store is None:
+            return None
+        try:
+            data = await self.store.get(JOB_KEY_PREFIX + job_id)
+            return Job.from_dict(loads(data)) if data is not None else None
+        except Exception as e:
+            print(f"[Jobs] Error loading job {job_id}: {e}")
+            return None
+
+    def _local(self, digest: str) -> Optional[Job]:
+        """This worker's job for an input, unless it failed"""
+        job = self.jobs.get(self._by_input.get(digest, ""))
+        return job if job is not None and job.status != JOB_FAILED else None
+
+    async def _existing(self, digest: str) -> Optional[Job]:
+        """Job for the same input that is still useful (not failed)"""
+        job = self._local(digest)
+        if job is not None:
+            return job
+        if self.store is None:
+            return None
+        try:
+            job_id = await self.store.get(JOB_INPUT_KEY_PREFIX + digest)
+        except Exception as e:
+            print(f"[Jobs] Error looking up job input: {e}")
+            return None
+        job = await self._load(job_id.decode("utf-8")) if job_id is not None else None
+        if job is None or job.status == JOB_FAILED:
+            return None
+        # An unfinished job not updated for longer than a run may take belonged to a worker that stopped
+        if not job.finished and time.time() - (job.started_at or job.created_at) > self.timeout:
+            return None
+        return job
+
+    async def submit(self, kind: str, payload: dict) -> Tuple[Job, bool]:
+        """
+        Queue a job, or return the job already handling the same input
+
+        Args:
+            kind: Registered job kind
+            payload: Handler input (JSON-serializable)
+
+        Returns:
+            Tuple of (job, whether it was an existing job)
+
+        Raises:
+            ValueError: If the kind is not registered
+            JobQueueFull: If JOB_QUEUE_SIZE jobs are already waiting
+        """
+        if kind not in self.handlers:
+            raise ValueError(f"Unknown job kind '{kind}'")
+        self._expire()
+        self._start_workers()
+
+        digest = input_hash(kind, payload)
+        # Checked again in case a concurrent submission created it while the store was read
+        existing = await self._existing(digest) or self._local(digest)
+        if existing is not None:
+            self.deduplicated += 1
+            JOB_SUBMISSIONS.labels(kind, "deduplicated").inc()
+            return existing, True
+
+        job = Job(kind, digest, payload)
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            self.rejected += 1
+            JOB_SUBMISSIONS.labels(kind, "rejected").inc()
+            raise JobQueueFull(f"{self.queue_size} jobs are already waiting")
+        self.jobs[job.id] = job
+        self._by_input[digest] = job.id
+        JOB_SUBMISSIONS.labels(kind, "queued").inc()
+        await self._store(job)
+        return job, False
+
+    async def get(self, job_id: str) -> Optional[Job]:
+        """A job by id, from this worker or the shared store; None if unknown or expired"""
+        self._expire()
+        job = self.jobs.get(job_id)
+        if job is not None:
+            return job
+        return await self._load(job_id)
+
+    async def next_update(self, job: Job) -> Job:
+        """
+        Wait for a job's next status change
+
+        Jobs of this worker signal their changes; jobs of another worker are
+        read again from the store every REMOTE_POLL_SECONDS.
+
+        Returns:
+            The job with its new status (a new object for jobs of another worker)
+        """
+        if self.jobs.get(job.id) is job:
+            await job.updated.wait()
+            return job
+        while True:
+            await asyncio.sleep(REMOTE_POLL_SECONDS)
+            stored = await self._load(job.id)
+            if stored is None:
+                job.status = JOB_FAILED
+                job.error = "Job expired"
+                return job
+            if stored.status != job.status:
+                return stored
+
+    async def _worker(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._run(job)
+            finally:
+                self._queue.task_done()
+
+    async def _run(self, job: Job):
+        job.started_at = time.time()
+        job.set_status(JOB_RUNNING)
+        await self._store(job)
+        with trace_span(f"job.{job.kind}", job_id=job.id) as span:
+            try:
+                job.result = await asyncio.wait_for(self.handlers[job.kind](job.payload), self.timeout)
+                status = JOB_SUCCEEDED
+            except asyncio.TimeoutError:
+                job.error = f"Timed out after {self.timeout:g}s"
+                status = JOB_FAILED
+            except Exception as e:
+                job.error = str(e) or type(e).__name__
+                status = JOB_FAILED
+            span.set("status", status)
+
+        job.payload = None
+        job.finished_at = time.time()
+        JOB_DURATION.labels(job.kind).observe(job.finished_at - job.started_at)
+        JOBS_FINISHED.labels(job.kind, status).inc()
+        if status == JOB_FAILED:
+            print(f"[Jobs] {job.kind} job {job.id} failed: {job.error}")
+        await self._store(job, status)
+        job.set_status(status)
+
+    async def _store(self, job: Job, status: Optional[str] = None):
+        """
+        Share a job's state with other workers
+
+        The input key points at the job while it is queued, running or
+        succeeded, and is deleted once it failed so a resubmission runs again.
+
+        Args:
+            job: Job to write
+            status: Status to write instead of the job's current one
+        """
+        if self.store is None:
+            return
+        status = status or job.status
+        input_key = JOB_INPUT_KEY_PREFIX + job.input_hash
+        async with self._store_lock:
+            values = {JOB_KEY_PREFIX + job.id: dumps({**job.to_dict(), "status": status})}
+            deletes = []
+            if status == JOB_FAILED:
+                deletes.append(input_key)
+            else:
+                values[input_key] = job.id.encode("utf-8")
+            try:
+                await self.store.write_batch(values, deletes)
+            except Exception as e:
+                print(f"[Jobs] Error storing job {job.id}: {e}")
+
+    async def close(self):
+        """Stop the workers; jobs not finished yet fail"""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        for job in self.jobs.values():
+            if not job.finished:
+                job.error = "Server shut down"
+                job.finished_at = time.time()
+                job.set_status(JOB_FAILED)
+                await self._store(job)
+        if self.store is not None:
+            await self.store.close()
+
+    def stats(self) -> dict:
+        self._expire()
+        counts: Dict[str, int] = {}
+        for job in self.jobs.values():
+            counts[job.status] = counts.get(job.status, 0) + 1
+        return {
+            "workers": self.worker_count,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "jobs": counts,
+            "deduplicated": self.deduplicated,
+            "rejected": self.rejected,
+            "result_ttl_seconds": self.result_ttl,
+            "store": self.store.stats() if self.store is not None else {"mode": "memory"}
+        }
+
+
+# ==================== Job Kinds ====================
+
+async def run_summary_job(payload: dict) -> dict:
+    summary = await generate_summary(payload["transcript"], payload["max_length"])
+    return {"summary": summary, "transcript_length": len(payload["transcript"])}
+
+
+async def run_sentiment_job(payload: dict) -> dict:
+    return {"results": await analyze_sentiments(payload["texts"])}
+
+
+async def run_transcription_job(payload: dict) -> dict:
+    audio_data = base64.b64decode(payload["audio"])
+    result = await transcribe_audio(audio_data, payload["language"], payload.get("backend"))
+    if not result.ok:
+        # Backends report failures in the result; fail the job so a retry runs again
+        raise RuntimeError("Transcription failed")
+    return {"language": payload["language"], "transcription": result.text, **result.to_dict()}
+
+
+# Global job manager instance
+job_manager = JobManager()
+job_manager.register("summary", run_summary_job)
+job_manager.register("sentiment", run_sentiment_job)
+job_manager.register("transcription", run_transcription_job)
@@ -0,0 +1,140 @@
+"""
+Meeting Transcription Service - Room-level deduplicated transcription of meeting audio
+"""
+import hashlib
+import math
+import time
+from typing import Dict, Optional, Tuple
+
+from config import MEETING_AUDIO_WINDOW_SECONDS, MEETING_AUDIO_DEDUP_TTL_SECONDS
+from services.tracing import current_span, traced
+from services.transcription import RefinedCallback, transcribe_audio
+
+
+class RoomTranscriptionService:
+    """
+    Transcribes each piece of meeting audio once per room
+
+    Every listening client in a room uploads the meeting audio it hears. Chunks
+    are keyed by (room, speaker/track, time window) when the client identifies
+    the track, or by a hash of the audio bytes otherwise. The first upload of a
+    key owns the transcription; later uploads of the same key are dropped and
+    the owner is responsible for fanning the result out to the room. A failed
+    transcription releases its key so another upload of the chunk can retry.
+    """
+
+    def __init__(
+        self,
+        window_seconds: float = MEETING_AUDIO_WINDOW_SECONDS,
+        dedup_ttl_seconds: float = MEETING_AUDIO_DEDUP_TTL_SECONDS
+    ):
+        self.window_seconds = window_seconds
+        self.dedup_ttl_seconds = dedup_ttl_seconds
+        # Structure: {chunk_key: expiry_timestamp}
+        self._seen: Dict[Tuple[str, str, str], float] = {}
+        self.transcribed_chunks = 0
+        self.duplicate_chunks = 0
+
+    def chunk_key(
+        self,
+        room_id: str,
+        audio_data: bytes,
+        track_id: Optional[str] = None,
+        timestamp: Optional[float] = None
+    ) -> Tuple[str, str, str]:
+        """
+        Build the deduplication key for a meeting audio chunk
+
+        Args:
+            room_id: Room the audio belongs to
+            audio_data: Raw audio bytes
+            track_id: Optional speaker/track identifier sent by the client
+            timestamp: Optional capture time (unix seconds) sent by the client;
+                anything but a finite number falls back to the server clock
+
+        Returns:
+            Tuple of (room_id, track, window-or-hash)
+        """
+        if track_id:
+            captured_at = timestamp if _is_timestamp(timestamp) else time.time()
+            window = int(captured_at // self.window_seconds)
+            return (room_id, track_id, str(window))
+        # Without a track we can only recognise byte-identical uploads
+        return (room_id, "", hashlib.sha1(audio_data).hexdigest())
+
+    def _claim(self, key: Tuple[str, str, str]) -> bool:
+        """Claim a chunk key, returning False if it was already claimed"""
+        now = time.monotonic()
+
+        # Drop expired keys
+        expired = [k for k, expiry in self._seen.items() if expiry <= now]
+        for k in expired:
+            del self._seen[k]
+
+        if key in self._seen:
+            return False
+
+        self._seen[key] = now + self.dedup_ttl_seconds
+        return True
+
+    def _release(self, key: Tuple[str, str, str]):
+        """Forget a claimed key so the chunk can be transcribed again"""
+        self._seen.pop(key, None)
+
+    @traced("meeting_transcription")
+    async def transcribe(
+        self,
+        room_id: str,
+        audio_data: bytes,
+        track_id: Optional[str] = None,
+        timestamp: Optional[float] = None,
+        backend: Optional[str] = None,
+        on_refined: Optional[RefinedCallback] = None
+    ) -> Optional[str]:
+        """
+        Transcribe a meeting audio chunk unless the room already has it
+
+        Args:
+            room_id: Room the audio belongs to
+            audio_data: Raw audio bytes
+            track_id: Optional speaker/track identifier
+            timestamp: Optional capture time (unix seconds)
+            backend: Optional transcription backend name
+            on_refined: Called with a refined result later (hybrid mode only)
+
+        Returns:
+            Transcription text for the owning caller, or None for duplicates
+            and failed transcriptions
+        """
+        key = self.chunk_key(room_id, audio_data, track_id, timestamp)
+        if not self._claim(key):
+            self.duplicate_chunks += 1
+            current_span().set("duplicate", True)
+            return None
+
+        try:
+            result = await transcribe_audio(audio_data, backend=backend, on_refined=on_refined)
+        except BaseException:
+            # Let the next listener's upload of this chunk try again
+            self._release(key)
+            raise
+        if not result.ok:
+            # Backends report failures in the result rather than raising
+            self._release(key)
+            return None
+        self.transcribed_chunks += 1
+        return result.text
+
+    def forget_room(self, room_id: str):
+        """Drop deduplication state for a room"""
+        for key in [k for k in self._seen if k[0] == room_id]:
+            del self._seen[key]
+
+
+def _is_timestamp(value) -> bool:
+    """Whether a client-sent capture time is a usable number of seconds"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+# Global meeting transcription service instance
+meeting_transcriber = RoomTranscriptionService()
@@ -0,0 +1,490 @@
+"""
+Metrics - In-process counters, gauges and histograms exposed in Prometheus text format
+"""
+import asyncio
+import bisect
+from abc import ABC, abstractmethod
+import math
+import time
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from config import METRICS_LOOP_LAG_INTERVAL_MS
+
+
+# Latency buckets (seconds) for HTTP requests, Gemini calls and code runs
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Event loop lag buckets (seconds); anything past 100ms is a visible stall
+LOOP_LAG_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0)
+
+# Starlette appends "; charset=utf-8" to text responses
+PROMETHEUS_CONTENT_TYPE = "text/plain; version=0.0.4"
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _label_string(names: Sequence[str], values: Sequence[str]) -> str:
+    if not names:
+        return ""
+    pairs = ",".join(f'{name}="{_escape(str(value))}"' for name, value in zip(names, values))
+    return "{" + pairs + "}"
+
+
+class Metric(ABC):
+    """
+    Base class for a named metric with optional labels
+
+    Children are created once per label combination and cached, so an
+    observation is a dict lookup plus an add. Hot paths can keep the child
+    returned by labels() and skip the lookup entirely.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[Tuple[str, ...], object] = {}
+        if not self.labelnames:
+            self._children[()] = self._new_child()
+
+    @abstractmethod
+    def _new_child(self):
+        """A new value holder for one label combination"""
+
+    def labels(self, *values: str):
+        """Child for one label combination (created on first use)"""
+        key = tuple(str(value) for value in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def remove(self, *values: str):
+        """Drop a label combination (e.g. a room that no longer exists)"""
+        self._children.pop(tuple(str(value) for value in values), None)
+
+    @abstractmethod
+    def samples(self) -> Iterable[Tuple[str, str, float]]:
+        """Yields (sample name suffix, label string, value)"""
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.kind}"]
+        for suffix, labels, value in self.samples():
+            lines.append(f"{self.name}{suffix}{labels} {_format_value(value)}")
+        return lines
+
+
+class _Value:
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0.0
+
+    def inc(self, amount: float = 1.0):
+        self.value += amount
+
+    def dec(self, amount: float = 1.0):
+        self.value -= amount
+
+    def set(self, value: float):
+        self.value = value
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+
+    kind = "counter"
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            yield "_total" if not self.name.endswith("_total") else "", _label_string(self.labelnames, key), child.value
+
+
+class Gauge(Metric):
+    """
+    Value that can go up and down
+
+    A gauge can instead be computed at scrape time with set_function(), for
+    state that already lives elsewhere (connections per room, queue depth).
+    """
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._function: Optional[Callable[[], Dict[Tuple[str, ...], float]]] = None
+
+    def _new_child(self):
+        return _Value()
+
+    def inc(self, amount: float = 1.0):
+        self._children[()].inc(amount)
+
+    def dec(self, amount: float = 1.0):
+        self._children[()].dec(amount)
+
+    def set(self, value: float):
+        self._children[()].set(value)
+
+    def set_function(self, function: Callable[[], Dict[Tuple[str, ...], float]]):
+        """
+        Compute the gauge when scraped
+
+        Args:
+            function: Returns {label values tuple: value}; () for an unlabelled gauge
+        """
+        self._function = function
+
+    def samples(self):
+        if self._function is not None:
+            try:
+                values = self._function()
+            except Exception as e:
+                print(f"[Metrics] Error collecting {self.name}: {e}")
+                values = {}
+            for key, value in values.items():
+                yield "", _label_string(self.labelnames, key), value
+            return
+        for key, child in list(self._children.items()):
+            yield "", _label_string(self.labelnames, key), child.value
+
+
+class _HistogramValue:
+    __slots__ = ("upper_bounds", "counts", "sum", "count")
+
+    def __init__(self, upper_bounds: Tuple[float, ...]):
+        self.upper_bounds = upper_bounds
+        # Per-bucket (non-cumulative) counts; the last slot is +Inf
+        self.counts = [0] * (len(upper_bounds) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.upper_bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def time(self) -> "_Timer":
+        """Context manager observing the elapsed seconds of its block"""
+        return _Timer(self)
+
+
+class _Timer:
+    __slots__ = ("histogram", "start")
+
+    def __init__(self, histogram: _HistogramValue):
+        self.histogram = histogram
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.histogram.observe(time.perf_counter() - self.start)
+        return False
+
+
+class Histogram(Metric):
+    """Distribution of observations over fixed buckets (cumulative on export)"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        self.upper_bounds = tuple(sorted(buckets))
+        super().__init__(name, documentation, labelnames)
+
+    def _new_child(self):
+        return _HistogramValue(self.upper_bounds)
+
+    def observe(self, value: float):
+        self._children[()].observe(value)
+
+    def time(self) -> _Timer:
+        return self._children[()].time()
+
+    def samples(self):
+        for key, child in list(self._children.items()):
+            cumulative = 0
+            for bound, count in zip(self.upper_bounds + (math.inf,), child.counts):
+                cumulative += count
+                labels = _label_string(self.labelnames + ("le",), key + (_format_value(bound),))
+                yield "_bucket", labels, cumulative
+            labels = _label_string(self.labelnames, key)
+            yield "_sum", labels, child.sum
+            yield "_count", labels, child.count
+
+
+class MetricsRegistry:
+    """Named metrics rendered together for /metrics"""
+
+    def __init__(self):
+        self.metrics: Dict[str, Metric] = {}
+
+    def _register(self, metric: Metric) -> Metric:
+        existing = self.metrics.get(metric.name)
+        if existing is not None:
+            if type(existing) is not type(metric) or existing.labelnames != metric.labelnames:
+                raise ValueError(f"Metric {metric.name} already registered with a different type or labels")
+            return existing
+        self.metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, labelnames))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        labelnames: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, labelnames, buckets))
+
+    def render(self) -> str:
+        """All metrics in Prometheus text exposition format"""
+        lines: List[str] = []
+        for metric in list(self.metrics.values()):
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+# Global metrics registry
+registry = MetricsRegistry()
+
+
+# ==================== Application Metrics ====================
+
+HTTP_REQUESTS = registry.counter(
+    "http_requests_total", "HTTP requests by route and status", ("method", "route", "status")
+)
+HTTP_REQUEST_DURATION = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route")
+)
+HTTP_REQUESTS_IN_PROGRESS = registry.gauge(
+    "http_requests_in_progress", "HTTP requests currently being handled"
+)
+
+GEMINI_REQUESTS = registry.counter(
+    "gemini_requests_total", "Gemini API calls by outcome", ("operation", "model", "outcome")
+)
+GEMINI_REQUEST_DURATION = registry.histogram(
+    "gemini_request_duration_seconds", "Gemini API call latency", ("operation", "model")
+)
+GEMINI_RETRIES = registry.counter(
+    "gemini_retries_total", "Gemini calls retried after an error or rate limit", ("operation", "model")
+)
+GEMINI_FALLBACKS = registry.counter(
+    "gemini_fallback_responses_total", "Requests answered with a fallback after every model failed", ("operation",)
+)
+
+CODE_EXECUTIONS = registry.counter(
+    "code_executions_total", "Code executions by language and outcome", ("language", "outcome")
+)
+CODE_EXECUTION_DURATION = registry.histogram(
+    "code_execution_duration_seconds", "Wall time of code executions, including compilation", ("language",)
+)
+CODE_EXECUTIONS_IN_PROGRESS = registry.gauge(
+    "code_executions_in_progress", "Code executions currently running"
+)
+CODE_ROOM_RUN_REQUESTS = registry.counter(
+    "code_room_run_requests_total", "Room run requests by source and result (started, attached, busy)", ("source", "status")
+)
+
+WS_CONNECTIONS = registry.gauge(
+    "websocket_connections", "Open WebSocket connections per endpoint and room", ("endpoint", "room")
+)
+WS_MESSAGES = registry.counter(
+    "websocket_messages_received_total", "WebSocket messages received by endpoint and type", ("endpoint", "type")
+)
+WS_EVICTIONS = registry.counter(
+    "websocket_slow_consumer_evictions_total", "Clients disconnected for falling behind on sends"
+)
+WS_SEND_QUEUE_DEPTH = registry.gauge(
+    "websocket_send_queue_depth", "Frames waiting in outbound queues per endpoint", ("endpoint",)
+)
+
+EVENT_LOOP_LAG = registry.histogram(
+    "event_loop_lag_seconds", "Delay of a periodic timer past its deadline", buckets=LOOP_LAG_BUCKETS
+)
+EVENT_LOOP_LAG_LAST = registry.gauge(
+    "event_loop_lag_last_seconds", "Most recent event loop lag measurement"
+)
+PROCESS_START_TIME = registry.gauge(
+    "process_start_time_seconds", "Start time of the process since the Unix epoch"
+)
+PROCESS_START_TIME.set(time.time())
+
+# Structure: {endpoint: function returning {room_id: connection count}}
+_connection_sources: Dict[str, Callable[[], Dict[str, int]]] = {}
+# Structure: {endpoint: function returning total frames queued for sending}
+_queue_depth_sources: Dict[str, Callable[[], int]] = {}
+
+
+def track_connections(
+    endpoint: str,
+    connections: Callable[[], Dict[str, int]],
+    queue_depth: Optional[Callable[[], int]] = None
+):
+    """
+    Report a WebSocket endpoint's connections (and send queues) at scrape time
+
+    Args:
+        endpoint: Endpoint label, e.g. "yjs"
+        connections: Returns {room_id: open connections}
+        queue_depth: Optional, returns frames waiting in the endpoint's send queues
+    """
+    _connection_sources[endpoint] = connections
+    if queue_depth is not None:
+        _queue_depth_sources[endpoint] = queue_depth
+
+
+WS_CONNECTIONS.set_function(lambda: {
+    (endpoint, room_id): count
+    for endpoint, connections in list(_connection_sources.items())
+    for room_id, count in connections().items()
+})
+WS_SEND_QUEUE_DEPTH.set_function(lambda: {
+    (endpoint,): queue_depth() for endpoint, queue_depth in list(_queue_depth_sources.items())
+})
+
+
+def websocket_queue_depth() -> int:
+    """Frames waiting in the send queues of every WebSocket endpoint"""
+    return sum(queue_depth() for queue_depth in list(_queue_depth_sources.values()))
+
+
+def render_metrics() -> str:
+    """Render the global registry for /metrics"""
+    return registry.render()
+
+
+# ==================== Event Loop Lag ====================
+
+class EventLoopLagMonitor:
+    """
+    Measures event loop responsiveness
+
+    Sleeps for a fixed interval and records how late it woke up. Anything
+    blocking the loop (sync I/O, CPU-heavy handlers) shows up as lag.
+    """
+
+    def __init__(self, interval_ms: int = METRICS_LOOP_LAG_INTERVAL_MS):
+        self.interval = interval_ms / 1000
+        # Most recent lag in seconds (read by the load shedder)
+        self.last_lag = 0.0
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start sampling on the running loop (no-op if disabled or already running)"""
+        if self.interval > 0 and self._task is None:
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            expected = loop.time() + self.interval
+            await asyncio.sleep(self.interval)
+            lag = max(0.0, loop.time() - expected)
+            EVENT_LOOP_LAG.observe(lag)
+            EVENT_LOOP_LAG_LAST.set(lag)
+            self.last_lag = lag
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+# Global event loop lag monitor
+loop_lag_monitor = EventLoopLagMonitor()
+
+
+# ==================== HTTP Middleware ====================
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request count and latency per route
+
+    Requests are labelled with the matched route template (e.g.
+    /api/collab/rooms/{room_id}/snapshot) rather than the raw path, so
+    label cardinality stays bounded. WebSocket scopes pass straight through.
+    """
+
+    def __init__(self, app):
+        self.app = app
+        # Structure: {endpoint function: route path template}
+        self._route_paths: Dict[object, str] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = [500]
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        HTTP_REQUESTS_IN_PROGRESS.inc()
+        start_time = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - start_time
+            HTTP_REQUESTS_IN_PROGRESS.dec()
+            route = self._route_path(scope)
+            method = scope["method"]
+            HTTP_REQUESTS.labels(method, route, status[0]).inc()
+            HTTP_REQUEST_DURATION.labels(method, route).observe(elapsed)
+
+    def _route_path(self, scope) -> str:
+        """Route template of the endpoint the router matched, or 'unmatched'"""
+        endpoint = scope.get("endpoint")
+        if endpoint is None:
+            return "unmatched"
+        path = self._route_paths.get(endpoint)
+        if path is None:
+            path = "unmatched"
+            for route in getattr(scope.get("router"), "routes", ()):
+                if getattr(route, "endpoint", None) is endpoint:
+                    path = route.path
+                    break
+            self._route_paths[endpoint] = path
+        return path
@@ -0,0 +1,226 @@
+"""
+Profiler - On-demand stack sampling and event loop block detection
+"""
+import asyncio
+import os
+import sys
+import threading
+import time
+from collections import Counter as StackCounter, deque
+from typing import Deque, Dict, List, Optional
+
+from config import LOOP_BLOCK_HISTORY, LOOP_BLOCK_THRESHOLD_MS
+from services.metrics import registry
+
+
+EVENT_LOOP_BLOCKS = registry.counter(
+    "event_loop_blocks_total", "Times the event loop was blocked past LOOP_BLOCK_THRESHOLD_MS"
+)
+
+# Deepest stack kept per sample / per block report
+MAX_STACK_DEPTH = 64
+
+
+def _frame_label(frame) -> str:
+    code = frame.f_code
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{frame.f_lineno})"
+
+
+def _stack_labels(frame, max_depth: int = MAX_STACK_DEPTH) -> List[str]:
+    """Frames of a stack, outermost first"""
+    labels = []
+    while frame is not None and len(labels) < max_depth:
+        labels.append(_frame_label(frame))
+        frame = frame.f_back
+    labels.reverse()
+    return labels
+
+
+class ProfileInProgress(Exception):
+    """Raised when a profile is requested while another one is running"""
+
+
+class StackSampler:
+    """
+    Statistical profiler for the running worker
+
+    A background thread snapshots every thread's Python stack at a fixed
+    interval (sys._current_frames) and counts identical stacks. Nothing is
+    installed in the profiled code, so the cost is one stack walk per
+    thread per sample, and only while a profile is running.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.running = False
+
+    async def profile(self, seconds: float, interval_ms: float) -> dict:
+        """
+        Sample all threads for a while
+
+        Args:
+            seconds: How long to sample
+            interval_ms: Time between samples
+
+        Returns:
+            Dict with per-thread folded stacks ("outer;inner" -> count) and totals
+
+        Raises:
+            ProfileInProgress: If another profile is running
+        """
+        with self._lock:
+            if self.running:
+                raise ProfileInProgress()
+            self.running = True
+        try:
+            return await asyncio.to_thread(self._sample, seconds, interval_ms / 1000)
+        finally:
+            self.running = False
+
+    def _sample(self, seconds: float, interval: float) -> dict:
+        own_thread = threading.get_ident()
+        names = {thread.ident: thread.name for thread in threading.enumerate()}
+        stacks: Dict[int, StackCounter] = {}
+        samples = 0
+        started = time.perf_counter()
+        deadline = started + seconds
+
+        while time.perf_counter() < deadline:
+            for thread_id, frame in sys._current_frames().items():
+                if thread_id == own_thread:
+                    continue
+                stacks.setdefault(thread_id, StackCounter())[";".join(_stack_labels(frame))] += 1
+            samples += 1
+            time.sleep(interval)
+
+        elapsed = time.perf_counter() - started
+        return {
+            "duration_s": round(elapsed, 3),
+            "interval_ms": interval * 1000,
+            "samples": samples,
+            "threads": {
+                names.get(thread_id, str(thread_id)): dict(counter.most_common())
+                for thread_id, counter in stacks.items()
+            }
+        }
+
+
+def folded_stacks(profile: dict) -> str:
+    """
+    Render a profile in folded format (flamegraph.pl, speedscope)
+
+    Each line is "thread;outer;...;inner count".
+    """
+    lines = []
+    for thread_name, stacks in profile["threads"].items():
+        for stack, count in stacks.items():
+            lines.append(f"{thread_name};{stack} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def top_functions(profile: dict, limit: int = 20) -> List[dict]:
+    """Functions with the most samples on top of the stack (self) and anywhere on it (total)"""
+    self_counts: StackCounter = StackCounter()
+    total_counts: StackCounter = StackCounter()
+    for stacks in profile["threads"].values():
+        for stack, count in stacks.items():
+            frames = stack.split(";")
+            self_counts[frames[-1]] += count
+            for frame in set(frames):
+                total_counts[frame] += count
+    return [
+        {"function": frame, "self": self_counts[frame], "total": total}
+        for frame, total in total_counts.most_common(limit)
+    ]
+
+
+# Global stack sampler instance
+stack_sampler = StackSampler()
+
+
+class LoopBlockWatchdog:
+    """
+    Records what the event loop was running when it stalled
+
+    The loop renews a heartbeat every few milliseconds. A watchdog thread
+    checks it, and once it is older than LOOP_BLOCK_THRESHOLD_MS captures
+    the loop thread's stack - the callback doing the blocking - once per
+    stall. When the loop comes back, the stall's full duration is filled in.
+    """
+
+    def __init__(
+        self,
+        threshold_ms: int = LOOP_BLOCK_THRESHOLD_MS,
+        history: int = LOOP_BLOCK_HISTORY
+    ):
+        self.threshold = threshold_ms / 1000
+        self.interval = self.threshold / 4
+        self.blocks: Deque[dict] = deque(maxlen=history)
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread: Optional[int] = None
+        self._heartbeat = 0.0
+        self._open_block: Optional[dict] = None
+        self._handle: Optional[asyncio.TimerHandle] = None
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """Start watching the running loop (no-op if disabled or already running)"""
+        if self.threshold <= 0 or self._thread is not None:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        self._heartbeat = time.monotonic()
+        self._stop.clear()
+        self._handle = self._loop.call_later(self.interval, self._beat)
+        self._thread = threading.Thread(target=self._watch, name="loop-watchdog", daemon=True)
+        self._thread.start()
+
+    def _beat(self):
+        """Runs on the loop: renew the heartbeat and close a finished stall"""
+        now = time.monotonic()
+        with self._lock:
+            block = self._open_block
+            if block is not None:
+                # The heartbeat was due one interval after it was last renewed
+                block["blocked_ms"] = round(max(0.0, now - self._heartbeat - self.interval) * 1000, 1)
+                self._open_block = None
+            self._heartbeat = now
+        if block is not None:
+            print(f"[Loop] Event loop blocked for {block['blocked_ms']:.0f}ms in {block['stack'][-1] if block['stack'] else '?'}")
+        self._handle = self._loop.call_later(self.interval, self._beat)
+
+    def _watch(self):
+        """Runs on the watchdog thread"""
+        while not self._stop.wait(self.interval):
+            with self._lock:
+                stalled = time.monotonic() - self._heartbeat
+                if stalled < self.threshold + self.interval or self._open_block is not None:
+                    continue
+                frame = sys._current_frames().get(self._loop_thread)
+                self._open_block = {
+                    "detected_at": time.time(),
+                    "blocked_ms": round((stalled - self.interval) * 1000, 1),
+                    "stack": _stack_labels(frame) if frame is not None else []
+                }
+                self.blocks.append(self._open_block)
+            EVENT_LOOP_BLOCKS.inc()
+
+    def recent_blocks(self) -> List[dict]:
+        """Recorded stalls, newest first (blocked_ms is final once the loop resumed)"""
+        with self._lock:
+            return [dict(block) for block in reversed(self.blocks)]
+
+    def stop(self):
+        self._stop.set()
+        if self._handle is not None:
+            self._handle.cancel()
+            self._handle = None
+        if self._thread is not None:
+            self._thread.join(timeout=1)
+            self._thread = None
+
+
+# Global event loop watchdog instance
+loop_watchdog = LoopBlockWatchdog()
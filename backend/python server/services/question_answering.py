@@ -0,0 +1,112 @@
+"""
+Question Answering Service - Single-flight answers to questions detected in meetings
+"""
+import asyncio
+import re
+import time
+from typing import Dict, Tuple
+
+from config import QUESTION_ANSWER_CACHE_TTL_SECONDS
+from services.ai_service import FALLBACK_RESPONSES, process_text_with_gemini
+from services.tracing import current_span, traced
+
+
+def normalize_question(text: str) -> str:
+    """
+    Normalize a detected question so repeated detections compare equal
+
+    Args:
+        text: Question text as transcribed
+
+    Returns:
+        Lowercased question with punctuation removed and whitespace collapsed
+    """
+    text = re.sub(r"[^\w\s]", " ", text.lower())
+    return " ".join(text.split())
+
+
+class QuestionAnswerCoalescer:
+    """
+    Answers each meeting question once per room
+
+    Questions are keyed by (room, normalized text). Concurrent detections of the
+    same key share one in-flight Gemini call, and finished answers are cached
+    for a short window so late duplicates are served without another call.
+    """
+
+    def __init__(self, cache_ttl_seconds: float = QUESTION_ANSWER_CACHE_TTL_SECONDS):
+        self.cache_ttl_seconds = cache_ttl_seconds
+        self._in_flight: Dict[Tuple[str, str], asyncio.Task] = {}
+        # Structure: {question_key: (expiry_timestamp, answer)}
+        self._answers: Dict[Tuple[str, str], Tuple[float, str]] = {}
+        self.llm_calls = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    def question_key(self, room_id: str, question: str) -> Tuple[str, str]:
+        """Build the coalescing key for a question"""
+        return (room_id, normalize_question(question))
+
+    def _expire(self):
+        """Drop expired cached answers"""
+        now = time.monotonic()
+        expired = [key for key, (expiry, _) in self._answers.items() if expiry <= now]
+        for key in expired:
+            del self._answers[key]
+
+    async def _ask(self, key: Tuple[str, str], question: str) -> str:
+        """Make the single Gemini call for a question key, with the room's transcript searched for the question"""
+        self.llm_calls += 1
+        question_prompt = f"Someone in the meeting asked: \"{question}\"\n\nPlease provide a helpful, concise answer to this question."
+        answer = await process_text_with_gemini(question_prompt, room_id=key[0], context_query=question)
+
+        # Don't pin failures in the cache, the next detection should retry
+        if answer not in FALLBACK_RESPONSES:
+            self._answers[key] = (time.monotonic() + self.cache_ttl_seconds, answer)
+        return answer
+
+    @traced("question_answer")
+    async def answer(
+        self,
+        room_id: str,
+        question: str
+    ) -> str:
+        """
+        Get the answer to a meeting question, sharing work across listeners
+
+        Args:
+            room_id: Room the question was asked in
+            question: Detected question text
+
+        Returns:
+            AI answer text
+        """
+        key = self.question_key(room_id, question)
+        self._expire()
+
+        cached = self._answers.get(key)
+        if cached is not None:
+            self.cache_hits += 1
+            current_span().set("cached", True)
+            return cached[1]
+
+        task = self._in_flight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(self._ask(key, question))
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+            current_span().set("coalesced", True)
+
+        # Shield so one listener disconnecting doesn't cancel the others' answer
+        return await asyncio.shield(task)
+
+    def forget_room(self, room_id: str):
+        """Drop cached answers for a room"""
+        for key in [k for k in self._answers if k[0] == room_id]:
+            del self._answers[key]
+
+
+# Global question answering instance
+question_answerer = QuestionAnswerCoalescer()
@@ -0,0 +1,175 @@
+"""
+RESP Client - Minimal asyncio Redis-protocol client (pub/sub and plain commands)
+"""
+import asyncio
+from collections import deque
+from typing import Deque, Optional, Tuple, Union
+from urllib.parse import urlparse
+
+
+Reply = Union[None, int, bytes, str, list, "RespError"]
+
+
+class RespError(Exception):
+    """Error reply sent by the server"""
+
+
+def parse_url(url: str) -> Tuple[str, Union[str, Tuple[str, int]]]:
+    """
+    Parse a broker URL
+
+    Args:
+        url: redis://host:port or unix:///path/to/socket
+
+    Returns:
+        Tuple of ("unix", path) or ("tcp", (host, port))
+
+    Raises:
+        ValueError: If the scheme is not supported
+    """
+    parsed = urlparse(url)
+    if parsed.scheme == "unix":
+        return "unix", parsed.path
+    if parsed.scheme in ("redis", "tcp"):
+        return "tcp", (parsed.hostname or "127.0.0.1", parsed.port or 6379)
+    raise ValueError(f"Unsupported broker URL: {url}")
+
+
+def encode_command(*args: Union[str, bytes, int]) -> bytes:
+    """Encode a command as a RESP array of bulk strings"""
+    out = bytearray(b"*%d\r\n" % len(args))
+    for arg in args:
+        if isinstance(arg, str):
+            arg = arg.encode("utf-8")
+        elif isinstance(arg, int):
+            arg = str(arg).encode("ascii")
+        out += b"$%d\r\n" % len(arg)
+        out += arg
+        out += b"\r\n"
+    return bytes(out)
+
+
+async def read_reply(reader: asyncio.StreamReader) -> Reply:
+    """
+    Read one RESP value from a stream
+
+    Raises:
+        ConnectionError: If the stream closed
+        ValueError: If the data is not valid RESP
+    """
+    line = await reader.readline()
+    if not line:
+        raise ConnectionError("Broker connection closed")
+    prefix, body = line[:1], line[1:-2]
+
+    if prefix == b"+":
+        return body.decode("utf-8")
+    if prefix == b"-":
+        return RespError(body.decode("utf-8"))
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = await reader.readexactly(length + 2)
+        return data[:-2]
+    if prefix == b"*":
+        count = int(body)
+        if count < 0:
+            return None
+        return [await read_reply(reader) for _ in range(count)]
+    raise ValueError(f"Invalid RESP data: {line[:32]!r}")
+
+
+class RespConnection:
+    """
+    One connection to a Redis-protocol server
+
+    Commands are pipelined: call() writes immediately and waits for the reply
+    in order, so concurrent callers never wait on each other's round trips.
+    """
+
+    def __init__(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        self.reader = reader
+        self.writer = writer
+        # One entry per command in flight; None for replies nobody waits for
+        self._waiters: Deque[Optional[asyncio.Future]] = deque()
+        self._reader_task: Optional[asyncio.Task] = None
+        self.closed = False
+
+    @classmethod
+    async def open(cls, url: str, timeout: float = 5.0) -> "RespConnection":
+        """Connect to redis://host:port or unix:///path"""
+        kind, address = parse_url(url)
+        if kind == "unix":
+            connect = asyncio.open_unix_connection(address)
+        else:
+            connect = asyncio.open_connection(*address)
+        reader, writer = await asyncio.wait_for(connect, timeout)
+        return cls(reader, writer)
+
+    def send(self, *args: Union[str, bytes, int]):
+        """Write a command in subscriber mode, where replies arrive as pushed messages"""
+        self.writer.write(encode_command(*args))
+
+    def post(self, *args: Union[str, bytes, int]):
+        """Pipeline a command and discard its reply (e.g. PUBLISH on the hot path)"""
+        self._waiters.append(None)
+        self.writer.write(encode_command(*args))
+        self._start_reader()
+
+    async def call(self, *args: Union[str, bytes, int]) -> Reply:
+        """
+        Send a command and wait for its reply
+
+        Raises:
+            RespError: If the server answered with an error
+            ConnectionError: If the connection closed
+        """
+        if self.closed:
+            raise ConnectionError("Broker connection closed")
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.writer.write(encode_command(*args))
+        self._start_reader()
+        reply = await future
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def _start_reader(self):
+        if self._reader_task is None:
+            self._reader_task = asyncio.get_running_loop().create_task(self._read_replies())
+
+    async def _read_replies(self):
+        """Match replies to waiting callers in order"""
+        try:
+            while True:
+                reply = await read_reply(self.reader)
+                if self._waiters:
+                    future = self._waiters.popleft()
+                    if future is not None and not future.done():
+                        future.set_result(reply)
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError) as e:
+            self.closed = True
+            error = e if isinstance(e, ConnectionError) else ConnectionError(str(e))
+            for future in self._waiters:
+                if future is not None and not future.done():
+                    future.set_exception(error)
+            self._waiters.clear()
+
+    @property
+    def write_buffer_size(self) -> int:
+        return self.writer.transport.get_write_buffer_size()
+
+    async def close(self):
+        """Close the connection"""
+        self.closed = True
+        if self._reader_task is not None:
+            self._reader_task.cancel()
+        self.writer.close()
+        try:
+            await self.writer.wait_closed()
+        except Exception:
+            pass
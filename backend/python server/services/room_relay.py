@@ -0,0 +1,315 @@
+"""
+Room Relay - Forwards collaborative room traffic between worker processes
+"""
+import asyncio
+import hashlib
+import uuid
+from typing import Callable, Dict, List, Optional, Set, Tuple
+
+from pycrdt import write_var_uint
+
+from config import RELAY_MODE, RELAY_URL, WORKER_NAME
+from services.resp import RespConnection, read_reply
+from services.yjs_protocol import read_var_uint
+
+
+# Pub/sub channel of a room is this prefix + room id
+RELAY_CHANNEL_PREFIX = "yjs:room:"
+
+# Relay message kinds
+RELAY_UPDATE = 0      # Document update, logged to the store by its origin worker
+RELAY_AWARENESS = 1   # Awareness entries owned by the origin worker's clients
+RELAY_SYNC = 2        # Full state from a worker that (re)started serving the room; peers answer with RELAY_STATE
+RELAY_STATE = 3       # Full state answering a RELAY_SYNC
+
+# Disconnect from the broker (and resync on reconnect) if this much publish data is stuck
+RELAY_MAX_WRITE_BUFFER = 8 * 1024 * 1024
+RELAY_RECONNECT_MAX_SECONDS = 5.0
+
+# Callback signatures: (room_id, origin, kind, seq, payload) and (room_id)
+RelayHandler = Callable[[str, str, int, int, bytes], None]
+SubscribedHandler = Callable[[str], None]
+
+
+def encode_relay_message(origin: str, kind: int, seq: int, payload: bytes) -> bytes:
+    """Encode a relay message as kind, origin, seq, payload (lib0 varints)"""
+    origin_bytes = origin.encode("utf-8")
+    return (
+        write_var_uint(kind)
+        + write_var_uint(len(origin_bytes))
+        + origin_bytes
+        + write_var_uint(seq)
+        + payload
+    )
+
+
+def decode_relay_message(data: bytes) -> Tuple[str, int, int, bytes]:
+    """
+    Decode a relay message
+
+    Returns:
+        Tuple of (origin, kind, seq, payload)
+
+    Raises:
+        ValueError: If the message is malformed
+    """
+    kind, pos = read_var_uint(data)
+    length, pos = read_var_uint(data, pos)
+    origin = data[pos:pos + length].decode("utf-8")
+    seq, pos = read_var_uint(data, pos + length)
+    return origin, kind, seq, data[pos:]
+
+
+def room_worker(room_id: str, workers: List[str]) -> Optional[str]:
+    """
+    Pick the worker that should serve a room (rendezvous hashing)
+
+    Every process computes the same answer without coordination, and adding or
+    removing a worker only moves the rooms that hashed to it.
+
+    Args:
+        room_id: Room identifier
+        workers: Worker URLs or names
+
+    Returns:
+        The preferred worker, or None if no workers are configured
+    """
+    if not workers:
+        return None
+    return max(
+        workers,
+        key=lambda worker: hashlib.sha1(f"{worker}\0{room_id}".encode("utf-8")).digest()
+    )
+
+
+class RoomRelay:
+    """
+    In-process relay (the default)
+
+    A single worker serves every room, so there is nothing to forward; the
+    room manager still goes through this interface so the broker relay can be
+    switched on with configuration alone.
+    """
+
+    mode = "inprocess"
+
+    def __init__(self, worker_id: Optional[str] = None):
+        # Unique per process: update seqs restart at 1 with every new worker id
+        self.worker_id = worker_id or f"{WORKER_NAME}-{uuid.uuid4().hex[:8]}"
+        self.rooms: Set[str] = set()
+        self.on_message: Optional[RelayHandler] = None
+        self.on_subscribed: Optional[SubscribedHandler] = None
+        self.published = 0
+        self.received = 0
+        self.dropped = 0
+        self.bytes_out = 0
+        self.bytes_in = 0
+
+    @property
+    def enabled(self) -> bool:
+        """Whether frames are forwarded to other workers"""
+        return False
+
+    def set_handlers(self, on_message: RelayHandler, on_subscribed: SubscribedHandler):
+        """
+        Register the room manager's callbacks
+
+        Args:
+            on_message: Called for every message from another worker
+            on_subscribed: Called once a room's subscription is active (also after reconnects)
+        """
+        self.on_message = on_message
+        self.on_subscribed = on_subscribed
+
+    async def start(self):
+        """Connect to the broker, if any"""
+
+    async def subscribe(self, room_id: str):
+        """Start receiving a room's traffic from other workers"""
+        self.rooms.add(room_id)
+
+    def unsubscribe(self, room_id: str):
+        """Stop receiving a room's traffic (its last local client left)"""
+        self.rooms.discard(room_id)
+
+    def publish(self, room_id: str, kind: int, payload: bytes, seq: int = 0):
+        """Forward a message to the other workers serving a room (never blocks)"""
+
+    async def close(self):
+        """Disconnect from the broker"""
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "worker_id": self.worker_id,
+            "connected": self.enabled,
+            "rooms_subscribed": len(self.rooms),
+            "published": self.published,
+            "received": self.received,
+            "dropped": self.dropped,
+            "bytes_out": self.bytes_out,
+            "bytes_in": self.bytes_in
+        }
+
+
+class BrokerRoomRelay(RoomRelay):
+    """
+    Relay over a Redis-protocol pub/sub broker
+
+    Each worker subscribes only to the rooms that have local clients, so
+    traffic for a room only crosses processes when its clients are actually
+    spread over several workers. Frames published while the broker is
+    unreachable are dropped; after reconnecting every room is resubscribed and
+    resynced with a full-state exchange, which Yjs merges idempotently.
+    """
+
+    mode = "broker"
+
+    def __init__(self, url: str = RELAY_URL, worker_id: Optional[str] = None):
+        super().__init__(worker_id)
+        self.url = url
+        self._publisher: Optional[RespConnection] = None
+        self._subscriber: Optional[RespConnection] = None
+        self._pending_acks: Dict[str, asyncio.Future] = {}
+        self._runner: Optional[asyncio.Task] = None
+        self._connected = False
+        self.reconnects = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self._connected
+
+    async def start(self):
+        if self._runner is None:
+            self._runner = asyncio.get_running_loop().create_task(self._run())
+
+    async def _run(self):
+        """Keep the broker connections up, resubscribing after every reconnect"""
+        delay = 0.1
+        while True:
+            try:
+                self._publisher = await RespConnection.open(self.url)
+                self._subscriber = await RespConnection.open(self.url)
+                self._connected = True
+                delay = 0.1
+                print(f"[Relay] Worker {self.worker_id} connected to {self.url}")
+
+                for room_id in list(self.rooms):
+                    self._subscriber.send("SUBSCRIBE", RELAY_CHANNEL_PREFIX + room_id)
+                    self._pending_acks.setdefault(room_id, asyncio.get_running_loop().create_future())
+                await self._read_messages()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                print(f"[Relay] Broker connection lost ({type(e).__name__}: {e}), retrying in {delay:.1f}s")
+            finally:
+                self._connected = False
+                for connection in (self._publisher, self._subscriber):
+                    if connection is not None:
+                        await connection.close()
+                self._publisher = self._subscriber = None
+
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, RELAY_RECONNECT_MAX_SECONDS)
+            self.reconnects += 1
+
+    async def _read_messages(self):
+        """Dispatch pushed pub/sub messages until the connection drops"""
+        while True:
+            reply = await read_reply(self._subscriber.reader)
+            if not isinstance(reply, list) or len(reply) < 3:
+                continue
+            kind, channel = reply[0], reply[1].decode("utf-8")
+            room_id = channel[len(RELAY_CHANNEL_PREFIX):]
+
+            if kind == b"message":
+                self._dispatch(room_id, reply[2])
+            elif kind == b"subscribe":
+                future = self._pending_acks.pop(room_id, None)
+                if future is not None and not future.done():
+                    future.set_result(None)
+                if room_id in self.rooms and self.on_subscribed is not None:
+                    self.on_subscribed(room_id)
+
+    def _dispatch(self, room_id: str, data: bytes):
+        try:
+            origin, kind, seq, payload = decode_relay_message(data)
+        except (ValueError, UnicodeDecodeError) as e:
+            print(f"[Relay] Dropping malformed message for room {room_id}: {e}")
+            return
+        # The broker echoes our own publishes back to us
+        if origin == self.worker_id:
+            return
+        self.received += 1
+        self.bytes_in += len(data)
+        if self.on_message is not None:
+            try:
+                self.on_message(room_id, origin, kind, seq, payload)
+            except Exception as e:
+                print(f"[Relay] Error handling message for room {room_id}: {e}")
+
+    async def subscribe(self, room_id: str, timeout: float = 5.0):
+        if room_id in self.rooms:
+            return
+        self.rooms.add(room_id)
+        if not self._connected:
+            # Subscribed (and synced) as soon as the broker is reachable
+            return
+        future = self._pending_acks.setdefault(room_id, asyncio.get_running_loop().create_future())
+        self._subscriber.send("SUBSCRIBE", RELAY_CHANNEL_PREFIX + room_id)
+        try:
+            await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            print(f"[Relay] Subscribing to room {room_id} timed out")
+
+    def unsubscribe(self, room_id: str):
+        if room_id not in self.rooms:
+            return
+        self.rooms.discard(room_id)
+        if self._connected:
+            self._subscriber.send("UNSUBSCRIBE", RELAY_CHANNEL_PREFIX + room_id)
+
+    def publish(self, room_id: str, kind: int, payload: bytes, seq: int = 0):
+        if not self._connected:
+            self.dropped += 1
+            return
+        if self._publisher.write_buffer_size > RELAY_MAX_WRITE_BUFFER:
+            # The broker stopped reading; reconnecting resyncs every room
+            self.dropped += 1
+            print("[Relay] Broker is not keeping up, reconnecting")
+            self._publisher.writer.transport.abort()
+            self._subscriber.writer.transport.abort()
+            self._connected = False
+            return
+        message = encode_relay_message(self.worker_id, kind, seq, payload)
+        self._publisher.post("PUBLISH", RELAY_CHANNEL_PREFIX + room_id, message)
+        self.published += 1
+        self.bytes_out += len(message)
+
+    async def close(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            try:
+                await self._runner
+            except asyncio.CancelledError:
+                pass
+            self._runner = None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({"url": self.url, "reconnects": self.reconnects})
+        return stats
+
+
+def create_room_relay(mode: str = RELAY_MODE) -> RoomRelay:
+    """
+    Create the relay selected by RELAY_MODE
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode == "inprocess":
+        return RoomRelay()
+    if mode == "broker":
+        return BrokerRoomRelay()
+    raise ValueError(f"Unknown RELAY_MODE '{mode}', expected 'inprocess' or 'broker'")
@@ -0,0 +1,167 @@
+"""
+Room Store - Durable snapshot + write-ahead log storage for collaborative rooms
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+from pycrdt import merge_updates
+
+from config import YJS_STORE_PATH, YJS_STORE_FLUSH_MS
+
+
+class RoomStore:
+    """
+    SQLite-backed persistence for Yjs room documents
+
+    Every accepted update is appended to an update log (batched on a single
+    storage thread), and each compaction writes a snapshot and truncates the
+    log entries it covers. Reloading a room therefore reads one snapshot plus
+    at most one compaction window of updates.
+
+    Log entries are keyed by (origin, seq) so several worker processes can
+    share one store: each worker logs the updates its own clients sent, and
+    a snapshot is merged into the stored one rather than replacing it, so
+    snapshots written by different workers (or out of order) never lose edits.
+    """
+
+    def __init__(self, path: str = YJS_STORE_PATH, flush_ms: int = YJS_STORE_FLUSH_MS):
+        self.path = path
+        self.flush_interval = flush_ms / 1000
+        # SQLite connections are used from exactly one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="room-store")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, str, int, bytes]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self.last_load_ms = 0.0
+
+    # ==================== Storage Thread ====================
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS room_snapshots ("
+                "room_id TEXT PRIMARY KEY, state BLOB NOT NULL, updated_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS room_updates ("
+                "room_id TEXT NOT NULL, origin TEXT NOT NULL, seq INTEGER NOT NULL, data BLOB NOT NULL, "
+                "PRIMARY KEY (room_id, origin, seq))"
+            )
+        return self._connection
+
+    def _append_batch(self, rows: List[Tuple[str, str, int, bytes]]):
+        db = self._db()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO room_updates (room_id, origin, seq, data) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def _write_snapshot(self, room_id: str, state: bytes, versions: Dict[str, int]):
+        db = self._db()
+        with db:
+            # Take the write lock before reading so concurrent workers can't drop each other's merge
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT state FROM room_snapshots WHERE room_id = ?", (room_id,)).fetchone()
+            if row is not None:
+                # Yjs merges are idempotent, so an older or partial snapshot can only add to the stored one
+                state = merge_updates(row[0], state)
+            db.execute(
+                "INSERT OR REPLACE INTO room_snapshots (room_id, state, updated_at) VALUES (?, ?, ?)",
+                (room_id, state, time.time())
+            )
+            db.executemany(
+                "DELETE FROM room_updates WHERE room_id = ? AND origin = ? AND seq <= ?",
+                [(room_id, origin, seq) for origin, seq in versions.items()]
+            )
+
+    def _load(self, room_id: str) -> Tuple[Optional[bytes], List[Tuple[str, int, bytes]]]:
+        db = self._db()
+        row = db.execute("SELECT state FROM room_snapshots WHERE room_id = ?", (room_id,)).fetchone()
+        # Anything still in the log may be missing from the snapshot; replaying covered updates is harmless
+        rows = db.execute(
+            "SELECT origin, seq, data FROM room_updates WHERE room_id = ? ORDER BY origin, seq",
+            (room_id,)
+        ).fetchall()
+        return (row[0] if row else None), rows
+
+    def _size_bytes(self) -> int:
+        return sum(
+            os.path.getsize(self.path + suffix)
+            for suffix in ("", "-wal")
+            if os.path.exists(self.path + suffix)
+        )
+
+    # ==================== Async API ====================
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def append(self, room_id: str, origin: str, seq: int, update: bytes):
+        """Queue an update for the write-ahead log (written within flush_ms)"""
+        self._pending.append((room_id, origin, seq, update))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Write all pending updates"""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            await self._run(self._append_batch, rows)
+        except sqlite3.Error as e:
+            print(f"[Yjs] Error writing update log: {e}")
+
+    async def write_snapshot(self, room_id: str, state: bytes, versions: Dict[str, int]):
+        """
+        Merge a compacted snapshot into storage and truncate the log it covers
+
+        Args:
+            room_id: Room identifier
+            state: Compacted document state
+            versions: Highest seq per origin worker included in state
+        """
+        # Covered updates must be in the log before it is truncated
+        await self.flush()
+        try:
+            await self._run(self._write_snapshot, room_id, state, versions)
+        except sqlite3.Error as e:
+            print(f"[Yjs] Error writing snapshot for room {room_id}: {e}")
+
+    async def load(self, room_id: str) -> Tuple[Optional[bytes], List[Tuple[str, int, bytes]]]:
+        """
+        Load a room's persisted state
+
+        Returns:
+            Tuple of (snapshot state or None, logged (origin, seq, update) rows)
+        """
+        await self.flush()
+        start_time = time.perf_counter()
+        result = await self._run(self._load, room_id)
+        self.last_load_ms = (time.perf_counter() - start_time) * 1000
+        return result
+
+    async def size_bytes(self) -> int:
+        """On-disk size of the store including the SQLite WAL"""
+        return await self._run(self._size_bytes)
+
+    async def close(self):
+        """Flush pending writes and close the database"""
+        await self.flush()
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
@@ -0,0 +1,494 @@
+"""
+Sentiment Timeline - Rolling per-room and per-speaker mood of meeting transcriptions
+"""
+import asyncio
+import math
+import re
+import time
+from array import array
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+
+from config import (
+    SENTIMENT_BUCKET_SECONDS,
+    SENTIMENT_MAX_SPEAKERS,
+    SENTIMENT_MOOD_WINDOW_SECONDS,
+    SENTIMENT_PUSH_INTERVAL_MS,
+    SENTIMENT_ROOM_IDLE_SECONDS,
+    SENTIMENT_SCORER,
+    SENTIMENT_TIMELINE,
+    SENTIMENT_TIMELINE_BUCKETS
+)
+from services.ai_service import SENTIMENT_BATCH_SIZE, analyze_sentiments
+from services.metrics import registry
+from services.tracing import trace_span
+
+
+SENTIMENT_UTTERANCES = registry.counter(
+    "sentiment_utterances_total", "Meeting transcriptions scored for the sentiment timeline by label", ("label",)
+)
+SENTIMENT_PUSHES = registry.counter(
+    "sentiment_pushes_total", "Sentiment timeline updates sent to subscribers"
+)
+SENTIMENT_ROOMS = registry.gauge(
+    "sentiment_timeline_rooms", "Rooms with a sentiment timeline in memory"
+)
+
+# Speaker of utterances without a (usable) name, and of speakers past the per-room limit
+DEFAULT_SPEAKER = "Meeting"
+OVERFLOW_SPEAKER = "Other"
+# Longest speaker name kept (longer names are truncated)
+MAX_SPEAKER_LENGTH = 64
+
+# Rooms whose queued utterances are scored by Gemini at the same time
+MAX_CONCURRENT_SCORING = 4
+
+# Word polarities, grouped by strength
+POSITIVE_WORDS = {
+    2.0: "excellent amazing awesome fantastic brilliant outstanding perfect love loved wonderful superb incredible",
+    1.5: "great happy glad excited impressive delighted thrilled beautiful enjoy enjoyed",
+    1.0: "good nice cool helpful useful agree agreed thanks thank appreciate appreciated fixed solved "
+         "success successful progress better best pleased easy clear interesting exciting works",
+    0.5: "like liked okay ok fine sure yes fair hope hopefully promising smooth ready done right"
+}
+NEGATIVE_WORDS = {
+    2.0: "terrible awful horrible hate hated disaster worst useless disgusting furious",
+    1.5: "bad angry upset frustrated frustrating annoying annoyed broken fail failed failing failure "
+         "disappointed disappointing",
+    1.0: "wrong problem problems issue issues bug bugs error errors worried worry concern concerned "
+         "difficult confusing confused slow stuck blocked delay delayed late sad unfortunately disagree "
+         "crash crashed",
+    0.5: "hard doubt unsure risk risky tired sorry"
+}
+LEXICON: Dict[str, float] = {
+    **{word: weight for weight, words in POSITIVE_WORDS.items() for word in words.split()},
+    **{word: -weight for weight, words in NEGATIVE_WORDS.items() for word in words.split()}
+}
+NEGATIONS = frozenset("not no never none nobody nothing neither nor without hardly cannot".split())
+INTENSIFIERS = {
+    **dict.fromkeys("very really so extremely totally super incredibly absolutely".split(), 1.5),
+    **dict.fromkeys("slightly somewhat little bit".split(), 0.5)
+}
+# Words after a negation whose polarity is flipped (and damped)
+NEGATION_SCOPE = 3
+NEGATION_FACTOR = -0.75
+# Polarities beyond these are labelled positive / negative
+LABEL_THRESHOLD = 0.25
+
+WORD = re.compile(r"[a-z']+")
+
+# Subscriber queues hold this many updates; a slow subscriber loses the oldest
+SUBSCRIBER_QUEUE_SIZE = 8
+
+
+def score_sentiment(text: str) -> Tuple[str, float]:
+    """
+    Score a text with the local lexicon
+
+    Word polarities are summed, flipped within NEGATION_SCOPE words of a
+    negation ("not good") and scaled by a preceding intensifier ("very
+    bad"), then squashed into -1..1 so longer utterances don't grow without
+    bound.
+
+    Args:
+        text: Utterance to score
+
+    Returns:
+        Tuple of (positive/negative/neutral, polarity from -1 to 1)
+    """
+    total = 0.0
+    negated_until = -1
+    boost = 1.0
+    for position, word in enumerate(WORD.findall(text.lower())):
+        if word in NEGATIONS or word.endswith("n't"):
+            negated_until = position + NEGATION_SCOPE
+            continue
+        if word in INTENSIFIERS:
+            boost = INTENSIFIERS[word]
+            continue
+        weight = LEXICON.get(word)
+        if weight is not None:
+            if position <= negated_until:
+                weight *= NEGATION_FACTOR
+            total += weight * boost
+        boost = 1.0
+    polarity = total / math.sqrt(total * total + 4)
+    return polarity_label(polarity), polarity
+
+
+def speaker_name(speaker) -> Optional[str]:
+    """A client-sent speaker as a bounded, stripped string (None if it isn't a non-empty string)"""
+    if not isinstance(speaker, str):
+        return None
+    return speaker.strip()[:MAX_SPEAKER_LENGTH] or None
+
+
+def polarity_label(polarity: float) -> str:
+    if polarity >= LABEL_THRESHOLD:
+        return "positive"
+    if polarity <= -LABEL_THRESHOLD:
+        return "negative"
+    return "neutral"
+
+
+class SentimentSeries:
+    """
+    Ring of fixed-width time buckets in compact arrays
+
+    Each slot holds one bucket's polarity sum and label counts, and the
+    bucket number it belongs to so stale slots are recognised without being
+    cleared. Adding is O(1); reading a window touches only its buckets.
+    """
+
+    __slots__ = ("bucket_seconds", "numbers", "totals", "counts", "positives", "negatives")
+
+    def __init__(self, buckets: int, bucket_seconds: int):
+        self.bucket_seconds = bucket_seconds
+        self.numbers = array("q", [-1]) * buckets
+        self.totals = array("d", [0.0]) * buckets
+        self.counts = array("I", [0]) * buckets
+        self.positives = array("I", [0]) * buckets
+        self.negatives = array("I", [0]) * buckets
+
+    def bucket_number(self, timestamp: float) -> int:
+        return int(timestamp // self.bucket_seconds)
+
+    def add(self, timestamp: float, polarity: float, label: str):
+        number = self.bucket_number(timestamp)
+        slot = number % len(self.numbers)
+        if self.numbers[slot] != number:
+            if self.numbers[slot] > number:
+                # Older than the whole ring
+                return
+            self.numbers[slot] = number
+            self.totals[slot] = 0.0
+            self.counts[slot] = self.positives[slot] = self.negatives[slot] = 0
+        self.totals[slot] += polarity
+        self.counts[slot] += 1
+        if label == "positive":
+            self.positives[slot] += 1
+        elif label == "negative":
+            self.negatives[slot] += 1
+
+    def buckets(self, first: int, last: int) -> Iterator[Tuple[int, float, int, int, int]]:
+        """(bucket number, polarity sum, count, positive, negative) of non-empty buckets in first..last"""
+        first = max(first, last - len(self.numbers) + 1)
+        for number in range(first, last + 1):
+            slot = number % len(self.numbers)
+            if self.numbers[slot] == number and self.counts[slot]:
+                yield number, self.totals[slot], self.counts[slot], self.positives[slot], self.negatives[slot]
+
+    def summary(self, first: int, last: int) -> dict:
+        total = count = positive = negative = 0
+        for _, bucket_total, bucket_count, bucket_positive, bucket_negative in self.buckets(first, last):
+            total += bucket_total
+            count += bucket_count
+            positive += bucket_positive
+            negative += bucket_negative
+        return _aggregate(total, count, positive, negative)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(part.itemsize * len(part) for part in (
+            self.numbers, self.totals, self.counts, self.positives, self.negatives
+        ))
+
+
+def _aggregate(total: float, count: int, positive: int, negative: int) -> dict:
+    average = total / count if count else 0.0
+    return {
+        "utterances": count,
+        "average": round(average, 3),
+        "mood": polarity_label(average) if count else "neutral",
+        "positive": positive,
+        "neutral": count - positive - negative,
+        "negative": negative
+    }
+
+
+class RoomSentiment:
+    """One room's timeline, its speakers' timelines and its subscribers"""
+
+    __slots__ = ("series", "speakers", "subscribers", "pending", "scoring", "dirty_from", "last_activity")
+
+    def __init__(self, buckets: int, bucket_seconds: int):
+        self.series = SentimentSeries(buckets, bucket_seconds)
+        self.speakers: Dict[str, SentimentSeries] = {}
+        self.subscribers: Set[asyncio.Queue] = set()
+        # Utterances waiting for a batched Gemini score: (timestamp, speaker, text)
+        self.pending: List[Tuple[float, str, str]] = []
+        # Task scoring the utterances taken from pending, while one runs
+        self.scoring: Optional[asyncio.Task] = None
+        # Earliest bucket changed since the last push (None when nothing changed)
+        self.dirty_from: Optional[int] = None
+        self.last_activity = time.monotonic()
+
+
+class SentimentTimeline:
+    """
+    Rolling sentiment of every meeting, fed by its transcriptions
+
+    Each transcription is scored once as it arrives (locally, or in batched
+    Gemini calls with SENTIMENT_SCORER=gemini) and added to its room's and
+    speaker's bucket rings, so a mood timeline never re-sends or re-scores
+    earlier utterances. Every SENTIMENT_PUSH_INTERVAL_MS the buckets that
+    changed are pushed to the room's subscribers; Gemini scoring runs in
+    per-room tasks beside the pushes, so a slow room delays neither the
+    pushes nor the other rooms.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = SENTIMENT_TIMELINE,
+        scorer: str = SENTIMENT_SCORER,
+        bucket_seconds: int = SENTIMENT_BUCKET_SECONDS,
+        buckets: int = SENTIMENT_TIMELINE_BUCKETS,
+        mood_window_seconds: int = SENTIMENT_MOOD_WINDOW_SECONDS,
+        push_interval_ms: int = SENTIMENT_PUSH_INTERVAL_MS,
+        idle_seconds: float = SENTIMENT_ROOM_IDLE_SECONDS,
+        max_speakers: int = SENTIMENT_MAX_SPEAKERS
+    ):
+        if scorer not in ("lexicon", "gemini"):
+            raise ValueError(f"Unknown sentiment scorer '{scorer}', expected lexicon or gemini")
+        self.enabled = enabled
+        self.scorer = scorer
+        self.bucket_seconds = bucket_seconds
+        self.bucket_count = buckets
+        self.mood_window = mood_window_seconds
+        self.push_interval = push_interval_ms / 1000
+        self.idle_seconds = idle_seconds
+        self.max_speakers = max_speakers
+        self.rooms: Dict[str, RoomSentiment] = {}
+        self._pusher: Optional[asyncio.Task] = None
+        self._scoring_slots = asyncio.Semaphore(MAX_CONCURRENT_SCORING)
+        self.scored = 0
+        self.gemini_failures = 0
+        SENTIMENT_ROOMS.set_function(lambda: {(): len(self.rooms)})
+
+    def _room(self, room_id: str) -> RoomSentiment:
+        room = self.rooms.get(room_id)
+        if room is None:
+            room = self.rooms[room_id] = RoomSentiment(self.bucket_count, self.bucket_seconds)
+            if self._pusher is None:
+                self._pusher = asyncio.get_running_loop().create_task(self._push_loop())
+        return room
+
+    def add(self, room_id: str, text: str, speaker: Optional[str] = None, timestamp: Optional[float] = None):
+        """
+        Add a meeting transcription to its room's timeline
+
+        Args:
+            room_id: Room the utterance was heard in
+            text: Transcribed text
+            speaker: Optional speaker name (anything but a string counts as no name)
+            timestamp: When it was said (unix seconds), defaults to now
+        """
+        if not self.enabled or not text.strip():
+            return
+        room = self._room(room_id)
+        room.last_activity = time.monotonic()
+        timestamp = time.time() if timestamp is None else timestamp
+        speaker = speaker_name(speaker) or DEFAULT_SPEAKER
+        if self.scorer == "gemini":
+            room.pending.append((timestamp, speaker, text))
+            return
+        label, polarity = score_sentiment(text)
+        self._record(room, timestamp, speaker, label, polarity)
+
+    def _record(self, room: RoomSentiment, timestamp: float, speaker: str, label: str, polarity: float):
+        room.series.add(timestamp, polarity, label)
+        series = room.speakers.get(speaker)
+        if series is None:
+            if len(room.speakers) >= self.max_speakers:
+                # Each speaker costs a series, so a room can't grow them without bound
+                speaker = OVERFLOW_SPEAKER
+                series = room.speakers.get(speaker)
+            if series is None:
+                series = room.speakers[speaker] = SentimentSeries(self.bucket_count, self.bucket_seconds)
+        series.add(timestamp, polarity, label)
+        number = room.series.bucket_number(timestamp)
+        room.dirty_from = number if room.dirty_from is None else min(room.dirty_from, number)
+        self.scored += 1
+        SENTIMENT_UTTERANCES.labels(label).inc()
+
+    async def _score_pending(self, room: RoomSentiment):
+        """Score a room's queued utterances in batched Gemini calls, locally if that fails"""
+        pending, room.pending = room.pending, []
+        for start in range(0, len(pending), SENTIMENT_BATCH_SIZE):
+            batch = pending[start:start + SENTIMENT_BATCH_SIZE]
+            try:
+                async with self._scoring_slots:
+                    ratings = await analyze_sentiments([text for _, _, text in batch], fill_missing=False)
+            except Exception as e:
+                self.gemini_failures += 1
+                print(f"[Sentiment] Gemini scoring failed, using the lexicon: {e}")
+                ratings = []
+            # Utterances Gemini returned no rating for are scored locally
+            scores = [
+                (rating["sentiment"], {"positive": 1, "negative": -1}.get(rating["sentiment"], 0) * rating["score"])
+                if rating is not None else score_sentiment(text)
+                for (_, _, text), rating in zip(batch, ratings + [None] * (len(batch) - len(ratings)))
+            ]
+            for (timestamp, speaker, _), (label, polarity) in zip(batch, scores):
+                self._record(room, timestamp, speaker, label, polarity)
+
+    def _window(self, series: SentimentSeries, window_seconds: float, now: float) -> Tuple[int, int]:
+        last = series.bucket_number(now)
+        return last - max(1, math.ceil(window_seconds / self.bucket_seconds)) + 1, last
+
+    def mood(self, room_id: str) -> Optional[dict]:
+        """Room and per-speaker aggregates over the latest SENTIMENT_MOOD_WINDOW_SECONDS"""
+        room = self.rooms.get(room_id)
+        if room is None:
+            return None
+        first, last = self._window(room.series, self.mood_window, time.time())
+        return {
+            "window_seconds": self.mood_window,
+            "room": room.series.summary(first, last),
+            "speakers": self._speaker_summaries(room, first, last)
+        }
+
+    def timeline(self, room_id: str, window_seconds: float, speaker: Optional[str] = None) -> Optional[dict]:
+        """
+        A room's (or one speaker's) timeline over the latest window
+
+        Only the buckets inside the window are read, so the cost depends on
+        the window, not on how long the meeting has been running.
+
+        Args:
+            room_id: Meeting room
+            window_seconds: How far back to go (capped at what is kept)
+            speaker: Only this speaker's utterances
+
+        Returns:
+            {"buckets": [...], "summary": {...}, "speakers": {...}}, or None
+            for an unknown room or speaker
+        """
+        room = self.rooms.get(room_id)
+        if room is None:
+            return None
+        series = room.series if speaker is None else room.speakers.get(speaker)
+        if series is None:
+            return None
+        window_seconds = min(window_seconds, self.bucket_seconds * self.bucket_count)
+        first, last = self._window(series, window_seconds, time.time())
+        result = {
+            "room_id": room_id,
+            "speaker": speaker,
+            "bucket_seconds": self.bucket_seconds,
+            "window_seconds": window_seconds,
+            "buckets": self._buckets(series, first, last),
+            "summary": series.summary(first, last)
+        }
+        if speaker is None:
+            result["speakers"] = self._speaker_summaries(room, first, last)
+        return result
+
+    @staticmethod
+    def _speaker_summaries(room: RoomSentiment, first: int, last: int) -> Dict[str, dict]:
+        """Aggregates of the speakers heard between two buckets"""
+        summaries = {}
+        for speaker, series in room.speakers.items():
+            summary = series.summary(first, last)
+            if summary["utterances"]:
+                summaries[speaker] = summary
+        return summaries
+
+    def _buckets(self, series: SentimentSeries, first: int, last: int) -> List[dict]:
+        return [
+            {"start": number * self.bucket_seconds, **_aggregate(total, count, positive, negative)}
+            for number, total, count, positive, negative in series.buckets(first, last)
+        ]
+
+    def subscribe(self, room_id: str) -> asyncio.Queue:
+        """Queue receiving the room's sentiment updates until unsubscribed"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        room = self._room(room_id)
+        if not room.subscribers:
+            # The new subscriber starts from a full timeline, not from old changes
+            room.dirty_from = None
+        room.subscribers.add(queue)
+        return queue
+
+    def unsubscribe(self, room_id: str, queue: asyncio.Queue):
+        room = self.rooms.get(room_id)
+        if room is not None:
+            room.subscribers.discard(queue)
+            room.last_activity = time.monotonic()
+
+    async def _push_loop(self):
+        while True:
+            await asyncio.sleep(self.push_interval)
+            try:
+                await self._tick()
+            except Exception as e:
+                print(f"[Sentiment] Error pushing sentiment updates: {e}")
+
+    async def _tick(self):
+        cutoff = time.monotonic() - self.idle_seconds
+        for room_id, room in list(self.rooms.items()):
+            if room.pending and room.scoring is None:
+                room.scoring = asyncio.get_running_loop().create_task(self._score_room(room_id, room))
+            if room.dirty_from is not None and room.subscribers:
+                self._push(room_id, room)
+            if (
+                not room.subscribers and not room.pending and room.scoring is None
+                and room.last_activity < cutoff
+            ):
+                del self.rooms[room_id]
+
+    async def _score_room(self, room_id: str, room: RoomSentiment):
+        """Score a room's queued utterances; the next tick pushes the result"""
+        try:
+            with trace_span("sentiment.score", room_id=room_id, utterances=len(room.pending)):
+                await self._score_pending(room)
+        except Exception as e:
+            print(f"[Sentiment] Error scoring room {room_id}: {e}")
+        finally:
+            room.scoring = None
+
+    def _push(self, room_id: str, room: RoomSentiment):
+        """Send the buckets changed since the last push and the current mood"""
+        last = room.series.bucket_number(time.time())
+        update = {
+            "type": "sentiment",
+            "room_id": room_id,
+            "bucket_seconds": self.bucket_seconds,
+            "buckets": self._buckets(room.series, room.dirty_from, last),
+            "mood": self.mood(room_id)
+        }
+        room.dirty_from = None
+        for queue in room.subscribers:
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait(update)
+        SENTIMENT_PUSHES.inc(len(room.subscribers))
+
+    async def close(self):
+        """Stop pushing updates and scoring"""
+        tasks = [room.scoring for room in self.rooms.values() if room.scoring is not None]
+        if self._pusher is not None:
+            tasks.append(self._pusher)
+            self._pusher = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "scorer": self.scorer,
+            "rooms": len(self.rooms),
+            "speakers": sum(len(room.speakers) for room in self.rooms.values()),
+            "subscribers": sum(len(room.subscribers) for room in self.rooms.values()),
+            "pending": sum(len(room.pending) for room in self.rooms.values()),
+            "scored": self.scored,
+            "gemini_failures": self.gemini_failures,
+            "bytes": sum(
+                room.series.nbytes + sum(series.nbytes for series in room.speakers.values())
+                for room in self.rooms.values()
+            )
+        }
+
+
+# Global sentiment timeline instance
+sentiment_timeline = SentimentTimeline()
@@ -0,0 +1,165 @@
+"""
+Serialization - Fast JSON encoding and negotiated WebSocket message codecs
+"""
+import json
+from typing import Any, List, Union
+
+from fastapi import WebSocket, WebSocketDisconnect
+from fastapi.responses import JSONResponse
+
+from config import JSON_LIBRARY
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:
+    msgpack = None
+
+
+# WebSocket subprotocol a client offers to exchange MessagePack binary frames
+MSGPACK_SUBPROTOCOL = "msgpack"
+
+# Envelope type carrying several events in one frame
+BATCH_EVENT = "batch"
+
+USE_ORJSON = orjson is not None and JSON_LIBRARY != "json"
+JSON_LIBRARY_NAME = "orjson" if USE_ORJSON else "json"
+
+
+def dumps(obj: Any) -> bytes:
+    """Encode a value as compact UTF-8 JSON"""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_text(obj: Any) -> str:
+    """Encode a value as compact JSON text (for WebSocket text frames)"""
+    if USE_ORJSON:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS).decode("utf-8")
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":"))
+
+
+def loads(data: Union[bytes, str]) -> Any:
+    """
+    Decode JSON
+
+    Raises:
+        ValueError: If the data is not valid JSON
+    """
+    if USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+class FastJSONResponse(JSONResponse):
+    """JSON response rendered with orjson when available (default for every route)"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+class MessageCodec:
+    """
+    JSON text frames (the default WebSocket codec)
+
+    With batching enabled, events produced together (e.g. the "typing off"
+    and the answer that ends it) go out as one
+    {"type": "batch", "events": [...]} frame instead of one frame each.
+    """
+
+    name = "json"
+    subprotocol = None
+
+    def __init__(self, batch: bool = False):
+        self.batch = batch
+        self.frames_sent = 0
+        self.events_sent = 0
+
+    def encode(self, message: dict) -> Union[str, bytes]:
+        return dumps_text(message)
+
+    def decode_bytes(self, data: bytes) -> Any:
+        return loads(data)
+
+    async def _send_frame(self, websocket: WebSocket, frame: Union[str, bytes]):
+        if isinstance(frame, str):
+            await websocket.send_text(frame)
+        else:
+            await websocket.send_bytes(frame)
+        self.frames_sent += 1
+
+    async def send(self, websocket: WebSocket, message: dict):
+        """Send one event"""
+        await self._send_frame(websocket, self.encode(message))
+        self.events_sent += 1
+
+    async def send_events(self, websocket: WebSocket, messages: List[dict]):
+        """Send events in order, as one batch frame if the client asked for batching"""
+        if self.batch and len(messages) > 1:
+            await self._send_frame(websocket, self.encode({"type": BATCH_EVENT, "events": messages}))
+            self.events_sent += len(messages)
+            return
+        for message in messages:
+            await self.send(websocket, message)
+
+    async def receive(self, websocket: WebSocket) -> Any:
+        """
+        Receive and decode one frame (text frames are always JSON)
+
+        Raises:
+            WebSocketDisconnect: If the client disconnected
+            ValueError: If the frame cannot be decoded
+        """
+        message = await websocket.receive()
+        if message["type"] == "websocket.disconnect":
+            raise WebSocketDisconnect(message.get("code", 1000))
+        text = message.get("text")
+        if text is not None:
+            return loads(text)
+        return self.decode_bytes(message.get("bytes") or b"")
+
+
+class MsgpackCodec(MessageCodec):
+    """MessagePack binary frames, negotiated with the "msgpack" subprotocol"""
+
+    name = "msgpack"
+    subprotocol = MSGPACK_SUBPROTOCOL
+
+    def encode(self, message: dict) -> bytes:
+        return msgpack.packb(message, use_bin_type=True)
+
+    def decode_bytes(self, data: bytes) -> Any:
+        try:
+            return msgpack.unpackb(data, raw=False)
+        except Exception as e:
+            raise ValueError(f"Invalid MessagePack frame: {e}")
+
+
+# Codec for sockets that never negotiated one
+DEFAULT_CODEC = MessageCodec()
+
+
+def negotiate_codec(websocket: WebSocket, batch: bool = False) -> MessageCodec:
+    """
+    Pick a connection's codec from the subprotocols the client offered
+
+    MessagePack is used when offered and the msgpack package is installed;
+    otherwise JSON. Accept the socket with subprotocol=codec.subprotocol.
+
+    Args:
+        websocket: Socket that has not been accepted yet
+        batch: Whether the client accepts batch envelopes
+    """
+    if msgpack is not None and MSGPACK_SUBPROTOCOL in websocket.scope.get("subprotocols", ()):
+        return MsgpackCodec(batch)
+    return MessageCodec(batch)
+
+
+def get_codec(websocket: WebSocket) -> MessageCodec:
+    """The codec negotiated for a socket (JSON if none was)"""
+    return getattr(websocket.state, "codec", DEFAULT_CODEC)
@@ -0,0 +1,380 @@
+"""
+Session Store - Shared storage for AI chat sessions that outlives the WebSocket
+"""
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple, Union
+
+from config import (
+    SESSION_FLUSH_MS,
+    SESSION_STORE,
+    SESSION_STORE_PATH,
+    SESSION_STORE_URL,
+    SESSION_TTL_SECONDS
+)
+from services.chat_state import ChatMessage, MessageRing
+from services.resp import RespConnection
+from services.serialization import dumps, loads
+
+
+# Keys of a client's chat history, its resume token digest and a room's meeting context
+SESSION_KEY_PREFIX = "chat:session:"
+TOKEN_KEY_PREFIX = "chat:token:"
+ROOM_KEY_PREFIX = "chat:room:"
+
+SESSION_RETRY_MAX_SECONDS = 5.0
+
+
+def encode_messages(ring: MessageRing) -> bytes:
+    """Serialize a ring's records for the store"""
+    return dumps(ring.to_dicts())
+
+
+def decode_messages(data: bytes, ring: MessageRing) -> MessageRing:
+    """
+    Append stored records to a ring
+
+    Raises:
+        ValueError: If the data is not a stored message list
+    """
+    try:
+        for message in loads(data):
+            ring.append(ChatMessage.from_dict(message))
+    except (KeyError, TypeError) as e:
+        raise ValueError(f"Invalid stored session: {e}")
+    return ring
+
+
+class SessionStore:
+    """
+    In-memory store (the default)
+
+    Keeps sessions of disconnected clients in this worker for the TTL, so a
+    reconnect to the same process resumes them. The SQLite and Redis stores
+    implement the same interface to share sessions between workers.
+    """
+
+    mode = "memory"
+
+    def __init__(self, ttl_seconds: float = SESSION_TTL_SECONDS):
+        self.ttl = ttl_seconds
+        # Structure: {key: (expires_at, data)}
+        self._entries: Dict[str, Tuple[float, bytes]] = {}
+        self.reads = 0
+        self.hits = 0
+        self.writes = 0
+        self.deletes = 0
+
+    async def get(self, key: str) -> Optional[bytes]:
+        """Stored value of a key, or None if missing or expired"""
+        self.reads += 1
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] <= time.time():
+            del self._entries[key]
+            return None
+        self.hits += 1
+        return entry[1]
+
+    async def write_batch(self, values: Dict[str, bytes], deletes: List[str]):
+        """
+        Store values (each expiring after the TTL) and delete keys in one batch
+
+        Raises:
+            ConnectionError, sqlite3.Error: If the backing store is unavailable
+        """
+        now = time.time()
+        expires_at = now + self.ttl
+        for key, data in values.items():
+            self._entries[key] = (expires_at, data)
+        for key in deletes:
+            self._entries.pop(key, None)
+        self.writes += len(values)
+        self.deletes += len(deletes)
+        for key in [key for key, (expiry, _) in self._entries.items() if expiry <= now]:
+            del self._entries[key]
+
+    async def close(self):
+        """Release connections"""
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "ttl_seconds": self.ttl,
+            "reads": self.reads,
+            "hits": self.hits,
+            "writes": self.writes,
+            "deletes": self.deletes,
+            "entries": len(self._entries)
+        }
+
+
+class SqliteSessionStore(SessionStore):
+    """
+    Sessions in a SQLite file shared by every worker on the machine
+
+    All queries run on one storage thread, like the collaborative room store.
+    Expired rows are ignored on read and purged with each write batch.
+    """
+
+    mode = "sqlite"
+
+    def __init__(self, path: str = SESSION_STORE_PATH, ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.path = path
+        # SQLite connections are used from exactly one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="session-store")
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False, timeout=5)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS chat_sessions ("
+                "key TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS chat_sessions_expiry ON chat_sessions (expires_at)"
+            )
+        return self._connection
+
+    def _get(self, key: str) -> Optional[bytes]:
+        row = self._db().execute(
+            "SELECT data FROM chat_sessions WHERE key = ? AND expires_at > ?", (key, time.time())
+        ).fetchone()
+        return row[0] if row else None
+
+    def _write_batch(self, values: Dict[str, bytes], deletes: List[str]):
+        now = time.time()
+        db = self._db()
+        with db:
+            db.executemany(
+                "INSERT OR REPLACE INTO chat_sessions (key, data, expires_at) VALUES (?, ?, ?)",
+                [(key, data, now + self.ttl) for key, data in values.items()]
+            )
+            db.executemany("DELETE FROM chat_sessions WHERE key = ?", [(key,) for key in deletes])
+            db.execute("DELETE FROM chat_sessions WHERE expires_at <= ?", (now,))
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self.reads += 1
+        data = await self._run(self._get, key)
+        if data is not None:
+            self.hits += 1
+        return data
+
+    async def write_batch(self, values: Dict[str, bytes], deletes: List[str]):
+        await self._run(self._write_batch, values, deletes)
+        self.writes += len(values)
+        self.deletes += len(deletes)
+
+    async def close(self):
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({"path": self.path, "entries": None})
+        return stats
+
+
+class RespSessionStore(SessionStore):
+    """
+    Sessions in a Redis-protocol server (Redis, or relay_broker.py)
+
+    Values are plain keys with a PX expiry; a write batch is pipelined on
+    one connection, which is reopened on the next operation after an error.
+    """
+
+    mode = "redis"
+
+    def __init__(self, url: str = SESSION_STORE_URL, ttl_seconds: float = SESSION_TTL_SECONDS):
+        super().__init__(ttl_seconds)
+        self.url = url
+        self._connection: Optional[RespConnection] = None
+        self._connecting = asyncio.Lock()
+
+    async def _conn(self) -> RespConnection:
+        async with self._connecting:
+            if self._connection is None or self._connection.closed:
+                self._connection = await RespConnection.open(self.url)
+            return self._connection
+
+    async def _reset(self):
+        if self._connection is not None:
+            connection, self._connection = self._connection, None
+            await connection.close()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        self.reads += 1
+        try:
+            data = await (await self._conn()).call("GET", key)
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            await self._reset()
+            raise ConnectionError(f"Session store unavailable: {e}")
+        if data is not None:
+            self.hits += 1
+        return data
+
+    async def write_batch(self, values: Dict[str, bytes], deletes: List[str]):
+        ttl_ms = max(1, int(self.ttl * 1000))
+        try:
+            connection = await self._conn()
+            calls = [connection.call("SET", key, data, "PX", ttl_ms) for key, data in values.items()]
+            if deletes:
+                calls.append(connection.call("DEL", *deletes))
+            await asyncio.gather(*calls)
+        except (ConnectionError, OSError, asyncio.TimeoutError) as e:
+            await self._reset()
+            raise ConnectionError(f"Session store unavailable: {e}")
+        self.writes += len(values)
+        self.deletes += len(deletes)
+
+    async def close(self):
+        await self._reset()
+
+    def stats(self) -> dict:
+        stats = super().stats()
+        stats.update({"url": self.url, "entries": None})
+        return stats
+
+
+def create_session_store(
+    mode: str = SESSION_STORE,
+    ttl_seconds: float = SESSION_TTL_SECONDS,
+    path: str = SESSION_STORE_PATH
+) -> SessionStore:
+    """
+    Create the store selected by SESSION_STORE
+
+    Args:
+        mode: "memory", "sqlite" or "redis"
+        ttl_seconds: How long each written value is kept
+        path: SQLite file for the sqlite mode
+
+    Raises:
+        ValueError: If the mode is unknown
+    """
+    if mode == "memory":
+        return SessionStore(ttl_seconds)
+    if mode == "sqlite":
+        return SqliteSessionStore(path, ttl_seconds)
+    if mode == "redis":
+        return RespSessionStore(SESSION_STORE_URL, ttl_seconds)
+    raise ValueError(f"Unknown store mode '{mode}', expected 'memory', 'sqlite' or 'redis'")
+
+
+class SessionWriteBehind:
+    """
+    Batches session writes off the message hot path
+
+    Handlers only mark a key dirty with its live ring buffer. Every
+    SESSION_FLUSH_MS the dirty rings are serialized once - however many
+    messages were appended meanwhile - and written to the store in one
+    batch; empty rings are deleted. A failed batch is kept and retried with
+    backoff.
+    """
+
+    def __init__(self, store: SessionStore, flush_ms: int = SESSION_FLUSH_MS):
+        self.store = store
+        self.flush_interval = flush_ms / 1000
+        # Structure: {key: ring whose current contents must be stored, or raw bytes}
+        self._dirty: Dict[str, Union[MessageRing, bytes]] = {}
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._writing: Optional[asyncio.Task] = None
+        self._retry_delay = 0.0
+        self.batches = 0
+        self.failures = 0
+        self.bytes_written = 0
+
+    def mark(self, key: str, ring: Union[MessageRing, bytes], urgent: bool = False):
+        """
+        Schedule a ring's contents to be stored
+
+        Args:
+            key: Store key
+            ring: Live ring buffer (serialized when the batch is written), or
+                bytes stored as they are; empty values delete the key
+            urgent: Write without waiting for the flush interval (e.g. on disconnect)
+        """
+        self._dirty[key] = ring
+        if self._writing is not None:
+            # Scheduled again once the batch in flight completes
+            return
+        if self._timer is None or (urgent and not self._retry_delay):
+            if self._timer is not None:
+                self._timer.cancel()
+            delay = self._retry_delay or (0 if urgent else self.flush_interval)
+            self._timer = asyncio.get_running_loop().call_later(delay, self._start_write)
+
+    def pending(self, key: str) -> Optional[Union[MessageRing, bytes]]:
+        """A ring (or bytes) marked for this key but not yet written"""
+        return self._dirty.get(key)
+
+    def _start_write(self):
+        self._timer = None
+        self._writing = asyncio.get_running_loop().create_task(self._write())
+
+    async def _write(self):
+        try:
+            await self.flush()
+        finally:
+            self._writing = None
+            if self._dirty:
+                # Marked while writing, or the batch failed
+                self._timer = asyncio.get_running_loop().call_later(
+                    self._retry_delay or self.flush_interval, self._start_write
+                )
+
+    async def flush(self):
+        """Write all dirty sessions"""
+        if not self._dirty:
+            return
+        batch, self._dirty = self._dirty, {}
+        values = {
+            key: ring if isinstance(ring, bytes) else encode_messages(ring)
+            for key, ring in batch.items() if len(ring) > 0
+        }
+        deletes = [key for key, ring in batch.items() if len(ring) == 0]
+        try:
+            await self.store.write_batch(values, deletes)
+        except Exception as e:
+            self.failures += 1
+            self._retry_delay = min(max(self._retry_delay * 2, self.flush_interval), SESSION_RETRY_MAX_SECONDS)
+            print(f"[Session] Error writing {len(batch)} session(s), retrying in {self._retry_delay:.1f}s: {e}")
+            for key, ring in batch.items():
+                self._dirty.setdefault(key, ring)
+            return
+        self._retry_delay = 0.0
+        self.batches += 1
+        self.bytes_written += sum(len(data) for data in values.values())
+
+    async def close(self):
+        """Write everything still pending"""
+        if self._writing is not None:
+            await self._writing
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+    def stats(self) -> dict:
+        return {
+            "flush_ms": self.flush_interval * 1000,
+            "pending": len(self._dirty),
+            "batches": self.batches,
+            "failures": self.failures,
+            "bytes_written": self.bytes_written
+        }
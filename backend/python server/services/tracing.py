@@ -0,0 +1,226 @@
+"""
+Tracing - Lightweight request-scoped spans with sampling and a JSONL exporter
+"""
+import functools
+import json
+import os
+import random
+import sys
+import time
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Deque, Dict, Iterator, List, Optional
+
+from config import TRACE_EXPORT, TRACE_RECENT, TRACE_SAMPLE_RATE
+
+
+class Trace:
+    """Spans of one sampled request, exported together when the root span ends"""
+
+    __slots__ = ("trace_id", "spans", "done")
+
+    def __init__(self):
+        self.trace_id = os.urandom(8).hex()
+        self.spans: List[dict] = []
+        self.done = False
+
+
+class Span:
+    """A timed operation inside a trace"""
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "attributes", "start", "start_time")
+
+    sampled = True
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = os.urandom(4).hex()
+        self.parent_id = parent_id
+        self.name = name
+        self.attributes = attributes
+        self.start_time = time.time()
+        self.start = time.perf_counter()
+
+    def set(self, key: str, value: Any):
+        """Attach an attribute (model name, bytes, outcome...)"""
+        self.attributes[key] = value
+
+    def to_dict(self, duration: float) -> dict:
+        return {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start": round(self.start_time, 6),
+            "duration_ms": round(duration * 1000, 3),
+            "attributes": self.attributes
+        }
+
+
+class _NoopSpan:
+    """Stands in for spans of unsampled requests; children stay unsampled"""
+
+    __slots__ = ()
+
+    sampled = False
+
+    def set(self, key: str, value: Any):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+# Span the running task is inside of (None outside any request)
+_current_span: ContextVar[Optional[object]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Samples requests and exports their spans
+
+    A request is sampled when its root span starts (TRACE_SAMPLE_RATE);
+    every span below it follows that decision, so unsampled requests cost a
+    context variable lookup per span. Exported spans are JSON lines written
+    to stdout or appended to a file, and the most recent traces are kept in
+    memory for /api/admin/traces.
+    """
+
+    def __init__(self, export: str = TRACE_EXPORT, sample_rate: float = TRACE_SAMPLE_RATE, recent: int = TRACE_RECENT):
+        self.export = export
+        self.sample_rate = sample_rate
+        self.enabled = bool(export) and sample_rate > 0
+        self.recent: Deque[List[dict]] = deque(maxlen=recent)
+        self.traces_sampled = 0
+        self.spans_exported = 0
+        self._file = None
+
+    def start_root(self, name: str, attributes: Dict[str, Any]):
+        if not self.enabled or random.random() >= self.sample_rate:
+            return NOOP_SPAN
+        self.traces_sampled += 1
+        return Span(Trace(), name, None, attributes)
+
+    def finish(self, span: Span, duration: float):
+        record = span.to_dict(duration)
+        trace = span.trace
+        if trace.done:
+            # Background work that outlived its request
+            self._export([record])
+            return
+        trace.spans.append(record)
+        if span.parent_id is None:
+            trace.done = True
+            self._export(trace.spans)
+
+    def _export(self, records: List[dict]):
+        self.spans_exported += len(records)
+        if len(records) > 1 or records[0]["parent_id"] is None:
+            self.recent.append(records)
+        lines = "".join(json.dumps(record, default=str) + "\n" for record in records)
+        try:
+            if self.export == "stdout":
+                sys.stdout.write(lines)
+                sys.stdout.flush()
+                return
+            if self._file is None:
+                self._file = open(self.export, "a", encoding="utf-8")
+            self._file.write(lines)
+            self._file.flush()
+        except OSError as e:
+            print(f"[Trace] Error exporting spans: {e}")
+
+    def recent_traces(self, limit: int) -> List[List[dict]]:
+        """Most recent exported traces, newest first"""
+        return list(self.recent)[-limit:][::-1] if limit > 0 else []
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "export": self.export or None,
+            "sample_rate": self.sample_rate,
+            "traces_sampled": self.traces_sampled,
+            "spans_exported": self.spans_exported
+        }
+
+    def close(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+# Global tracer instance
+tracer = Tracer()
+
+
+@contextmanager
+def trace_span(name: str, **attributes: Any) -> Iterator[object]:
+    """
+    Time a block as a span of the current trace
+
+    Starts a new (possibly unsampled) trace when called outside one. Works
+    in sync and async code; tasks created inside the block inherit it as
+    their parent.
+
+    Args:
+        name: Span name, e.g. "gemini.attempt"
+        **attributes: Initial span attributes
+
+    Yields:
+        The span, with set(key, value) for attributes known later
+    """
+    parent = _current_span.get()
+    if parent is NOOP_SPAN or (parent is None and not tracer.enabled):
+        yield NOOP_SPAN
+        return
+
+    if parent is None:
+        span = tracer.start_root(name, attributes)
+    else:
+        span = Span(parent.trace, name, parent.span_id, attributes)
+    token = _current_span.set(span)
+    try:
+        yield span
+    except BaseException as e:
+        span.set("error", f"{type(e).__name__}: {e}")
+        raise
+    finally:
+        _current_span.reset(token)
+        if span is not NOOP_SPAN:
+            tracer.finish(span, time.perf_counter() - span.start)
+
+
+def traced(name: str):
+    """Decorator running an async function inside a span of the current trace"""
+    def decorator(function):
+        @functools.wraps(function)
+        async def wrapper(*args, **kwargs):
+            with trace_span(name):
+                return await function(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def current_span():
+    """The active span (a no-op span outside sampled requests)"""
+    return _current_span.get() or NOOP_SPAN
+
+
+class TracingMiddleware:
+    """ASGI middleware opening a root span per HTTP request"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        with trace_span(f"HTTP {scope['method']} {scope['path']}") as span:
+            async def send_wrapper(message):
+                if message["type"] == "http.response.start":
+                    span.set("status", message["status"])
+                await send(message)
+
+            await self.app(scope, receive, send_wrapper)
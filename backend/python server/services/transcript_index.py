@@ -0,0 +1,453 @@
+"""
+Transcript Index - Per-room meeting transcripts with BM25 retrieval for AI prompts
+"""
+import asyncio
+import math
+import os
+import re
+import sqlite3
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    TRANSCRIPT_CONTEXT_MAX_CHARS,
+    TRANSCRIPT_CONTEXT_RECENT,
+    TRANSCRIPT_FLUSH_MS,
+    TRANSCRIPT_MAX_SNIPPETS,
+    TRANSCRIPT_STORE_PATH
+)
+from services.chat_state import ChatMessage
+from services.metrics import registry
+
+
+TRANSCRIPT_LOOKUP_DURATION = registry.histogram(
+    "transcript_context_lookup_seconds", "Time to select meeting transcript snippets for a prompt",
+    buckets=(0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.05)
+)
+
+# BM25 parameters (the usual defaults)
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Ranked candidates considered when filling the budget
+MAX_CANDIDATES = 64
+
+# A term found in more snippets than this only scores its newest occurrences:
+# it says little about relevance, and this bounds lookup time on long meetings
+MAX_TERM_POSTINGS = 256
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Words too common in speech to say anything about relevance
+STOPWORDS = frozenset("""
+a about after again all also am an and any are as at be because been before being but by can could
+did do does doing don for from had has have having he her here hers him his how i if in into is it its
+just like me more most my no not now of off on once only or other our out over own really said same
+she should so some such than that the their them then there these they this those through to too
+um uh under until up very was we were what when where which while who whom why will with would yeah
+you your yours okay ok
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    Index terms of a snippet or query
+
+    Lowercased words without stopwords; a plural "s" is dropped so
+    "deadlines" matches "deadline".
+    """
+    terms = []
+    for word in TOKEN_PATTERN.findall(text.lower()):
+        if len(word) < 2 or word in STOPWORDS:
+            continue
+        if len(word) > 3 and word.endswith("s") and not word.endswith("ss"):
+            word = word[:-1]
+        terms.append(word)
+    return terms
+
+
+def format_snippet(snippet: ChatMessage) -> str:
+    """Prompt line of a snippet (the role holds the speaker, if known)"""
+    return f"{snippet.role}: {snippet.content}" if snippet.role else snippet.content
+
+
+class RoomTranscript:
+    """
+    Append-only transcript of one room with an inverted index
+
+    Postings are flat arrays of (snippet id, term frequency) pairs, so a
+    full meeting costs a few bytes per word, and a query only touches the
+    postings of its own terms. Past max_snippets the oldest half is dropped
+    and the index rebuilt, which keeps appends amortized constant time.
+    """
+
+    __slots__ = ("max_snippets", "snippets", "doc_lengths", "postings", "total_length", "loaded")
+
+    def __init__(self, max_snippets: int = TRANSCRIPT_MAX_SNIPPETS):
+        self.max_snippets = max_snippets
+        self.snippets: List[ChatMessage] = []
+        self.doc_lengths = array("I")
+        # Structure: {term: array of snippet_id, tf, snippet_id, tf, ...}
+        self.postings: Dict[str, array] = {}
+        self.total_length = 0
+        # Whether the stored transcript has been read (always True without a store)
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.snippets)
+
+    def append(self, snippet: ChatMessage):
+        """Index a snippet"""
+        if len(self.snippets) >= self.max_snippets:
+            self._rebuild(self.snippets[len(self.snippets) // 2:])
+        self._index(snippet)
+
+    def _index(self, snippet: ChatMessage):
+        snippet_id = len(self.snippets)
+        terms = tokenize(snippet.content)
+        self.snippets.append(snippet)
+        self.doc_lengths.append(len(terms))
+        self.total_length += len(terms)
+
+        counts: Dict[str, int] = {}
+        for term in terms:
+            counts[term] = counts.get(term, 0) + 1
+        for term, count in counts.items():
+            postings = self.postings.get(term)
+            if postings is None:
+                postings = self.postings[term] = array("I")
+            postings.append(snippet_id)
+            postings.append(count)
+
+    def clear(self):
+        self._rebuild([])
+
+    def _rebuild(self, snippets: List[ChatMessage]):
+        self.snippets = []
+        self.doc_lengths = array("I")
+        self.postings = {}
+        self.total_length = 0
+        for snippet in snippets:
+            self._index(snippet)
+
+    def scores(self, query: str) -> Dict[int, float]:
+        """BM25 score of every snippet sharing a term with the query"""
+        count = len(self.snippets)
+        if count == 0:
+            return {}
+        length_weight = BM25_K1 * BM25_B / ((self.total_length / count) or 1.0)
+        base_norm = BM25_K1 * (1 - BM25_B)
+        doc_lengths = self.doc_lengths
+        scores: Dict[int, float] = {}
+        for term in set(tokenize(query)):
+            postings = self.postings.get(term)
+            if postings is None:
+                continue
+            frequency = len(postings) // 2
+            idf = math.log(1 + (count - frequency + 0.5) / (frequency + 0.5)) * (BM25_K1 + 1)
+            recent = postings[-2 * MAX_TERM_POSTINGS:]
+            for snippet_id, tf in zip(recent[::2], recent[1::2]):
+                norm = base_norm + length_weight * doc_lengths[snippet_id]
+                scores[snippet_id] = scores.get(snippet_id, 0.0) + idf * tf / (tf + norm)
+        return scores
+
+    def select(self, query: str, max_chars: int, recent: int) -> List[str]:
+        """
+        Snippets for a prompt about `query`, within max_chars
+
+        The latest `recent` snippets come first, then the best BM25 matches;
+        with no match the budget is filled with the latest snippets, like
+        the plain recent-history context. Returned in meeting order.
+        """
+        count = len(self.snippets)
+        chosen: Dict[int, str] = {}
+        used = 0
+
+        def take(snippet_id: int) -> bool:
+            nonlocal used
+            if snippet_id in chosen:
+                return True
+            line = format_snippet(self.snippets[snippet_id])
+            if used + len(line) + 1 > max_chars:
+                return False
+            chosen[snippet_id] = line
+            used += len(line) + 1
+            return True
+
+        for snippet_id in range(count - 1, max(count - recent, 0) - 1, -1):
+            take(snippet_id)
+
+        scores = self.scores(query)
+        # Newest first, so the stable sort gives ties to the newer snippet
+        candidates = sorted(reversed(scores), key=scores.__getitem__, reverse=True)
+        for snippet_id in candidates[:MAX_CANDIDATES]:
+            take(snippet_id)
+
+        if not scores:
+            for snippet_id in range(count - 1, -1, -1):
+                if not take(snippet_id):
+                    break
+
+        return [chosen[snippet_id] for snippet_id in sorted(chosen)]
+
+    def nbytes(self) -> int:
+        """Approximate size of the index and snippets"""
+        return (
+            sum(snippet.nbytes for snippet in self.snippets)
+            + sum(postings.itemsize * len(postings) for postings in self.postings.values())
+            + self.doc_lengths.itemsize * len(self.doc_lengths)
+        )
+
+
+class TranscriptStore:
+    """
+    Append-only SQLite log of meeting transcripts
+
+    Snippets are written in batches on one storage thread, like the
+    collaborative room store, and read back when a room is reopened.
+    """
+
+    def __init__(self, path: str = TRANSCRIPT_STORE_PATH, flush_ms: int = TRANSCRIPT_FLUSH_MS):
+        self.path = path
+        self.flush_interval = flush_ms / 1000
+        # SQLite connections are used from exactly one thread
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transcript-store")
+        self._connection: Optional[sqlite3.Connection] = None
+        self._pending: List[Tuple[str, float, str, str]] = []
+        self._flusher: Optional[asyncio.Task] = None
+        self.rows_written = 0
+
+    def _db(self) -> sqlite3.Connection:
+        if self._connection is None:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            self._connection = sqlite3.connect(self.path, check_same_thread=False)
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS meeting_transcripts ("
+                "room_id TEXT NOT NULL, timestamp REAL NOT NULL, speaker TEXT NOT NULL, text TEXT NOT NULL)"
+            )
+            self._connection.execute(
+                "CREATE INDEX IF NOT EXISTS meeting_transcripts_room ON meeting_transcripts (room_id, timestamp)"
+            )
+        return self._connection
+
+    def _append_batch(self, rows: List[Tuple[str, float, str, str]]):
+        db = self._db()
+        with db:
+            db.executemany(
+                "INSERT INTO meeting_transcripts (room_id, timestamp, speaker, text) VALUES (?, ?, ?, ?)", rows
+            )
+
+    def _load(self, room_id: str, limit: int) -> List[Tuple[float, str, str]]:
+        rows = self._db().execute(
+            "SELECT timestamp, speaker, text FROM meeting_transcripts WHERE room_id = ? "
+            "ORDER BY timestamp DESC LIMIT ?",
+            (room_id, limit)
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def _delete(self, room_id: str):
+        db = self._db()
+        with db:
+            db.execute("DELETE FROM meeting_transcripts WHERE room_id = ?", (room_id,))
+
+    async def _run(self, func, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._executor, func, *args)
+
+    def append(self, room_id: str, snippet: ChatMessage):
+        """Queue a snippet (written within flush_ms)"""
+        self._pending.append((room_id, snippet.timestamp, snippet.role, snippet.content))
+        if self._flusher is None or self._flusher.done():
+            self._flusher = asyncio.get_running_loop().create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval)
+        await self.flush()
+
+    async def flush(self):
+        """Write all pending snippets"""
+        if not self._pending:
+            return
+        rows, self._pending = self._pending, []
+        try:
+            await self._run(self._append_batch, rows)
+            self.rows_written += len(rows)
+        except sqlite3.Error as e:
+            print(f"[Transcript] Error writing {len(rows)} snippet(s): {e}")
+
+    async def load(self, room_id: str, limit: int = TRANSCRIPT_MAX_SNIPPETS) -> List[ChatMessage]:
+        """A room's latest `limit` stored snippets, oldest first"""
+        await self.flush()
+        rows = await self._run(self._load, room_id, limit)
+        return [ChatMessage(speaker, text, timestamp) for timestamp, speaker, text in rows]
+
+    async def delete(self, room_id: str):
+        """Delete a room's stored transcript, including snippets not written yet"""
+        self._pending = [row for row in self._pending if row[0] != room_id]
+        try:
+            await self._run(self._delete, room_id)
+        except sqlite3.Error as e:
+            print(f"[Transcript] Error deleting transcript of room {room_id}: {e}")
+
+    async def close(self):
+        """Flush pending writes and close the database"""
+        await self.flush()
+        if self._connection is not None:
+            await self._run(self._connection.close)
+            self._connection = None
+
+
+class TranscriptIndex:
+    """
+    Meeting transcripts of every open room, searchable for prompt context
+
+    Each room keeps its whole transcript indexed in memory while it is
+    open. With TRANSCRIPT_STORE_PATH set, snippets are also appended to
+    SQLite and a room reopened later is indexed again from there.
+    """
+
+    def __init__(self, store_path: str = TRANSCRIPT_STORE_PATH):
+        self.rooms: Dict[str, RoomTranscript] = {}
+        self.store = TranscriptStore(store_path) if store_path else None
+        self._loading: Dict[str, asyncio.Task] = {}
+        self.lookups = 0
+        self.lookup_seconds = 0.0
+
+    def _room(self, room_id: str) -> RoomTranscript:
+        transcript = self.rooms.get(room_id)
+        if transcript is None:
+            transcript = self.rooms[room_id] = RoomTranscript()
+            transcript.loaded = self.store is None
+        return transcript
+
+    def append(self, room_id: str, text: str, speaker: Optional[str] = None, timestamp: Optional[float] = None):
+        """
+        Add a transcription to a room's transcript
+
+        Args:
+            room_id: Room identifier
+            text: Transcribed text
+            speaker: Speaker name, if known
+            timestamp: When it was said (defaults to now)
+        """
+        snippet = ChatMessage(speaker or "", text, timestamp)
+        self._room(room_id).append(snippet)
+        if self.store is not None:
+            self.store.append(room_id, snippet)
+
+    async def load_room(self, room_id: str, fallback: Iterable[ChatMessage] = ()):
+        """
+        Index a reopened room's earlier transcript
+
+        Reads the stored transcript, or without a store indexes `fallback`
+        (e.g. the room's restored recent context) if the room is empty.
+        Snippets appended while loading are kept after the stored ones.
+        """
+        transcript = self._room(room_id)
+        if self.store is None:
+            if len(transcript) == 0:
+                for message in fallback:
+                    transcript.append(ChatMessage("", message.content, message.timestamp))
+            return
+        if transcript.loaded:
+            return
+
+        task = self._loading.get(room_id)
+        if task is None:
+            task = self._loading[room_id] = asyncio.ensure_future(self._load(room_id))
+            task.add_done_callback(lambda _: self._loading.pop(room_id, None))
+        await asyncio.shield(task)
+
+    async def _load(self, room_id: str):
+        try:
+            stored = await self.store.load(room_id)
+        except sqlite3.Error as e:
+            print(f"[Transcript] Error loading transcript of room {room_id}: {e}")
+            stored = []
+
+        current = self.rooms.get(room_id)
+        if current is None:
+            # The room closed while loading
+            return
+        seen = {(snippet.timestamp, snippet.content) for snippet in stored}
+        newer = [snippet for snippet in current.snippets if (snippet.timestamp, snippet.content) not in seen]
+        transcript = RoomTranscript(current.max_snippets)
+        for snippet in stored + newer:
+            transcript.append(snippet)
+        transcript.loaded = True
+        self.rooms[room_id] = transcript
+        if stored:
+            print(f"[Transcript] Indexed {len(stored)} stored snippet(s) for room {room_id}")
+
+    def select(
+        self,
+        room_id: str,
+        query: str,
+        max_chars: int = TRANSCRIPT_CONTEXT_MAX_CHARS,
+        recent: int = TRANSCRIPT_CONTEXT_RECENT
+    ) -> List[str]:
+        """
+        Transcript lines of a room most relevant to a query
+
+        Args:
+            room_id: Room identifier
+            query: Question or message the context is for
+            max_chars: Character budget of the returned lines
+            recent: Latest snippets included regardless of relevance
+
+        Returns:
+            Prompt lines in the order they were said (empty for an unknown room)
+        """
+        transcript = self.rooms.get(room_id)
+        if transcript is None or len(transcript) == 0:
+            return []
+        start_time = time.perf_counter()
+        lines = transcript.select(query, max_chars, recent)
+        elapsed = time.perf_counter() - start_time
+        TRANSCRIPT_LOOKUP_DURATION.observe(elapsed)
+        self.lookups += 1
+        self.lookup_seconds += elapsed
+        return lines
+
+    def clear_room(self, room_id: str):
+        """Erase a room's transcript, including the stored copy"""
+        transcript = self.rooms.get(room_id)
+        if transcript is not None:
+            transcript.clear()
+        if self.store is not None:
+            asyncio.get_running_loop().create_task(self.store.delete(room_id))
+
+    def forget_room(self, room_id: str):
+        """Drop a closed room's index from memory (a stored transcript is kept)"""
+        self.rooms.pop(room_id, None)
+
+    async def close(self):
+        if self.store is not None:
+            await self.store.close()
+
+    def stats(self) -> dict:
+        return {
+            "store": self.store.path if self.store is not None else None,
+            "rows_written": self.store.rows_written if self.store is not None else 0,
+            "lookups": self.lookups,
+            "avg_lookup_us": round(self.lookup_seconds / self.lookups * 1e6, 1) if self.lookups else 0.0,
+            "rooms": [
+                {
+                    "room_id": room_id,
+                    "snippets": len(transcript),
+                    "terms": len(transcript.postings),
+                    "bytes": transcript.nbytes()
+                }
+                for room_id, transcript in self.rooms.items()
+            ]
+        }
+
+
+# Global transcript index instance
+transcript_index = TranscriptIndex()
@@ -0,0 +1,427 @@
+"""
+Transcription Service - Pluggable speech-to-text backends (Gemini, offline, hybrid)
+"""
+import asyncio
+import io
+from abc import ABC, abstractmethod
+import shutil
+import subprocess
+import time
+import wave
+from typing import Awaitable, Callable, Dict, Optional
+
+from config import (
+    GEMINI_API_KEY,
+    TRANSCRIPTION_BACKEND,
+    LOCAL_TRANSCRIPTION_ENGINE,
+    TRANSCRIPTION_HYBRID_REFINE
+)
+from services.ai_service import request_gemini_transcription
+from services.audio_ingest import audio_ingestor, audio_mime_type
+from services.tracing import current_span, trace_span, traced
+from services.transcription_cache import transcription_cache
+
+
+class TranscriptionResult:
+    """Outcome of a single transcription call"""
+
+    def __init__(
+        self,
+        text: str,
+        backend: str,
+        ok: bool = True,
+        latency_ms: float = 0.0,
+        audio_seconds: Optional[float] = None
+    ):
+        self.text = text
+        self.backend = backend
+        self.ok = ok
+        self.latency_ms = latency_ms
+        self.audio_seconds = audio_seconds
+        # What audio ingestion did to the payload (format, bytes in/out/saved)
+        self.audio: Optional[dict] = None
+
+    @property
+    def real_time_factor(self) -> Optional[float]:
+        """Processing time divided by audio duration, when the duration is known"""
+        if not self.audio_seconds:
+            return None
+        return (self.latency_ms / 1000) / self.audio_seconds
+
+    def to_dict(self) -> dict:
+        """Serialize for API responses"""
+        result = {
+            "backend": self.backend,
+            "latency_ms": round(self.latency_ms, 2),
+            "real_time_factor": self.real_time_factor
+        }
+        if self.audio is not None:
+            result["audio"] = self.audio
+        return result
+
+
+# Callback invoked with the refined result in hybrid mode
+RefinedCallback = Callable[[TranscriptionResult], Awaitable[None]]
+
+
+def wav_duration_seconds(audio_data: bytes) -> Optional[float]:
+    """Get the duration of a WAV payload, or None for other formats"""
+    if not audio_data.startswith(b"RIFF"):
+        return None
+    try:
+        with wave.open(io.BytesIO(audio_data)) as wav:
+            return wav.getnframes() / float(wav.getframerate())
+    except Exception:
+        return None
+
+
+class TranscriptionBackend(ABC):
+    """Base class for speech-to-text backends with latency accounting"""
+
+    name = "base"
+    requires_api_key = False
+
+    def __init__(self):
+        self.calls = 0
+        self.failures = 0
+        self.total_latency_ms = 0.0
+        self.last_latency_ms = 0.0
+        self.total_audio_seconds = 0.0
+        self.timed_latency_ms = 0.0
+
+    @property
+    def available(self) -> bool:
+        """Whether the backend can serve requests in this deployment"""
+        return not self.requires_api_key or bool(GEMINI_API_KEY)
+
+    @abstractmethod
+    async def _transcribe(self, audio_data: bytes, language: str, mime_type: Optional[str] = None) -> TranscriptionResult:
+        """Backend-specific transcription, implemented by subclasses"""
+
+    async def transcribe(
+        self,
+        audio_data: bytes,
+        language: str = "en",
+        on_refined: Optional[RefinedCallback] = None,
+        mime_type: Optional[str] = None
+    ) -> TranscriptionResult:
+        """
+        Transcribe audio and record latency statistics
+
+        Args:
+            audio_data: Raw audio bytes
+            language: Language code
+            on_refined: Called with an improved result later (hybrid backends only)
+            mime_type: MIME type of the audio, sniffed from its bytes when not given
+
+        Returns:
+            TranscriptionResult
+        """
+        start_time = time.perf_counter()
+        with trace_span(f"transcription.{self.name}", audio_bytes=len(audio_data)):
+            result = await self._transcribe(audio_data, language, mime_type)
+        result.latency_ms = (time.perf_counter() - start_time) * 1000
+        self._record(result)
+        return result
+
+    def _record(self, result: TranscriptionResult):
+        """Update per-backend statistics"""
+        self.calls += 1
+        self.last_latency_ms = result.latency_ms
+        self.total_latency_ms += result.latency_ms
+        if not result.ok:
+            self.failures += 1
+        if result.audio_seconds:
+            self.total_audio_seconds += result.audio_seconds
+            self.timed_latency_ms += result.latency_ms
+
+    def stats(self) -> dict:
+        """Latency and real-time factor statistics for this backend"""
+        return {
+            "available": self.available,
+            "calls": self.calls,
+            "failures": self.failures,
+            "avg_latency_ms": round(self.total_latency_ms / self.calls, 2) if self.calls else 0.0,
+            "last_latency_ms": round(self.last_latency_ms, 2),
+            "real_time_factor": (
+                (self.timed_latency_ms / 1000) / self.total_audio_seconds
+                if self.total_audio_seconds else None
+            )
+        }
+
+
+class GeminiTranscriptionBackend(TranscriptionBackend):
+    """Cloud transcription through Gemini's multimodal models"""
+
+    name = "gemini"
+    requires_api_key = True
+
+    async def _transcribe(self, audio_data: bytes, language: str, mime_type: Optional[str] = None) -> TranscriptionResult:
+        text = await request_gemini_transcription(audio_data, mime_type or audio_mime_type(audio_data))
+        return TranscriptionResult(
+            text=text or "",
+            backend=self.name,
+            ok=text is not None,
+            audio_seconds=wav_duration_seconds(audio_data)
+        )
+
+
+class LocalTranscriptionBackend(TranscriptionBackend):
+    """
+    Offline transcription with SpeechRecognition
+
+    Uses a local engine (PocketSphinx by default) so no network call is made.
+    Non-WAV payloads (e.g. browser webm/opus) are decoded with ffmpeg.
+    """
+
+    name = "local"
+
+    def __init__(self, engine: str = LOCAL_TRANSCRIPTION_ENGINE):
+        super().__init__()
+        self.engine = engine
+
+    def _to_wav(self, audio_data: bytes) -> bytes:
+        """Convert audio to 16kHz mono WAV, which SpeechRecognition can read"""
+        if audio_data.startswith(b"RIFF"):
+            return audio_data
+        if not shutil.which("ffmpeg"):
+            raise RuntimeError("ffmpeg is required to decode non-WAV audio for local transcription")
+        result = subprocess.run(
+            ["ffmpeg", "-loglevel", "error", "-i", "pipe:0", "-ac", "1", "-ar", "16000", "-f", "wav", "pipe:1"],
+            input=audio_data,
+            capture_output=True,
+            timeout=30
+        )
+        if result.returncode != 0:
+            raise RuntimeError(f"ffmpeg failed: {result.stderr.decode(errors='ignore').strip()}")
+        return result.stdout
+
+    def _recognize(self, audio_data: bytes, language: str) -> TranscriptionResult:
+        """Blocking recognition, run in a worker thread"""
+        import speech_recognition as sr
+
+        recognizer = sr.Recognizer()
+        with sr.AudioFile(io.BytesIO(self._to_wav(audio_data))) as source:
+            audio = recognizer.record(source)
+        audio_seconds = len(audio.frame_data) / float(audio.sample_rate * audio.sample_width)
+
+        try:
+            if self.engine == "whisper":
+                text = recognizer.recognize_whisper(audio, language=language)
+            else:
+                text = getattr(recognizer, f"recognize_{self.engine}")(audio)
+        except sr.UnknownValueError:
+            # Engine heard nothing intelligible, treat as silence
+            text = ""
+
+        return TranscriptionResult(
+            text=text.strip(),
+            backend=self.name,
+            audio_seconds=audio_seconds
+        )
+
+    async def _transcribe(self, audio_data: bytes, language: str, mime_type: Optional[str] = None) -> TranscriptionResult:
+        try:
+            return await asyncio.to_thread(self._recognize, audio_data, language)
+        except Exception as e:
+            print(f"Error transcribing audio locally ({self.engine}): {e}")
+            return TranscriptionResult(text="", backend=self.name, ok=False)
+
+
+class HybridTranscriptionBackend(TranscriptionBackend):
+    """
+    Local transcription first, optionally refined by Gemini
+
+    The local result is returned immediately. When a refinement callback is
+    given, Gemini transcribes the same audio in the background and the
+    callback receives the refined result if it differs.
+    """
+
+    name = "hybrid"
+
+    def __init__(
+        self,
+        local: TranscriptionBackend,
+        remote: TranscriptionBackend,
+        refine: bool = TRANSCRIPTION_HYBRID_REFINE
+    ):
+        super().__init__()
+        self.local = local
+        self.remote = remote
+        self.refine = refine
+        self._refinements = set()
+
+    async def _transcribe(self, audio_data: bytes, language: str, mime_type: Optional[str] = None) -> TranscriptionResult:
+        """Local transcription, falling back to the remote engine if the local one is unusable"""
+        result = await self.local.transcribe(audio_data, language, mime_type=mime_type)
+        if not result.ok and self.remote.available:
+            result = await self.remote.transcribe(audio_data, language, mime_type=mime_type)
+        return result
+
+    async def transcribe(
+        self,
+        audio_data: bytes,
+        language: str = "en",
+        on_refined: Optional[RefinedCallback] = None,
+        mime_type: Optional[str] = None
+    ) -> TranscriptionResult:
+        start_time = time.perf_counter()
+        result = await self._transcribe(audio_data, language, mime_type)
+
+        # Refine a usable local result in the background
+        refinable = result.ok and result.backend == self.local.name
+        if refinable and self.refine and on_refined is not None and self.remote.available:
+            task = asyncio.ensure_future(self._refine(audio_data, language, result, on_refined, mime_type))
+            # Keep a reference so the task isn't garbage collected mid-flight
+            self._refinements.add(task)
+            task.add_done_callback(self._refinements.discard)
+
+        latency_ms = (time.perf_counter() - start_time) * 1000
+        hybrid_result = TranscriptionResult(
+            text=result.text,
+            backend=f"{self.name}:{result.backend}",
+            ok=result.ok,
+            latency_ms=latency_ms,
+            audio_seconds=result.audio_seconds
+        )
+        self._record(hybrid_result)
+        return hybrid_result
+
+    async def _refine(
+        self,
+        audio_data: bytes,
+        language: str,
+        local_result: TranscriptionResult,
+        on_refined: RefinedCallback,
+        mime_type: Optional[str] = None
+    ):
+        """Transcribe with the remote engine and report an improved result"""
+        refined = await self.remote.transcribe(audio_data, language, mime_type=mime_type)
+        if refined.ok and refined.text and refined.text != local_result.text:
+            try:
+                await on_refined(refined)
+            except Exception as e:
+                print(f"Error delivering refined transcription: {e}")
+
+
+# Registered backends, selectable per deployment (TRANSCRIPTION_BACKEND) or per request
+gemini_backend = GeminiTranscriptionBackend()
+local_backend = LocalTranscriptionBackend()
+TRANSCRIPTION_BACKENDS: Dict[str, TranscriptionBackend] = {
+    "gemini": gemini_backend,
+    "local": local_backend,
+    "hybrid": HybridTranscriptionBackend(local_backend, gemini_backend)
+}
+
+
+def get_transcription_backend(name: Optional[str] = None) -> TranscriptionBackend:
+    """
+    Get a transcription backend by name
+
+    Args:
+        name: Backend name, defaults to TRANSCRIPTION_BACKEND
+
+    Returns:
+        TranscriptionBackend instance
+
+    Raises:
+        ValueError: If the backend name is unknown
+    """
+    backend_name = name or TRANSCRIPTION_BACKEND
+    if backend_name not in TRANSCRIPTION_BACKENDS:
+        raise ValueError(
+            f"Unknown transcription backend: {backend_name}. "
+            f"Supported: {', '.join(TRANSCRIPTION_BACKENDS)}"
+        )
+    return TRANSCRIPTION_BACKENDS[backend_name]
+
+
+@traced("transcription")
+async def transcribe_audio(
+    audio_data: bytes,
+    language: str = "en",
+    backend: Optional[str] = None,
+    on_refined: Optional[RefinedCallback] = None,
+    use_cache: bool = True
+) -> TranscriptionResult:
+    """
+    Transcribe audio with the selected backend
+
+    The content-hash cache is consulted first, so retried chunks with
+    byte-identical audio never reach a backend. Entries are per backend, so
+    e.g. a hybrid/local draft is never served to a request for Gemini. On a miss the audio goes
+    through ingestion (format detection, downmixing and resampling) first.
+
+    Args:
+        audio_data: Raw audio bytes
+        language: Language code
+        backend: Optional backend name overriding the deployment default
+        on_refined: Called with a refined result later (hybrid mode only)
+        use_cache: Whether to read and populate the transcription cache
+
+    Returns:
+        TranscriptionResult
+
+    Raises:
+        UnsupportedAudioFormat: If the audio can't be transcribed or converted
+    """
+    selected = get_transcription_backend(backend)
+    if not use_cache:
+        return await _transcribe_prepared(selected, audio_data, language, on_refined)
+
+    start_time = time.perf_counter()
+    cache_key = transcription_cache.make_key(audio_data, language, selected.name)
+    cached = await transcription_cache.get(cache_key)
+    if cached is not None:
+        current_span().set("cache_hit", True)
+        return TranscriptionResult(
+            text=cached,
+            backend="cache",
+            latency_ms=(time.perf_counter() - start_time) * 1000
+        )
+
+    async def cache_refined(refined: TranscriptionResult):
+        # A refined transcription supersedes the local one
+        await transcription_cache.put(cache_key, refined.text)
+        await on_refined(refined)
+
+    result = await _transcribe_prepared(
+        selected,
+        audio_data,
+        language,
+        cache_refined if on_refined is not None else None
+    )
+    # Cache successes and confirmed silence, never failures
+    if result.ok:
+        await transcription_cache.put(cache_key, result.text)
+    return result
+
+
+async def _transcribe_prepared(
+    selected: TranscriptionBackend,
+    audio_data: bytes,
+    language: str,
+    on_refined: Optional[RefinedCallback]
+) -> TranscriptionResult:
+    """Run a payload through audio ingestion, then the backend"""
+    audio = await audio_ingestor.prepare(audio_data)
+    result = await selected.transcribe(audio.data, language, on_refined, audio.mime_type)
+    if result.audio_seconds is None:
+        result.audio_seconds = audio.seconds
+    result.audio = audio.to_dict()
+    return result
+
+
+def get_transcription_stats() -> Dict[str, dict]:
+    """Per-backend latency and real-time factor statistics"""
+    return {name: backend.stats() for name, backend in TRANSCRIPTION_BACKENDS.items()}
+
+
+def get_transcription_cache_stats() -> dict:
+    """Transcription cache hit-rate metrics"""
+    return transcription_cache.stats()
+
+
+def get_audio_ingest_stats() -> dict:
+    """Audio ingestion actions and bytes saved"""
+    return audio_ingestor.stats()
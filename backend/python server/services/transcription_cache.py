@@ -0,0 +1,179 @@
+"""
+Transcription Cache - Content-hash cache for transcription results
+"""
+import asyncio
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional
+
+from config import (
+    TRANSCRIPTION_CACHE_MAX_BYTES,
+    TRANSCRIPTION_CACHE_DIR,
+    TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES
+)
+
+
+# Approximate per-entry bookkeeping cost (dict slot, key string, str header)
+ENTRY_OVERHEAD_BYTES = 200
+
+# Prune the disk tier after this many writes
+DISK_PRUNE_INTERVAL = 100
+
+
+class TranscriptionCache:
+    """
+    Memory-bounded LRU of transcriptions keyed by audio content
+
+    Keys are a SHA-256 of the backend, the language and the raw audio bytes,
+    so client retries of byte-identical chunks never reach a backend, and a
+    request for one backend is never answered with another backend's text. Both successful
+    transcriptions and confirmed silence ("") are cached; failures are not.
+    An optional directory-backed tier keeps entries across restarts.
+    """
+
+    def __init__(
+        self,
+        max_bytes: int = TRANSCRIPTION_CACHE_MAX_BYTES,
+        disk_dir: Optional[str] = TRANSCRIPTION_CACHE_DIR or None,
+        disk_max_entries: int = TRANSCRIPTION_CACHE_DISK_MAX_ENTRIES
+    ):
+        self.max_bytes = max_bytes
+        self.disk_dir = disk_dir
+        self.disk_max_entries = disk_max_entries
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.current_bytes = 0
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._disk_writes = 0
+
+        if self.disk_dir:
+            os.makedirs(self.disk_dir, exist_ok=True)
+
+    @staticmethod
+    def make_key(audio_data: bytes, language: str = "en", backend: str = "") -> str:
+        """Hash audio bytes, language and backend name into a cache key"""
+        digest = hashlib.sha256(backend.encode("utf-8") + b"\0" + language.encode("utf-8") + b"\0")
+        digest.update(audio_data)
+        return digest.hexdigest()
+
+    @staticmethod
+    def _entry_size(key: str, text: str) -> int:
+        return len(key) + len(text.encode("utf-8")) + ENTRY_OVERHEAD_BYTES
+
+    async def get(self, key: str) -> Optional[str]:
+        """
+        Look up a cached transcription
+
+        Args:
+            key: Key from make_key()
+
+        Returns:
+            Cached text ("" for silence), or None on a miss
+        """
+        text = self._entries.get(key)
+        if text is not None:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return text
+
+        if self.disk_dir:
+            text = await asyncio.to_thread(self._read_disk, key)
+            if text is not None:
+                self.disk_hits += 1
+                self._put_memory(key, text)
+                return text
+
+        self.misses += 1
+        return None
+
+    async def put(self, key: str, text: str):
+        """
+        Cache a transcription result
+
+        Args:
+            key: Key from make_key()
+            text: Transcription text, "" for confirmed silence
+        """
+        self._put_memory(key, text)
+        if self.disk_dir:
+            await asyncio.to_thread(self._write_disk, key, text)
+
+    def _put_memory(self, key: str, text: str):
+        """Insert into the in-memory LRU, evicting to stay within budget"""
+        size = self._entry_size(key, text)
+        if size > self.max_bytes:
+            return
+
+        if key in self._entries:
+            self.current_bytes -= self._entry_size(key, self._entries.pop(key))
+
+        self._entries[key] = text
+        self.current_bytes += size
+
+        while self.current_bytes > self.max_bytes:
+            old_key, old_text = self._entries.popitem(last=False)
+            self.current_bytes -= self._entry_size(old_key, old_text)
+            self.evictions += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, f"{key}.json")
+
+    def _read_disk(self, key: str) -> Optional[str]:
+        """Read an entry from the disk tier"""
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as f:
+                return json.load(f)["text"]
+        except (OSError, ValueError, KeyError):
+            return None
+
+    def _write_disk(self, key: str, text: str):
+        """Write an entry to the disk tier, pruning oldest entries periodically"""
+        try:
+            with open(self._disk_path(key), "w", encoding="utf-8") as f:
+                json.dump({"text": text}, f)
+        except OSError as e:
+            print(f"Error writing transcription cache entry: {e}")
+            return
+
+        self._disk_writes += 1
+        if self._disk_writes % DISK_PRUNE_INTERVAL == 0:
+            self._prune_disk()
+
+    def _prune_disk(self):
+        """Remove the least recently written entries beyond disk_max_entries"""
+        try:
+            paths = [
+                os.path.join(self.disk_dir, name)
+                for name in os.listdir(self.disk_dir)
+                if name.endswith(".json")
+            ]
+            if len(paths) <= self.disk_max_entries:
+                return
+            paths.sort(key=os.path.getmtime)
+            for path in paths[:len(paths) - self.disk_max_entries]:
+                os.remove(path)
+        except OSError as e:
+            print(f"Error pruning transcription cache: {e}")
+
+    def stats(self) -> dict:
+        """Hit-rate and size metrics"""
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.current_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round((self.hits + self.disk_hits) / lookups, 4) if lookups else 0.0,
+            "disk_enabled": bool(self.disk_dir)
+        }
+
+
+# Global transcription cache instance
+transcription_cache = TranscriptionCache()
@@ -0,0 +1,129 @@
+"""
+Yjs Awareness - Ephemeral per-room presence/cursor table
+"""
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from config import YJS_AWARENESS_TIMEOUT_SECONDS
+from services.yjs_protocol import decode_awareness_update
+
+
+# JSON state that marks an awareness client as gone
+REMOVED_STATE = "null"
+
+
+class AwarenessEntry:
+    """Latest awareness state of one Yjs client"""
+
+    __slots__ = ("awareness_id", "clock", "state", "owner", "updated_at")
+
+    def __init__(self, awareness_id: int, clock: int, state: str, owner: str):
+        self.awareness_id = awareness_id
+        self.clock = clock
+        self.state = state
+        # WebSocket client that announced this awareness id
+        self.owner = owner
+        self.updated_at = time.monotonic()
+
+    def as_tuple(self) -> Tuple[int, int, str]:
+        return (self.awareness_id, self.clock, self.state)
+
+
+class RoomAwareness:
+    """
+    Awareness table for one collaborative room
+
+    Keeps only the latest state per awareness client; it is never written to
+    the document or to storage. Changed entries are marked dirty so the room
+    can fan them out in coalesced batches instead of one frame per cursor move.
+    """
+
+    def __init__(self, timeout_seconds: float = YJS_AWARENESS_TIMEOUT_SECONDS):
+        self.timeout_seconds = timeout_seconds
+        self.entries: Dict[int, AwarenessEntry] = {}
+        self._dirty: Set[int] = set()
+        self.frames_in = 0
+        self.frames_out = 0
+
+    def apply(self, owner: str, update: bytes) -> int:
+        """
+        Apply an awareness update received from a client
+
+        Args:
+            owner: WebSocket client the update came from
+            update: Awareness update payload
+
+        Returns:
+            Number of entries that changed
+
+        Raises:
+            ValueError: If the update is malformed
+        """
+        self.frames_in += 1
+        changed = 0
+        for awareness_id, clock, state in decode_awareness_update(update):
+            entry = self.entries.get(awareness_id)
+            if entry is not None and clock < entry.clock:
+                continue
+            if entry is not None and clock == entry.clock and state != REMOVED_STATE:
+                continue
+
+            if entry is None:
+                entry = AwarenessEntry(awareness_id, clock, state, owner)
+                self.entries[awareness_id] = entry
+            else:
+                entry.clock = clock
+                entry.state = state
+                entry.owner = owner
+                entry.updated_at = time.monotonic()
+            self._dirty.add(awareness_id)
+            changed += 1
+        return changed
+
+    def remove_owner(self, owner: str) -> int:
+        """Mark every entry announced by a client as removed"""
+        removed = 0
+        for entry in self.entries.values():
+            if entry.owner == owner and entry.state != REMOVED_STATE:
+                self._remove(entry)
+                removed += 1
+        return removed
+
+    def expire(self) -> int:
+        """Remove entries that haven't been renewed within the timeout"""
+        cutoff = time.monotonic() - self.timeout_seconds
+        expired = 0
+        for entry in self.entries.values():
+            if entry.updated_at < cutoff and entry.state != REMOVED_STATE:
+                self._remove(entry)
+                expired += 1
+        return expired
+
+    def _remove(self, entry: AwarenessEntry):
+        entry.clock += 1
+        entry.state = REMOVED_STATE
+        self._dirty.add(entry.awareness_id)
+
+    def take_dirty(self) -> List[AwarenessEntry]:
+        """Get and reset the entries changed since the last call"""
+        if not self._dirty:
+            return []
+        dirty = [self.entries[awareness_id] for awareness_id in self._dirty]
+        self._dirty = set()
+
+        # Removals only need to be announced once
+        for entry in dirty:
+            if entry.state == REMOVED_STATE:
+                del self.entries[entry.awareness_id]
+        return dirty
+
+    def snapshot(self, exclude_owner: Optional[str] = None) -> List[Tuple[int, int, str]]:
+        """Get all live entries, e.g. for a newly joined client"""
+        return [
+            entry.as_tuple() for entry in self.entries.values()
+            if entry.state != REMOVED_STATE and entry.owner != exclude_owner
+        ]
+
+    @property
+    def has_dirty(self) -> bool:
+        return bool(self._dirty)
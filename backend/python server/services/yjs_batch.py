@@ -0,0 +1,83 @@
+"""
+Yjs Batch - Per-room tick coalescing of document update frames
+"""
+import asyncio
+import time
+from typing import Dict, List, Optional, Set, Tuple
+
+from pycrdt import merge_updates
+
+
+class UpdateBatch:
+    """
+    Document updates waiting for a room's next tick
+
+    Updates are kept with their sender so each recipient can be sent one
+    merged update of everything its peers changed during the tick.
+    """
+
+    __slots__ = ("updates", "senders", "nbytes", "timer")
+
+    def __init__(self):
+        # (sender client id or None for relayed updates, update, monotonic enqueue time)
+        self.updates: List[Tuple[Optional[str], bytes, float]] = []
+        self.senders: Set[Optional[str]] = set()
+        self.nbytes = 0
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+    def add(self, sender_id: Optional[str], update: bytes):
+        self.updates.append((sender_id, update, time.monotonic()))
+        self.senders.add(sender_id)
+        self.nbytes += len(update)
+
+    def merged_for(self, recipient_id: str, cache: Dict[Optional[str], Optional[bytes]]) -> Optional[bytes]:
+        """
+        Merge the updates a recipient didn't send itself
+
+        Args:
+            recipient_id: Client the merged update is for
+            cache: Merges already computed this tick, keyed by the excluded sender
+
+        Returns:
+            Merged update, or None if every update came from the recipient
+        """
+        excluded = recipient_id if recipient_id in self.senders else None
+        if excluded not in cache:
+            updates = [update for sender_id, update, _ in self.updates if excluded is None or sender_id != excluded]
+            if not updates:
+                cache[excluded] = None
+            else:
+                cache[excluded] = updates[0] if len(updates) == 1 else merge_updates(*updates)
+        return cache[excluded]
+
+
+class BatchMetrics:
+    """Counters for update coalescing across all rooms"""
+
+    def __init__(self):
+        self.updates_in = 0
+        self.ticks = 0
+        self.size_flushes = 0
+        self.frames_out = 0
+        # Frames that would have been sent with one frame per update per peer
+        self.frames_unbatched = 0
+        self.latency_total_ms = 0.0
+        self.latency_max_ms = 0.0
+
+    def record_latency(self, enqueued_at: float, flushed_at: float):
+        latency_ms = (flushed_at - enqueued_at) * 1000
+        self.latency_total_ms += latency_ms
+        if latency_ms > self.latency_max_ms:
+            self.latency_max_ms = latency_ms
+
+    def to_dict(self) -> dict:
+        return {
+            "updates_in": self.updates_in,
+            "ticks": self.ticks,
+            "size_flushes": self.size_flushes,
+            "frames_out": self.frames_out,
+            "frames_unbatched": self.frames_unbatched,
+            "frames_saved": self.frames_unbatched - self.frames_out,
+            "avg_added_latency_ms": round(self.latency_total_ms / self.updates_in, 2) if self.updates_in else 0.0,
+            "max_added_latency_ms": round(self.latency_max_ms, 2)
+        }
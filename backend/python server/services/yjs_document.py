@@ -0,0 +1,127 @@
+"""
+Yjs Document - Server-side merged document state for collaborative rooms
+"""
+from typing import Callable, Dict, List, Optional
+
+from pycrdt import get_state, get_update, merge_updates
+
+from config import YJS_COMPACT_EVERY_UPDATES, YJS_COMPACT_LOG_BYTES
+from services.yjs_protocol import EMPTY_UPDATE
+
+
+class RoomDocument:
+    """
+    Merged Yjs state of one room
+
+    Incoming updates are appended to a log; the log is merged into a single
+    compacted update once it reaches compact_every_updates or
+    compact_log_bytes. The server can then answer a client's sync-step-1
+    itself with the minimal diff against the client's state vector,
+    regardless of which peers are online. Reads merge the base and the log
+    without compacting, and the merged view is reused until the next update.
+    """
+
+    def __init__(
+        self,
+        room_id: str,
+        state: bytes = EMPTY_UPDATE,
+        compact_every_updates: int = YJS_COMPACT_EVERY_UPDATES,
+        compact_log_bytes: int = YJS_COMPACT_LOG_BYTES,
+        on_compact: Optional[Callable[["RoomDocument"], None]] = None
+    ):
+        self.room_id = room_id
+        self.compact_every_updates = compact_every_updates
+        self.compact_log_bytes = compact_log_bytes
+        self.on_compact = on_compact
+        # Compacted state, encoded as a single Yjs update
+        self.base = state or EMPTY_UPDATE
+        self.log: List[bytes] = []
+        self.log_bytes = 0
+        # base merged with the current log, for reads between updates
+        self._merged: Optional[bytes] = None
+        self.compactions = 0
+        self.updates_applied = 0
+        # Highest seq applied per origin worker, and the part already merged into base
+        self.versions: Dict[str, int] = {}
+        self.base_versions: Dict[str, int] = {}
+
+    def apply_update(self, update: bytes, origin: Optional[str] = None, seq: int = 0) -> bool:
+        """
+        Append an update to the room's log
+
+        Args:
+            update: Yjs update (v1 encoding)
+            origin: Worker that logged the update, if it is in the store's log
+            seq: The update's sequence number for that worker
+
+        Returns:
+            True if the update was accepted, False if it was empty or malformed
+        """
+        if not update or update == EMPTY_UPDATE:
+            return False
+        try:
+            # Cheap structural validation so one bad frame can't poison compaction
+            get_state(update)
+        except ValueError:
+            print(f"[Yjs] Rejected malformed update in room {self.room_id}")
+            return False
+
+        self.log.append(update)
+        self.log_bytes += len(update)
+        self._merged = None
+        self.updates_applied += 1
+        if origin is not None and seq > self.versions.get(origin, 0):
+            self.versions[origin] = seq
+
+        if len(self.log) >= self.compact_every_updates or self.log_bytes >= self.compact_log_bytes:
+            self.compact()
+        return True
+
+    def compact(self):
+        """Merge the update log into the base state"""
+        if not self.log:
+            return
+        self.base = self._merged or merge_updates(self.base, *self.log)
+        self._merged = None
+        self.log = []
+        self.log_bytes = 0
+        self.base_versions = dict(self.versions)
+        self.compactions += 1
+        if self.on_compact is not None:
+            self.on_compact(self)
+
+    def get_state(self) -> bytes:
+        """Get the full document state as a single update (without compacting)"""
+        if not self.log:
+            return self.base
+        if self._merged is None:
+            self._merged = merge_updates(self.base, *self.log)
+        return self._merged
+
+    def get_state_vector(self) -> bytes:
+        """Get the document's state vector"""
+        return get_state(self.get_state())
+
+    def get_diff(self, state_vector: Optional[bytes] = None) -> bytes:
+        """
+        Get the updates a peer is missing
+
+        Args:
+            state_vector: The peer's state vector, or None for the full state
+
+        Returns:
+            Yjs update containing everything not covered by state_vector
+        """
+        state = self.get_state()
+        if not state_vector:
+            return state
+        return get_update(state, state_vector)
+
+    def next_seq(self, origin: str) -> int:
+        """Get the sequence number for the next update logged by a worker"""
+        return self.versions.get(origin, 0) + 1
+
+    @property
+    def size_bytes(self) -> int:
+        """Memory held by the document's state, log and merged view"""
+        return len(self.base) + self.log_bytes + len(self._merged or b"")
@@ -0,0 +1,146 @@
+"""
+Yjs Protocol - Parsing and building y-protocol (y-websocket) messages
+"""
+from typing import List, Optional, Tuple
+
+from pycrdt import read_message, write_var_uint
+
+
+# Top-level message types (first varint of every frame)
+MESSAGE_SYNC = 0
+MESSAGE_AWARENESS = 1
+MESSAGE_AUTH = 2
+MESSAGE_QUERY_AWARENESS = 3
+
+# Sync sub-message types (second varint of a sync frame)
+SYNC_STEP1 = 0
+SYNC_STEP2 = 1
+SYNC_UPDATE = 2
+
+# An update that contains no structs and no deletes
+EMPTY_UPDATE = b"\x00\x00"
+
+
+def read_var_uint(data: bytes, pos: int = 0) -> Tuple[int, int]:
+    """
+    Decode a lib0 variable-length unsigned integer
+
+    Args:
+        data: Encoded bytes
+        pos: Offset to start reading at
+
+    Returns:
+        Tuple of (value, offset after the integer)
+
+    Raises:
+        ValueError: If the data ends inside the integer
+    """
+    value = 0
+    shift = 0
+    while True:
+        if pos >= len(data):
+            raise ValueError("Truncated varint in Yjs message")
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+        if byte < 0x80:
+            return value, pos
+
+
+def parse_message(frame: bytes) -> Tuple[int, Optional[int], bytes]:
+    """
+    Split a y-websocket frame into its header and payload
+
+    Args:
+        frame: Binary WebSocket frame
+
+    Returns:
+        Tuple of (message_type, sync_type or None, payload). For sync frames the
+        payload is the decoded state vector / update, for awareness frames the
+        decoded awareness update; for other frames it is the remainder of the
+        frame after the message type.
+
+    Raises:
+        ValueError: If the frame is malformed
+    """
+    message_type, pos = read_var_uint(frame)
+    try:
+        if message_type == MESSAGE_AWARENESS:
+            return message_type, None, read_message(frame[pos:])
+        if message_type != MESSAGE_SYNC:
+            return message_type, None, frame[pos:]
+
+        sync_type, pos = read_var_uint(frame, pos)
+        return message_type, sync_type, read_message(frame[pos:])
+    except (IndexError, RuntimeError) as e:
+        raise ValueError(f"Malformed Yjs message: {e}") from e
+
+
+def _sync_message(sync_type: int, payload: bytes) -> bytes:
+    return (
+        write_var_uint(MESSAGE_SYNC)
+        + write_var_uint(sync_type)
+        + write_var_uint(len(payload))
+        + payload
+    )
+
+
+def sync_step1_message(state_vector: bytes) -> bytes:
+    """Build a sync-step-1 frame announcing a state vector"""
+    return _sync_message(SYNC_STEP1, state_vector)
+
+
+def sync_step2_message(update: bytes) -> bytes:
+    """Build a sync-step-2 frame carrying the updates the peer is missing"""
+    return _sync_message(SYNC_STEP2, update)
+
+
+def update_message(update: bytes) -> bytes:
+    """Build a sync update frame"""
+    return _sync_message(SYNC_UPDATE, update)
+
+
+def decode_awareness_update(update: bytes) -> List[Tuple[int, int, str]]:
+    """
+    Decode an awareness update into its entries
+
+    Args:
+        update: Awareness update payload (without the message header)
+
+    Returns:
+        List of (awareness client id, clock, JSON state string); a state of
+        "null" means the client went away
+
+    Raises:
+        ValueError: If the update is malformed
+    """
+    count, pos = read_var_uint(update)
+    entries = []
+    for _ in range(count):
+        awareness_id, pos = read_var_uint(update, pos)
+        clock, pos = read_var_uint(update, pos)
+        length, pos = read_var_uint(update, pos)
+        if pos + length > len(update):
+            raise ValueError("Truncated awareness state")
+        entries.append((awareness_id, clock, update[pos:pos + length].decode("utf-8")))
+        pos += length
+    return entries
+
+
+def encode_awareness_update(entries: List[Tuple[int, int, str]]) -> bytes:
+    """Encode (awareness client id, clock, JSON state) entries as an awareness update payload"""
+    update = bytearray(write_var_uint(len(entries)))
+    for awareness_id, clock, state in entries:
+        state_bytes = state.encode("utf-8")
+        update += write_var_uint(awareness_id)
+        update += write_var_uint(clock)
+        update += write_var_uint(len(state_bytes))
+        update += state_bytes
+    return bytes(update)
+
+
+def awareness_message(entries: List[Tuple[int, int, str]]) -> bytes:
+    """Build an awareness frame from (awareness client id, clock, JSON state) entries"""
+    update = encode_awareness_update(entries)
+    return write_var_uint(MESSAGE_AWARENESS) + write_var_uint(len(update)) + update
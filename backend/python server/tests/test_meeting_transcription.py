@@ -0,0 +1,64 @@
+"""
+Meeting Transcription tests - Per-room deduplication and claim release
+"""
+import asyncio
+import unittest
+from unittest import mock
+
+from services import meeting_transcription
+from services.meeting_transcription import RoomTranscriptionService
+from services.transcription import TranscriptionResult
+
+
+class RoomTranscriptionServiceTest(unittest.TestCase):
+    """Chunks are transcribed once per room unless the transcription fails"""
+
+    def setUp(self):
+        self.service = RoomTranscriptionService(window_seconds=5, dedup_ttl_seconds=30)
+        self.calls = []
+
+    def _run(self, results):
+        """Transcribe two uploads of the same chunk with a stubbed backend"""
+        async def fake_transcribe(audio_data, backend=None, on_refined=None):
+            self.calls.append(audio_data)
+            return results[len(self.calls) - 1]
+
+        async def upload_twice():
+            with mock.patch.object(meeting_transcription, "transcribe_audio", fake_transcribe):
+                first = await self.service.transcribe("room", b"first copy", track_id="alice", timestamp=60.0)
+                second = await self.service.transcribe("room", b"second copy", track_id="alice", timestamp=61.0)
+            return first, second
+
+        return asyncio.run(upload_twice())
+
+    def test_duplicate_upload_is_dropped(self):
+        first, second = self._run([TranscriptionResult(text="hello everyone", backend="gemini")])
+        self.assertEqual((first, second), ("hello everyone", None))
+        self.assertEqual(len(self.calls), 1)
+        self.assertEqual(self.service.duplicate_chunks, 1)
+
+    def test_failed_transcription_releases_the_chunk(self):
+        first, second = self._run([
+            TranscriptionResult(text="", backend="local", ok=False),
+            TranscriptionResult(text="hello everyone", backend="gemini")
+        ])
+        self.assertIsNone(first)
+        self.assertEqual(second, "hello everyone")
+        self.assertEqual(self.calls, [b"first copy", b"second copy"])
+        self.assertEqual(self.service.duplicate_chunks, 0)
+
+    def test_raising_transcription_releases_the_chunk(self):
+        async def failing(audio_data, backend=None, on_refined=None):
+            raise RuntimeError("backend down")
+
+        async def upload():
+            with mock.patch.object(meeting_transcription, "transcribe_audio", failing):
+                with self.assertRaises(RuntimeError):
+                    await self.service.transcribe("room", b"first copy", track_id="alice", timestamp=60.0)
+
+        asyncio.run(upload())
+        self.assertEqual(self.service._seen, {})
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -3,10 +3,19 @@ WebSocket handlers module
 """
 from .ai_chat import websocket_ai_chat, ChatConnectionManager
 from .collaborative import websocket_yjs_sync, CollaborativeRoomManager
+from .code_room import websocket_code_room, CodeRoomManager
+from .jobs import websocket_job_updates
+from .sentiment import websocket_sentiment_updates
+from .connection import ClientConnection
 
 __all__ = [
     'websocket_ai_chat',
     'ChatConnectionManager',
     'websocket_yjs_sync', 
-    'CollaborativeRoomManager'
+    'CollaborativeRoomManager',
+    'websocket_code_room',
+    'CodeRoomManager',
+    'websocket_job_updates',
+    'websocket_sentiment_updates',
+    'ClientConnection'
 ]
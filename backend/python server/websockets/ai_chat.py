@@ -1,15 +1,81 @@
 """
 AI Chat WebSocket - Real-time AI chat with audio support
 """
+import asyncio
 import base64
-from typing import Dict, List
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import time
+from typing import Dict, List, Optional, Set, Tuple
 from fastapi import WebSocket, WebSocketDisconnect
 
+from config import (
+    CHAT_HISTORY_CAPACITY,
+    CHAT_CONTEXT_CAPACITY,
+    CHAT_SESSION_MAX_BYTES,
+    CHAT_GLOBAL_MAX_BYTES,
+    CHAT_SESSION_IDLE_SECONDS,
+    CHAT_SPILL_DIR,
+    SESSION_TTL_SECONDS
+)
+
+from services.admission import (
+    ADMISSION_REJECTIONS,
+    SHED_RETRY_AFTER_SECONDS,
+    check_message,
+    load_shedder,
+    retry_after_header
+)
 from services.ai_service import (
     is_question,
-    process_text_with_gemini,
-    transcribe_audio_with_gemini
+    process_text_with_gemini
 )
+from services.audio_ingest import UnsupportedAudioFormat
+from services.chat_state import ChatMessage, MessageRing
+from services.meeting_transcription import meeting_transcriber
+from services.metrics import WS_MESSAGES, track_connections
+from services.tracing import trace_span
+from services.transcript_index import transcript_index
+from services.question_answering import question_answerer
+from services.sentiment_timeline import DEFAULT_SPEAKER, sentiment_timeline, speaker_name
+from services.serialization import get_codec, negotiate_codec
+from services.session_store import (
+    ROOM_KEY_PREFIX,
+    SESSION_KEY_PREFIX,
+    TOKEN_KEY_PREFIX,
+    SessionWriteBehind,
+    create_session_store,
+    decode_messages
+)
+from services.transcription import TranscriptionResult, transcribe_audio
+
+
+# Number of past messages sent to the AI as conversation history
+HISTORY_PROMPT_MESSAGES = 10
+
+# Close code for a client_id whose session belongs to someone else (4000-4999 are application-defined)
+CLOSE_INVALID_RESUME_TOKEN = 4401
+
+# Longest track_id accepted from a client (longer ids are truncated)
+MAX_TRACK_ID_LENGTH = 128
+
+# Message types counted under their own metrics label (anything else is "other")
+MESSAGE_TYPES = ("text", "audio", "meeting_audio", "start_listening", "stop_listening", "clear")
+
+
+async def _send_json(websocket: WebSocket, message: dict):
+    """Send an event with the socket's codec, timed as a span of the current trace"""
+    with trace_span("send_json", type=message.get("type")):
+        await get_codec(websocket).send(websocket, message)
+
+
+async def _send_events(websocket: WebSocket, *messages: dict):
+    """Send events produced together, in one frame if the client accepts batches"""
+    with trace_span("send_json", type=",".join(message.get("type", "") for message in messages)):
+        await get_codec(websocket).send_events(websocket, list(messages))
 
 
 class ChatConnectionManager:
@@ -17,47 +83,474 @@ class ChatConnectionManager:
     
     def __init__(self):
         self.active_connections: Dict[str, WebSocket] = {}
-        self.chat_histories: Dict[str, List[dict]] = {}
-        self.meeting_contexts: Dict[str, List[str]] = {}
+        self.chat_histories: Dict[str, MessageRing] = {}
         self.listening_status: Dict[str, bool] = {}
+        # Structure: {client_id: room_id}
+        self.client_rooms: Dict[str, str] = {}
+        # Structure: {room_id: {client_id, ...}}
+        self.rooms: Dict[str, Set[str]] = {}
+        # Meeting context is shared by every client in a room
+        self.meeting_contexts: Dict[str, MessageRing] = {}
+        # Structure: {client_id: monotonic time of last activity}
+        self.last_active: Dict[str, float] = {}
+        # Structure: {client_id: sha256 of the session's resume token}, while connected
+        self.session_tokens: Dict[str, bytes] = {}
+        # Sessions whose history was evicted from memory (and spilled if enabled)
+        self.evicted_sessions: Set[str] = set()
+        self.total_bytes = 0
+        self._sweeper: Optional[asyncio.Task] = None
+        # Histories and meeting contexts outlive their sockets in the session store
+        self.persist_sessions = SESSION_TTL_SECONDS > 0
+        self.session_store = create_session_store()
+        self.session_writer = SessionWriteBehind(self.session_store)
+        self.resumed_sessions = 0
+        self.resumed_rooms = 0
+        self.rejected_resumes = 0
+        
+        if CHAT_SPILL_DIR:
+            os.makedirs(CHAT_SPILL_DIR, exist_ok=True)
     
-    def connect(self, client_id: str, websocket: WebSocket):
-        """Register a new connection"""
+    async def authenticate(self, client_id: str, resume_token: Optional[str]) -> Tuple[Optional[str], bool]:
+        """
+        Check that a connecting client owns the session of its client_id
+        
+        The first connection of a client_id is issued a resume token; the
+        session (its live socket and its stored history) only goes to
+        connections presenting that token until it expires with the session.
+        
+        Args:
+            client_id: Client identifier
+            resume_token: Token the client was issued earlier, if any
+        
+        Returns:
+            Tuple of (token issued to a new session or None, whether an
+            existing session is resumed)
+        
+        Raises:
+            PermissionError: If the client_id has a session and the token doesn't match it
+        """
+        digest = self.session_tokens.get(client_id)
+        if digest is None and self.persist_sessions:
+            stored = await self._load_token(client_id)
+            # Another connection may have claimed the id while the store was read
+            digest = self.session_tokens.get(client_id) or stored
+        
+        if digest is not None:
+            if resume_token and hmac.compare_digest(_token_digest(resume_token), digest):
+                self.session_tokens[client_id] = digest
+                return None, True
+            self.rejected_resumes += 1
+            raise PermissionError("Invalid resume token")
+        
+        token = secrets.token_urlsafe(24)
+        self.session_tokens[client_id] = _token_digest(token)
+        self._persist_token(client_id)
+        return token, False
+    
+    async def _load_token(self, client_id: str) -> Optional[bytes]:
+        """Stored resume token digest of a client's session"""
+        key = TOKEN_KEY_PREFIX + client_id
+        pending = self.session_writer.pending(key)
+        if pending is not None:
+            return pending or None
+        try:
+            return await self.session_store.get(key)
+        except Exception as e:
+            print(f"[Session] Error loading {key}: {e}")
+            return None
+    
+    def _persist_token(self, client_id: str, urgent: bool = False):
+        """Store a session's token digest so it expires together with the session"""
+        digest = self.session_tokens.get(client_id)
+        if self.persist_sessions and digest is not None:
+            self.session_writer.mark(TOKEN_KEY_PREFIX + client_id, digest, urgent)
+    
+    def connect(self, client_id: str, websocket: WebSocket, room_id: Optional[str] = None):
+        """
+        Register a new connection, optionally inside a meeting room
+        
+        Call authenticate() first. A client reconnecting before its old socket
+        was noticed as closed takes over that socket's session; call
+        resume_session() afterwards to restore a session from the store.
+        """
+        # Clients without a room get a private one so state stays isolated
+        room_id = room_id or client_id
+        
+        previous_room = self.client_rooms.get(client_id)
+        if previous_room is not None and previous_room != room_id:
+            self._leave_room(client_id, previous_room)
+        
         self.active_connections[client_id] = websocket
-        self.chat_histories[client_id] = []
-        self.meeting_contexts[client_id] = []
-        self.listening_status[client_id] = False
+        if client_id not in self.chat_histories and client_id not in self.evicted_sessions:
+            self.chat_histories[client_id] = MessageRing(CHAT_HISTORY_CAPACITY, CHAT_SESSION_MAX_BYTES)
+        self.listening_status.setdefault(client_id, False)
+        self.client_rooms[client_id] = room_id
+        self.rooms.setdefault(room_id, set()).add(client_id)
+        if room_id not in self.meeting_contexts:
+            self.meeting_contexts[room_id] = MessageRing(CHAT_CONTEXT_CAPACITY, CHAT_SESSION_MAX_BYTES)
+        self.last_active[client_id] = time.monotonic()
+        self._start_sweeper()
     
-    def disconnect(self, client_id: str):
-        """Clean up on disconnect"""
+    def disconnect(self, client_id: str, websocket: Optional[WebSocket] = None):
+        """
+        Clean up on disconnect
+        
+        The session's history (and the room's meeting context when the last
+        client leaves) is handed to the session store, so a reconnect within
+        SESSION_TTL_SECONDS resumes it.
+        
+        Args:
+            client_id: Client identifier
+            websocket: The closed socket; ignored if the client already reconnected on a new one
+        """
+        if websocket is not None and self.active_connections.get(client_id) not in (None, websocket):
+            return
+        
         if client_id in self.active_connections:
             del self.active_connections[client_id]
         if client_id in self.chat_histories:
-            del self.chat_histories[client_id]
-        if client_id in self.meeting_contexts:
-            del self.meeting_contexts[client_id]
+            self._persist_history(client_id, urgent=True)
+            self.total_bytes -= self.chat_histories.pop(client_id).nbytes
+        # Written again so the token lasts as long as the stored history
+        self._persist_token(client_id, urgent=True)
+        self.session_tokens.pop(client_id, None)
         if client_id in self.listening_status:
             del self.listening_status[client_id]
+        self.last_active.pop(client_id, None)
+        if client_id in self.evicted_sessions:
+            # Eviction already handed the history to the store
+            self.evicted_sessions.discard(client_id)
+            self._delete_spill(client_id)
+        
+        room_id = self.client_rooms.pop(client_id, None)
+        if room_id is not None:
+            self._leave_room(client_id, room_id)
+    
+    def _leave_room(self, client_id: str, room_id: str):
+        """Remove a client from a room, dropping shared room state once the last client leaves"""
+        if room_id not in self.rooms:
+            return
+        self.rooms[room_id].discard(client_id)
+        if len(self.rooms[room_id]) == 0:
+            del self.rooms[room_id]
+            if room_id in self.meeting_contexts:
+                self._persist_context(room_id, urgent=True)
+                self.total_bytes -= self.meeting_contexts.pop(room_id).nbytes
+            meeting_transcriber.forget_room(room_id)
+            question_answerer.forget_room(room_id)
+            transcript_index.forget_room(room_id)
+    
+    def get_room_id(self, client_id: str) -> str:
+        """Get the room a client belongs to"""
+        return self.client_rooms.get(client_id, client_id)
+    
+    def touch(self, client_id: str):
+        """Mark a session as active"""
+        self.last_active[client_id] = time.monotonic()
+    
+    def get_history(self, client_id: str) -> List[dict]:
+        """Get the recent chat history used as AI conversation context"""
+        history = self._get_history_ring(client_id)
+        return history.to_dicts(HISTORY_PROMPT_MESSAGES) if history is not None else []
+    
+    def clear_history(self, client_id: str):
+        """Clear a client's chat history"""
+        history = self._get_history_ring(client_id)
+        if history is not None:
+            self.total_bytes -= history.nbytes
+            history.clear()
+            self._persist_history(client_id)
+    
+    def clear_meeting_context(self, room_id: str):
+        """Clear a room's shared meeting context"""
+        context = self.meeting_contexts.get(room_id)
+        if context is not None:
+            self.total_bytes -= context.nbytes
+            context.clear()
+            self._persist_context(room_id)
+        transcript_index.clear_room(room_id)
+    
+    def get_listening_clients(self, room_id: str) -> Dict[str, WebSocket]:
+        """Get all clients in a room that are listening to the meeting"""
+        return {
+            client_id: self.active_connections[client_id]
+            for client_id in self.rooms.get(room_id, set())
+            if self.listening_status.get(client_id, False)
+            and client_id in self.active_connections
+        }
     
     def add_to_history(self, client_id: str, role: str, content: str):
         """Add message to chat history"""
-        if client_id in self.chat_histories:
-            self.chat_histories[client_id].append({
-                "role": role,
-                "content": content
+        history = self._get_history_ring(client_id)
+        if history is not None:
+            before = history.nbytes
+            history.append(ChatMessage(role, content))
+            self.total_bytes += history.nbytes - before
+            self._persist_history(client_id)
+            self._enforce_global_budget()
+    
+    def add_to_context(self, room_id: str, transcription: str, speaker: Optional[str] = None):
+        """Add transcription to a room's shared meeting context, its searchable transcript and its sentiment timeline"""
+        context = self.meeting_contexts.get(room_id)
+        if context is not None:
+            transcript_index.append(room_id, transcription, speaker)
+            sentiment_timeline.add(room_id, transcription, speaker)
+            before = context.nbytes
+            context.append(ChatMessage("meeting", transcription))
+            self.total_bytes += context.nbytes - before
+            self._persist_context(room_id)
+            self._enforce_global_budget()
+    
+    # ==================== Session Store ====================
+    
+    def _persist_history(self, client_id: str, urgent: bool = False):
+        """Queue a client's history for the next session store batch"""
+        history = self.chat_histories.get(client_id)
+        if self.persist_sessions and history is not None:
+            self.session_writer.mark(SESSION_KEY_PREFIX + client_id, history, urgent)
+    
+    def _persist_context(self, room_id: str, urgent: bool = False):
+        """Queue a room's meeting context for the next session store batch"""
+        context = self.meeting_contexts.get(room_id)
+        if self.persist_sessions and context is not None:
+            self.session_writer.mark(ROOM_KEY_PREFIX + room_id, context, urgent)
+    
+    async def _load_stored(self, key: str, capacity: int) -> List[ChatMessage]:
+        """Records stored under a key, including writes still waiting for the next batch"""
+        pending = self.session_writer.pending(key)
+        if pending is not None:
+            return list(pending)
+        try:
+            data = await self.session_store.get(key)
+            if data is None:
+                return []
+            return list(decode_messages(data, MessageRing(capacity, CHAT_SESSION_MAX_BYTES)))
+        except Exception as e:
+            print(f"[Session] Error loading {key}: {e}")
+            return []
+    
+    def _prepend(self, ring: MessageRing, records: List[ChatMessage]):
+        """Put restored records in front of anything appended while they were loading"""
+        before = ring.nbytes
+        newer = list(ring)
+        ring.clear()
+        for message in records + newer:
+            ring.append(message)
+        self.total_bytes += ring.nbytes - before
+    
+    async def resume_session(self, client_id: str, restore_history: bool = True) -> List[dict]:
+        """
+        Restore a client's history and its room's meeting context
+        
+        Empty state is filled from the session store (or a spilled session
+        from disk), so a reconnect - also to another worker with a shared
+        store - continues the conversation without re-priming the AI. The
+        room's transcript index is reloaded too.
+        
+        Args:
+            client_id: Client identifier
+            restore_history: False for a newly issued session, whose id may
+                still have a stale history in the store; that history is deleted
+        
+        Returns:
+            The client's restored history, oldest first (empty for a new session)
+        """
+        history = self._get_history_ring(client_id)
+        room_id = self.get_room_id(client_id)
+        context = self.meeting_contexts.get(room_id)
+        
+        if self.persist_sessions:
+            if not restore_history:
+                self._persist_history(client_id)
+            elif history is not None and len(history) == 0:
+                records = await self._load_stored(SESSION_KEY_PREFIX + client_id, CHAT_HISTORY_CAPACITY)
+                # The client may have disconnected while the store was read
+                if records and self.chat_histories.get(client_id) is history:
+                    self._prepend(history, records)
+                    self.resumed_sessions += 1
+            
+            if context is not None and len(context) == 0:
+                records = await self._load_stored(ROOM_KEY_PREFIX + room_id, CHAT_CONTEXT_CAPACITY)
+                if records and self.meeting_contexts.get(room_id) is context:
+                    self._prepend(context, records)
+                    self.resumed_rooms += 1
+            
+            self._enforce_global_budget()
+        
+        if room_id in self.rooms:
+            # The stored transcript, or without a transcript store the restored recent context
+            await transcript_index.load_room(room_id, self.meeting_contexts.get(room_id) or ())
+        
+        history = self.chat_histories.get(client_id)
+        return history.to_dicts() if history is not None else []
+    
+    async def close(self):
+        """Write every live session (and pending transcript) to the stores and close them"""
+        for client_id in list(self.chat_histories):
+            self._persist_history(client_id)
+        for room_id in list(self.meeting_contexts):
+            self._persist_context(room_id)
+        await self.session_writer.close()
+        await self.session_store.close()
+        await transcript_index.close()
+    
+    # ==================== Memory Management ====================
+    
+    def _get_history_ring(self, client_id: str) -> Optional[MessageRing]:
+        """Get a client's history ring, reloading it if it was evicted"""
+        if client_id in self.evicted_sessions:
+            self._restore_session(client_id)
+        return self.chat_histories.get(client_id)
+    
+    def evict_session(self, client_id: str):
+        """Move a session's history out of memory, spilling it to disk if enabled"""
+        history = self.chat_histories.get(client_id)
+        if history is None or client_id in self.evicted_sessions:
+            return
+        
+        if CHAT_SPILL_DIR and len(history) > 0:
+            try:
+                with open(self._spill_path(client_id), "w", encoding="utf-8") as f:
+                    json.dump(history.to_dicts(), f)
+            except OSError as e:
+                print(f"Error spilling chat session {client_id}: {e}")
+        # The write-behind batch keeps the ring until it is stored
+        self._persist_history(client_id)
+        
+        self.total_bytes -= history.nbytes
+        del self.chat_histories[client_id]
+        self.evicted_sessions.add(client_id)
+    
+    def _restore_session(self, client_id: str):
+        """Reload an evicted session's history"""
+        self.evicted_sessions.discard(client_id)
+        history = MessageRing(CHAT_HISTORY_CAPACITY, CHAT_SESSION_MAX_BYTES)
+        
+        if CHAT_SPILL_DIR:
+            try:
+                with open(self._spill_path(client_id), "r", encoding="utf-8") as f:
+                    for message in json.load(f):
+                        history.append(ChatMessage.from_dict(message))
+            except (OSError, ValueError, KeyError):
+                pass
+            self._delete_spill(client_id)
+        
+        self.chat_histories[client_id] = history
+        self.total_bytes += history.nbytes
+    
+    def _spill_path(self, client_id: str) -> str:
+        safe_id = "".join(c if c.isalnum() or c in "-_" else "_" for c in client_id)
+        return os.path.join(CHAT_SPILL_DIR, f"{safe_id}.json")
+    
+    def _delete_spill(self, client_id: str):
+        if CHAT_SPILL_DIR:
+            try:
+                os.remove(self._spill_path(client_id))
+            except OSError:
+                pass
+    
+    def evict_idle_sessions(self, idle_seconds: float = CHAT_SESSION_IDLE_SECONDS) -> int:
+        """Evict sessions with no activity for idle_seconds, returning how many"""
+        now = time.monotonic()
+        idle = [
+            client_id for client_id, last in self.last_active.items()
+            if now - last >= idle_seconds and client_id in self.chat_histories
+        ]
+        for client_id in idle:
+            self.evict_session(client_id)
+        return len(idle)
+    
+    def _enforce_global_budget(self):
+        """Evict least recently active sessions until under the global budget"""
+        if self.total_bytes <= CHAT_GLOBAL_MAX_BYTES:
+            return
+        for client_id in sorted(self.chat_histories, key=lambda c: self.last_active.get(c, 0.0)):
+            if self.total_bytes <= CHAT_GLOBAL_MAX_BYTES:
+                break
+            self.evict_session(client_id)
+    
+    def _start_sweeper(self):
+        """Start the idle-session sweeper on first use"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_idle_sessions())
+    
+    async def _sweep_idle_sessions(self):
+        """Periodically evict idle sessions"""
+        interval = max(1.0, min(CHAT_SESSION_IDLE_SECONDS / 4, 60.0))
+        while self.active_connections:
+            await asyncio.sleep(interval)
+            evicted = self.evict_idle_sessions()
+            if evicted:
+                print(f"Evicted {evicted} idle chat session(s)")
+    
+    def connection_counts(self) -> Dict[str, int]:
+        """Open connections per room"""
+        return {room_id: len(clients) for room_id, clients in self.rooms.items()}
+    
+    def session_stats(self) -> dict:
+        """Per-session and total memory use"""
+        now = time.monotonic()
+        transcript_stats = transcript_index.stats()
+        sessions = []
+        # Ids are left out: a client_id is all it takes to resume someone's session
+        for client_id in self.active_connections:
+            history = self.chat_histories.get(client_id)
+            sessions.append({
+                "messages": len(history) if history is not None else 0,
+                "bytes": history.nbytes if history is not None else 0,
+                "idle_seconds": round(now - self.last_active.get(client_id, now), 1),
+                "evicted": client_id in self.evicted_sessions,
+                "codec": get_codec(self.active_connections[client_id]).name,
+                "listening": self.listening_status.get(client_id, False)
             })
+        return {
+            "total_bytes": self.total_bytes,
+            "global_max_bytes": CHAT_GLOBAL_MAX_BYTES,
+            "session_max_bytes": CHAT_SESSION_MAX_BYTES,
+            "store": {
+                **self.session_store.stats(),
+                **self.session_writer.stats(),
+                "enabled": self.persist_sessions,
+                "resumed_sessions": self.resumed_sessions,
+                "resumed_rooms": self.resumed_rooms,
+                "rejected_resumes": self.rejected_resumes
+            },
+            "sessions": sessions,
+            "transcripts": {
+                **transcript_stats,
+                "rooms": [
+                    {key: value for key, value in room.items() if key != "room_id"}
+                    for room in transcript_stats["rooms"]
+                ]
+            },
+            "sentiment": sentiment_timeline.stats(),
+            "rooms": [
+                {
+                    "clients": len(self.rooms.get(room_id, ())),
+                    "context_entries": len(context),
+                    "context_bytes": context.nbytes
+                }
+                for room_id, context in self.meeting_contexts.items()
+            ]
+        }
     
-    def add_to_context(self, client_id: str, transcription: str):
-        """Add transcription to meeting context"""
-        if client_id in self.meeting_contexts:
-            self.meeting_contexts[client_id].append(transcription)
-            # Keep only last 50 transcriptions
-            if len(self.meeting_contexts[client_id]) > 50:
-                self.meeting_contexts[client_id] = self.meeting_contexts[client_id][-50:]
+    async def broadcast_to_listeners(self, room_id: str, message: dict):
+        """Send a JSON message to every listening client in a room"""
+        for client_id, websocket in self.get_listening_clients(room_id).items():
+            try:
+                await _send_json(websocket, message)
+            except Exception as e:
+                print(f"Error sending to {client_id}: {e}")
+
+
+def _token_digest(token: str) -> bytes:
+    """Digest a resume token is compared and stored as"""
+    return hashlib.sha256(token.encode()).digest()
 
 
 # Global connection manager instance
 chat_manager = ChatConnectionManager()
+track_connections("ai_chat", chat_manager.connection_counts)
 
 
 async def analyze_and_respond_to_question(
@@ -69,45 +562,34 @@ async def analyze_and_respond_to_question(
     if not transcription or len(transcription.strip()) < 5:
         return False
     
-    if is_question(transcription):
+    with trace_span("is_question"):
+        question = is_question(transcription)
+    
+    if question:
         print(f"Question detected: {transcription}")
         
-        # Notify about detected question
-        await websocket.send_json({
+        # Notify about detected question and send typing indicator
+        await _send_events(websocket, {
             "type": "question_detected",
             "question": transcription
-        })
-        
-        # Send typing indicator
-        await websocket.send_json({
+        }, {
             "type": "typing",
             "status": True
         })
         
-        # Get meeting context
-        context = chat_manager.meeting_contexts.get(client_id, [])
-        
-        # Prepare question with context
-        question_prompt = f"Someone in the meeting asked: \"{transcription}\"\n\nPlease provide a helpful, concise answer to this question."
-        
-        # Get AI response
-        response = await process_text_with_gemini(
-            question_prompt,
-            chat_manager.chat_histories.get(client_id, []),
-            context
-        )
+        # Get AI response, shared with every listener in the room
+        room_id = chat_manager.get_room_id(client_id)
+        response = await question_answerer.answer(room_id, transcription)
         
         # Add to chat history
         chat_manager.add_to_history(client_id, "user", f"[Meeting Question] {transcription}")
         chat_manager.add_to_history(client_id, "assistant", response)
         
         # Send response
-        await websocket.send_json({
+        await _send_events(websocket, {
             "type": "typing",
             "status": False
-        })
-        
-        await websocket.send_json({
+        }, {
             "type": "message",
             "role": "assistant",
             "content": f"📝 **Answer to the question:**\n\n{response}"
@@ -118,70 +600,161 @@ async def analyze_and_respond_to_question(
     return False
 
 
-async def websocket_ai_chat(websocket: WebSocket, client_id: str):
+async def websocket_ai_chat(
+    websocket: WebSocket,
+    client_id: str,
+    room_id: Optional[str] = None,
+    batch: bool = False,
+    resume_token: Optional[str] = None
+):
     """
     WebSocket endpoint for real-time AI chat with audio support
     
+    Clients connected with the same room_id share meeting transcription and
+    meeting context; clients without a room_id get a private room.
+    
+    A new session is sent {"type": "session", "resume_token": "..."} before
+    the welcome message. Reconnecting with the same client_id and that
+    resume_token within SESSION_TTL_SECONDS resumes the chat history, which
+    is sent as {"type": "history", "messages": [...]} instead of the welcome
+    message. A client_id whose session has a different token is refused
+    with close code 4401; pick a new client_id.
+    
+    Frames are JSON text, or MessagePack binary when the client offers the
+    "msgpack" subprotocol. With batch=True, events sent together arrive as
+    one {"type": "batch", "events": [...]} frame.
+    
     Message types:
     - text: {"type": "text", "content": "user message"}
-    - audio: {"type": "audio", "data": "base64_encoded_audio"}
-    - meeting_audio: {"type": "meeting_audio", "data": "base64_encoded_audio"}
+    - audio: {"type": "audio", "data": "base64_encoded_audio", "backend": "optional"}
+    - meeting_audio: {"type": "meeting_audio", "data": "base64_encoded_audio",
+                      "track_id": "optional speaker/track id", "speaker": "optional name",
+                      "timestamp": optional_capture_time_seconds, "backend": "optional"}
+      With a track_id (the speaker's participant identity) the chunk is
+      transcribed once per room and sent to every listener; without one only
+      the sender gets the transcription.
+    
+    "backend" selects the transcription backend (gemini, local, hybrid). In
+    hybrid mode a later "transcription_refined" / "meeting_transcription_refined"
+    event carries the Gemini-refined text.
     - start_listening: {"type": "start_listening"}
     - stop_listening: {"type": "stop_listening"}
     - clear: {"type": "clear"} - Clear chat history
     """
-    await websocket.accept()
-    chat_manager.connect(client_id, websocket)
+    codec = negotiate_codec(websocket, batch)
+    await websocket.accept(subprotocol=codec.subprotocol)
+    websocket.state.codec = codec
     
-    # Send welcome message
-    await websocket.send_json({
-        "type": "message",
-        "role": "assistant",
-        "content": "Hello! I'm your AI meeting assistant. I can listen to your meeting and automatically answer questions. Click 'Listen to Meeting' to get started, or type/speak your questions directly!"
-    })
+    try:
+        issued_token, resumed = await chat_manager.authenticate(client_id, resume_token)
+    except PermissionError:
+        await _send_json(websocket, {"type": "error", "content": "Invalid resume token for this session"})
+        await websocket.close(code=CLOSE_INVALID_RESUME_TOKEN)
+        return
+    chat_manager.connect(client_id, websocket, room_id)
     
     try:
+        if issued_token:
+            await _send_json(websocket, {"type": "session", "resume_token": issued_token})
+        history = await chat_manager.resume_session(client_id, restore_history=resumed)
+        if history:
+            # Reconnect: let the client redraw the conversation it may have lost
+            await _send_json(websocket, {
+                "type": "history",
+                "messages": [{"role": message["role"], "content": message["content"]} for message in history]
+            })
+        else:
+            # Send welcome message
+            await _send_json(websocket, {
+                "type": "message",
+                "role": "assistant",
+                "content": "Hello! I'm your AI meeting assistant. I can listen to your meeting and automatically answer questions. Click 'Listen to Meeting' to get started, or type/speak your questions directly!"
+            })
+        
         while True:
-            data = await websocket.receive_json()
+            data = await codec.receive(websocket)
+            if not isinstance(data, dict):
+                continue
+            chat_manager.touch(client_id)
+            if client_id in chat_manager.evicted_sessions:
+                await chat_manager.resume_session(client_id)
             msg_type = data.get("type", "text")
+            msg_label = msg_type if msg_type in MESSAGE_TYPES else "other"
+            WS_MESSAGES.labels("ai_chat", msg_label).inc()
             
-            if msg_type == "text":
-                await _handle_text_message(data, client_id, websocket)
+            # One trace per message: decode, transcription, AI calls and sends
+            with trace_span(f"ai_chat.{msg_label}", client_id=client_id, room_id=chat_manager.get_room_id(client_id)):
+                if msg_type == "text":
+                    await _run_admitted("ai_message", _handle_text_message, data, client_id, websocket)
                 
-            elif msg_type == "audio":
-                await _handle_audio_message(data, client_id, websocket)
+                elif msg_type == "audio":
+                    await _run_admitted("ai_message", _handle_audio_message, data, client_id, websocket)
                 
-            elif msg_type == "meeting_audio":
-                await _handle_meeting_audio(data, client_id, websocket)
+                elif msg_type == "meeting_audio":
+                    await _run_admitted("meeting_audio", _handle_meeting_audio, data, client_id, websocket)
                 
-            elif msg_type == "start_listening":
-                chat_manager.listening_status[client_id] = True
-                await websocket.send_json({
-                    "type": "status",
-                    "status": "listening"
-                })
+                elif msg_type == "start_listening":
+                    chat_manager.listening_status[client_id] = True
+                    await _send_json(websocket, {
+                        "type": "status",
+                        "status": "listening"
+                    })
                 
-            elif msg_type == "stop_listening":
-                chat_manager.listening_status[client_id] = False
-                await websocket.send_json({
-                    "type": "status",
-                    "status": "stopped"
-                })
+                elif msg_type == "stop_listening":
+                    chat_manager.listening_status[client_id] = False
+                    await _send_json(websocket, {
+                        "type": "status",
+                        "status": "stopped"
+                    })
                 
-            elif msg_type == "clear":
-                chat_manager.chat_histories[client_id] = []
-                chat_manager.meeting_contexts[client_id] = []
-                await websocket.send_json({
-                    "type": "cleared",
-                    "content": "Chat history cleared"
-                })
+                elif msg_type == "clear":
+                    chat_manager.clear_history(client_id)
+                    # Meeting context is shared, only clear it for a room of one
+                    client_room = chat_manager.get_room_id(client_id)
+                    if len(chat_manager.rooms.get(client_room, set())) <= 1:
+                        chat_manager.clear_meeting_context(client_room)
+                    await _send_json(websocket, {
+                        "type": "cleared",
+                        "content": "Chat history cleared"
+                    })
                 
     except WebSocketDisconnect:
         print(f"Client {client_id} disconnected")
     except Exception as e:
         print(f"WebSocket error: {e}")
     finally:
-        chat_manager.disconnect(client_id)
+        chat_manager.disconnect(client_id, websocket)
+
+
+async def _run_admitted(kind: str, handler, data: dict, client_id: str, websocket: WebSocket):
+    """
+    Run an expensive message handler if admission control allows it
+    
+    Over the client's or room's rate limit, or while the load shedder is
+    saturated, the message is dropped; the client is told when to retry
+    (except for meeting audio, which is simply sent again with the next chunk).
+    """
+    retry_after = check_message(kind, client_id, chat_manager.get_room_id(client_id))
+    if retry_after:
+        content = "You're sending messages too quickly."
+    elif not load_shedder.try_acquire():
+        ADMISSION_REJECTIONS.labels(kind, "shed").inc()
+        retry_after = SHED_RETRY_AFTER_SECONDS
+        content = "The assistant is busy right now."
+    else:
+        try:
+            await handler(data, client_id, websocket)
+        finally:
+            load_shedder.release()
+        return
+    
+    if kind != "meeting_audio":
+        seconds = int(retry_after_header(retry_after))
+        await _send_json(websocket, {
+            "type": "error",
+            "content": f"{content} Please try again in {seconds}s.",
+            "retry_after": seconds
+        })
 
 
 async def _handle_text_message(data: dict, client_id: str, websocket: WebSocket):
@@ -194,7 +767,7 @@ async def _handle_text_message(data: dict, client_id: str, websocket: WebSocket)
     chat_manager.add_to_history(client_id, "user", user_message)
     
     # Send typing indicator
-    await websocket.send_json({
+    await _send_json(websocket, {
         "type": "typing",
         "status": True
     })
@@ -202,20 +775,18 @@ async def _handle_text_message(data: dict, client_id: str, websocket: WebSocket)
     # Get AI response with meeting context
     response = await process_text_with_gemini(
         user_message,
-        chat_manager.chat_histories[client_id],
-        chat_manager.meeting_contexts.get(client_id, [])
+        chat_manager.get_history(client_id),
+        room_id=chat_manager.get_room_id(client_id)
     )
     
     # Add AI response to history
     chat_manager.add_to_history(client_id, "assistant", response)
     
     # Send response
-    await websocket.send_json({
+    await _send_events(websocket, {
         "type": "typing",
         "status": False
-    })
-    
-    await websocket.send_json({
+    }, {
         "type": "message",
         "role": "assistant",
         "content": response
@@ -230,29 +801,38 @@ async def _handle_audio_message(data: dict, client_id: str, websocket: WebSocket
     
     try:
         # Decode audio
-        audio_data = base64.b64decode(audio_base64)
+        with trace_span("audio.decode", base64_chars=len(audio_base64)):
+            audio_data = base64.b64decode(audio_base64)
         
         # Send processing status
-        await websocket.send_json({
+        await _send_json(websocket, {
             "type": "status",
             "status": "transcribing"
         })
         
+        async def send_refined(refined: TranscriptionResult):
+            await _send_json(websocket, {
+                "type": "transcription_refined",
+                "content": refined.text
+            })
+        
         # Transcribe audio
-        transcription = await transcribe_audio_with_gemini(audio_data)
+        result = await transcribe_audio(
+            audio_data,
+            backend=data.get("backend"),
+            on_refined=send_refined
+        )
+        transcription = result.text
         
         if transcription:
-            # Send transcription to user
-            await websocket.send_json({
-                "type": "transcription",
-                "content": transcription
-            })
-            
             # Add transcription to history
             chat_manager.add_to_history(client_id, "user", transcription)
             
-            # Send typing indicator
-            await websocket.send_json({
+            # Send transcription to user with the typing indicator
+            await _send_events(websocket, {
+                "type": "transcription",
+                "content": transcription
+            }, {
                 "type": "typing",
                 "status": True
             })
@@ -260,40 +840,49 @@ async def _handle_audio_message(data: dict, client_id: str, websocket: WebSocket
             # Get AI response
             response = await process_text_with_gemini(
                 transcription,
-                chat_manager.chat_histories[client_id],
-                chat_manager.meeting_contexts.get(client_id, [])
+                chat_manager.get_history(client_id),
+                room_id=chat_manager.get_room_id(client_id)
             )
             
             # Add AI response to history
             chat_manager.add_to_history(client_id, "assistant", response)
             
             # Send response
-            await websocket.send_json({
+            await _send_events(websocket, {
                 "type": "typing",
                 "status": False
-            })
-            
-            await websocket.send_json({
+            }, {
                 "type": "message",
                 "role": "assistant",
                 "content": response
             })
         else:
-            await websocket.send_json({
+            await _send_json(websocket, {
                 "type": "error",
                 "content": "Could not transcribe audio. Please try again or type your message."
             })
             
+    except UnsupportedAudioFormat as e:
+        await _send_json(websocket, {
+            "type": "error",
+            "content": f"{e}. Please record again or type your message."
+        })
     except Exception as e:
         print(f"Error processing audio: {e}")
-        await websocket.send_json({
+        await _send_json(websocket, {
             "type": "error",
             "content": "Error processing audio. Please try again."
         })
 
 
 async def _handle_meeting_audio(data: dict, client_id: str, websocket: WebSocket):
-    """Handle meeting audio (from other participants)"""
+    """
+    Handle meeting audio (from other participants)
+    
+    Chunks tagged with a track_id are transcribed once per room and the result
+    is fanned out to every listener. Untagged chunks can't be matched against
+    other listeners' uploads, so only the sender gets their transcription.
+    """
     if not chat_manager.listening_status.get(client_id, False):
         return
     
@@ -301,26 +890,62 @@ async def _handle_meeting_audio(data: dict, client_id: str, websocket: WebSocket
     if not audio_base64:
         return
     
+    room_id = chat_manager.get_room_id(client_id)
+    track_id = data.get("track_id")
+    track_id = track_id[:MAX_TRACK_ID_LENGTH] if isinstance(track_id, str) and track_id else None
+    
     try:
         # Decode audio
-        audio_data = base64.b64decode(audio_base64)
+        with trace_span("audio.decode", base64_chars=len(audio_base64)):
+            audio_data = base64.b64decode(audio_base64)
         
-        # Transcribe audio
-        transcription = await transcribe_audio_with_gemini(audio_data)
+        name = speaker_name(data.get("speaker"))
+        speaker = name or DEFAULT_SPEAKER
+        
+        async def send_refined(refined: TranscriptionResult):
+            message = {
+                "type": "meeting_transcription_refined",
+                "content": refined.text,
+                "speaker": speaker
+            }
+            if track_id:
+                await chat_manager.broadcast_to_listeners(room_id, message)
+            else:
+                await _send_json(websocket, message)
+        
+        # Transcribe once per room; duplicates from other listeners return None
+        transcription = await meeting_transcriber.transcribe(
+            room_id,
+            audio_data,
+            track_id=track_id,
+            timestamp=data.get("timestamp"),
+            backend=data.get("backend"),
+            on_refined=send_refined
+        )
         
         if transcription and len(transcription.strip()) > 3:
-            # Add to meeting context
-            chat_manager.add_to_context(client_id, transcription)
+            # Add to the room's shared meeting context
+            chat_manager.add_to_context(room_id, transcription, name)
             
-            # Send meeting transcription to user
-            await websocket.send_json({
+            message = {
                 "type": "meeting_transcription",
                 "content": transcription,
-                "speaker": "Meeting"
-            })
+                "speaker": speaker
+            }
+            if not track_id:
+                await _send_json(websocket, message)
+                await analyze_and_respond_to_question(transcription, client_id, websocket)
+                return
+            
+            # Fan the transcription out to every listener in the room
+            await chat_manager.broadcast_to_listeners(room_id, message)
             
-            # Check if it's a question and respond
-            await analyze_and_respond_to_question(transcription, client_id, websocket)
+            # Check if it's a question and respond to each listener
+            listeners = chat_manager.get_listening_clients(room_id)
+            await asyncio.gather(*[
+                analyze_and_respond_to_question(transcription, listener_id, listener_ws)
+                for listener_id, listener_ws in listeners.items()
+            ], return_exceptions=True)
             
     except Exception as e:
         print(f"Error processing meeting audio: {e}")
@@ -0,0 +1,384 @@
+"""
+Code Room WebSocket - Room-shared code execution for the collaborative editor
+"""
+import asyncio
+import time
+import uuid
+from typing import Dict, List, Optional, Tuple
+from fastapi import WebSocket, WebSocketDisconnect
+
+from config import CODE_OUTPUT_FLUSH_MS, CODE_OUTPUT_MAX_BYTES
+from services.admission import (
+    ADMISSION_REJECTIONS,
+    SHED_RETRY_AFTER_SECONDS,
+    check_message,
+    load_shedder,
+    retry_after_header
+)
+from services.code_execution import stream_code_execution
+from services.metrics import CODE_ROOM_RUN_REQUESTS, WS_MESSAGES, track_connections
+from services.serialization import dumps_text, loads
+from services.tracing import trace_span
+from websockets.connection import ClientConnection
+
+
+# Outcome of asking a room to run code
+EXECUTION_STARTED = "started"
+EXECUTION_ATTACHED = "attached"
+EXECUTION_BUSY = "busy"
+
+
+class RoomExecution:
+    """One run of the room's code: its request, streamed output and final result"""
+
+    def __init__(self, code: str, language: str, stdin: str, triggered_by: Optional[str]):
+        self.execution_id = uuid.uuid4().hex[:12]
+        self.code = code
+        self.language = language
+        self.stdin = stdin
+        self.triggered_by = triggered_by
+        self.started_at = time.time()
+        self.attached = 0
+        # Output already broadcast, and chunks waiting for the next flush
+        self.output: List[Dict[str, str]] = []
+        self.output_bytes = 0
+        self.truncated = False
+        self.pending: List[Dict[str, str]] = []
+        self.flush_handle: Optional[asyncio.TimerHandle] = None
+        self.result: Optional[dict] = None
+        self.task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self.result is None
+
+    def same_request(self, code: str, language: str, stdin: str) -> bool:
+        return (self.code, self.language, self.stdin) == (code, language, stdin)
+
+    def add_output(self, stream: str, text: str) -> bool:
+        """
+        Buffer an output chunk for broadcast
+
+        Returns:
+            False once the broadcast output limit has been reached
+        """
+        if self.truncated:
+            return False
+        remaining = CODE_OUTPUT_MAX_BYTES - self.output_bytes
+        data = text.encode("utf-8")
+        if len(data) > remaining:
+            text = data[:remaining].decode("utf-8", errors="ignore")
+            self.truncated = True
+        self.output_bytes += len(text.encode("utf-8"))
+
+        # Merge consecutive chunks of the same stream
+        if self.pending and self.pending[-1]["stream"] == stream:
+            self.pending[-1]["data"] += text
+        elif text:
+            self.pending.append({"stream": stream, "data": text})
+        return not self.truncated
+
+    def take_pending(self) -> List[Dict[str, str]]:
+        chunks, self.pending = self.pending, []
+        for chunk in chunks:
+            if self.output and self.output[-1]["stream"] == chunk["stream"]:
+                self.output[-1] = {"stream": chunk["stream"], "data": self.output[-1]["data"] + chunk["data"]}
+            else:
+                self.output.append(dict(chunk))
+        return chunks
+
+    def broadcast_result(self) -> Optional[dict]:
+        """The final result with output capped like the stream"""
+        if self.result is None:
+            return None
+        limit = CODE_OUTPUT_MAX_BYTES
+        return {
+            **self.result,
+            "output": self.result["output"][:limit],
+            "error": self.result["error"][:limit]
+        }
+
+    def to_dict(self, include_output: bool = False) -> dict:
+        data = {
+            "execution_id": self.execution_id,
+            "language": self.language,
+            "triggered_by": self.triggered_by,
+            "started_at": self.started_at,
+            "running": self.running,
+            "result": self.broadcast_result()
+        }
+        if include_output:
+            data["output"] = self.output
+            data["truncated"] = self.truncated
+        return data
+
+
+class CodeRoomManager:
+    """
+    Runs code once per collaborative room and shares the run with every member
+
+    Members connect to /ws/code/{room_id}. A run started from any of them
+    (or from /api/execute-code with a room_id) is broadcast as it happens:
+    a started event, coalesced output chunks and the final
+    CodeExecutionResponse. Requests for the same code while it is running
+    attach to the in-flight run instead of executing it again.
+    """
+
+    def __init__(self):
+        # Structure: {room_id: {client_id: ClientConnection, ...}}
+        self.rooms: Dict[str, Dict[str, ClientConnection]] = {}
+        # Latest execution (running or finished) per room
+        self.executions: Dict[str, RoomExecution] = {}
+        self.executions_started = 0
+        self.duplicates_suppressed = 0
+        self.busy_rejections = 0
+
+    def join_room(self, room_id: str, client_id: str, websocket: WebSocket) -> ClientConnection:
+        """Add a client to a room and send it the current or last execution"""
+        connection = ClientConnection(
+            client_id,
+            websocket,
+            on_evicted=lambda conn, reason: self.leave_room(room_id, conn.client_id)
+        )
+        connection.start()
+        self.rooms.setdefault(room_id, {})[client_id] = connection
+
+        execution = self.executions.get(room_id)
+        if execution is not None:
+            connection.send(dumps_text({"type": "execution_state", "execution": execution.to_dict(include_output=True)}))
+        return connection
+
+    def leave_room(self, room_id: str, client_id: str):
+        """Remove a client from a room"""
+        clients = self.rooms.get(room_id)
+        if clients is None or client_id not in clients:
+            return
+        clients.pop(client_id).stop()
+        if not clients:
+            del self.rooms[room_id]
+            execution = self.executions.get(room_id)
+            if execution is not None and not execution.running:
+                del self.executions[room_id]
+
+    def broadcast(self, room_id: str, message: dict):
+        """Queue a JSON message for every client in a room (never blocks)"""
+        clients = self.rooms.get(room_id)
+        if not clients:
+            return
+        data = dumps_text(message)
+        for connection in list(clients.values()):
+            connection.send(data)
+
+    def start_execution(
+        self,
+        room_id: str,
+        code: str,
+        language: str,
+        stdin: str = "",
+        triggered_by: Optional[str] = None,
+        source: str = "ws"
+    ) -> Tuple[RoomExecution, str]:
+        """
+        Run code for a room, or attach to the run already in flight
+
+        Args:
+            source: Where the request came from ("ws" or "http"), for metrics
+
+        Returns:
+            Tuple of (execution, EXECUTION_STARTED / EXECUTION_ATTACHED / EXECUTION_BUSY).
+            Busy means different code is already running; the returned
+            execution is the one in flight.
+        """
+        current = self.executions.get(room_id)
+        if current is not None and current.running:
+            if current.same_request(code, language, stdin):
+                current.attached += 1
+                self.duplicates_suppressed += 1
+                CODE_ROOM_RUN_REQUESTS.labels(source, EXECUTION_ATTACHED).inc()
+                return current, EXECUTION_ATTACHED
+            self.busy_rejections += 1
+            CODE_ROOM_RUN_REQUESTS.labels(source, EXECUTION_BUSY).inc()
+            return current, EXECUTION_BUSY
+
+        execution = RoomExecution(code, language, stdin, triggered_by)
+        self.executions[room_id] = execution
+        self.executions_started += 1
+        CODE_ROOM_RUN_REQUESTS.labels(source, EXECUTION_STARTED).inc()
+        self.broadcast(room_id, {"type": "execution_started", "execution": execution.to_dict()})
+        execution.task = asyncio.get_running_loop().create_task(self._run(room_id, execution))
+        return execution, EXECUTION_STARTED
+
+    async def execute(
+        self,
+        room_id: str,
+        code: str,
+        language: str,
+        stdin: str = "",
+        triggered_by: Optional[str] = None,
+        source: str = "http"
+    ) -> Tuple[dict, str]:
+        """
+        Run code for a room and wait for the result
+
+        Returns:
+            Tuple of (CodeExecutionResponse dict, start status)
+        """
+        execution, status = self.start_execution(room_id, code, language, stdin, triggered_by, source)
+        if status == EXECUTION_BUSY:
+            return {
+                "success": False,
+                "output": "",
+                "error": "Another execution is already running in this room",
+                "execution_time": ""
+            }, status
+        # The run outlives a caller that disconnects
+        return await asyncio.shield(execution.task), status
+
+    async def _run(self, room_id: str, execution: RoomExecution) -> dict:
+        with trace_span("code_room.execution", room_id=room_id, execution_id=execution.execution_id):
+            success, output, error, execution_time = await stream_code_execution(
+                code=execution.code,
+                language=execution.language,
+                stdin=execution.stdin,
+                on_output=lambda stream, text: self._on_output(room_id, execution, stream, text)
+            )
+        self._flush_output(room_id, execution)
+        execution.result = {
+            "success": success,
+            "output": output,
+            "error": error,
+            "execution_time": execution_time
+        }
+        self.broadcast(room_id, {
+            "type": "execution_result",
+            "execution_id": execution.execution_id,
+            "result": execution.broadcast_result(),
+            "truncated": execution.truncated
+        })
+
+        # Nobody is left to show it to
+        if room_id not in self.rooms and self.executions.get(room_id) is execution:
+            del self.executions[room_id]
+        return execution.result
+
+    def _on_output(self, room_id: str, execution: RoomExecution, stream: str, text: str):
+        """Buffer output and flush it at most once per CODE_OUTPUT_FLUSH_MS"""
+        if not execution.add_output(stream, text) and not execution.pending:
+            return
+        if execution.flush_handle is None:
+            execution.flush_handle = asyncio.get_running_loop().call_later(
+                CODE_OUTPUT_FLUSH_MS / 1000, self._flush_output, room_id, execution
+            )
+
+    def _flush_output(self, room_id: str, execution: RoomExecution):
+        if execution.flush_handle is not None:
+            execution.flush_handle.cancel()
+            execution.flush_handle = None
+        chunks = execution.take_pending()
+        if chunks:
+            self.broadcast(room_id, {
+                "type": "execution_output",
+                "execution_id": execution.execution_id,
+                "chunks": chunks,
+                "truncated": execution.truncated
+            })
+
+    def connection_counts(self) -> Dict[str, int]:
+        """Open connections per room"""
+        return {room_id: len(clients) for room_id, clients in self.rooms.items()}
+
+    def queue_depth(self) -> int:
+        """Frames waiting in every client's send queue"""
+        return sum(conn.queue_depth for clients in self.rooms.values() for conn in clients.values())
+
+    def stats(self) -> dict:
+        """Execution counts and per-room state"""
+        return {
+            "rooms": len(self.rooms),
+            "clients": sum(len(clients) for clients in self.rooms.values()),
+            "executions_started": self.executions_started,
+            "duplicates_suppressed": self.duplicates_suppressed,
+            "busy_rejections": self.busy_rejections,
+            "executions": {
+                room_id: execution.to_dict()
+                for room_id, execution in self.executions.items()
+            }
+        }
+
+
+# Global code room manager instance
+code_room_manager = CodeRoomManager()
+track_connections("code", code_room_manager.connection_counts, code_room_manager.queue_depth)
+
+
+async def websocket_code_room(websocket: WebSocket, room_id: str, participant: Optional[str] = None):
+    """
+    WebSocket endpoint for room-shared code execution
+
+    Client messages:
+    - run: {"type": "run", "code": "...", "language": "python", "stdin": ""}
+
+    Server messages:
+    - execution_state: current or last execution, sent on join (with output so far)
+    - execution_started / execution_output / execution_result: a run in progress
+    - execution_attached: the same code was already running, no second run started
+    - execution_busy: different code is already running in the room
+    - execution_rejected: over the run rate limit or the server is overloaded (with retry_after)
+    - error: the message was not a JSON object, or a run's fields were not strings
+    """
+    await websocket.accept()
+
+    client_id = f"code_{int(time.time() * 1000)}_{id(websocket)}"
+    connection = code_room_manager.join_room(room_id, client_id, websocket)
+
+    try:
+        while True:
+            data = await websocket.receive_text()
+            try:
+                message = loads(data)
+            except ValueError:
+                connection.send(dumps_text({"type": "error", "message": "Invalid JSON"}))
+                continue
+            if not isinstance(message, dict):
+                connection.send(dumps_text({"type": "error", "message": "Expected a JSON object"}))
+                continue
+
+            if message.get("type") != "run":
+                WS_MESSAGES.labels("code", "other").inc()
+                continue
+            WS_MESSAGES.labels("code", "run").inc()
+            if not all(isinstance(message.get(field, ""), str) for field in ("code", "language", "stdin")):
+                connection.send(dumps_text({"type": "error", "message": "code, language and stdin must be strings"}))
+                continue
+
+            retry_after = check_message("code_run", client_id, room_id)
+            shed = not retry_after and load_shedder.is_overloaded()
+            if shed:
+                ADMISSION_REJECTIONS.labels("code_run", "shed").inc()
+            if retry_after or shed:
+                connection.send(dumps_text({
+                    "type": "execution_rejected",
+                    "reason": "rate_limited" if retry_after else "busy",
+                    "retry_after": int(retry_after_header(retry_after or SHED_RETRY_AFTER_SECONDS))
+                }))
+                continue
+
+            execution, status = code_room_manager.start_execution(
+                room_id,
+                code=message.get("code", ""),
+                language=message.get("language", "python"),
+                stdin=message.get("stdin", ""),
+                triggered_by=participant
+            )
+            if status != EXECUTION_STARTED:
+                connection.send(dumps_text({
+                    "type": f"execution_{status}",
+                    "execution": execution.to_dict()
+                }))
+
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        print(f"[Code] Error in room {room_id}: {e}")
+    finally:
+        code_room_manager.leave_room(room_id, client_id)
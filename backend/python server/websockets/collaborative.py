@@ -1,105 +1,575 @@
 """
 Collaborative WebSocket - Yjs document synchronization for code editor
 """
+import asyncio
 import time
-from typing import Dict
+from typing import Dict, Optional, Set
 from fastapi import WebSocket, WebSocketDisconnect
 
+from pycrdt import get_update, merge_updates
+
+from config import (
+    YJS_AWARENESS_INTERVAL_MS,
+    YJS_BATCH_MAX_BYTES,
+    YJS_BATCH_WINDOW_MS,
+    YJS_ROOM_IDLE_SECONDS,
+    YJS_STORE_PATH
+)
+from services.room_relay import (
+    RELAY_AWARENESS,
+    RELAY_STATE,
+    RELAY_SYNC,
+    RELAY_UPDATE,
+    create_room_relay
+)
+from services.metrics import WS_MESSAGES, track_connections
+from services.room_store import RoomStore
+from services.yjs_awareness import REMOVED_STATE, RoomAwareness
+from services.yjs_batch import BatchMetrics, UpdateBatch
+from services.yjs_document import RoomDocument
+from websockets.connection import ClientConnection
+from services.yjs_protocol import (
+    MESSAGE_AWARENESS,
+    MESSAGE_QUERY_AWARENESS,
+    MESSAGE_SYNC,
+    SYNC_STEP1,
+    SYNC_STEP2,
+    SYNC_UPDATE,
+    EMPTY_UPDATE,
+    awareness_message,
+    encode_awareness_update,
+    parse_message,
+    sync_step1_message,
+    sync_step2_message,
+    update_message
+)
+
+# Check for stale awareness entries every this many flush intervals
+AWARENESS_EXPIRY_CHECK_TICKS = 10
+
+# Awareness entries received from other workers are owned by "relay:<worker id>"
+RELAY_OWNER_PREFIX = "relay:"
+
+# Received-frame counters by y-protocol message type (bound once, off the hot path)
+MESSAGE_COUNTERS = {
+    MESSAGE_SYNC: WS_MESSAGES.labels("yjs", "sync"),
+    MESSAGE_AWARENESS: WS_MESSAGES.labels("yjs", "awareness"),
+    MESSAGE_QUERY_AWARENESS: WS_MESSAGES.labels("yjs", "query_awareness")
+}
+OTHER_MESSAGES = WS_MESSAGES.labels("yjs", "other")
+
 
 class CollaborativeRoomManager:
     """Manages collaborative code editor rooms and connections"""
     
     def __init__(self):
-        # Structure: {room_id: {client_id: WebSocket, ...}}
-        self.rooms: Dict[str, Dict[str, WebSocket]] = {}
-        # Store Yjs document state for each room
-        self.doc_states: Dict[str, bytes] = {}
+        # Structure: {room_id: {client_id: ClientConnection, ...}}
+        self.rooms: Dict[str, Dict[str, ClientConnection]] = {}
+        # Merged Yjs document (compacted state + update log) for each room
+        self.documents: Dict[str, RoomDocument] = {}
+        # Ephemeral awareness (cursors/presence) per room, never persisted
+        self.awareness: Dict[str, RoomAwareness] = {}
+        self._awareness_flushers: Dict[str, asyncio.Task] = {}
+        # Document updates waiting for the room's next tick (when YJS_BATCH_WINDOW_MS > 0)
+        self.batch_window = YJS_BATCH_WINDOW_MS / 1000
+        self._update_batches: Dict[str, UpdateBatch] = {}
+        self.batch_metrics = BatchMetrics()
+        # Sync-step-2 answers sent to joining/reconnecting clients
+        self.sync_responses = 0
+        self.sync_bytes = 0
+        # Durable snapshot + update log storage (None keeps rooms in memory only)
+        self.store: Optional[RoomStore] = RoomStore(YJS_STORE_PATH) if YJS_STORE_PATH else None
+        self._loading: Dict[str, asyncio.Future] = {}
+        self._snapshot_tasks: Set[asyncio.Task] = set()
+        # Structure: {room_id: monotonic time the last client left}
+        self._empty_since: Dict[str, float] = {}
+        self._sweeper: Optional[asyncio.Task] = None
+        # Forwards room traffic to other worker processes (no-op in single-worker mode)
+        self.relay = create_room_relay()
+        self.relay.set_handlers(self._on_relay_message, self._on_relay_subscribed)
+    
+    async def start(self):
+        """Connect the relay (on startup)"""
+        await self.relay.start()
     
-    def join_room(self, room_id: str, client_id: str, websocket: WebSocket):
-        """Add a client to a room"""
+    def join_room(self, room_id: str, client_id: str, websocket: WebSocket) -> ClientConnection:
+        """Add a client to a room and start its outbound writer"""
         if room_id not in self.rooms:
             self.rooms[room_id] = {}
             print(f"[Yjs] Created new room: {room_id}")
         
-        self.rooms[room_id][client_id] = websocket
+        connection = ClientConnection(
+            client_id,
+            websocket,
+            on_evicted=lambda conn, reason: self.leave_room(room_id, conn.client_id)
+        )
+        connection.start()
+        self.rooms[room_id][client_id] = connection
+        self._empty_since.pop(room_id, None)
+        self._start_sweeper()
         print(f"[Yjs] Client {client_id} joined room {room_id}. Total clients: {len(self.rooms[room_id])}")
+        return connection
     
     def leave_room(self, room_id: str, client_id: str):
         """Remove a client from a room"""
         if room_id in self.rooms and client_id in self.rooms[room_id]:
-            del self.rooms[room_id][client_id]
+            self.rooms[room_id].pop(client_id).stop()
             print(f"[Yjs] Removed {client_id} from room {room_id}. Remaining: {len(self.rooms[room_id])}")
             
+            # Announce that the client's cursors are gone
+            if room_id in self.awareness:
+                self.awareness[room_id].remove_owner(client_id)
+            
             # Clean up empty rooms (but keep doc state for a while)
             if len(self.rooms[room_id]) == 0:
+                self._drop_update_batch(room_id)
+                # Other workers still need to hear that the cursors are gone
+                self.flush_awareness(room_id)
+                self.relay.unsubscribe(room_id)
                 del self.rooms[room_id]
+                self.awareness.pop(room_id, None)
+                self._empty_since[room_id] = time.monotonic()
                 print(f"[Yjs] Room {room_id} is now empty")
     
-    def get_room_clients(self, room_id: str) -> Dict[str, WebSocket]:
+    def get_room_clients(self, room_id: str) -> Dict[str, ClientConnection]:
         """Get all clients in a room"""
         return self.rooms.get(room_id, {})
     
+    def get_document(self, room_id: str) -> RoomDocument:
+        """Get (or create) the in-memory merged document for a room"""
+        if room_id not in self.documents:
+            self.documents[room_id] = RoomDocument(room_id, on_compact=self._persist_snapshot)
+        return self.documents[room_id]
+    
+    async def load_document(self, room_id: str) -> RoomDocument:
+        """Get a room's document, lazily reloading it from storage after eviction"""
+        if room_id in self.documents:
+            return self.documents[room_id]
+        if self.store is None:
+            return self.get_document(room_id)
+        
+        # Concurrent joins share one load
+        if room_id in self._loading:
+            return await asyncio.shield(self._loading[room_id])
+        
+        future = asyncio.get_running_loop().create_future()
+        self._loading[room_id] = future
+        try:
+            state, updates = await self.store.load(room_id)
+            document = RoomDocument(room_id, state=state)
+            for origin, seq, update in updates:
+                document.apply_update(update, origin, seq)
+            
+            # Replay is folded into one snapshot so the next recovery reads less
+            document.on_compact = self._persist_snapshot
+            document.compact()
+            
+            self.documents[room_id] = document
+            if state is not None or updates:
+                print(f"[Yjs] Loaded room {room_id} from storage ({len(updates)} logged updates, {self.store.last_load_ms:.1f}ms)")
+            future.set_result(document)
+            return document
+        except Exception as e:
+            print(f"[Yjs] Error loading room {room_id}: {e}")
+            future.set_result(self.get_document(room_id))
+            return future.result()
+        finally:
+            del self._loading[room_id]
+    
+    async def get_snapshot(self, room_id: str) -> bytes:
+        """
+        Get a room's full state for HTTP snapshot delivery
+        
+        Rooms that are not in memory are read straight from storage and never
+        materialized, so requests for arbitrary room ids cannot grow memory;
+        unknown rooms get an empty update.
+        """
+        if room_id in self.documents:
+            return self.documents[room_id].get_state()
+        if room_id in self._loading:
+            return (await asyncio.shield(self._loading[room_id])).get_state()
+        if self.store is None:
+            return EMPTY_UPDATE
+        
+        state, updates = await self.store.load(room_id)
+        if not updates:
+            return state or EMPTY_UPDATE
+        return merge_updates(state or EMPTY_UPDATE, *[update for _, _, update in updates])
+    
     def get_doc_state(self, room_id: str) -> bytes:
-        """Get the stored document state for a room"""
-        return self.doc_states.get(room_id, b'')
+        """Get the merged document state for a room as a single update"""
+        return self.get_document(room_id).get_state()
+    
+    def apply_update(self, room_id: str, update: bytes) -> bool:
+        """Apply a client's document update, log it and forward it to other workers"""
+        document = self.get_document(room_id)
+        origin = self.relay.worker_id
+        seq = document.next_seq(origin)
+        if not document.apply_update(update, origin, seq):
+            return False
+        if self.store is not None:
+            self.store.append(room_id, origin, seq, update)
+        self.relay.publish(room_id, RELAY_UPDATE, update, seq)
+        return True
+    
+    # ==================== Relay ====================
+    
+    async def subscribe_relay(self, room_id: str):
+        """Receive a room's traffic from other workers while it has local clients"""
+        if room_id in self.rooms:
+            await self.relay.subscribe(room_id)
+    
+    def _on_relay_subscribed(self, room_id: str):
+        """Exchange full state with workers already serving the room"""
+        document = self.documents.get(room_id)
+        if document is not None:
+            self.relay.publish(room_id, RELAY_SYNC, document.get_state())
+    
+    def _on_relay_message(self, room_id: str, origin: str, kind: int, seq: int, payload: bytes):
+        """Apply a frame another worker published and fan it out to local clients"""
+        document = self.documents.get(room_id)
+        if document is None or room_id not in self.rooms:
+            return
+        
+        if kind == RELAY_UPDATE:
+            # Already logged by its origin; the seq lets our snapshots truncate that log
+            if document.apply_update(payload, origin, seq):
+                self.queue_update(room_id, None, payload)
+        
+        elif kind == RELAY_AWARENESS:
+            try:
+                if self.get_awareness(room_id).apply(RELAY_OWNER_PREFIX + origin, payload):
+                    self._start_awareness_flusher(room_id)
+            except ValueError as e:
+                print(f"[Yjs] Dropping malformed relayed awareness for room {room_id}: {e}")
+        
+        elif kind in (RELAY_SYNC, RELAY_STATE):
+            # Only forward what this worker's clients are missing
+            missing = get_update(payload, document.get_state_vector())
+            if missing != EMPTY_UPDATE and document.apply_update(missing):
+                self.queue_update(room_id, None, missing)
+            
+            if kind == RELAY_SYNC:
+                self.relay.publish(room_id, RELAY_STATE, document.get_state())
+                local_entries = self._local_awareness_entries(room_id)
+                if local_entries:
+                    self.relay.publish(room_id, RELAY_AWARENESS, encode_awareness_update(local_entries))
+    
+    def _local_awareness_entries(self, room_id: str):
+        """Live awareness entries announced by this worker's own clients"""
+        awareness = self.awareness.get(room_id)
+        if awareness is None:
+            return []
+        return [
+            entry.as_tuple() for entry in awareness.entries.values()
+            if not entry.owner.startswith(RELAY_OWNER_PREFIX) and entry.state != REMOVED_STATE
+        ]
+    
+    # ==================== Persistence ====================
+    
+    def _persist_snapshot(self, document: RoomDocument):
+        """Write a snapshot after the document compacted"""
+        if self.store is None:
+            return
+        task = asyncio.get_running_loop().create_task(
+            self.store.write_snapshot(document.room_id, document.base, document.base_versions)
+        )
+        self._snapshot_tasks.add(task)
+        task.add_done_callback(self._snapshot_tasks.discard)
     
-    def update_doc_state(self, room_id: str, state: bytes):
-        """Update the stored document state"""
-        self.doc_states[room_id] = state
+    def _start_sweeper(self):
+        """Start the idle-room sweeper on first use"""
+        if self._sweeper is None or self._sweeper.done():
+            self._sweeper = asyncio.get_running_loop().create_task(self._sweep_idle_rooms())
     
-    async def broadcast(self, room_id: str, sender_id: str, data: bytes):
-        """Broadcast data to all clients in a room except the sender"""
-        disconnected = []
+    async def _sweep_idle_rooms(self):
+        """Periodically evict rooms that have been empty for YJS_ROOM_IDLE_SECONDS"""
+        interval = max(1.0, min(YJS_ROOM_IDLE_SECONDS / 4, 30.0))
+        while self.documents:
+            await asyncio.sleep(interval)
+            await self.evict_idle_rooms()
+    
+    async def evict_idle_rooms(self, idle_seconds: float = YJS_ROOM_IDLE_SECONDS) -> int:
+        """
+        Snapshot and drop idle rooms from memory, returning how many
+        
+        Without a store the rooms are simply discarded, so memory stays bounded
+        by the rooms in use rather than every room ever opened.
+        """
+        now = time.monotonic()
+        idle = [
+            room_id for room_id, since in self._empty_since.items()
+            if now - since >= idle_seconds and room_id in self.documents
+        ]
+        evicted = 0
+        for room_id in idle:
+            document = self.documents[room_id]
+            if self.store is not None:
+                document.on_compact = None
+                document.compact()
+                await self.store.write_snapshot(room_id, document.base, document.base_versions)
+                
+                # Someone may have rejoined while the snapshot was being written
+                if room_id in self.rooms or self.documents.get(room_id) is not document:
+                    document.on_compact = self._persist_snapshot
+                    continue
+            del self.documents[room_id]
+            self._empty_since.pop(room_id, None)
+            evicted += 1
+            print(f"[Yjs] Evicted idle room {room_id} from memory" + ("" if self.store else " (not persisted)"))
+        return evicted
+    
+    async def close(self):
+        """Snapshot every room, close storage and disconnect the relay (on shutdown)"""
+        await self.relay.close()
+        if self.store is None:
+            return
+        for room_id, document in list(self.documents.items()):
+            document.on_compact = None
+            document.compact()
+            await self.store.write_snapshot(room_id, document.base, document.base_versions)
+        await self.store.close()
+    
+    def connection_counts(self) -> Dict[str, int]:
+        """Open connections per room"""
+        return {room_id: len(clients) for room_id, clients in self.rooms.items()}
+    
+    def queue_depth(self) -> int:
+        """Frames waiting in every client's send queue"""
+        return sum(conn.queue_depth for clients in self.rooms.values() for conn in clients.values())
+    
+    async def stats(self) -> dict:
+        """Room counts, document sizes and storage metrics"""
+        return {
+            "rooms_active": len(self.rooms),
+            "documents_in_memory": len(self.documents),
+            "clients": sum(len(clients) for clients in self.rooms.values()),
+            "documents": [
+                {
+                    "room_id": room_id,
+                    "clients": len(self.rooms.get(room_id, {})),
+                    "state_bytes": len(document.base),
+                    "log_updates": len(document.log),
+                    "log_bytes": document.log_bytes,
+                    "updates_applied": document.updates_applied
+                }
+                for room_id, document in self.documents.items()
+            ],
+            "store": {
+                "enabled": self.store is not None,
+                "size_bytes": await self.store.size_bytes() if self.store else 0,
+                "last_load_ms": round(self.store.last_load_ms, 2) if self.store else 0.0
+            },
+            "sync": {
+                "responses": self.sync_responses,
+                "bytes": self.sync_bytes
+            },
+            "relay": self.relay.stats(),
+            "batching": {
+                "window_ms": YJS_BATCH_WINDOW_MS,
+                "max_bytes": YJS_BATCH_MAX_BYTES,
+                **self.batch_metrics.to_dict()
+            }
+        }
+    
+    def get_awareness(self, room_id: str) -> RoomAwareness:
+        """Get (or create) the awareness table for a room"""
+        if room_id not in self.awareness:
+            self.awareness[room_id] = RoomAwareness()
+        return self.awareness[room_id]
+    
+    def apply_awareness(self, room_id: str, client_id: str, update: bytes):
+        """Record an awareness update; it is fanned out on the next flush"""
+        if self.get_awareness(room_id).apply(client_id, update):
+            self._start_awareness_flusher(room_id)
+    
+    def _start_awareness_flusher(self, room_id: str):
+        """Start the room's coalescing awareness flusher if it isn't running"""
+        task = self._awareness_flushers.get(room_id)
+        if task is None or task.done():
+            self._awareness_flushers[room_id] = asyncio.get_running_loop().create_task(
+                self._flush_awareness_loop(room_id)
+            )
+    
+    async def _flush_awareness_loop(self, room_id: str):
+        """Flush coalesced awareness at most once per interval while the room is active"""
+        interval = YJS_AWARENESS_INTERVAL_MS / 1000
+        ticks = 0
+        try:
+            while room_id in self.rooms:
+                await asyncio.sleep(interval)
+                ticks += 1
+                if ticks % AWARENESS_EXPIRY_CHECK_TICKS == 0 and room_id in self.awareness:
+                    self.awareness[room_id].expire()
+                self.flush_awareness(room_id)
+        finally:
+            self._awareness_flushers.pop(room_id, None)
+    
+    def flush_awareness(self, room_id: str):
+        """Queue one frame per client with the awareness changes of its peers"""
+        awareness = self.awareness.get(room_id)
+        if awareness is None or not awareness.has_dirty:
+            return
+        
+        dirty = awareness.take_dirty()
+        if self.relay.enabled:
+            local_entries = [entry.as_tuple() for entry in dirty if not entry.owner.startswith(RELAY_OWNER_PREFIX)]
+            if local_entries:
+                self.relay.publish(room_id, RELAY_AWARENESS, encode_awareness_update(local_entries))
+        
+        for client_id, connection in list(self.get_room_clients(room_id).items()):
+            entries = [entry.as_tuple() for entry in dirty if entry.owner != client_id]
+            if entries and connection.send(awareness_message(entries)):
+                awareness.frames_out += 1
+    
+    def get_awareness_snapshot(self, room_id: str, client_id: str) -> bytes:
+        """Get an awareness frame with every peer's current state, or b'' if none"""
+        awareness = self.awareness.get(room_id)
+        entries = awareness.snapshot(exclude_owner=client_id) if awareness else []
+        return awareness_message(entries) if entries else b''
+    
+    def queue_update(self, room_id: str, sender_id: Optional[str], update: bytes, frame: Optional[bytes] = None):
+        """
+        Fan a document update out to the room, coalesced per tick if batching is on
+        
+        Args:
+            room_id: Room identifier
+            sender_id: Client that sent the update (None if it came from another worker)
+            update: Yjs update
+            frame: The sender's original frame, forwarded as-is when not batching
+        """
+        if self.batch_window <= 0:
+            self.broadcast(room_id, sender_id, frame or update_message(update))
+            return
         
-        for client_id, websocket in self.get_room_clients(room_id).items():
+        batch = self._update_batches.get(room_id)
+        if batch is None:
+            batch = self._update_batches[room_id] = UpdateBatch()
+            batch.timer = asyncio.get_running_loop().call_later(self.batch_window, self.flush_updates, room_id)
+        batch.add(sender_id, update)
+        self.batch_metrics.updates_in += 1
+        
+        if batch.nbytes >= YJS_BATCH_MAX_BYTES:
+            self.batch_metrics.size_flushes += 1
+            self.flush_updates(room_id)
+    
+    def flush_updates(self, room_id: str):
+        """Queue one merged update per client with everything its peers sent this tick"""
+        batch = self._update_batches.pop(room_id, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        
+        clients = self.get_room_clients(room_id)
+        metrics = self.batch_metrics
+        metrics.ticks += 1
+        merged_cache = {}
+        for client_id, connection in list(clients.items()):
+            merged = batch.merged_for(client_id, merged_cache)
+            if merged is not None and connection.send(update_message(merged)):
+                metrics.frames_out += 1
+        
+        flushed_at = time.monotonic()
+        for sender_id, _, enqueued_at in batch.updates:
+            metrics.frames_unbatched += len(clients) - (1 if sender_id in clients else 0)
+            metrics.record_latency(enqueued_at, flushed_at)
+    
+    def _drop_update_batch(self, room_id: str):
+        """Discard pending updates of a room nobody is left to receive"""
+        batch = self._update_batches.pop(room_id, None)
+        if batch is not None and batch.timer is not None:
+            batch.timer.cancel()
+    
+    def broadcast(self, room_id: str, sender_id: Optional[str], data: bytes):
+        """Queue data for all clients in a room except the sender (never blocks)"""
+        for client_id, connection in list(self.get_room_clients(room_id).items()):
             if client_id != sender_id:
-                try:
-                    await websocket.send_bytes(data)
-                except Exception as e:
-                    print(f"[Yjs] Error sending to {client_id}: {e}")
-                    disconnected.append(client_id)
-        
-        # Clean up disconnected clients
-        for client_id in disconnected:
-            self.leave_room(room_id, client_id)
+                # Slow consumers are evicted by their connection
+                connection.send(data)
 
 
 # Global room manager instance
 room_manager = CollaborativeRoomManager()
+track_connections("yjs", room_manager.connection_counts, room_manager.queue_depth)
 
 
 async def websocket_yjs_sync(websocket: WebSocket, room_id: str):
     """
     WebSocket endpoint for Yjs document synchronization
     
-    This is a broadcast server that relays Yjs sync messages between clients.
-    Supports: sync-step-1, sync-step-2, update, awareness messages
+    The server keeps a merged copy of each room's document. It answers
+    sync-step-1 itself with the diff against the client's state vector,
+    applies sync-step-2/update messages to the room document, and relays
+    updates to the other clients in the room. Awareness messages go to a
+    separate per-room table and are fanned out in coalesced batches, and
+    document updates can be coalesced per tick (YJS_BATCH_WINDOW_MS). With
+    RELAY_MODE=broker, updates and awareness are also forwarded to the other
+    workers serving the room.
     """
     await websocket.accept()
     
     # Generate client ID
     client_id = f"client_{int(time.time() * 1000)}_{id(websocket)}"
     
-    # Join room
-    room_manager.join_room(room_id, client_id, websocket)
+    # Join room; all outbound frames go through the connection's queue
+    connection = room_manager.join_room(room_id, client_id, websocket)
+    document = await room_manager.load_document(room_id)
+    await room_manager.subscribe_relay(room_id)
     
     try:
-        # Send current document state if available
-        doc_state = room_manager.get_doc_state(room_id)
-        if doc_state:
-            await websocket.send_bytes(doc_state)
-            print(f"[Yjs] Sent stored doc state to {client_id}")
+        # Ask the client for anything the server doesn't have yet
+        connection.send(sync_step1_message(document.get_state_vector()))
+        
+        # Show the new client who else is here
+        awareness_snapshot = room_manager.get_awareness_snapshot(room_id, client_id)
+        if awareness_snapshot:
+            connection.send(awareness_snapshot)
         
         while True:
             # Receive message (binary for Yjs)
             data = await websocket.receive_bytes()
+            if len(data) == 0:
+                continue
+            
+            try:
+                message_type, sync_type, payload = parse_message(data)
+            except ValueError as e:
+                print(f"[Yjs] Dropping malformed frame from {client_id}: {e}")
+                continue
+            MESSAGE_COUNTERS.get(message_type, OTHER_MESSAGES).inc()
+            
+            if message_type == MESSAGE_SYNC:
+                if sync_type == SYNC_STEP1:
+                    # Answer from the server's merged state, peers aren't involved
+                    response = sync_step2_message(document.get_diff(payload))
+                    room_manager.sync_responses += 1
+                    room_manager.sync_bytes += len(response)
+                    connection.send(response)
+                    continue
+                
+                if sync_type in (SYNC_STEP2, SYNC_UPDATE):
+                    # Relay every update the document accepted (non-empty and well-formed);
+                    # duplicates are relayed too, applying them again is harmless
+                    if room_manager.apply_update(room_id, payload):
+                        room_manager.queue_update(room_id, client_id, payload, data)
+                    continue
+            
+            elif message_type == MESSAGE_AWARENESS:
+                try:
+                    room_manager.apply_awareness(room_id, client_id, payload)
+                except ValueError as e:
+                    print(f"[Yjs] Dropping malformed awareness from {client_id}: {e}")
+                continue
             
-            # Store the latest update for new clients
-            if len(data) > 0:
-                room_manager.update_doc_state(room_id, data)
+            elif message_type == MESSAGE_QUERY_AWARENESS:
+                awareness_snapshot = room_manager.get_awareness_snapshot(room_id, client_id)
+                if awareness_snapshot:
+                    connection.send(awareness_snapshot)
+                continue
             
             # Broadcast to all other clients in the room
-            await room_manager.broadcast(room_id, client_id, data)
+            room_manager.broadcast(room_id, client_id, data)
             
     except WebSocketDisconnect:
         print(f"[Yjs] Client {client_id} disconnected from room {room_id}")
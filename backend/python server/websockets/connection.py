@@ -0,0 +1,117 @@
+"""
+Client Connection - WebSocket wrapper with a bounded outbound queue and writer task
+"""
+import asyncio
+from typing import Callable, Optional, Union
+from fastapi import WebSocket
+
+from config import YJS_SEND_QUEUE_SIZE, YJS_MAX_SEND_LATENCY_MS
+from services.metrics import WS_EVICTIONS
+
+
+# WebSocket close code asking the client to reconnect later
+CLOSE_TRY_AGAIN_LATER = 1013
+
+
+class ClientConnection:
+    """
+    A room member's WebSocket with its own outbound queue
+
+    Senders never await the network: send() enqueues and returns, and a
+    dedicated writer task drains the queue. A client whose queue overflows or
+    whose single send exceeds the latency budget is closed with 1013 so it
+    reconnects and resyncs instead of slowing down the rest of the room.
+    """
+
+    def __init__(
+        self,
+        client_id: str,
+        websocket: WebSocket,
+        on_evicted: Optional[Callable[["ClientConnection", str], None]] = None,
+        max_queue: int = YJS_SEND_QUEUE_SIZE,
+        max_send_latency_ms: int = YJS_MAX_SEND_LATENCY_MS
+    ):
+        self.client_id = client_id
+        self.websocket = websocket
+        self.on_evicted = on_evicted
+        self.max_send_latency = max_send_latency_ms / 1000
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=max_queue)
+        self.closed = False
+        self.frames_sent = 0
+        self._writer: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.get_running_loop().create_task(self._write_loop())
+
+    def send(self, data: Union[bytes, str]) -> bool:
+        """
+        Queue a frame for delivery without blocking
+
+        Args:
+            data: Binary frame, or text frame if a str
+
+        Returns:
+            False if the connection is closed or was just evicted for overflowing
+        """
+        if self.closed:
+            return False
+        try:
+            self.queue.put_nowait(data)
+            return True
+        except asyncio.QueueFull:
+            self.evict(f"send queue full ({self.queue.maxsize} frames)")
+            return False
+
+    @property
+    def queue_depth(self) -> int:
+        return self.queue.qsize()
+
+    async def _write_loop(self):
+        """Drain the outbound queue onto the socket"""
+        while not self.closed:
+            data = await self.queue.get()
+            try:
+                if isinstance(data, str):
+                    await asyncio.wait_for(self.websocket.send_text(data), self.max_send_latency)
+                else:
+                    await asyncio.wait_for(self.websocket.send_bytes(data), self.max_send_latency)
+                self.frames_sent += 1
+            except asyncio.TimeoutError:
+                self.evict(f"send exceeded {self.max_send_latency * 1000:.0f}ms")
+                return
+            except Exception as e:
+                print(f"[WS] Error sending to {self.client_id}: {e}")
+                self.evict("send failed")
+                return
+
+    def evict(self, reason: str):
+        """Disconnect the client; it can reconnect and resync"""
+        if self.closed:
+            return
+        self.closed = True
+        WS_EVICTIONS.inc()
+        print(f"[WS] Disconnecting client {self.client_id}: {reason}")
+
+        if self.on_evicted is not None:
+            self.on_evicted(self, reason)
+        asyncio.get_running_loop().create_task(self._close())
+
+    async def _close(self):
+        """Stop the writer and close the socket without waiting on a stalled peer"""
+        if self._writer is not None and self._writer is not asyncio.current_task():
+            self._writer.cancel()
+        try:
+            await asyncio.wait_for(
+                self.websocket.close(code=CLOSE_TRY_AGAIN_LATER),
+                self.max_send_latency
+            )
+        except Exception:
+            pass
+
+    def stop(self):
+        """Stop the writer task after the client left normally"""
+        self.closed = True
+        if self._writer is not None:
+            self._writer.cancel()
@@ -0,0 +1,59 @@
+"""
+Jobs WebSocket - Pushes a background job's status changes and result
+"""
+import asyncio
+from fastapi import WebSocket, WebSocketDisconnect
+
+from services.jobs import job_manager
+from services.serialization import negotiate_codec
+
+
+# Close code for an unknown or expired job (4000-4999 are application-defined)
+CLOSE_UNKNOWN_JOB = 4404
+
+
+async def websocket_job_updates(websocket: WebSocket, job_id: str):
+    """
+    Send {"type": "job", ...} with the job's state now and on every change
+
+    The socket is closed by the server once the job has finished, so a
+    client only has to wait for the final message instead of polling. Jobs
+    running on another worker are followed through the shared JOB_STORE.
+
+    Args:
+        websocket: WebSocket connection
+        job_id: Job to follow
+    """
+    codec = negotiate_codec(websocket)
+    await websocket.accept(subprotocol=codec.subprotocol)
+    websocket.state.codec = codec
+
+    job = await job_manager.get(job_id)
+    if job is None:
+        await codec.send(websocket, {"type": "error", "content": "Unknown or expired job"})
+        await websocket.close(code=CLOSE_UNKNOWN_JOB)
+        return
+
+    # Nothing is expected from the client; receiving notices it leaving
+    receiver = asyncio.ensure_future(websocket.receive())
+    try:
+        while True:
+            # Taken before sending, so a change while the state is sent isn't missed
+            changed = asyncio.ensure_future(job_manager.next_update(job))
+            await codec.send(websocket, {"type": "job", **job.to_dict()})
+            if job.finished:
+                changed.cancel()
+                break
+            while not changed.done():
+                await asyncio.wait({changed, receiver}, return_when=asyncio.FIRST_COMPLETED)
+                if receiver.done():
+                    if receiver.result()["type"] == "websocket.disconnect":
+                        changed.cancel()
+                        return
+                    receiver = asyncio.ensure_future(websocket.receive())
+            job = changed.result()
+        await websocket.close()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
@@ -0,0 +1,65 @@
+"""
+Sentiment WebSocket - Pushes a meeting room's rolling sentiment timeline
+"""
+import asyncio
+from fastapi import WebSocket, WebSocketDisconnect
+
+from config import SENTIMENT_TIMELINE
+from services.serialization import negotiate_codec
+from services.sentiment_timeline import sentiment_timeline
+
+
+# Close code when the sentiment timeline is disabled (4000-4999 are application-defined)
+CLOSE_DISABLED = 4403
+
+
+async def websocket_sentiment_updates(websocket: WebSocket, room_id: str):
+    """
+    Send the room's timeline now, then {"type": "sentiment", ...} updates
+
+    The first message ({"type": "sentiment_timeline"}) is the full timeline
+    kept for the room. Each update carries only the buckets that changed
+    since the previous one, plus the current room and per-speaker mood.
+
+    Args:
+        websocket: WebSocket connection
+        room_id: Meeting room to follow
+    """
+    codec = negotiate_codec(websocket)
+    await websocket.accept(subprotocol=codec.subprotocol)
+    websocket.state.codec = codec
+
+    if not SENTIMENT_TIMELINE:
+        await codec.send(websocket, {"type": "error", "content": "Sentiment timeline is disabled"})
+        await websocket.close(code=CLOSE_DISABLED)
+        return
+
+    queue = sentiment_timeline.subscribe(room_id)
+    window = sentiment_timeline.bucket_seconds * sentiment_timeline.bucket_count
+    # Nothing is expected from the client; receiving notices it leaving
+    receiver = asyncio.ensure_future(websocket.receive())
+    update = None
+    try:
+        await codec.send(websocket, {
+            "type": "sentiment_timeline",
+            **sentiment_timeline.timeline(room_id, window),
+            "mood": sentiment_timeline.mood(room_id)
+        })
+        while True:
+            update = asyncio.ensure_future(queue.get())
+            await asyncio.wait({update, receiver}, return_when=asyncio.FIRST_COMPLETED)
+            if receiver.done():
+                if receiver.result()["type"] == "websocket.disconnect":
+                    return
+                receiver = asyncio.ensure_future(websocket.receive())
+            if update.done():
+                await codec.send(websocket, update.result())
+            else:
+                update.cancel()
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        receiver.cancel()
+        if update is not None:
+            update.cancel()
+        sentiment_timeline.unsubscribe(room_id, queue)
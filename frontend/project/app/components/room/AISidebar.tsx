@@ -15,9 +15,14 @@ interface Message {
 
 interface AISidebarProps {
   onClose: () => void;
+  roomId?: string;
 }
 
-export function AISidebar({ onClose }: AISidebarProps) {
+// Meeting audio is captured in fixed wall-clock slots shared by every listener
+const MEETING_CAPTURE_INTERVAL_MS = 6000;
+const MEETING_CAPTURE_DURATION_MS = 5000;
+
+export function AISidebar({ onClose, roomId }: AISidebarProps) {
   const [messages, setMessages] = useState<Message[]>([]);
   const [inputText, setInputText] = useState("");
   const [isConnected, setIsConnected] = useState(false);
@@ -28,13 +33,11 @@ export function AISidebar({ onClose }: AISidebarProps) {
   
   const wsRef = useRef<WebSocket | null>(null);
   const mediaRecorderRef = useRef<MediaRecorder | null>(null);
-  const meetingRecorderRef = useRef<MediaRecorder | null>(null);
+  const meetingRecordersRef = useRef<MediaRecorder[]>([]);
   const audioChunksRef = useRef<Blob[]>([]);
-  const meetingAudioChunksRef = useRef<Blob[]>([]);
   const messagesEndRef = useRef<HTMLDivElement>(null);
   const clientIdRef = useRef<string>("");
   const audioContextRef = useRef<AudioContext | null>(null);
-  const meetingStreamRef = useRef<MediaStream | null>(null);
 
   // Get remote participants for meeting audio
   const remoteParticipants = useRemoteParticipants();
@@ -48,27 +51,35 @@ export function AISidebar({ onClose }: AISidebarProps) {
   const cleanupMeetingListening = useCallback(() => {
     setIsListeningToMeeting(false);
     
-    if (meetingRecorderRef.current && meetingRecorderRef.current.state !== "inactive") {
-      meetingRecorderRef.current.stop();
-    }
-    
-    if (meetingStreamRef.current) {
-      meetingStreamRef.current.getTracks().forEach(track => track.stop());
-      meetingStreamRef.current = null;
-    }
+    // Stop the recorders only: the tracks belong to LiveKit and are still playing
+    meetingRecordersRef.current.forEach((recorder) => {
+      if (recorder.state !== "inactive") {
+        recorder.stop();
+      }
+    });
+    meetingRecordersRef.current = [];
   }, []);
 
   // Connect to WebSocket
   useEffect(() => {
-    // Generate client ID
-    const clientId = `client_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
-    clientIdRef.current = clientId;
+    // Reuse this tab's client ID and resume token so a reload resumes the chat session on the server
+    const storageKey = `ai-chat-client:${roomId || "default"}`;
+    const tokenStorageKey = `ai-chat-token:${roomId || "default"}`;
     
     const pythonServerUrl = process.env.NEXT_PUBLIC_PYTHON_API_URL || "http://localhost:5000";
-    const wsUrl = `${pythonServerUrl.replace('http', 'ws')}/ws/ai-chat/${clientId}`;
+    const roomQuery = roomId ? `&room_id=${encodeURIComponent(roomId)}` : "";
     
     const connectWebSocket = () => {
-      const ws = new WebSocket(wsUrl);
+      const clientId = sessionStorage.getItem(storageKey)
+        || `client_${Date.now()}_${Math.random().toString(36).substr(2, 9)}`;
+      sessionStorage.setItem(storageKey, clientId);
+      clientIdRef.current = clientId;
+      
+      const resumeToken = sessionStorage.getItem(tokenStorageKey);
+      const tokenQuery = resumeToken ? `&resume_token=${encodeURIComponent(resumeToken)}` : "";
+      const ws = new WebSocket(
+        `${pythonServerUrl.replace('http', 'ws')}/ws/ai-chat/${clientId}?batch=true${roomQuery}${tokenQuery}`
+      );
       
       ws.onopen = () => {
         console.log("Connected to AI chat");
@@ -77,102 +88,129 @@ export function AISidebar({ onClose }: AISidebarProps) {
       
       ws.onmessage = (event) => {
         try {
-          const data = JSON.parse(event.data);
+          const payload = JSON.parse(event.data);
+          // Events produced together arrive as one batch frame
+          const events = payload.type === "batch" ? payload.events : [payload];
           
-          switch (data.type) {
-            case "message":
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `msg_${Date.now()}`,
-                  role: data.role,
-                  content: data.content,
-                },
-              ]);
-              break;
-              
-            case "transcription":
-              // Show the transcribed speech
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `msg_${Date.now()}`,
-                  role: "user",
-                  content: data.content,
-                  isTranscription: true,
-                },
-              ]);
-              break;
-              
-            case "meeting_transcription":
-              // Show meeting transcription (from other participants)
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `msg_${Date.now()}`,
-                  role: "meeting",
-                  content: data.content,
-                  speaker: data.speaker || "Participant",
-                  isTranscription: true,
-                },
-              ]);
-              break;
-              
-            case "question_detected":
-              // A question was detected and AI is answering
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `msg_${Date.now()}`,
-                  role: "meeting",
-                  content: `❓ ${data.question}`,
-                  speaker: "Question Detected",
-                  isTranscription: true,
-                },
-              ]);
-              break;
-              
-            case "typing":
-              setIsTyping(data.status);
-              break;
-              
-            case "status":
-              if (data.status === "transcribing") {
-                setIsProcessing(true);
-              } else if (data.status === "listening") {
-                // Meeting listening status update
-              }
-              break;
-              
-            case "error":
-              setMessages((prev) => [
-                ...prev,
-                {
-                  id: `msg_${Date.now()}`,
-                  role: "assistant",
-                  content: `⚠️ ${data.content}`,
-                },
-              ]);
+          for (const data of events) {
+            switch (data.type) {
+              case "session":
+                // Needed to resume this session after a reconnect
+                sessionStorage.setItem(tokenStorageKey, data.resume_token);
+                break;
+                
+              case "message":
+                setMessages((prev) => [
+                  ...prev,
+                  {
+                    id: `msg_${Date.now()}`,
+                    role: data.role,
+                    content: data.content,
+                  },
+                ]);
+                break;
+                
+              case "history":
+                // Resumed session: redraw the conversation unless it is still on screen
+                setMessages((prev) =>
+                  prev.length > 0
+                    ? prev
+                    : data.messages.map((message: { role: "user" | "assistant"; content: string }, index: number) => ({
+                        id: `msg_${Date.now()}_${index}`,
+                        role: message.role,
+                        content: message.content,
+                      }))
+                );
+                break;
+                
+              case "transcription":
+                // Show the transcribed speech
+                setMessages((prev) => [
+                  ...prev,
+                  {
+                    id: `msg_${Date.now()}`,
+                    role: "user",
+                    content: data.content,
+                    isTranscription: true,
+                  },
+                ]);
+                break;
+                
+              case "meeting_transcription":
+                // Show meeting transcription (from other participants)
+                setMessages((prev) => [
+                  ...prev,
+                  {
+                    id: `msg_${Date.now()}`,
+                    role: "meeting",
+                    content: data.content,
+                    speaker: data.speaker || "Participant",
+                    isTranscription: true,
+                  },
+                ]);
+                break;
+                
+              case "question_detected":
+                // A question was detected and AI is answering
+                setMessages((prev) => [
+                  ...prev,
+                  {
+                    id: `msg_${Date.now()}`,
+                    role: "meeting",
+                    content: `❓ ${data.question}`,
+                    speaker: "Question Detected",
+                    isTranscription: true,
+                  },
+                ]);
+                break;
+                
+              case "typing":
+                setIsTyping(data.status);
+                break;
+                
+              case "status":
+                if (data.status === "transcribing") {
+                  setIsProcessing(true);
+                } else if (data.status === "listening") {
+                  // Meeting listening status update
+                }
+                break;
+                
+              case "error":
+                setMessages((prev) => [
+                  ...prev,
+                  {
+                    id: `msg_${Date.now()}`,
+                    role: "assistant",
+                    content: `⚠️ ${data.content}`,
+                  },
+                ]);
+                setIsProcessing(false);
+                break;
+                
+              case "cleared":
+                setMessages([]);
+                break;
+            }
+            
+            if (data.type === "message" || data.type === "error") {
+              setIsTyping(false);
               setIsProcessing(false);
-              break;
-              
-            case "cleared":
-              setMessages([]);
-              break;
-          }
-          
-          if (data.type === "message" || data.type === "error") {
-            setIsTyping(false);
-            setIsProcessing(false);
+            }
           }
         } catch (e) {
           console.error("Error parsing WebSocket message:", e);
         }
       };
       
-      ws.onclose = () => {
+      ws.onclose = (event) => {
         console.log("Disconnected from AI chat");
         setIsConnected(false);
+        if (event.code === 4401) {
+          // The session was refused: start a new one under a fresh client ID
+          sessionStorage.removeItem(storageKey);
+          sessionStorage.removeItem(tokenStorageKey);
+        }
         // Attempt to reconnect after 3 seconds
         setTimeout(connectWebSocket, 3000);
       };
@@ -192,7 +230,7 @@ export function AISidebar({ onClose }: AISidebarProps) {
       }
       cleanupMeetingListening();
     };
-  }, [cleanupMeetingListening]);
+  }, [cleanupMeetingListening, roomId]);
 
   // Capture and send meeting audio periodically
   const captureMeetingAudio = useCallback(async () => {
@@ -206,68 +244,73 @@ export function AISidebar({ onClose }: AISidebarProps) {
         audioContextRef.current = new AudioContext();
       }
 
-      // Get all audio tracks from remote participants
-      const audioTracks: MediaStreamTrack[] = [];
-      
+      // Every listener records the same 5s slots of wall-clock time, so the
+      // server can recognise the copies of a speaker's chunk and transcribe it once
+      const timestamp = (Math.round(Date.now() / MEETING_CAPTURE_INTERVAL_MS) * MEETING_CAPTURE_INTERVAL_MS) / 1000;
+      const recorders: MediaRecorder[] = [];
+
+      // Record each remote participant separately so chunks carry their speaker
       remoteParticipants.forEach((participant) => {
         const audioTrack = participant.getTrackPublication(Track.Source.Microphone);
-        if (audioTrack?.track?.mediaStreamTrack) {
-          audioTracks.push(audioTrack.track.mediaStreamTrack);
+        const mediaStreamTrack = audioTrack?.track?.mediaStreamTrack;
+        if (!mediaStreamTrack) {
+          return;
         }
-      });
-
-      if (audioTracks.length === 0) {
-        console.log("No remote audio tracks available");
-        return;
-      }
 
-      // Create a new stream from all audio tracks
-      const combinedStream = new MediaStream(audioTracks);
-      meetingStreamRef.current = combinedStream;
+        const mediaRecorder = new MediaRecorder(new MediaStream([mediaStreamTrack]), {
+          mimeType: "audio/webm;codecs=opus",
+        });
+        const chunks: Blob[] = [];
 
-      // Create MediaRecorder
-      const mediaRecorder = new MediaRecorder(combinedStream, {
-        mimeType: "audio/webm;codecs=opus",
-      });
+        mediaRecorder.ondataavailable = (event) => {
+          if (event.data.size > 0) {
+            chunks.push(event.data);
+          }
+        };
 
-      meetingAudioChunksRef.current = [];
+        mediaRecorder.onstop = async () => {
+          if (chunks.length === 0) return;
+          
+          const audioBlob = new Blob(chunks, { type: "audio/webm" });
+          
+          // Only send if blob has meaningful size (more than ~1kb means actual audio)
+          if (audioBlob.size > 1000) {
+            const reader = new FileReader();
+            reader.onloadend = () => {
+              if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
+                const base64Audio = (reader.result as string).split(",")[1];
+                wsRef.current.send(JSON.stringify({
+                  type: "meeting_audio",
+                  data: base64Audio,
+                  track_id: participant.identity,
+                  speaker: participant.name || participant.identity,
+                  timestamp,
+                }));
+              }
+            };
+            reader.readAsDataURL(audioBlob);
+          }
+        };
 
-      mediaRecorder.ondataavailable = (event) => {
-        if (event.data.size > 0) {
-          meetingAudioChunksRef.current.push(event.data);
-        }
-      };
+        recorders.push(mediaRecorder);
+      });
 
-      mediaRecorder.onstop = async () => {
-        if (meetingAudioChunksRef.current.length === 0) return;
-        
-        const audioBlob = new Blob(meetingAudioChunksRef.current, { type: "audio/webm" });
-        
-        // Only send if blob has meaningful size (more than ~1kb means actual audio)
-        if (audioBlob.size > 1000) {
-          const reader = new FileReader();
-          reader.onloadend = () => {
-            if (wsRef.current && wsRef.current.readyState === WebSocket.OPEN) {
-              const base64Audio = (reader.result as string).split(",")[1];
-              wsRef.current.send(JSON.stringify({
-                type: "meeting_audio",
-                data: base64Audio,
-              }));
-            }
-          };
-          reader.readAsDataURL(audioBlob);
-        }
-      };
+      if (recorders.length === 0) {
+        console.log("No remote audio tracks available");
+        return;
+      }
 
-      meetingRecorderRef.current = mediaRecorder;
-      mediaRecorder.start();
+      meetingRecordersRef.current = recorders;
+      recorders.forEach((recorder) => recorder.start());
 
       // Record for 5 seconds then stop and process
       setTimeout(() => {
-        if (mediaRecorder.state !== "inactive") {
-          mediaRecorder.stop();
-        }
-      }, 5000);
+        recorders.forEach((recorder) => {
+          if (recorder.state !== "inactive") {
+            recorder.stop();
+          }
+        });
+      }, MEETING_CAPTURE_DURATION_MS);
 
     } catch (error) {
       console.error("Error capturing meeting audio:", error);
@@ -276,16 +319,21 @@ export function AISidebar({ onClose }: AISidebarProps) {
 
   // Set up interval for meeting audio capture
   useEffect(() => {
+    let timeoutId: NodeJS.Timeout | null = null;
     let intervalId: NodeJS.Timeout | null = null;
 
     if (isListeningToMeeting && isConnected) {
-      // Start capturing immediately
-      captureMeetingAudio();
-      // Then capture every 6 seconds (5s recording + 1s gap)
-      intervalId = setInterval(captureMeetingAudio, 6000);
+      // Start on the next slot boundary, then capture every slot (5s recording + 1s gap)
+      timeoutId = setTimeout(() => {
+        captureMeetingAudio();
+        intervalId = setInterval(captureMeetingAudio, MEETING_CAPTURE_INTERVAL_MS);
+      }, MEETING_CAPTURE_INTERVAL_MS - (Date.now() % MEETING_CAPTURE_INTERVAL_MS));
     }
 
     return () => {
+      if (timeoutId) {
+        clearTimeout(timeoutId);
+      }
       if (intervalId) {
         clearInterval(intervalId);
       }
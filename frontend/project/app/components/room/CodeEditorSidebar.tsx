@@ -1,6 +1,6 @@
 "use client";
 
-import { useState, useRef, useCallback } from "react";
+import { useState, useRef, useCallback, useEffect } from "react";
 import {
   X,
   Code2,
@@ -33,6 +33,22 @@ interface CodeEditorSidebarProps {
   startedBy?: string | null;
 }
 
+interface ExecutionResult {
+  success: boolean;
+  output: string;
+  error: string;
+  execution_time: string;
+}
+
+interface RoomExecution {
+  execution_id: string;
+  language: string;
+  triggered_by: string | null;
+  running: boolean;
+  result: ExecutionResult | null;
+  output?: { stream: string; data: string }[];
+}
+
 interface LanguageOption {
   id: SupportedLanguage;
   name: string;
@@ -68,6 +84,9 @@ export function CodeEditorSidebar({
   
   const editorRef = useRef<HTMLDivElement & { getCode?: () => string }>(null);
   const codeRef = useRef<string>("");
+  // Room-shared execution channel, and the terminal line the live run's output streams into
+  const codeSocketRef = useRef<WebSocket | null>(null);
+  const liveOutputIndexRef = useRef<number | null>(null);
 
   const handleCodeChange = useCallback((code: string) => {
     codeRef.current = code;
@@ -81,6 +100,113 @@ export function CodeEditorSidebar({
     return codeRef.current;
   }, []);
 
+  const showResult = useCallback((result: ExecutionResult, includeOutput: boolean) => {
+    if (result.success) {
+      if (includeOutput && result.output) {
+        setTerminalOutput((prev) => [...prev, result.output]);
+      }
+      if (result.error) {
+        setTerminalOutput((prev) => [...prev, `❌ Error:\n${result.error}`]);
+      }
+      setTerminalOutput((prev) => [
+        ...prev,
+        "─".repeat(40),
+        `✅ Execution completed (${result.execution_time || "N/A"})`,
+      ]);
+    } else {
+      setTerminalOutput((prev) => [
+        ...prev,
+        `❌ Execution failed: ${result.error || "Unknown error"}`,
+      ]);
+    }
+  }, []);
+
+  const showStarted = useCallback((execution: RoomExecution, initialOutput: string) => {
+    const languageName = languages.find((l) => l.id === execution.language)?.name || execution.language;
+    setTerminalOutput((prev) => {
+      liveOutputIndexRef.current = prev.length + 3;
+      return [
+        ...prev,
+        "",
+        `▶️ ${execution.triggered_by ? `${execution.triggered_by} is running` : "Running"} ${languageName} code...`,
+        "─".repeat(40),
+        initialOutput,
+      ];
+    });
+  }, []);
+
+  // Every participant sees runs started by anyone in the room as they happen
+  useEffect(() => {
+    const pythonServerUrl = process.env.NEXT_PUBLIC_PYTHON_API_URL || "http://localhost:5000";
+    const wsUrl = pythonServerUrl.replace('http', 'ws');
+    const socket = new WebSocket(
+      `${wsUrl}/ws/code/${encodeURIComponent(roomId)}?participant=${encodeURIComponent(participantName)}`
+    );
+    codeSocketRef.current = socket;
+
+    socket.onmessage = (event) => {
+      const message = JSON.parse(event.data);
+      switch (message.type) {
+        case "execution_started":
+          setIsRunning(true);
+          showStarted(message.execution, "");
+          break;
+        case "execution_output": {
+          const text = message.chunks
+            .filter((chunk: { stream: string }) => chunk.stream === "stdout")
+            .map((chunk: { data: string }) => chunk.data)
+            .join("");
+          const index = liveOutputIndexRef.current;
+          if (text && index !== null) {
+            setTerminalOutput((prev) => prev.map((line, i) => (i === index ? line + text : line)));
+          }
+          break;
+        }
+        case "execution_result":
+          setIsRunning(false);
+          liveOutputIndexRef.current = null;
+          showResult(message.result, false);
+          break;
+        case "execution_state": {
+          // Joined while a run is in progress, or after the last one finished
+          const execution: RoomExecution = message.execution;
+          const output = (execution.output || [])
+            .filter((chunk) => chunk.stream === "stdout")
+            .map((chunk) => chunk.data)
+            .join("");
+          if (execution.running) {
+            setIsRunning(true);
+            showStarted(execution, output);
+          } else if (execution.result) {
+            setTerminalOutput((prev) => [
+              ...prev,
+              "",
+              `▶️ Last run${execution.triggered_by ? ` by ${execution.triggered_by}` : ""}:`,
+            ]);
+            showResult(execution.result, true);
+          }
+          break;
+        }
+        case "execution_busy":
+          setTerminalOutput((prev) => [...prev, "⚠️ Another execution is already running in this room."]);
+          break;
+        case "execution_rejected":
+          setTerminalOutput((prev) => [
+            ...prev,
+            message.reason === "busy"
+              ? `⚠️ The server is busy, try again in ${message.retry_after}s.`
+              : `⚠️ Too many runs, try again in ${message.retry_after}s.`,
+          ]);
+          break;
+      }
+    };
+
+    return () => {
+      socket.close();
+      codeSocketRef.current = null;
+    };
+  }, [roomId, participantName, showResult, showStarted]);
+
   const runCode = async () => {
     const code = getCode();
     if (!code.trim()) {
@@ -88,6 +214,13 @@ export function CodeEditorSidebar({
       return;
     }
 
+    // Shared run: started, output and result arrive over the room channel
+    const socket = codeSocketRef.current;
+    if (socket && socket.readyState === WebSocket.OPEN) {
+      socket.send(JSON.stringify({ type: "run", code, language: selectedLanguage }));
+      return;
+    }
+
     setIsRunning(true);
     setTerminalOutput((prev) => [
       ...prev,
@@ -106,29 +239,18 @@ export function CodeEditorSidebar({
         body: JSON.stringify({
           code,
           language: selectedLanguage,
+          room_id: roomId,
+          participant: participantName,
         }),
       });
 
       const result = await response.json();
-
-      if (result.success) {
-        if (result.output) {
-          setTerminalOutput((prev) => [...prev, result.output]);
-        }
-        if (result.error) {
-          setTerminalOutput((prev) => [...prev, `❌ Error:\n${result.error}`]);
-        }
-        setTerminalOutput((prev) => [
-          ...prev,
-          "─".repeat(40),
-          `✅ Execution completed (${result.execution_time || "N/A"})`,
-        ]);
-      } else {
-        setTerminalOutput((prev) => [
-          ...prev,
-          `❌ Execution failed: ${result.error || "Unknown error"}`,
-        ]);
+      if (!response.ok && result.retry_after) {
+        // Rate limited (429) or shed under load (503)
+        setTerminalOutput((prev) => [...prev, `⚠️ ${result.detail}, try again in ${result.retry_after}s.`]);
+        return;
       }
+      showResult(result, true);
     } catch (error) {
       setTerminalOutput((prev) => [
         ...prev,
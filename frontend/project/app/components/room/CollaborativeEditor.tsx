@@ -149,10 +149,29 @@ export function CollaborativeEditor({
       `${wsUrl}/ws/yjs`,
       roomId,
       ydoc,
-      { connect: true }
+      { connect: false }
     );
     providerRef.current = provider;
 
+    // Load the document over HTTP first (gzip-compressed when large), so the
+    // WebSocket sync only has to send what changed since the snapshot
+    let cancelled = false;
+    fetch(`${pythonServerUrl}/api/collab/rooms/${encodeURIComponent(roomId)}/snapshot`)
+      .then((response) => (response.ok ? response.arrayBuffer() : null))
+      .then((snapshot) => {
+        if (!cancelled && snapshot && snapshot.byteLength > 0) {
+          Y.applyUpdate(ydoc, new Uint8Array(snapshot), "snapshot");
+        }
+      })
+      .catch((error) => {
+        console.warn(`[CodeEditor] Snapshot load failed, syncing over WebSocket:`, error);
+      })
+      .finally(() => {
+        if (!cancelled) {
+          provider.connect();
+        }
+      });
+
     // Set user awareness (cursor position, name, color)
     const userColor = getColorForName(participantName);
     provider.awareness.setLocalStateField("user", {
@@ -291,6 +310,7 @@ export function CollaborativeEditor({
 
     return () => {
       console.log(`[CodeEditor] Cleaning up editor for room: ${roomId}`);
+      cancelled = true;
       clearTimeout(initTimeout);
       initRef.current = false;
       view.destroy();
@@ -166,7 +166,7 @@ export function VideoConferenceComponent() {
               className="h-full bg-gray-900 border-l border-gray-800 shadow-xl z-10 flex flex-col"
             >
               {activeSidebar === "ai" && (
-                <AISidebar onClose={() => setActiveSidebar("none")} />
+                <AISidebar onClose={() => setActiveSidebar("none")} roomId={roomId} />
               )}
               {activeSidebar === "chat" && (
                 <div className="flex flex-col h-full ">